@@ -38,6 +38,10 @@ common:
   log_format: "%(asctime)s - %(name)s - %(levelname)s - %(module)s.%(funcName)s (line %(lineno)d): %(message)s"
   log_datefmt: "%Y-%m-%d %H:%M:%S"
   log_path: /ink/ink.log
+  # Seconds between checks of this file for changes (0: reload only on
+  # SIGHUP). Settings read per request (e.g. auth, security) apply without
+  # a restart; settings read at start-up (e.g. storage) still need one.
+  config_reload_interval: 5
 
 database:
   host: fastink-db
@@ -58,6 +62,49 @@ auth:
   issuer: ""
   client_id: null
   client_secret: ""
+  # Validated-token cache: positive results (seconds, never past the
+  # credential's own expiry), rejections, max entries. token_cache_redis
+  # shares results between workers through the redis section above.
+  # Token and user writes drop the user's results in this worker and in
+  # redis; other workers may accept the old token until token_cache_ttl.
+  token_cache_ttl: 60
+  token_cache_negative_ttl: 30
+  token_cache_size: 10000
+  token_cache_redis: false
+  # Threads running synchronous backend validation off the event loop.
+  validate_workers: 16
+  # Password tokens carry a signed expiry and validate without the
+  # database. password_revocation_redis keeps revoked tokens (POST
+  # /auth/revoke_token, which reports revocation as disabled when this is
+  # off) in redis until they expire, and every worker checks it on token
+  # cache hits; password_legacy_tokens accepts tokens issued before the
+  # expiry was embedded (no expiry).
+  password_revocation_redis: false
+  password_legacy_tokens: true
+  # Effective-permission cache per user (seconds, max users). Writes in
+  # this process invalidate it; writes from elsewhere show after the TTL.
+  permission_cache_ttl: 60
+  permission_cache_size: 10000
+  # Group-membership index rebuilt from one NSS sweep (seconds; 0 looks
+  # groups up per user). Stale indexes are rebuilt in the background while
+  # lookups use the old one. POST /auth/refresh_group_index forces a rebuild.
+  group_index_ttl: 300
+  # Kerberos tickets: the krb5_renew cron job renews stored tickets that
+  # expire within krb5_renew_ahead seconds (at most krb5_renew_batch per
+  # cycle, krb5_renew_workers krenews at once); get_krb5 only reads them,
+  # cached per process for krb5_ticket_cache_ttl seconds. Set
+  # krb5_renew_on_read to renew inside get_krb5 when there is no cron.
+  krb5_renew_ahead: 7200
+  krb5_renew_batch: 500
+  krb5_renew_workers: 8
+  krb5_ticket_cache_ttl: 60
+  krb5_ticket_cache_size: 10000
+  krb5_renew_on_read: false
+  # One ccache file per user (krb5cc_<uid>) for storage and submission,
+  # rewritten when the stored ticket changes; expired files are removed
+  # every ccache_gc_interval seconds.
+  ccache_dir: /dev/shm/fastink-ccache
+  ccache_gc_interval: 60
 
 security:
   ip_whitelist:
@@ -74,6 +121,7 @@ security:
     - /api/v2/auth/get_users_by_permission
     - /api/v2/auth/get_user
     - /api/v2/auth/create_user
+    - /api/v2/auth/refresh_group_index
     - /api/v2/fs/shared_file
     - /api/v2/service/access_shared_rootfile
   # Routers in ip_controlled_routers where a VALID Ink-Username/Ink-Token
@@ -107,8 +155,60 @@ security:
 
 storage:
   xrd_host: {{ xrd_host | to_yaml }}
+  # xrootd/eos: xrdfs/xrdcp commands. xrdcl: in-process XRootD python
+  # bindings with a per-user client pool (needs krb5_enabled, otherwise it
+  # falls back to the xrootd commands). lustre/nfs/fuse, http, s3.
   fs_backend: xrootd
   max_file_size: 2147483648
+  # xrdcl backend: max pooled per-user clients and per-request timeout (s).
+  xrdcl_pool_size: 256
+  xrdcl_timeout: 20
+  # Seconds an unused XrdCl channel (e.g. of an evicted client) stays open.
+  xrdcl_channel_ttl: 120
+  # Per-user path_exist/list_path cache (seconds, entries). 0 disables it.
+  meta_cache_ttl: 5
+  meta_cache_size: 10000
+  # Files fetched ahead while streaming download_dir/download_list zips.
+  zip_parallel: 4
+  # delete_path: concurrent xrdfs calls and files removed per xrdfs rm call.
+  delete_parallel: 8
+  delete_batch_size: 64
+  # Multipart uploads: parts are staged here ("~" is the user's home) and
+  # sessions older than upload_expire seconds are purged. An assembly that
+  # has not finished after upload_assemble_timeout seconds (e.g. its worker
+  # died) may be restarted by calling upload_complete again.
+  upload_staging_dir: "~/.ink/uploads"
+  upload_expire: 86400
+  upload_assemble_timeout: 3600
+  # s3 backend (pip install fastink[s3]). POSIX path /a/b is stored as key
+  # <s3_prefix>a/b in s3_bucket; users may only touch paths below
+  # s3_user_roots ("{username}" and "~" are expanded). Empty credentials
+  # fall back to the default AWS credential chain.
+  s3_endpoint: ""
+  s3_region: ""
+  s3_bucket: ""
+  s3_access_key: ""
+  s3_secret_key: ""
+  s3_prefix: ""
+  s3_user_roots: ["~"]
+  # Pooled HTTP connections, multipart part size and parts in flight.
+  s3_pool_size: 64
+  s3_part_size: 8388608
+  s3_parallel: 8
+  # http backend (WebDAV). Paths are appended to http_endpoint (defaults to
+  # xrd_host). http_auth: krb5 (SPNEGO from the user's ccache, pip install
+  # fastink[http]), bearer (token read from http_token_file, "{uid}" and
+  # "{username}" are expanded) or none (users limited to http_user_roots).
+  http_endpoint: ""
+  http_auth: krb5
+  http_token_file: "/tmp/bt_u{uid}"
+  http_user_roots: ["~"]
+  # Keep-alive connections shared by all users, timeout (s), TLS checks and
+  # directories listed concurrently by recursive list_path.
+  http_pool_size: 100
+  http_timeout: 60
+  http_verify_ssl: true
+  http_list_parallel: 8
 
 computing:
   site: generic
@@ -137,6 +237,10 @@ computing:
   node_domain_suffix: {{ node_domain_suffix | to_yaml }}
   # Slurm partitions counted in system-info summaries. Empty = all.
   system_info_partitions: []
+  # Slurm job lists are served from the snapshot published by the
+  # slurm_update_job_state cron job while it is at most this many seconds
+  # old; otherwise query_jobs runs sacct itself. 0 = always run sacct.
+  sacct_snapshot_max_age: 30
   # NOTE: start_keywords / noenv_jobtype / iptables_jobtype are no longer
   # part of the config -- they are derived at runtime from the JobApp
   # classes under fastink.computing.apps (via fastink.computing.apps.registry).
@@ -147,6 +251,12 @@ crond:
   submit_workers: []
   async_submit_retries: 3
   retry_delay_seconds: 10
+  # The schedd's job event log (its EVENT_LOG) as mounted in the cron
+  # container. When set, refresh_redis_jobs only applies the changes it
+  # records; empty = re-query the whole queue every cycle.
+  condor_event_log: ""
+  # Seconds between full HTCondor queue resyncs when the event log is used.
+  condor_full_resync_interval: 300
 
 job_time:
   walltime: 24
@@ -50,4 +50,9 @@ setup(
         "uvicorn",
         "websockets",
     ],
+    extras_require={
+        "s3": ["aiobotocore"],
+        "http": ["gssapi"],
+        "xrdcl": ["xrootd"],
+    },
 )
@@ -0,0 +1,79 @@
+"""Awaitable view of auth backends.
+
+Request middlewares await ``validate_token`` on every API call. Backends
+written against :class:`~fastink.auth.backends.base.AsyncAuthBackend` are
+used as they are; synchronous backends (krb5, password, most plugins) are
+wrapped so each call runs on a shared thread pool of
+``auth.validate_workers`` threads. The pool bounds how many blocking
+validations (database lookups, identity-provider calls) run at once, and
+the event loop keeps serving other requests while they do.
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastink.common.config import get_config
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_config("auth", "validate_workers", fallback=16, type=int),
+                    thread_name_prefix="ink-auth",
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the auth thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), functools.partial(func, *args, **kwargs))
+
+
+def is_async_backend(backend) -> bool:
+    return inspect.iscoroutinefunction(getattr(backend, "validate_token", None))
+
+
+class ThreadedBackend:
+    """Expose a synchronous backend's validation as coroutines."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        if hasattr(backend, "validated_until"):
+            self.validated_until = self._validated_until
+
+    def create_token(self, username: str, password: Optional[str] = None) -> Optional[dict]:
+        return self.backend.create_token(username, password)
+
+    def get_token(self, username: str) -> str:
+        return self.backend.get_token(username)
+
+    async def validate_token(self, username: str, token: str, **kwargs) -> bool:
+        return await run_blocking(self.backend.validate_token, username=username, token=token, **kwargs)
+
+    async def _validated_until(self, username: str, token: str, **kwargs) -> float:
+        return await run_blocking(self.backend.validated_until, username=username, token=token, **kwargs)
+
+
+_wrapped = {}
+
+
+def as_async(backend):
+    """Return ``backend`` if it is already async, else its threaded wrapper."""
+    if is_async_backend(backend):
+        return backend
+    wrapper = _wrapped.get(id(backend))
+    if wrapper is None or wrapper.backend is not backend:
+        wrapper = _wrapped[id(backend)] = ThreadedBackend(backend)
+    return wrapper
@@ -13,6 +13,19 @@ the ``@register_backend("<name>")`` decorator. The backend for a request
 is selected by the ``auth.type`` config key, which is also the backend's
 ``name`` and the authentication record name in the database.
 
+A backend may also implement ``validated_until(username, token, **kw)``,
+which validates like ``validate_token`` and returns the Unix time the
+credential stops being valid (raising when it is invalid). The token cache
+in :mod:`fastink.auth.token_cache` uses it to never outlive a credential.
+Backends with revocable credentials may implement
+``revoke_token(username, token)``, served by ``POST /auth/revoke_token``.
+
+Backends whose validation does I/O may implement ``validate_token`` (and
+``validated_until``) as coroutines instead; see :class:`AsyncAuthBackend`.
+The request middlewares always validate through
+:func:`fastink.auth.backends.aio.as_async`, which runs synchronous backends
+on a bounded thread pool so a slow check never blocks the event loop.
+
 Built-in backends (password, krb5) live under this package. Site
 backends (e.g. IHEP's apikey/hai) live in plugin packages and register
 the same way — the plugin's ``initialize()`` imports its backend module.
@@ -70,3 +83,32 @@ class AuthBackend(Protocol):
         than hidden behind ``**kwargs`` for readability.
         """
         ...
+
+
+@runtime_checkable
+class AsyncAuthBackend(Protocol):
+    """Variant of :class:`AuthBackend` whose hot path is a coroutine.
+
+    ``create_token``/``get_token`` keep their synchronous signatures (they
+    run from route handlers and cron); only validation, which runs on every
+    request, is awaited. An optional ``validated_until`` must then be a
+    coroutine as well.
+    """
+
+    name: str
+
+    def create_token(self, username: str, password: Optional[str] = None) -> Optional[dict]:
+        ...
+
+    def get_token(self, username: str) -> str:
+        ...
+
+    async def validate_token(
+        self,
+        username: str,
+        token: str,
+        client_id: Optional[str] = None,
+        client_secret: Optional[str] = None,
+        issuer: Optional[str] = None,
+    ) -> bool:
+        ...
@@ -6,10 +6,13 @@ import tempfile
 from datetime import datetime, timedelta
 from typing import Optional
 
+from fastink.common.ccache import CCache, parse_token, read_ccache
+from fastink.common.config import get_config
 from fastink.common.hooks import hookable
 from fastink.common.logger import logger
 from fastink.common.utils import ccachefile_to_token, token_to_ccachefile
 from fastink.auth.account import validate_account_status
+from fastink.auth.ticket_cache import ticket_cache
 from fastink.auth.common import (
     add_kerberos_token,
     get_kerberos_token,
@@ -150,39 +153,36 @@ def _renew_tgt(ccachefile: str) -> bool:
         raise ValueError(f"Failed to renew TGT for {ccachefile}. {error}")
 
 
-def resolve_tgt(ccache_file: str):
-    def time_to_timestamp(date_str, time_str):
-        datetime_str = f"{date_str} {time_str}"
-        dt = datetime.strptime(datetime_str, "%m/%d/%y %H:%M:%S")
-        timestamp = dt.timestamp()
-        return int(timestamp)
-
-    logger.debug(f"Resolving tgt")
-    try:
-        result = subprocess.run(
-            ["klist", "-c", f"{ccache_file}"],
-            capture_output=True,
-            text=True,
-            env={"LC_TIME": "C"},
-        )
-    except subprocess.CalledProcessError as error:
-        raise ValueError(f"Failed to resolve tgt for {ccache_file}. {error}")
-    result = result.stdout.split("\n")
-    username = result[1].split()[2].split("@")[0]
-    expired_at = result[4].split()[2:4]
-    renew_until = result[5].split()[2:4]
+def _tgt_summary(ccache: CCache) -> dict:
+    tgt = ccache.tgt()
+    if tgt is None:
+        raise ValueError("No ticket in ccache")
+    # Tickets that are not renewable have no renew_till.
+    renew_until = tgt.renew_till or tgt.endtime
     logger.debug(
-        f"Username: {username}, Expired at: {expired_at}, Renew until: {renew_until}"
+        f"Username: {ccache.username}, Expired at: {tgt.endtime}, Renew until: {renew_until}"
     )
-    expired_at_int = time_to_timestamp(*expired_at)
-    renew_until_int = time_to_timestamp(*renew_until)
     return {
-        "username": username,
-        "expired_at": expired_at_int,
-        "renew_until": renew_until_int,
+        "username": ccache.username,
+        "expired_at": tgt.endtime,
+        "renew_until": renew_until,
     }
 
 
+def resolve_tgt(ccache_file: str):
+    logger.debug(f"Resolving tgt")
+    try:
+        ccache = read_ccache(ccache_file)
+    except (OSError, ValueError) as error:
+        raise ValueError(f"Failed to resolve tgt for {ccache_file}. {error}")
+    return _tgt_summary(ccache)
+
+
+def resolve_token(token: str):
+    """Same as ``resolve_tgt`` for a base64 ccache token, without a file."""
+    return _tgt_summary(parse_token(token))
+
+
 def create_krb5(username: str, password: str) -> bool:
     """Create a new kerberos token by username and password.
 
@@ -218,7 +218,7 @@ def _persist_ccache_token(username: str, token: str) -> None:
     every caller (password kinit via ``create_krb5`` and passwordless
     refill via ``get_krb5``) persists tickets consistently. ``expired_at``
     is the conventional 25h estimate used throughout this module, not the
-    ticket's exact klist expiry.
+    ticket's exact expiry.
 
     Args:
         username: Username whose ticket is being stored.
@@ -263,6 +263,7 @@ def _persist_ccache_token(username: str, token: str) -> None:
         except:
             logger.debug(f"Update {username} token to database failed")
             raise Exception(f"Update {username} token to database failed")
+    ticket_cache.invalidate_user(user_id)
 
 
 def _refill_passwordless_or_raise(username: str, original_error: Exception) -> str:
@@ -300,7 +301,13 @@ def get_krb5(
     uid: Optional[int] = None,
     expire_in: int = 3600,
 ) -> Optional[str]:
-    """Get a kerberos token by username, email or uid. If the token is expiring, it will be renewed.
+    """Get a kerberos token by username, email or uid.
+
+    This is a read: tickets are renewed ahead of expiry by the
+    ``krb5_renew`` cron job (``fastink.auth.krb5_renewal``), not here.
+    ``auth.krb5_renew_on_read`` brings back renewal inside the call for
+    deployments without the cron container. Expired or missing tickets
+    still go through the passwordless refill.
 
     Args:
         username (Optional[str], optional): Username in database. Defaults to None.
@@ -319,21 +326,28 @@ def get_krb5(
     if not validate_result.get("password_valid", True):
         raise ValueError("Account password is expired")
 
-    # Getting Token from database.
+    # Getting Token from the cache or the database.
     logger.debug(f"User {username} is trying to extend TGT.")
-    user_item = get_user(username=username, email=email, uid=uid)
+    cache_key = (username, email, uid)
+    cached = ticket_cache.get(cache_key)
+    if cached is not None:
+        user_item, ticket = cached
+    else:
+        user_item = get_user(username=username, email=email, uid=uid)
     user_id = user_item["id"]
     # The passwordless mint API keys off the Kerberos principal name, which
     # may not have been passed in when get_krb5 is called by email/uid.
     principal = user_item.get("username") or username
-    try:
-        ticket = get_kerberos_token(user_id=user_id)
-    except Exception as err:
-        # No ticket in the database (e.g. an SSO user who never submitted a
-        # password). Try to mint one without a password before giving up.
-        return _refill_passwordless_or_raise(
-            principal, ValueError(f"Token not exists in database: {err}")
-        )
+    if cached is None:
+        try:
+            ticket = get_kerberos_token(user_id=user_id)
+        except Exception as err:
+            # No ticket in the database (e.g. an SSO user who never submitted a
+            # password). Try to mint one without a password before giving up.
+            return _refill_passwordless_or_raise(
+                principal, ValueError(f"Token not exists in database: {err}")
+            )
+        ticket_cache.put(cache_key, user_item, ticket)
 
     # Judging if it is expired.
     if ticket["expired_at"] < datetime.now():
@@ -342,30 +356,72 @@ def get_krb5(
             principal, ValueError("Token is expired")
         )
     elif ticket["expired_at"] - datetime.now() < timedelta(seconds=expire_in):
-        logger.debug(f"Token for {username} is expiring soon.")
-        fd, ccachefile = tempfile.mkstemp()
-        os.close(fd)
-        token_to_ccachefile(token=ticket["token"], ccachefile=ccachefile)
+        if get_config("auth", "krb5_renew_on_read", fallback=False, type=bool):
+            logger.debug(f"Token for {username} is expiring soon.")
+            return renew_stored_ticket(user_id, principal, ticket["token"])
+        # Renewal belongs to the krb5_renew cron job; seeing this means it
+        # is not running or is behind.
+        logger.warning(
+            f"Token for {principal} expires at {ticket['expired_at']}, "
+            f"within {expire_in}s, and has not been renewed yet."
+        )
+        return ticket["token"]
+    else:
+        return ticket["token"]
+
+
+def renew_stored_ticket(user_id, principal: str, token: str) -> str:
+    """Renew a stored ticket with krenew and save the result.
+
+    When krenew fails (renew_until has likely passed) this falls back to a
+    passwordless refill, like the other ``get_krb5`` dead-ends.
+
+    Args:
+        user_id: Owner of the ``kerberos_tokens`` row.
+        principal: Kerberos principal, used for the passwordless refill.
+        token: The stored base64 ccache token.
+
+    Returns:
+        The renewed (or refilled) base64 ccache token.
+    """
+    fd, ccachefile = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        token_to_ccachefile(token=token, ccachefile=ccachefile)
         generated_at = datetime.now()
         expired_at = datetime.now() + timedelta(hours=25)
         try:
             _renew_tgt(ccachefile)
         except Exception as err:
-            # renew_until has likely passed; fall back to a passwordless
-            # refill before failing.
-            os.remove(ccachefile)
             return _refill_passwordless_or_raise(principal, err)
         token = ccachefile_to_token(ccachefile)
+    finally:
         os.remove(ccachefile)
-        update_kerberos_token(
-            user_id=user_id,
-            token=token,
-            generated_at=generated_at,
-            expired_at=expired_at,
-        )
-        return token
-    else:
-        return ticket["token"]
+    update_kerberos_token(
+        user_id=user_id,
+        token=token,
+        generated_at=generated_at,
+        expired_at=expired_at,
+    )
+    ticket_cache.invalidate_user(user_id)
+    return token
+
+
+def krb5_token_until(username: str, token: str) -> int:
+    """Check a presented Kerberos ccache token and return its ``renew_until``.
+
+    Raises when the token is malformed, belongs to another user or can no
+    longer be renewed.
+    """
+    try:
+        tgt_result = resolve_token(token)
+    except ValueError:
+        raise Exception("Invalid Kerberos token")
+    if tgt_result["username"] != username:
+        raise Exception("username not match")
+    if tgt_result["renew_until"] <= int(datetime.now().timestamp()):
+        raise Exception("Kerberos token expired")
+    return tgt_result["renew_until"]
 
 
 def validate_krb5_token(
@@ -376,27 +432,8 @@ def validate_krb5_token(
     issuer: Optional[str] = None,
 ) -> bool:
     """Verify a presented Kerberos ccache token (moved from plugins/krb5.py)."""
-    fd, ccachefile = tempfile.mkstemp()
-    os.close(fd)
-    try:
-        token_to_ccachefile(token, ccachefile)
-        try:
-            tgt_result = resolve_tgt(ccachefile)
-        except ValueError:
-            raise Exception("Invalid Kerberos token")
-        if tgt_result["username"] != username:
-            raise Exception("username not match")
-        if tgt_result["renew_until"] <= int(datetime.now().timestamp()):
-            raise Exception("Kerberos token expired")
-        return True
-    finally:
-        # Always clean up the temp ccache, even when the token is
-        # malformed/invalid/expired, so hot-path validation of bad
-        # tokens cannot leak temp files.
-        try:
-            os.remove(ccachefile)
-        except OSError:
-            pass
+    krb5_token_until(username, token)
+    return True
 
 
 from fastink.auth.backends.registry import register_backend
@@ -406,7 +443,7 @@ from fastink.auth.backends.registry import register_backend
 class Krb5Backend:
     """Kerberos authentication backend.
 
-    Wraps the module-level TGT implementation (kinit/krenew/klist) behind
+    Wraps the module-level TGT implementation (kinit/krenew, ccache parsing) behind
     the AuthBackend protocol. The heavy lifting stays in the module
     functions above so the tested logic is unchanged.
     """
@@ -431,3 +468,8 @@ class Krb5Backend:
         issuer: Optional[str] = None,
     ) -> bool:
         return validate_krb5_token(username, token, client_id, client_secret, issuer)
+
+    def validated_until(self, username: str, token: str, **_) -> float:
+        """Validate like ``validate_token`` and return the ticket's
+        ``renew_until``, which bounds how long the result may be cached."""
+        return krb5_token_until(username, token)
@@ -4,9 +4,15 @@ Consolidates the former ``auth/token.py`` (DB token orchestration) and
 ``auth/plugins/password.py`` (Fernet crypto + /etc/passwd validation)
 into one :class:`PasswordBackend`.
 
-Tokens are the username encrypted with a Fernet key derived from the
-``password`` authentication record's UUID. Validation decrypts and
-compares; user validation checks the system password database.
+Tokens are ``<username>\n<expiry>`` encrypted with a Fernet key derived
+from the ``password`` authentication record's UUID; Fernet authenticates
+the payload, so the expiry cannot be changed without the key. Validation
+decrypts with a per-process cipher and checks user, expiry and the
+optional revocation list (:mod:`fastink.auth.revocation`), all without
+the database. Tokens issued before the expiry was embedded hold only the
+username; they are accepted, without expiry, while
+``auth.password_legacy_tokens`` is true. User validation checks the
+system password database.
 """
 
 from __future__ import annotations
@@ -16,9 +22,10 @@ import crypt
 import functools
 import pwd
 import spwd
+import time
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 from cryptography.fernet import Fernet
 
@@ -30,6 +37,8 @@ from fastink.auth.common import (
     get_user,
     update_token,
 )
+from fastink.auth.revocation import revocation_list
+from fastink.common.config import get_config
 from fastink.common.logger import logger
 
 
@@ -45,12 +54,29 @@ def _fernet_key() -> bytes:
     return base64.urlsafe_b64encode(uuid_bytes.ljust(32, b"\0"))
 
 
+@functools.lru_cache(maxsize=1)
+def _fernet() -> Fernet:
+    """The cipher, built once per process (Fernet objects are thread-safe)."""
+    return Fernet(_fernet_key())
+
+
 def _encrypt(payload: str) -> str:
-    return Fernet(_fernet_key()).encrypt(payload.encode("utf-8")).decode("utf-8")
+    return _fernet().encrypt(payload.encode("utf-8")).decode("utf-8")
 
 
 def _decrypt(token: str) -> str:
-    return Fernet(_fernet_key()).decrypt(token.encode("utf-8")).decode("utf-8")
+    return _fernet().decrypt(token.encode("utf-8")).decode("utf-8")
+
+
+def _issue(username: str, expired_at: datetime) -> str:
+    return _encrypt(f"{username}\n{int(expired_at.timestamp())}")
+
+
+def _claims(token: str) -> Tuple[str, Optional[float]]:
+    """(username, expiry) of a token; expiry is None for legacy tokens.
+    Raises when the token does not decrypt."""
+    username, sep, expiry = _decrypt(token).partition("\n")
+    return username, float(expiry) if sep else None
 
 
 def _validate_user(username: str, password: str, uid: Optional[str] = None) -> bool:
@@ -87,9 +113,9 @@ class PasswordBackend:
 
         user_id = get_user(username=username)["id"]
         authentication_id = get_authentication(authentication=self.name)["id"]
-        token_value = _encrypt(username)
         generated_at = datetime.now()
         expired_at = datetime.now() + timedelta(seconds=expire_in)
+        token_value = _issue(username, expired_at)
 
         logger.debug(f"Create token for {username} = {user_id}")
         try:
@@ -129,19 +155,24 @@ class PasswordBackend:
         if token is None or token["expired_at"] < datetime.now():
             logger.debug(f"Token for {username} is expired.")
             raise ValueError("Token expired")
-        elif token["expired_at"] - datetime.now() < timedelta(seconds=expire_in):
-            logger.debug(f"Token for {username} is expiring soon.")
+        elif token["expired_at"] - datetime.now() < timedelta(seconds=expire_in) or (
+            _claims(token["token"])[1] is None
+        ):
+            # The expiry is part of the token, so extending it (or moving a
+            # legacy token to the signed format) means issuing a new one.
+            logger.debug(f"Token for {username} is expiring soon or unsigned.")
             authentication_id = get_authentication(authentication=self.name)["id"]
             generated_at = datetime.now()
-            expired_at = datetime.now() + timedelta(seconds=expire_in)
+            expired_at = max(token["expired_at"], datetime.now() + timedelta(seconds=expire_in))
+            token_value = _issue(username, expired_at)
             update_token(
                 user_id=user_id,
                 authentication_id=authentication_id,
-                token=token["token"],
+                token=token_value,
                 generated_at=generated_at,
                 expired_at=expired_at,
             )
-            return token["token"]
+            return token_value
         else:
             logger.debug(f"Token for {username} is valid.")
             return token["token"]
@@ -155,6 +186,44 @@ class PasswordBackend:
         issuer: Optional[str] = None,
     ) -> bool:
         try:
-            return _decrypt(token) == username
+            self.validated_until(username, token)
+            return True
         except Exception:
             return False
+
+    def validated_until(self, username: str, token: str, **_) -> Optional[float]:
+        """Validate in-process and return the token's signed expiry (None for
+        legacy tokens). Raises when the token is invalid."""
+        owner, expiry = _claims(token)
+        if owner != username:
+            raise ValueError("username not match")
+        if expiry is None:
+            if not get_config("auth", "password_legacy_tokens", fallback=True, type=bool):
+                raise ValueError("Unsigned legacy token")
+        elif expiry <= time.time():
+            raise ValueError("Token expired")
+        if revocation_list.is_revoked(token):
+            raise ValueError("Token revoked")
+        return expiry
+
+    def revoke_token(self, username: str, token: str) -> None:
+        """Reject ``token`` from now on (logout). Needs
+        ``auth.password_revocation_redis``."""
+        owner, expiry = _claims(token)
+        if owner != username:
+            raise ValueError("username not match")
+        revocation_list.revoke(username, token, expiry)
+        # get_token must not hand the revoked token out again
+        try:
+            user_id = get_user(username=username)["id"]
+            stored = get_token(user_id=user_id)
+        except Exception:
+            return
+        if stored and stored["token"] == token:
+            update_token(
+                user_id=user_id,
+                authentication_id=stored["authentication_id"],
+                token=stored["token"],
+                generated_at=stored["generated_at"],
+                expired_at=datetime.now(),
+            )
@@ -8,6 +8,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import update, select, delete
 from typing import Optional, Any
 
+from fastink.auth.permission_cache import invalidates_permissions
+from fastink.auth.token_cache import invalidates_tokens
 from fastink.database.sqla import models
 from fastink.database.sqla.session import read_session, transactional_session
 from fastink.common.logger import logger
@@ -87,6 +89,17 @@ def get_user(
         raise NoResultFound("User not found")
 
 
+@read_session
+def get_username(user_id: str, *, session: Session) -> str:
+    stmt = select(models.Users.username).where(models.Users.id == user_id)
+    try:
+        return session.execute(stmt).scalar_one()
+    except NoResultFound:
+        raise NoResultFound("User not found")
+
+
+@invalidates_tokens
+@invalidates_permissions("user")
 @transactional_session
 def update_user(
     user_id: str,
@@ -117,6 +130,8 @@ def update_user(
         raise IntegrityError("Updated user is duplicated with another existing user")
 
 
+@invalidates_tokens
+@invalidates_permissions("user")
 @transactional_session
 def delete_user(user_id: str, *, session: Session) -> bool:
     try:
@@ -189,6 +204,7 @@ def get_all_permissions(*, session: Session) -> list[dict[str, Any]]:
     return [i.to_dict() for i in result]
 
 
+@invalidates_permissions()
 @transactional_session
 def update_permission(
     permission_id: str, permission: Optional[str] = None, *, session: Session
@@ -210,6 +226,7 @@ def update_permission(
         )
 
 
+@invalidates_permissions()
 @transactional_session
 def delete_permission(permission_id: str, *, session: Session) -> bool:
     try:
@@ -243,6 +260,7 @@ def get_app(app_name: Optional[str], *, session: Session) -> Optional[dict[str,
         raise NoResultFound("App not found")
 
 
+@invalidates_permissions()
 @transactional_session
 def update_app(
     app_id: str, app_name: Optional[str] = None, *, session: Session
@@ -262,6 +280,7 @@ def update_app(
         raise IntegrityError("Updated app is duplicated with another existing app")
 
 
+@invalidates_permissions()
 @transactional_session
 def delete_app(app_id: str, *, session: Session) -> bool:
     try:
@@ -376,6 +395,7 @@ def get_token(
         raise NoResultFound("Token not found")
 
 
+@invalidates_tokens
 @transactional_session
 def update_token(
     user_id: str,
@@ -443,6 +463,33 @@ def get_kerberos_token(
         raise NoResultFound("Kerberos token not found")
 
 
+@read_session
+def get_expiring_kerberos_tokens(
+    expire_before: datetime,
+    expire_after: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    *,
+    session: Session,
+) -> list[dict[str, Any]]:
+    """Kerberos tokens with ``expire_after <= expired_at < expire_before``,
+    soonest first, each with its owner's ``username``."""
+    stmt = (
+        select(models.KerberosTokens, models.Users.username)
+        .join(models.Users, models.Users.id == models.KerberosTokens.user_id)
+        .where(models.KerberosTokens.expired_at < expire_before)
+        .order_by(models.KerberosTokens.expired_at)
+    )
+    if expire_after is not None:
+        stmt = stmt.where(models.KerberosTokens.expired_at >= expire_after)
+    if limit:
+        stmt = stmt.limit(limit)
+    return [
+        {**ticket.to_dict(), "username": username}
+        for ticket, username in session.execute(stmt).all()
+    ]
+
+
+@invalidates_tokens
 @transactional_session
 def update_kerberos_token(
     user_id: str,
@@ -472,6 +519,7 @@ def update_kerberos_token(
         )
 
 
+@invalidates_tokens
 @transactional_session
 def delete_kerberos_token(user_id: str, *, session: Session) -> bool:
     try:
@@ -485,6 +533,7 @@ def delete_kerberos_token(user_id: str, *, session: Session) -> bool:
         raise DatabaseError("Failed to delete kerberos token")
 
 
+@invalidates_permissions("user")
 @transactional_session
 def add_user_permission(user_id: str, permission_id: str, *, session: Session) -> bool:
     try:
@@ -498,6 +547,64 @@ def add_user_permission(user_id: str, permission_id: str, *, session: Session) -
         raise IntegrityError("User permission already exists")
 
 
+@read_session
+def get_effective_permissions(
+    username: str, group_names: list[str], *, session: Session
+) -> dict[str, Any]:
+    """Return everything granted to ``username`` in three queries.
+
+    Direct permissions come from one outer join on the user row, group
+    permissions from a single ``IN`` over ``group_names`` and apps from one
+    join. Permission names are ordered direct first, then by the order of
+    ``group_names``, without duplicates.
+
+    Raises NoResultFound if the user does not exist.
+    """
+    stmt = (
+        select(models.Users.id, models.Permissions.permission)
+        .select_from(models.Users)
+        .outerjoin(
+            models.UserPermissions,
+            models.UserPermissions.user_id == models.Users.id,
+        )
+        .outerjoin(
+            models.Permissions,
+            models.Permissions.id == models.UserPermissions.permission_id,
+        )
+        .where(models.Users.username == username)
+    )
+    rows = session.execute(stmt).all()
+    if not rows:
+        raise NoResultFound("User not found")
+    user_id = rows[0][0]
+    permissions = [perm for _, perm in rows if perm is not None]
+
+    if group_names:
+        stmt = (
+            select(models.GroupPermissions.group_name, models.Permissions.permission)
+            .join(
+                models.Permissions,
+                models.Permissions.id == models.GroupPermissions.permission_id,
+            )
+            .where(models.GroupPermissions.group_name.in_(group_names))
+        )
+        order = {group: i for i, group in reversed(list(enumerate(group_names)))}
+        granted = sorted(session.execute(stmt).all(), key=lambda row: order[row[0]])
+        permissions.extend(perm for _, perm in granted)
+
+    stmt = (
+        select(models.Apps.app)
+        .join(models.UserApps, models.UserApps.app_id == models.Apps.id)
+        .where(models.UserApps.user_id == user_id)
+    )
+    apps = session.execute(stmt).scalars().all()
+    return {
+        "user_id": str(user_id),
+        "permissions": list(dict.fromkeys(permissions)),
+        "apps": list(apps),
+    }
+
+
 @read_session
 def get_user_permission(
     user_id: str, permission_id: str, *, session: Session
@@ -530,6 +637,7 @@ def get_user_permissions(
     return result
 
 
+@invalidates_permissions("user")
 @transactional_session
 def delete_user_permission(
     user_id: str, permission_id: str, *, session: Session
@@ -546,6 +654,7 @@ def delete_user_permission(
         raise DatabaseError("Failed to delete user permission")
 
 
+@invalidates_permissions()
 @transactional_session
 def delete_all_user_permissions_by_permission(
     permission_id: str, *, session: Session
@@ -565,6 +674,7 @@ def delete_all_user_permissions_by_permission(
         raise DatabaseError("Failed to delete user permissions by permission")
 
 
+@invalidates_permissions("user")
 @transactional_session
 def add_user_app(user_id: str, app_id: str, *, session: Session) -> bool:
     try:
@@ -593,6 +703,7 @@ def get_user_app(
         raise NoResultFound("User app not found")
 
 
+@invalidates_permissions("user")
 @transactional_session
 def delete_user_app(user_id: str, app_id: str, *, session: Session) -> bool:
     try:
@@ -658,6 +769,7 @@ def delete_user_authorization(
 # ---------------------------------------------------------------------------
 
 
+@invalidates_permissions()
 @transactional_session
 def add_group_permission(
     group_name: str, permission_id: str, *, session: Session
@@ -702,6 +814,7 @@ def get_group_permissions(
     return [r.to_dict() for r in result]
 
 
+@invalidates_permissions()
 @transactional_session
 def delete_group_permission(
     group_name: str, permission_id: str, *, session: Session
@@ -719,6 +832,7 @@ def delete_group_permission(
         raise DatabaseError("Failed to delete group permission")
 
 
+@invalidates_permissions()
 @transactional_session
 def delete_all_group_permissions_by_permission(
     permission_id: str, *, session: Session
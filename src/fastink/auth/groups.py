@@ -3,33 +3,57 @@
 Provides a hookable function to resolve a user's Linux group memberships
 (primary + supplemental). The default implementation uses OS calls.
 IHEP's plugin overrides this hook to query the CCS database instead.
+
+Lookups are served from a group-membership index (``group_index``): one
+sweep of the group and passwd databases (``sweep_group_database``, itself
+hookable for sites with a bulk group source) builds gid -> name and
+uid -> primary gid maps. ``gr_mem`` from ``getgrall()`` misses memberships
+that SSSD/LDAP/AD only report per user, so username -> groups comes from
+the sweep only when the hook declares it ``complete``; otherwise each user
+is resolved with ``getgrouplist`` on first use and kept in the index.
+
+Once the index is older than ``auth.group_index_ttl`` seconds a lookup
+starts a rebuild in a background thread and keeps answering from the old
+maps; users resolved one by one are re-resolved by that rebuild.
+``auth.group_index_ttl: 0`` disables the index.
 """
 
 import grp
 import os
 import pwd
+import threading
+import time
+from typing import Optional
 
+from fastink.common.config import get_config
 from fastink.common.hooks import hookable
 from fastink.common.logger import logger
 
 
 @hookable
-def get_user_groups(username: str) -> list[str]:
-    """Return ALL Linux groups a user belongs to (primary + supplemental).
-
-    Default implementation uses os.getgrouplist(). Plugins (e.g., IHEP)
-    can override this via register_hook("fastink.auth.groups.get_user_groups")
-    to use their own group database (CCS DB).
+def sweep_group_database() -> dict:
+    """Enumerate all groups and users in one pass.
 
-    Args:
-        username: The Unix username.
+    Plugins with a bulk group source can override this via
+    register_hook("fastink.auth.groups.sweep_group_database").
 
     Returns:
-        List of group name strings. Returns empty list on failure.
+        ``{"groups": [(name, gid, [member, ...]), ...],
+        "users": [(username, uid, primary_gid), ...], "complete": bool}``.
+        Either list may be partial; users absent from ``users`` fall back
+        to per-user lookups. Set ``complete`` only when the member lists
+        hold every supplemental membership of the listed users; without it
+        memberships are resolved per user.
     """
+    groups = [(g.gr_name, g.gr_gid, list(g.gr_mem)) for g in grp.getgrall()]
+    users = [(p.pw_name, p.pw_uid, p.pw_gid) for p in pwd.getpwall()]
+    return {"groups": groups, "users": users, "complete": False}
+
+
+def _nss_user_groups(username: str) -> list[str]:
+    """Per-user NSS lookup (primary + supplemental), the pre-index path."""
     try:
         pw = pwd.getpwnam(username)
-        uid = pw.pw_uid
         primary_gid = pw.pw_gid
         group_ids = os.getgrouplist(username, primary_gid)
     except (KeyError, OSError) as e:
@@ -48,12 +72,170 @@ def get_user_groups(username: str) -> list[str]:
     return list(dict.fromkeys(groups))
 
 
+class GroupIndex:
+    """In-memory gid/uid/username -> group maps, rebuilt in the background
+    when stale."""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.built_at = 0.0
+        self.gid_names: dict[int, str] = {}
+        self.primary_gids: dict[int, int] = {}
+        self.user_groups: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self._rebuild: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def refresh(self) -> None:
+        """Rebuild the index now."""
+        tm_start = time.perf_counter()
+        sweep = sweep_group_database()
+        gid_names = {}
+        members: dict[str, list[str]] = {}
+        for name, gid, group_members in sweep.get("groups", []):
+            gid_names.setdefault(gid, name)
+            for member in group_members:
+                members.setdefault(member, []).append(name)
+
+        primary_gids = {}
+        user_groups = {}
+        for username, uid, primary_gid in sweep.get("users", []):
+            primary_gids.setdefault(uid, primary_gid)
+            if sweep.get("complete"):
+                primary = gid_names.get(primary_gid)
+                groups = ([primary] if primary else []) + members.get(username, [])
+                user_groups[username] = list(dict.fromkeys(groups))
+        for username in list(self.user_groups):
+            if username not in user_groups:
+                user_groups[username] = _nss_user_groups(username)
+
+        with self._lock:
+            self.gid_names = gid_names
+            self.primary_gids = primary_gids
+            self.user_groups = user_groups
+            self.built_at = time.time()
+        logger.info(
+            "Group index rebuilt: %d groups, %d users in %.3fs",
+            len(gid_names), len(user_groups), time.perf_counter() - tm_start,
+        )
+
+    def _fresh(self) -> None:
+        if time.time() - self.built_at < self.ttl:
+            return
+        with self._lock:
+            if time.time() - self.built_at < self.ttl or self._rebuild is not None:
+                return
+            self._rebuild = threading.Thread(
+                target=self._rebuild_in_background, name="group-index", daemon=True
+            )
+            self._rebuild.start()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("Group index rebuild failed: %s", e)
+            with self._lock:
+                # keep serving the old maps; retry after another ttl
+                self.built_at = time.time()
+        finally:
+            self._rebuild = None
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for a running background rebuild."""
+        rebuild = self._rebuild
+        if rebuild is not None:
+            rebuild.join(timeout)
+
+    def groups_of(self, username: str) -> list[str]:
+        self._fresh()
+        groups = self.user_groups.get(username)
+        if groups is None:
+            groups = _nss_user_groups(username)
+            self.user_groups[username] = groups
+        return list(groups)
+
+    def primary_gid(self, uid: int) -> int:
+        """Primary gid of ``uid``; raises KeyError like ``pwd.getpwuid``."""
+        self._fresh()
+        gid = self.primary_gids.get(uid)
+        if gid is None:
+            gid = self.primary_gids[uid] = pwd.getpwuid(uid).pw_gid
+        return gid
+
+    def gid_name(self, gid: int) -> str:
+        """Name of ``gid``; raises KeyError like ``grp.getgrgid``."""
+        self._fresh()
+        name = self.gid_names.get(gid)
+        if name is None:
+            name = self.gid_names[gid] = grp.getgrgid(gid).gr_name
+        return name
+
+    def stats(self) -> dict:
+        return {
+            "groups": len(self.gid_names),
+            "users": len(self.user_groups),
+            "age": time.time() - self.built_at if self.built_at else None,
+        }
+
+
+group_index = GroupIndex(
+    ttl=get_config("auth", "group_index_ttl", fallback=300, type=float),
+)
+
+
+def refresh_group_index() -> dict:
+    """Force a rebuild (e.g. after group changes) and drop cached permission
+    sets, which depend on group membership."""
+    from fastink.auth.permission_cache import permission_cache
+
+    group_index.refresh()
+    permission_cache.clear()
+    return group_index.stats()
+
+
+def lookup_user_groups(username: str) -> list[str]:
+    """Groups of ``username`` from the index, bypassing the hooks below."""
+    if not group_index.enabled:
+        return _nss_user_groups(username)
+    return group_index.groups_of(username)
+
+
+def primary_group_name(uid: int) -> str:
+    """Primary group name of ``uid``; raises KeyError for unknown ids."""
+    if not group_index.enabled:
+        return grp.getgrgid(pwd.getpwuid(uid).pw_gid).gr_name
+    return group_index.gid_name(group_index.primary_gid(uid))
+
+
+@hookable
+def get_user_groups(username: str) -> list[str]:
+    """Return ALL Linux groups a user belongs to (primary + supplemental).
+
+    Default implementation reads the group index (see module docstring).
+    Plugins (e.g., IHEP) can override this via
+    register_hook("fastink.auth.groups.get_user_groups") to use their own
+    group database (CCS DB).
+
+    Args:
+        username: The Unix username.
+
+    Returns:
+        List of group name strings. Returns empty list on failure.
+    """
+    return lookup_user_groups(username)
+
+
 @hookable
 def get_users_groups(usernames: list[str]) -> dict[str, list[str]]:
     """Return Linux group memberships for many users at once.
 
-    The default implementation loops over get_user_groups() per user.
-    Plugins backed by a remote group database SHOULD override this via
+    The default implementation answers from the group index, one
+    dictionary lookup per user. Plugins backed by a remote group database
+    SHOULD override this via
     register_hook("fastink.auth.groups.get_users_groups") with a true
     batch implementation (e.g., a single IN (...) query) to avoid the
     N+1 lookup cost on bulk endpoints such as
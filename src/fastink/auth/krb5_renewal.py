@@ -0,0 +1,95 @@
+"""Ahead-of-time renewal of stored Kerberos tickets.
+
+Runs inside the cron container (job ``krb5_renew`` in
+deploy/images/cron/cron.yaml), so ``get_krb5`` only reads tickets and no
+request pays for a krenew. Each cycle selects the stored tickets whose
+``expired_at`` falls within the next ``auth.krb5_renew_ahead`` seconds,
+soonest first and at most ``auth.krb5_renew_batch`` of them, and renews
+them with at most ``auth.krb5_renew_workers`` krenew processes at once.
+Tickets that can no longer be renewed go through the passwordless refill
+hook; failures are logged and retried on the next cycle. Already expired
+tickets are left to ``get_krb5``'s refill path.
+
+The last cycle's counts are written to the ``krb5_renewal:meta`` redis
+hash and logged.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastink.auth.backends.krb5 import renew_stored_ticket
+from fastink.auth.common import get_expiring_kerberos_tokens
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+from fastink.inkdb.inkredis import redis_connect
+
+META_KEY = "krb5_renewal:meta"
+
+
+async def _renew_one(semaphore: asyncio.Semaphore, ticket: dict) -> bool:
+    async with semaphore:
+        try:
+            await asyncio.to_thread(
+                renew_stored_ticket, ticket["user_id"], ticket["username"], ticket["token"]
+            )
+            return True
+        except Exception as e:
+            logger.warning(
+                "krb5_renewal: renewing ticket of %s (expires %s) failed: %s",
+                ticket["username"], ticket["expired_at"], e,
+            )
+            return False
+
+
+async def _record(stats: dict) -> None:
+    r = redis_connect()
+    try:
+        await r.hset(META_KEY, mapping={k: str(v) for k, v in stats.items()})
+    except Exception as e:
+        logger.warning("krb5_renewal: storing metrics failed: %s", e)
+    finally:
+        await r.aclose()
+
+
+async def renew_expiring_tickets() -> dict:
+    """One renewal cycle. Called periodically by the cron runner."""
+    if not get_config("common", "krb5_enabled", fallback=False, type=bool):
+        return {}
+
+    ahead = get_config("auth", "krb5_renew_ahead", fallback=7200, type=int)
+    workers = max(1, get_config("auth", "krb5_renew_workers", fallback=8, type=int))
+    batch = get_config("auth", "krb5_renew_batch", fallback=500, type=int)
+
+    tm_start = time.perf_counter()
+    now = datetime.now()
+    tickets = await asyncio.to_thread(
+        get_expiring_kerberos_tokens,
+        expire_before=now + timedelta(seconds=ahead),
+        expire_after=now,
+        limit=batch,
+    )
+    if batch and len(tickets) >= batch:
+        logger.warning(
+            "krb5_renewal: %d tickets due, more wait for the next cycle", len(tickets)
+        )
+    semaphore = asyncio.Semaphore(workers)
+    results = await asyncio.gather(*(_renew_one(semaphore, t) for t in tickets))
+
+    renewed = sum(results)
+    stats = {
+        "last_run": int(time.time()),
+        "candidates": len(tickets),
+        "renewed": renewed,
+        "failed": len(tickets) - renewed,
+        # seconds left on the most urgent ticket when the cycle started;
+        # values near 0 mean the job cannot keep up.
+        "min_lead": int((tickets[0]["expired_at"] - now).total_seconds()) if tickets else "",
+        "duration": round(time.perf_counter() - tm_start, 3),
+    }
+    await _record(stats)
+    logger.info(
+        "krb5_renewal: %d/%d tickets renewed in %.3fs",
+        renewed, len(tickets), stats["duration"],
+    )
+    return stats
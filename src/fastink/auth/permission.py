@@ -3,7 +3,8 @@ from sqlalchemy.exc import IntegrityError, NoResultFound, DatabaseError
 from typing import Optional, Callable
 
 from fastink.auth import common
-from fastink.auth.groups import get_user_groups
+from fastink.auth.groups import get_user_groups, get_users_groups
+from fastink.auth.permission_cache import EffectivePermissions, permission_cache
 from fastink.auth.backends.krb5 import get_krb5
 from fastink.common.logger import logger
 from fastink.common.utils import timer
@@ -79,49 +80,7 @@ def delete_user_permission(username: str, permission: str) -> bool:
     return True
 
 
-@hookable
-@timer
-def query_user_permissions(
-    username: str = None, email: str = None, uid: str = None
-) -> list:
-    try:
-        user_record = common.get_user(username=username, email=email, uid=uid)
-        user_id = user_record["id"]
-        resolved_username = user_record["username"]
-    except NoResultFound:
-        raise NoResultFound("User not found")
-
-    permissions = list()
-
-    # Step 1: Collect direct user_permissions
-    try:
-        user_permissions = common.get_user_permissions(user_id=user_id)
-        for up in user_permissions:
-            permission_name = common.get_permission_name(up["permission_id"])
-            permissions.append(permission_name)
-    except NoResultFound:
-        pass  # No direct permissions, continue to group check
-
-    # Step 2: Collect group-based permissions (NEW)
-    try:
-        user_groups = get_user_groups(resolved_username)
-    except Exception as e:
-        logger.warning(
-            "Failed to resolve groups for user %s: %s", resolved_username, e
-        )
-        user_groups = []
-
-    for group_name in user_groups:
-        try:
-            group_perms = common.get_permissions_by_group_name(
-                group_name=group_name
-            )
-        except (NoResultFound, DatabaseError):
-            continue
-        for perm_name in group_perms:
-            if perm_name not in permissions:
-                permissions.append(perm_name)
-
+def _order_permissions(permissions: list) -> list:
     # Stupid hack to make CentOS7 and AlmaLinux9 permissions appear first in the list
     if "AlmaLinux9" in permissions:
         permissions.remove("AlmaLinux9")
@@ -132,26 +91,18 @@ def query_user_permissions(
     return permissions
 
 
-@hookable
-def check_user_permission(username: str, permission: str) -> bool:
-    if not username or not permission:
-        raise ValueError(
-            f"username and permission must be non-empty strings, "
-            f"got username={username!r}, permission={permission!r}"
-        )
+def resolve_effective(username: str) -> EffectivePermissions:
+    """Return the user's effective permissions and apps, cached.
 
-    user_id = common.get_user(username=username)["id"]
-    perm_id = common.get_permission(permission=permission)["id"]
-
-    # Step 1: Check direct user_permissions (existing logic)
-    try:
-        if common.get_user_permission(user_id=user_id, permission_id=perm_id):
-            logger.debug(f"User {username} has direct permission {permission}")
-            return True
-    except NoResultFound:
-        pass  # No direct permission, continue to group check
+    A miss costs one group resolution (``get_user_groups``) and one
+    ``common.get_effective_permissions`` call, whatever the number of
+    groups or permissions. Raises NoResultFound for unknown users.
+    """
+    cached = permission_cache.get(username)
+    if cached is not None:
+        return cached
+    generation = permission_cache.generation
 
-    # Step 2: Check group-based permissions (NEW)
     try:
         user_groups = get_user_groups(username)
     except Exception as e:
@@ -160,21 +111,64 @@ def check_user_permission(username: str, permission: str) -> bool:
         )
         user_groups = []
 
-    if user_groups:
+    try:
+        granted = common.get_effective_permissions(
+            username=username, group_names=list(user_groups)
+        )
+    except NoResultFound:
+        raise NoResultFound("User not found")
+
+    effective = EffectivePermissions(
+        user_id=granted["user_id"],
+        username=username,
+        permissions=tuple(_order_permissions(granted["permissions"])),
+        apps=frozenset(granted["apps"]),
+    )
+    permission_cache.put(effective, generation)
+    return effective
+
+
+@hookable
+@timer
+def query_user_permissions(
+    username: str = None, email: str = None, uid: str = None
+) -> list:
+    if not username:
         try:
-            group_names = common.get_group_names_by_permission(
-                permission_name=permission
-            )
-        except (NoResultFound, DatabaseError) as e:
-            logger.warning(
-                "Failed to query group permissions for %s: %s", permission, e
-            )
-            group_names = []
-        if any(g in group_names for g in user_groups):
-            logger.debug(
-                f"User {username} has permission {permission} via group membership"
-            )
-            return True
+            username = common.get_user(username=username, email=email, uid=uid)["username"]
+        except NoResultFound:
+            raise NoResultFound("User not found")
+    return list(resolve_effective(username).permissions)
+
+
+def query_users_by_permission(permission: str) -> list:
+    """Usernames holding ``permission`` directly or through a group.
+
+    Group memberships of all users come from one ``get_users_groups``
+    call, so the cost is one dictionary lookup per user.
+    """
+    holders = [u["username"] for u in common.get_users_by_permission(permission_name=permission)]
+    group_names = set(common.get_group_names_by_permission(permission_name=permission))
+    if group_names:
+        usernames = [u["username"] for u in common.get_users()]
+        memberships = get_users_groups(usernames)
+        for username in usernames:
+            if group_names.intersection(memberships.get(username, ())):
+                holders.append(username)
+    return list(dict.fromkeys(holders))
+
+
+@hookable
+def check_user_permission(username: str, permission: str) -> bool:
+    if not username or not permission:
+        raise ValueError(
+            f"username and permission must be non-empty strings, "
+            f"got username={username!r}, permission={permission!r}"
+        )
+
+    if resolve_effective(username).has_permission(permission):
+        logger.debug(f"User {username} has permission {permission}")
+        return True
 
     logger.debug(f"User {username} does not have permission {permission}")
     return False
@@ -187,15 +181,9 @@ def check_user_app(username: str, app: str) -> bool:
             f"got username={username!r}, app={app!r}"
         )
 
-    user_id = common.get_user(username=username)["id"]
-    app_id = common.get_app(app=app)["id"]
-
-    try:
-        if common.get_user_app(user_id=user_id, app_id=app_id):
-            logger.debug(f"User {username} has access to app {app}")
-            return True
-    except NoResultFound:
-        pass
+    if resolve_effective(username).has_app(app):
+        logger.debug(f"User {username} has access to app {app}")
+        return True
 
     logger.debug(f"User {username} does not have access to app {app}")
     return False
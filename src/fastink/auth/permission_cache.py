@@ -0,0 +1,131 @@
+"""Cache of effective permission sets.
+
+A user's effective permissions are their direct user_permissions plus
+everything granted to the Linux groups they belong to, and their apps.
+``fastink.auth.permission.resolve_effective`` computes all of it in a
+fixed number of queries; this module keeps the result per username for
+``auth.permission_cache_ttl`` seconds (at most
+``auth.permission_cache_size`` users, least recently used first out).
+
+Writes through ``fastink.auth.common`` invalidate the affected entries via
+``@invalidates_permissions``: user-scoped writes drop that user, group and
+permission-level writes drop everything. Invalidation is per process, so
+writes made elsewhere (e.g. ``ink`` admin commands) are picked up once the
+TTL expires.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from fastink.common.config import get_config
+
+
+class EffectivePermissions(NamedTuple):
+    user_id: str
+    username: str
+    #: Ordered as returned by /get_permission (default first).
+    permissions: Tuple[str, ...]
+    apps: FrozenSet[str]
+
+    def has_permission(self, permission: str) -> bool:
+        return permission in self.permissions
+
+    def has_app(self, app: str) -> bool:
+        return app in self.apps
+
+
+class PermissionCache:
+    def __init__(self, ttl: float = 60, size: int = 10000):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        #: Bumped by every invalidation so a resolution that raced a write
+        #: is not stored.
+        self._generation = 0
+        self.metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, username: str) -> Optional[EffectivePermissions]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(username)
+                    self.metrics["hits"] += 1
+                    return value
+                del self._entries[username]
+            self.metrics["misses"] += 1
+        return None
+
+    def put(self, value: EffectivePermissions, generation: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[value.username] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(value.username)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            self._generation += 1
+            self.metrics["invalidations"] += 1
+            for username, (value, _) in list(self._entries.items()):
+                if value.user_id == user_id:
+                    del self._entries[username]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.metrics["invalidations"] += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.metrics, "size": len(self._entries)}
+
+
+permission_cache = PermissionCache(
+    ttl=get_config("auth", "permission_cache_ttl", fallback=60, type=float),
+    size=get_config("auth", "permission_cache_size", fallback=10000, type=int),
+)
+
+
+def invalidates_permissions(scope: str = "all"):
+    """Drop cached permission sets after the decorated write succeeds.
+
+    ``scope="user"`` drops the user given as ``user_id``; anything else
+    clears the whole cache. Apply it above ``@transactional_session`` so
+    it runs after the commit.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            if scope == "user" and "user_id" in kwargs:
+                permission_cache.invalidate_user(kwargs["user_id"])
+            else:
+                permission_cache.clear()
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,70 @@
+"""Revocation list for self-contained tokens.
+
+Password tokens carry their own signed expiry, so validation never reads
+the database and a token stays valid until that expiry. With
+``auth.password_revocation_redis`` enabled, revoked tokens (logout) are
+kept in Redis under ``ink:revoked:<sha256 of token>`` until they would
+have expired anyway, and validation checks that list.
+
+Revocation also drops the token from the validation cache of the revoking
+process and from the shared Redis layer of
+:mod:`fastink.auth.token_cache`. Other workers check cached acceptances
+against this list (``routers.headers.validate_token``), so they reject
+the token at once too. Redis failures are logged and the token is treated
+as not revoked, like the token cache's shared layer. With the list
+disabled, ``revoke`` raises ``NotImplementedError`` and
+``POST /auth/revoke_token`` answers that revocation is disabled.
+"""
+
+import hashlib
+import time
+from typing import Optional
+
+from fastink.auth.token_cache import REDIS_PREFIX as TOKEN_CACHE_PREFIX, token_cache
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+REDIS_PREFIX = "ink:revoked:"
+
+
+class RevocationList:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._redis = None
+
+    @staticmethod
+    def key(token: str) -> str:
+        return REDIS_PREFIX + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _client(self):
+        if self._redis is None:
+            # share the connection settings (and short timeouts) of the token cache
+            self._redis = token_cache._client()
+        return self._redis
+
+    def revoke(self, username: str, token: str, until: Optional[float] = None) -> None:
+        """Reject ``token`` until ``until`` (Unix time; None: for good)."""
+        if not self.enabled:
+            raise NotImplementedError("Token revocation needs auth.password_revocation_redis")
+        client = self._client()
+        if until is None:
+            client.set(self.key(token), "1")
+        elif until > time.time():
+            client.set(self.key(token), "1", px=max(int((until - time.time()) * 1000), 1))
+        token_cache.discard(username, token)
+        if token_cache.redis_enabled:
+            client.delete(TOKEN_CACHE_PREFIX + token_cache.key(username, token))
+
+    def is_revoked(self, token: str) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            return bool(self._client().exists(self.key(token)))
+        except Exception as e:
+            logger.warning("Revocation list: redis lookup failed: %s", e)
+            return False
+
+
+revocation_list = RevocationList(
+    enabled=get_config("auth", "password_revocation_redis", fallback=False, type=bool),
+)
@@ -0,0 +1,88 @@
+"""Per-process cache of stored Kerberos tickets for ``get_krb5``.
+
+``get_krb5`` runs inside storage operations, job submission and service
+start-up; each call used to cost a user lookup and a ticket query. Entries
+are keyed by the (username, email, uid) lookup and hold the user record
+and the ``kerberos_tokens`` row:
+
+- an entry lives for ``auth.krb5_ticket_cache_ttl`` seconds, but never past
+  the ticket's ``expired_at``;
+- writes through this process (``_persist_ccache_token``, renewals) drop
+  the user's entries; renewals done by the ``krb5_renew`` cron job show up
+  after the TTL, while the cached ticket is still valid;
+- at most ``auth.krb5_ticket_cache_size`` entries are kept, least recently
+  used first out.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastink.common.config import get_config
+
+
+class TicketCache:
+    def __init__(self, ttl: float = 60, size: int = 10000):
+        self.ttl = ttl
+        self.size = size
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    def get(self, key: tuple) -> Optional[Tuple[dict, dict]]:
+        """Cached (user_item, ticket) for ``key``, or None."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, user_item, ticket = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.metrics["hits"] += 1
+                    return dict(user_item), dict(ticket)
+                del self._entries[key]
+            self.metrics["misses"] += 1
+        return None
+
+    def put(self, key: tuple, user_item: dict, ticket: dict) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        if isinstance(ticket.get("expired_at"), datetime):
+            expires_at = min(expires_at, ticket["expired_at"].timestamp())
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, dict(user_item), dict(ticket))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v[1].get("id") == user_id]:
+                del self._entries[key]
+            self.metrics["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.metrics, "size": len(self._entries)}
+
+
+ticket_cache = TicketCache(
+    ttl=get_config("auth", "krb5_ticket_cache_ttl", fallback=60, type=float),
+    size=get_config("auth", "krb5_ticket_cache_size", fallback=10000, type=int),
+)
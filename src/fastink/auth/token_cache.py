@@ -0,0 +1,233 @@
+"""Cache of token validation results.
+
+``routers.headers.validate_token`` runs on every authenticated request, and
+backends may have to decode credentials or call out to an identity provider
+for each validation. Results are cached per process, keyed by a SHA-256 of
+(username, token) so raw credentials are never kept:
+
+- positive results live for ``auth.token_cache_ttl`` seconds, but never
+  past the credential's own expiry when the backend reports one
+  (``validated_until``, e.g. the ticket's ``renew_until``);
+- rejections live for ``auth.token_cache_negative_ttl`` seconds, so a
+  client retrying a bad token does not fork on every request;
+- at most ``auth.token_cache_size`` entries are kept, least recently used
+  first out.
+
+With ``auth.token_cache_redis`` enabled, results are also shared between
+workers through Redis under ``ink:token:<hash>``. Redis failures only
+disable the shared layer; validation falls back to the backend.
+
+``@invalidates_tokens`` drops a user's results after token and user writes
+in :mod:`fastink.auth.common`, here and in Redis. Other workers keep their
+local results until they expire, so a rotated token or a removed user is
+still accepted there for at most ``auth.token_cache_ttl`` seconds.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Set
+
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+REDIS_PREFIX = "ink:token:"
+REDIS_USER_PREFIX = "ink:token-user:"
+
+
+class TokenCache:
+    def __init__(
+        self,
+        ttl: float = 60,
+        negative_ttl: float = 30,
+        size: int = 10000,
+        redis_enabled: bool = False,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.size = size
+        self.redis_enabled = redis_enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._users: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self.metrics = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "redis_hits": 0,
+            "redis_errors": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    @staticmethod
+    def key(username: str, token: str) -> str:
+        return hashlib.sha256(f"{username}\0{token}".encode("utf-8")).hexdigest()
+
+    def _client(self):
+        if self._redis is None:
+            from redis import Redis
+
+            redis_config = get_config("redis")
+            self._redis = Redis(
+                host=redis_config.get("host", "localhost"),
+                port=redis_config.get("port", 6379),
+                password=redis_config.get("password", None),
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+        return self._redis
+
+    def _store(self, username: str, key: str, valid: bool, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (valid, expires_at, username)
+            self._entries.move_to_end(key)
+            self._users.setdefault(username, set()).add(key)
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)), evicted=True)
+
+    def _drop(self, key: str, evicted: bool = False) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if evicted:
+            self.metrics["evictions"] += 1
+        keys = self._users.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._users[entry[2]]
+
+    def get(self, username: str, token: str) -> Optional[bool]:
+        """Cached result for (username, token), or None when unknown."""
+        if not self.enabled:
+            return None
+        key = self.key(username, token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                valid, expires_at, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.metrics["hits" if valid else "negative_hits"] += 1
+                    return valid
+                self._drop(key)
+        if self.redis_enabled:
+            try:
+                client = self._client()
+                value = client.get(REDIS_PREFIX + key)
+                if value is not None:
+                    ttl_ms = client.pttl(REDIS_PREFIX + key)
+                    if ttl_ms and ttl_ms > 0:
+                        valid = value == "1"
+                        self._store(username, key, valid, now + ttl_ms / 1000)
+                        self.metrics["redis_hits"] += 1
+                        self.metrics["hits" if valid else "negative_hits"] += 1
+                        return valid
+            except Exception as e:
+                self.metrics["redis_errors"] += 1
+                logger.warning("Token cache: redis lookup failed: %s", e)
+        self.metrics["misses"] += 1
+        return None
+
+    def put(self, username: str, token: str, valid: bool, valid_until: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if valid else self.negative_ttl)
+        if valid and valid_until is not None:
+            expires_at = min(expires_at, valid_until)
+        if expires_at <= now:
+            return
+        key = self.key(username, token)
+        self._store(username, key, valid, expires_at)
+        if self.redis_enabled:
+            try:
+                client = self._client()
+                client.set(
+                    REDIS_PREFIX + key,
+                    "1" if valid else "0",
+                    px=max(int((expires_at - now) * 1000), 1),
+                )
+                if valid:
+                    client.sadd(REDIS_USER_PREFIX + username, key)
+                    client.expire(REDIS_USER_PREFIX + username, int(self.ttl) + 1)
+            except Exception as e:
+                self.metrics["redis_errors"] += 1
+                logger.warning("Token cache: redis store failed: %s", e)
+
+    def discard(self, username: str, token: str) -> None:
+        """Forget the local result for (username, token)."""
+        with self._lock:
+            self._drop(self.key(username, token))
+
+    def discard_user(self, username: str) -> None:
+        """Forget every result for ``username``, locally and in Redis."""
+        with self._lock:
+            keys = set(self._users.get(username, ()))
+            for key in keys:
+                self._drop(key)
+        if self.redis_enabled:
+            try:
+                client = self._client()
+                keys |= set(client.smembers(REDIS_USER_PREFIX + username) or ())
+                client.delete(REDIS_USER_PREFIX + username, *(REDIS_PREFIX + key for key in keys))
+            except Exception as e:
+                self.metrics["redis_errors"] += 1
+                logger.warning("Token cache: redis invalidation failed: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._users.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.metrics, "size": len(self._entries)}
+
+
+token_cache = TokenCache(
+    ttl=get_config("auth", "token_cache_ttl", fallback=60, type=float),
+    negative_ttl=get_config("auth", "token_cache_negative_ttl", fallback=30, type=float),
+    size=get_config("auth", "token_cache_size", fallback=10000, type=int),
+    redis_enabled=get_config("auth", "token_cache_redis", fallback=False, type=bool),
+)
+
+
+def _username(user_id: str) -> Optional[str]:
+    from fastink.auth.common import get_username
+
+    try:
+        return get_username(user_id)
+    except Exception as e:
+        logger.warning("Token cache: cannot resolve user %s: %s", user_id, e)
+        return None
+
+
+def invalidates_tokens(func):
+    """Drop the cached validations of ``user_id`` after the decorated write
+    succeeds; without a resolvable ``user_id`` the local cache is cleared.
+    The username is looked up before the write, so renames and deletions
+    are covered. Apply it above ``@transactional_session`` so it runs after
+    the commit.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        username = _username(kwargs["user_id"]) if "user_id" in kwargs else None
+        result = func(*args, **kwargs)
+        if username is not None:
+            token_cache.discard_user(username)
+        else:
+            token_cache.clear()
+        return result
+
+    return wrapper
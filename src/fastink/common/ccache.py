@@ -0,0 +1,172 @@
+"""Reader for MIT Kerberos credential caches (FILE ccache, format v3/v4).
+
+Tokens handed around by FastINK are base64-encoded ccache files (see
+``common.utils.ccachefile_to_token``). This module decodes them in-process
+so callers can read the default principal and the TGT lifetime without
+writing a temporary file or running ``klist``.
+
+Layout (big-endian for v3/v4)::
+
+    0x05 0x0N                     file format version
+    [v4] u16 header length, tags  (KDC time offset, ignored)
+    principal                     default principal
+    credential*                   until EOF
+
+    principal  := u32 name type, u32 count, data realm, data component*count
+    data       := u32 length, bytes
+    credential := principal client, principal server,
+                  u16 enctype [twice in v3], data key,
+                  u32 authtime, starttime, endtime, renew_till,
+                  u8 is_skey, u32 flags,
+                  u32 count, (u16 type, data)*   addresses
+                  u32 count, (u16 type, data)*   authdata
+                  data ticket, data second_ticket
+
+Entries whose server realm is ``X-CACHECONF:`` carry cache configuration,
+not tickets, and are skipped.
+"""
+
+import base64
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+
+CONF_REALM = "X-CACHECONF:"
+
+_u16 = struct.Struct(">H")
+_u32 = struct.Struct(">I")
+_times = struct.Struct(">IIIIBI")
+
+
+class Credential(NamedTuple):
+    client: str
+    server: str
+    authtime: int
+    starttime: int
+    endtime: int
+    renew_till: int
+    flags: int
+
+
+class CCache(NamedTuple):
+    version: int
+    principal: str
+    credentials: List[Credential]
+
+    @property
+    def username(self) -> str:
+        return self.principal.split("@")[0]
+
+    @property
+    def realm(self) -> str:
+        return self.principal.rpartition("@")[2]
+
+    def tgt(self) -> Optional[Credential]:
+        """The ticket-granting ticket of the default principal's realm,
+        else the first ticket in the cache (what ``klist`` lists first)."""
+        wanted = f"krbtgt/{self.realm}@{self.realm}"
+        for cred in self.credentials:
+            if cred.server == wanted:
+                return cred
+        for cred in self.credentials:
+            if cred.server.startswith("krbtgt/"):
+                return cred
+        return self.credentials[0] if self.credentials else None
+
+
+class _Reader:
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf: bytes, pos: int = 0):
+        self.buf = buf
+        self.pos = pos
+
+    def take(self, n: int) -> bytes:
+        end = self.pos + n
+        if end > len(self.buf):
+            raise ValueError("Truncated ccache")
+        chunk = self.buf[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def unpack(self, fmt: struct.Struct) -> Tuple:
+        if self.pos + fmt.size > len(self.buf):
+            raise ValueError("Truncated ccache")
+        values = fmt.unpack_from(self.buf, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def u16(self) -> int:
+        return self.unpack(_u16)[0]
+
+    def u32(self) -> int:
+        return self.unpack(_u32)[0]
+
+    def data(self) -> bytes:
+        return self.take(self.u32())
+
+    def principal(self) -> Tuple[str, str]:
+        """Returns (name, realm)."""
+        self.u32()
+        count = self.u32()
+        realm = self.data().decode("utf-8", errors="replace")
+        components = [self.data().decode("utf-8", errors="replace") for _ in range(count)]
+        return "/".join(components), realm
+
+    def skip_list(self) -> None:
+        for _ in range(self.u32()):
+            self.u16()
+            self.data()
+
+
+def parse_ccache(buf: bytes) -> CCache:
+    """Parse the bytes of a v3/v4 FILE ccache. Raises ValueError."""
+    if len(buf) < 2 or buf[0] != 5:
+        raise ValueError("Not a Kerberos ccache")
+    version = buf[1]
+    if version not in (3, 4):
+        raise ValueError(f"Unsupported ccache version 0x05{version:02x}")
+    r = _Reader(buf, 2)
+    if version == 4:
+        r.take(r.u16())
+    name, realm = r.principal()
+    principal = f"{name}@{realm}"
+
+    credentials = []
+    while r.pos < len(buf):
+        client, client_realm = r.principal()
+        server, server_realm = r.principal()
+        r.u16()
+        if version == 3:
+            r.u16()
+        r.data()
+        authtime, starttime, endtime, renew_till, _, flags = r.unpack(_times)
+        r.skip_list()
+        r.skip_list()
+        r.data()
+        r.data()
+        if server_realm == CONF_REALM:
+            continue
+        credentials.append(Credential(
+            client=f"{client}@{client_realm}",
+            server=f"{server}@{server_realm}",
+            authtime=authtime,
+            starttime=starttime or authtime,
+            endtime=endtime,
+            renew_till=renew_till,
+            flags=flags,
+        ))
+    return CCache(version, principal, credentials)
+
+
+def parse_token(token: str) -> CCache:
+    """Parse a base64 ccache token as produced by ``ccachefile_to_token``."""
+    try:
+        buf = base64.b64decode(token, validate=True)
+    except (ValueError, TypeError):
+        raise ValueError("Token is not valid base64")
+    return parse_ccache(buf)
+
+
+def read_ccache(path: str) -> CCache:
+    with open(path, "rb") as f:
+        return parse_ccache(f.read())
@@ -0,0 +1,186 @@
+"""One materialized credential cache file per user.
+
+Storage helpers, job submission and service start-up all need the user's
+Kerberos ticket as a FILE ccache. They used to decode the stored token
+into a fresh file on every call (``/tmp/krb5cc_{uid}_{timestamp}``,
+``/dev/shm/krb5cc_{user}_{timestamp}``), which left tmpfs filling up with
+stale copies under heavy submission load.
+
+:class:`CCacheStore` keeps exactly one file per user, ``krb5cc_{uid}`` in
+``auth.ccache_dir`` (a tmpfs by default):
+
+- the file is rewritten only when the token returned by ``get_krb5``
+  changes, compared by SHA-256; writes go through a temporary file that
+  is chowned to the user, chmodded 0600 and renamed over the old one, so
+  readers never see a partial ticket;
+- :meth:`CCacheStore.lease` pins a user's file while a request uses it;
+- every ``auth.ccache_gc_interval`` seconds, files whose ticket has
+  expired and that nobody in this process holds are removed, including
+  those left behind by other workers or earlier runs.
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from fastink.common.ccache import parse_ccache, read_ccache
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+PREFIX = "krb5cc_"
+
+
+class MaterializedCCache(NamedTuple):
+    path: str
+    #: Raw ccache bytes, for callers that upload the ticket elsewhere.
+    data: bytes
+    #: TGT end time (epoch seconds), 0 when the ccache holds no TGT.
+    endtime: int
+    digest: str
+
+
+class CCacheStore:
+    def __init__(self, directory: str = "/dev/shm/fastink-ccache", gc_interval: float = 60):
+        self.directory = directory
+        self.gc_interval = gc_interval
+        self._entries: Dict[int, MaterializedCCache] = {}
+        self._refs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._last_gc = time.time()
+        self.metrics = {"hits": 0, "writes": 0, "collected": 0}
+
+    def path_for(self, uid: int) -> str:
+        return os.path.join(self.directory, f"{PREFIX}{uid}")
+
+    def _write(self, uid: int, data: bytes) -> str:
+        os.makedirs(self.directory, mode=0o711, exist_ok=True)
+        path = self.path_for(uid)
+        fd, tmp = tempfile.mkstemp(prefix=f".{PREFIX}{uid}.", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp, 0o600)
+            if os.geteuid() == 0:
+                os.chown(tmp, uid, -1)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return path
+
+    @staticmethod
+    def _uid(username: str, uid: Optional[int]) -> int:
+        from fastink.common.utils import get_uid_from_name
+
+        if uid is None:
+            uid = get_uid_from_name(username)
+            if uid is None:
+                raise ValueError(f"User '{username}' not found in passwd.")
+        return uid
+
+    def materialize(self, username: str, uid: Optional[int] = None) -> MaterializedCCache:
+        """Make sure the user's ccache file matches the stored token.
+
+        Raises whatever ``get_krb5`` raises when there is no usable token.
+        """
+        from fastink.auth.backends.krb5 import get_krb5
+
+        uid = self._uid(username, uid)
+        token = get_krb5(username)
+        if not token:
+            raise ValueError(f"No Kerberos token for {username}.")
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            current = self._entries.get(uid)
+            if current is not None and current.digest == digest and os.path.exists(current.path):
+                self.metrics["hits"] += 1
+                entry = current
+            else:
+                data = base64.b64decode(token)
+                try:
+                    tgt = parse_ccache(data).tgt()
+                except ValueError as e:
+                    logger.warning(f"Stored ccache of {username} is unreadable: {e}")
+                    tgt = None
+                path = self._write(uid, data)
+                entry = self._entries[uid] = MaterializedCCache(
+                    path, data, tgt.endtime if tgt else 0, digest
+                )
+                self.metrics["writes"] += 1
+                logger.debug(f"Materialized ccache of {username} at {path}")
+        self._maybe_gc()
+        return entry
+
+    @contextmanager
+    def lease(self, username: str, uid: Optional[int] = None) -> Iterator[MaterializedCCache]:
+        """``materialize`` and keep the file from being collected until the
+        block exits."""
+        uid = self._uid(username, uid)
+        with self._lock:
+            self._refs[uid] = self._refs.get(uid, 0) + 1
+        try:
+            yield self.materialize(username, uid)
+        finally:
+            with self._lock:
+                self._refs[uid] -= 1
+                if not self._refs[uid]:
+                    del self._refs[uid]
+
+    def _maybe_gc(self) -> None:
+        if self.gc_interval > 0 and time.time() - self._last_gc >= self.gc_interval:
+            self._last_gc = time.time()
+            self.gc()
+
+    def gc(self) -> int:
+        """Remove expired, unleased ccache files. Returns how many."""
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if not name.startswith(PREFIX) or not name[len(PREFIX):].isdigit():
+                continue
+            uid = int(name[len(PREFIX):])
+            path = os.path.join(self.directory, name)
+            with self._lock:
+                if self._refs.get(uid):
+                    continue
+                entry = self._entries.get(uid)
+                endtime = entry.endtime if entry is not None else 0
+                if endtime <= now:
+                    # another worker may have refreshed the file
+                    try:
+                        tgt = read_ccache(path).tgt()
+                    except (OSError, ValueError):
+                        tgt = None
+                    endtime = tgt.endtime if tgt else 0
+                if endtime > now:
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                self._entries.pop(uid, None)
+                removed += 1
+        if removed:
+            self.metrics["collected"] += removed
+            logger.info(f"Removed {removed} expired ccache files from {self.directory}")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.metrics, "files": len(self._entries), "leased": len(self._refs)}
+
+
+ccache_store = CCacheStore(
+    directory=get_config("auth", "ccache_dir", fallback="/dev/shm/fastink-ccache"),
+    gc_interval=get_config("auth", "ccache_gc_interval", fallback=60, type=float),
+)
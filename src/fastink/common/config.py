@@ -1,25 +1,181 @@
+"""FastINK configuration access.
+
+The YAML file named by ``INK_CONFIG_FILE`` is parsed once into an immutable
+:class:`ConfigSnapshot`. ``get_config`` reads the current snapshot without
+touching the filesystem. A daemon thread checks the file every
+``common.config_reload_interval`` seconds (default 5, 0 disables) and
+SIGHUP (see :func:`install_sighup_handler`) reloads it immediately; a
+changed file is parsed into a new snapshot and swapped in atomically,
+after which callbacks registered with :func:`on_config_change` run so
+derived values are recomputed only when the configuration changes. A file
+that fails to parse is logged and the previous snapshot stays in use.
+"""
+
+import copy
+import logging
 import os
-import yaml
-from typing import Optional, Any, Type
-
-_CONFIG_CACHE = None
-_CONFIG_MTIME = None
-
-
-def _load_config(config_file: Optional[str] = None) -> dict:
-    global _CONFIG_CACHE, _CONFIG_MTIME
-
-    if not config_file:
-        config_file = os.environ.get("INK_CONFIG_FILE", "src/fastink/misc/config.yml")
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Type
 
-    mtime = os.path.getmtime(config_file)
+import yaml
 
-    if _CONFIG_CACHE is None or mtime != _CONFIG_MTIME:
-        with open(config_file, "r", encoding="utf-8") as f:
-            _CONFIG_CACHE = yaml.safe_load(f)
-        _CONFIG_MTIME = mtime
+# fastink.common.logger reads its settings from here; log through a
+# child of its "ink" logger instead of importing it.
+logger = logging.getLogger("ink.config")
+
+_DEFAULT_CONFIG_FILE = "src/fastink/misc/config.yml"
+
+
+class ConfigSnapshot(NamedTuple):
+    path: str
+    mtime: float
+    size: int
+    #: Increases by one on every reload of ``path``.
+    version: int
+    data: Dict[str, Any]
+
+    def lookup(self, section: Optional[str], option: Optional[str]):
+        """Return (found, value). Containers are copied so callers can
+        never mutate the snapshot."""
+        if section not in self.data:
+            return False, None
+        value = self.data[section]
+        if option is not None:
+            if not isinstance(value, dict) or option not in value:
+                return False, None
+            value = value[option]
+        if isinstance(value, (dict, list)):
+            value = copy.deepcopy(value)
+        return True, value
+
+
+_SNAPSHOTS: Dict[str, ConfigSnapshot] = {}
+_SUBSCRIBERS: List[Callable[[ConfigSnapshot, ConfigSnapshot], None]] = []
+_LOCK = threading.RLock()
+_WATCHING = False
+
+
+def _config_path(config_file: Optional[str] = None) -> str:
+    return config_file or os.environ.get("INK_CONFIG_FILE", _DEFAULT_CONFIG_FILE)
+
+
+def _read(path: str, version: int) -> ConfigSnapshot:
+    st = os.stat(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    return ConfigSnapshot(path, st.st_mtime, st.st_size, version, data)
+
+
+def snapshot(config_file: Optional[str] = None) -> ConfigSnapshot:
+    """Current snapshot of ``config_file`` (default: ``INK_CONFIG_FILE``)."""
+    path = _config_path(config_file)
+    current = _SNAPSHOTS.get(path)
+    if current is not None:
+        return current
+    with _LOCK:
+        current = _SNAPSHOTS.get(path)
+        if current is None:
+            current = _SNAPSHOTS[path] = _read(path, 1)
+    _start_watcher(current)
+    return current
+
+
+def reload_config(config_file: Optional[str] = None, force: bool = False) -> bool:
+    """Re-read the file if it changed (or always with ``force``).
+
+    Returns True when a new snapshot was swapped in.
+    """
+    path = _config_path(config_file)
+    with _LOCK:
+        old = _SNAPSHOTS.get(path)
+        if old is None:
+            snapshot(path)
+            return True
+        try:
+            st = os.stat(path)
+            if not force and (st.st_mtime, st.st_size) == (old.mtime, old.size):
+                return False
+            new = _read(path, old.version + 1)
+        except Exception as e:
+            logger.error("Failed to reload config %s, keeping version %d: %s", path, old.version, e)
+            return False
+        _SNAPSHOTS[path] = new
+        subscribers = list(_SUBSCRIBERS)
+    logger.info("Config %s reloaded (version %d)", path, new.version)
+    if new.data != old.data:
+        for callback in subscribers:
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error("Config change callback %r failed: %s", callback, e)
+    return True
+
+
+def on_config_change(callback: Callable[[ConfigSnapshot, ConfigSnapshot], None]):
+    """Call ``callback(old, new)`` after each reload that changes a file.
+
+    Usable as a decorator; returns ``callback``.
+    """
+    with _LOCK:
+        _SUBSCRIBERS.append(callback)
+    return callback
+
+
+def _watch(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        for path in list(_SNAPSHOTS):
+            reload_config(path)
+
+
+def _start_watcher(current: ConfigSnapshot) -> None:
+    global _WATCHING
+    if _WATCHING:
+        return
+    with _LOCK:
+        if _WATCHING:
+            return
+        _WATCHING = True
+        _, interval = current.lookup("common", "config_reload_interval")
+        try:
+            interval = float(5 if interval is None else interval)
+        except ValueError:
+            interval = 5.0
+        if interval > 0:
+            threading.Thread(
+                target=_watch, args=(interval,), name="ink-config-watcher", daemon=True
+            ).start()
+
+
+def _after_fork() -> None:
+    # Threads do not survive fork; the child starts its own watcher.
+    global _WATCHING, _LOCK
+    _LOCK = threading.RLock()
+    _WATCHING = False
+    for current in list(_SNAPSHOTS.values())[:1]:
+        _start_watcher(current)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def install_sighup_handler() -> bool:
+    """Reload every loaded config file on SIGHUP. Main thread only."""
+    def handler(signum, frame):
+        threading.Thread(
+            target=lambda: [reload_config(path, force=True) for path in list(_SNAPSHOTS)],
+            name="ink-config-sighup",
+            daemon=True,
+        ).start()
 
-    return _CONFIG_CACHE
+    try:
+        signal.signal(signal.SIGHUP, handler)
+    except (ValueError, AttributeError) as e:
+        logger.warning("SIGHUP config reload not installed: %s", e)
+        return False
+    return True
 
 
 def _cast_value(value: Any, target_type: Type) -> Any:
@@ -57,22 +213,9 @@ def get_config(
     type: Optional[Type] = None,
     config_file: Optional[str] = None,
 ) -> Any:
-    configs = _load_config(config_file)
-
-    value: Any = None
-    found = True
-
-    # ---- section ----
-    if section not in configs:
-        found = False
-    else:
-        if option is None:
-            value = configs[section]
-        else:
-            if option not in configs[section]:
-                found = False
-            else:
-                value = configs[section][option]
+    current = snapshot(config_file)
+    configs = current.data
+    found, value = current.lookup(section, option)
 
     # ---- fallback / error ----
     if not found:
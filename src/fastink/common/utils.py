@@ -14,6 +14,7 @@ from datetime import datetime
 from fastapi import HTTPException
 from functools import wraps
 
+from fastink.common.ccache import parse_token, read_ccache
 from fastink.common.logger import logger
 from fastink.common.exception import TokenExpiredException
 
@@ -26,28 +27,19 @@ def get_uid_from_name(username: str):
 
 
 def check_krb5_validity(krb5ccname: str) -> bool:
+    tm_now = time.time()
     try:
-        tm_now = datetime.now()
-        env = {"LC_TIME": ""}
-        tm_exp_raw = subprocess.check_output(
-            f"klist -f {krb5ccname} | awk '/krbtgt/ {{ print $3 \" \" $4}}'",
-            shell=True,
-            encoding="UTF-8",
-            env=env,
-        ).rstrip("\n")
-        if tm_exp_raw == "":
-            tm_exp = tm_now
-        else:
-            tm_exp = datetime.strptime(tm_exp_raw, "%m/%d/%y %H:%M:%S")
-        tm_dif = (tm_exp - tm_now).total_seconds()
-        if tm_dif >= 1800.0:
-            logger.debug(f"{krb5ccname} is valid for {tm_dif} seconds.")
-            return True
-        else:
-            logger.debug(f"{krb5ccname} is expired or invalid.")
-            return False
-    except Exception as e:
-        raise e
+        tgt = read_ccache(krb5ccname).tgt()
+    except (OSError, ValueError) as e:
+        logger.debug(f"{krb5ccname} is unreadable. Err:{str(e)}")
+        return False
+    tm_dif = (tgt.endtime if tgt else tm_now) - tm_now
+    if tm_dif >= 1800.0:
+        logger.debug(f"{krb5ccname} is valid for {tm_dif} seconds.")
+        return True
+    else:
+        logger.debug(f"{krb5ccname} is expired or invalid.")
+        return False
 
 
 #### Add krb5 switch
@@ -62,38 +54,19 @@ def get_krb5cc(uid: int = None, name: str = None, krb5: bool = True):
     if not krb5:
         return uid, name, ""
 
-    from fastink.auth.backends.krb5 import get_krb5
+    from fastink.common.ccache_store import ccache_store
 
-    krb5ccname = f"/tmp/krb5cc_{uid}"
-    #### KRB5 token exist
-    if os.path.isfile(krb5ccname):
-        try:
-            #### validate and refresh
-            if check_krb5_validity(krb5ccname):
-                logger.debug(f"Token file {krb5ccname} is valid. Just return. {uid} {name}")
-                return uid, name, krb5ccname
-            else:
-                logger.info(f"Token ticket {krb5ccname} is expired. Remove it and Retrieve new token.")
-                os.remove(krb5ccname)
-        except Exception as e:
-            logger.error(f"Error when check {krb5ccname}'s validity. Err:{str(e)}.")
-            raise e
-    #### Fetch KRB5 token from DB
+    #### One ccache file per user, rewritten only when the DB token changes
     try:
-        logger.debug(f"Trying to fetch latest krb5 token for {name} and save to {krb5ccname}.")
-        krb5_data = get_krb5(name)
-        with open(krb5ccname, "wb") as ofile:
-            ofile.write(base64.b64decode(krb5_data))
-        #### Re-check token validity 
-        if check_krb5_validity(krb5ccname):
-            logger.debug(f"Retrieved token {krb5ccname} is valid.")
-        else:
-            logger.error(f"Retrieved token for {name} is expired or invalid. Remove it.")
-            os.remove(krb5ccname)
-            raise TokenExpiredException(f"Retrieved token for {name} is expired or invalid.")
+        ccache = ccache_store.materialize(name, uid)
     except Exception as e:
-        logger.error(f"Failed to fetch token for {name} and save to file {krb5ccname}. Err:{str(e)}")
+        logger.error(f"Failed to fetch token for {name}. Err:{str(e)}")
         raise e
+    #### Same threshold as check_krb5_validity
+    if ccache.endtime - time.time() < 1800.0:
+        logger.error(f"Retrieved token for {name} is expired or invalid.")
+        raise TokenExpiredException(f"Retrieved token for {name} is expired or invalid.")
+    krb5ccname = ccache.path
 
     return uid, name, krb5ccname
 
@@ -190,23 +163,24 @@ def validate_user_krb5(username: str, token: str) -> bool:
     try:
         uid = query_pwd_uid(username)
         krb5ccname = f"/tmp/krb5cc_{uid}"
-        token_to_ccachefile(token=token, ccachefile=krb5ccname)
-        if not check_krb5_validity(krb5ccname=krb5ccname):
+        try:
+            ccache = parse_token(token)
+        except ValueError as e:
+            logger.error(f"Invalid Token for user {username}. Err:{str(e)}")
+            return False
+        tgt = ccache.tgt()
+        if tgt is None or tgt.endtime - time.time() < 1800.0:
             logger.error(f"Invalid Token for user {username}.")
             return False
-        krb5_name = subprocess.check_output(
-            f"klist -f {krb5ccname} | awk '/Default/ {{ print $3 }}'",
-            shell=True,
-            encoding="UTF-8",
-        ).split("@")[0]
+        krb5_name = ccache.username
         logger.debug(f"Specified User: {username}. Real User: {krb5_name}")
         if username != krb5_name:
             logger.error(
                 f"User verification failed. Speicified: {username}. Real: {krb5_name}"
             )
             return False
-        else:
-            return True
+        token_to_ccachefile(token=token, ccachefile=krb5ccname)
+        return True
     except Exception as e:
         logger.error(f"Error:{sys.exc_info()[0]}. Msg:{sys.exc_info()[1]}")
         raise e
@@ -1,3 +1,4 @@
+import asyncio
 import os, re, shlex
 from pathlib import Path
 from datetime import datetime
@@ -21,8 +22,8 @@ from fastink.computing.tools.common.utils import (
     parse_sbatch_out_err
 )
 from fastink.computing.hpc.v2.hpc_check_job import get_job_output
-from fastink.computing.tools.db.db_tools import get_endtime_info
 from fastink.computing.tools.common.failed_jobs import list_failed_jobs, failed_job_query_entry, delete_failed_job
+from fastink.computing.tools.common import sacct_snapshot
 from fastink.computing.tools.common.slurm_states import (
     SLURM_TERMINAL_JOB_STATUSES,
     normalize_slurm_state,
@@ -88,6 +89,42 @@ class HPC_Scheduler(SchedulerBase):
     async def _is_terminal_job_hidden(self, r, job_id: str | int) -> bool:
         return bool(await r.exists(self._hidden_terminal_job_key(job_id)))
 
+    async def _hidden_terminal_job_ids(self, r, job_ids: list[str]) -> set[str]:
+        """``_is_terminal_job_hidden`` for many jobs with one MGET."""
+        if not job_ids:
+            return set()
+        values = await r.mget([self._hidden_terminal_job_key(j) for j in job_ids])
+        return {j for j, v in zip(job_ids, values) if v is not None}
+
+    async def _fill_submit_uuids(self, r, job_list: list[dict]) -> None:
+        """Set submitUuid/submitMode/jobAsyncSubmitTime of async-submitted
+        jobs: one MGET for the mappings, one pipeline of HGETs."""
+        if not job_list:
+            return
+        uuid_vals = await r.mget(
+            [f"job_id_to_submit_uuid:{self.CLUSTER_TYPE}:{job['jobId']}" for job in job_list]
+        )
+        async_jobs = []
+        for job, uuid_val in zip(job_list, uuid_vals):
+            if isinstance(uuid_val, bytes):
+                uuid_val = uuid_val.decode()
+            if uuid_val:
+                job["submitUuid"] = uuid_val
+                job["submitMode"] = "ASYNC"
+                async_jobs.append(job)
+        if not async_jobs:
+            return
+        pipe = r.pipeline(transaction=False)
+        for job in async_jobs:
+            pipe.hget(f"cluster_jobs:{self.CLUSTER_TYPE}:{self.USERNAME}:{job['jobId']}", "submit_time")
+        for job, submit_val in zip(async_jobs, await pipe.execute()):
+            if submit_val is None:
+                job["jobAsyncSubmitTime"] = ""
+            elif isinstance(submit_val, bytes):
+                job["jobAsyncSubmitTime"] = submit_val.decode()
+            else:
+                job["jobAsyncSubmitTime"] = str(submit_val)
+
     def _map_sacct_state_to_job_status(self, slurm_state: str) -> str | None:
         return normalize_slurm_state(slurm_state)
 
@@ -329,6 +366,7 @@ class HPC_Scheduler(SchedulerBase):
 
             logger.info(f"Submit User {self.USERNAME} job {job_id} to cluster.")
             insert_job_info(self.UID, job_id, out_path, err_path, hpc_job_params.job_type, job_dir, self.CLUSTER_TYPE)
+            await sacct_snapshot.mark_user_changed(redis_connect(), self.CLUSTER_TYPE, self.USERNAME)
             logger.info(f"Submit job({job_id}) for user({self.USERNAME}) to queue.")
 
             return {
@@ -587,6 +625,7 @@ class HPC_Scheduler(SchedulerBase):
 
             job_id_line = stdout.decode().strip()
             job_id = job_id_line.split(";", 1)[0]
+            await sacct_snapshot.mark_user_changed(r, cluster, username)
 
             # --------------------------------------------------
             # 4. Persist DB
@@ -700,22 +739,26 @@ class HPC_Scheduler(SchedulerBase):
         # ======================================================
         # 1. Query Slurm jobs via sacct (authoritative source)
         # ======================================================
-        sacct_cmd = (
-            f"sacct -u {self.USERNAME} "
-            "--format=JobID,Partition,State,Elapsed,NNodes,NodeList,"
-            "WCkey,Submit,Start,End,WorkDir,Time,SubmitLine "
-            "-P -X -n"
-        )
+        # Served from the cron's cluster-wide snapshot when it is fresh.
+        lines = await sacct_snapshot.read_user_lines(r, self.CLUSTER_TYPE, self.USERNAME)
+        if lines is None:
+            sacct_cmd = (
+                f"sacct -u {self.USERNAME} "
+                "--format=JobID,Partition,State,Elapsed,NNodes,NodeList,"
+                "WCkey,Submit,Start,End,WorkDir,Time,SubmitLine "
+                "-P -X -n"
+            )
 
-        stdout = await sub_command(
-            sacct_cmd,
-            10,
-            "Query user jobs failed.",
-            "Query user jobs timeout."
-        )
+            stdout = await sub_command(
+                sacct_cmd,
+                10,
+                "Query user jobs failed.",
+                "Query user jobs timeout."
+            )
 
-        lines = stdout.decode().strip().split("\n")
+            lines = stdout.decode().strip().split("\n")
 
+        sacct_jobs = []
         for line in lines:
             if not line:
                 continue
@@ -725,6 +768,41 @@ class HPC_Scheduler(SchedulerBase):
                 logger.debug("query_job: skip malformed sacct line: %s", line)
                 continue
 
+            # job_info.jobid is an integer column: array/het job ids
+            # ("123_4", "123+1") cannot be stored
+            if not fields[0].strip().isdigit():
+                logger.debug("query_job: skip non-numeric job id: %s", fields[0])
+                continue
+
+            if req_job_type:
+                if fields[6] not in req_job_type.split(","):
+                    continue
+
+            sacct_jobs.append(fields)
+
+        hidden = await self._hidden_terminal_job_ids(r, [f[0].strip() for f in sacct_jobs])
+        sacct_jobs = [f for f in sacct_jobs if f[0].strip() not in hidden]
+
+        # --------------------------------------
+        # DB sync (insert if not exists), in bulk and off the event loop
+        # --------------------------------------
+        batch = JobStateBatch(self.UID, self.CLUSTER_TYPE)
+        await asyncio.to_thread(batch.load, [f[0].strip() for f in sacct_jobs])
+        missing = {}
+        for fields in sacct_jobs:
+            job_id = fields[0].strip()
+            if job_id not in batch and job_id not in missing:
+                out_path, err_path = parse_sbatch_out_err(fields[12], job_id)
+                missing[job_id] = {
+                    "outpath": out_path,
+                    "errpath": err_path,
+                    "job_type": fields[6],
+                    "job_path": fields[10],
+                }
+        if missing:
+            await asyncio.to_thread(batch.insert_missing, missing)
+
+        for fields in sacct_jobs:
             job_id = fields[0].strip()
             partition = fields[1]
             slurm_state = fields[2]
@@ -737,47 +815,12 @@ class HPC_Scheduler(SchedulerBase):
             submit_time = submit_time.replace("T", " ") if submit_time else ""
             start_time = start_time.replace("T", " ") if start_time else ""
             end_time = end_time.replace("T", " ") if end_time else ""
-            workdir = fields[10]
-            submit_line = fields[12]
 
-            if req_job_type:
-                if job_type not in req_job_type.split(","):
-                    continue
-
-            if await self._is_terminal_job_hidden(r, job_id):
-                continue
-
-            # --------------------------------------
-            # DB sync (insert if not exists)
-            # --------------------------------------
-            try:
-                (
-                    db_job_type,
-                    db_job_status,
-                    ipt_status,
-                    ipt_clean,
-                ) = get_job_info(self.UID, job_id, self.CLUSTER_TYPE)
-            except NoResultFound:
-                out_path, err_path = parse_sbatch_out_err(submit_line, job_id)
-                insert_job_info(
-                    self.UID,
-                    job_id,
-                    out_path,
-                    err_path,
-                    job_type,
-                    workdir,
-                    self.CLUSTER_TYPE,
-                )
-                (
-                    db_job_type,
-                    db_job_status,
-                    ipt_status,
-                    ipt_clean,
-                ) = get_job_info(self.UID, job_id, self.CLUSTER_TYPE)
-
-            (connect_sign,) = get_job_connect_info(
-                self.UID, job_id, self.CLUSTER_TYPE
-            )
+            row = batch.get(job_id)
+            db_job_status = row["job_status"]
+            ipt_status = row["iptable_status"]
+            ipt_clean = row["iptable_clean"]
+            connect_sign = row["connect_sign"]
 
             if not job_status:
                 logger.debug(
@@ -810,64 +853,28 @@ class HPC_Scheduler(SchedulerBase):
                             except Exception:
                                 connect_sign = "False"
 
-                        update_connect_status(
-                            self.UID, job_id, connect_sign, self.CLUSTER_TYPE
-                        )
+                        batch.set(job_id, connect_sign=connect_sign)
                         if start_time:
-                            update_start_time(
-                                self.UID, job_id, start_time, self.CLUSTER_TYPE
-                            )
+                            batch.set(job_id, job_start_time=start_time)
 
             elif job_status in SLURM_TERMINAL_JOB_STATUSES:
-                if end_time and not get_endtime_info(self.UID, job_id, self.CLUSTER_TYPE):
-                    update_end_time(
-                        self.UID, job_id, end_time, self.CLUSTER_TYPE
-                    )
+                if end_time and not row["job_end_time"]:
+                    batch.set(job_id, job_end_time=end_time)
 
             if db_job_status != job_status:
-                update_job_status(
-                    self.UID, job_id, job_status, self.CLUSTER_TYPE
-                )
+                batch.set(job_id, job_status=job_status)
 
             # Frontend no longer expects cancelled jobs in the query list.
             if job_status == "CANCELLED":
                 continue
 
-            # --------------------------------------
-            # NEW: resolve submit_uuid via Redis mapping
-            # --------------------------------------
-            submit_uuid = ""
-            job_async_submit_time = ""
-            submit_mode = "SYNC"
-
-            uuid_val = await r.get(
-                f"job_id_to_submit_uuid:{self.CLUSTER_TYPE}:{job_id}"
-            )
-            if uuid_val is None:
-                submit_uuid = ""
-            elif isinstance(uuid_val, bytes):
-                submit_uuid = uuid_val.decode()
-            else:
-                submit_uuid = uuid_val
-
-            if submit_uuid:
-                submit_mode = "ASYNC"
-                async_job_key = f"cluster_jobs:{self.CLUSTER_TYPE}:{self.USERNAME}:{job_id}"
-                async_submit_val = await r.hget(async_job_key, "submit_time")
-                if async_submit_val is None:
-                    job_async_submit_time = ""
-                elif isinstance(async_submit_val, bytes):
-                    job_async_submit_time = async_submit_val.decode()
-                else:
-                    job_async_submit_time = str(async_submit_val)
-
             job_list.append(
                 {
                     "clusterId": self.CLUSTER_TYPE,
                     "jobId": job_id,
-                    "submitUuid": submit_uuid,   # NEW
-                    "jobAsyncSubmitTime": job_async_submit_time,
-                    "submitMode": submit_mode,
+                    "submitUuid": "",
+                    "jobAsyncSubmitTime": "",
+                    "submitMode": "SYNC",
                     "jobPartition": partition,
                     "jobType": job_type,
                     "jobSubmitTime": submit_time,
@@ -879,6 +886,13 @@ class HPC_Scheduler(SchedulerBase):
                 }
             )
 
+        await asyncio.to_thread(batch.flush)
+
+        # --------------------------------------
+        # NEW: resolve submit_uuid via Redis mapping (pipelined)
+        # --------------------------------------
+        await self._fill_submit_uuids(r, job_list)
+
         # ======================================================
         # 2. Append SUBMITTING async jobs from Redis
         # ======================================================
@@ -1098,6 +1112,7 @@ class HPC_Scheduler(SchedulerBase):
                     f"cancel_job: scancel job_id={resolved_job_id} failed "
                     f"or job already ended: {e}"
                 )
+            await sacct_snapshot.mark_user_changed(r, cluster, username)
 
             # Best-effort DB update (sync & async share this path)
             try:
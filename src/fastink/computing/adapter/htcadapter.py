@@ -1,10 +1,10 @@
+import asyncio
 import json
 from shlex import quote
 from typing import Optional
 from datetime import datetime
 from fastink.common.logger import logger
 from fastink.common.config import get_config
-from sqlalchemy.exc import NoResultFound
 from fastink.computing.tools.db.db_tools import *
 from fastink.computing.cluster.cluster import HTC_JOB
 from fastink.computing.adapter.strategy import scheduler
@@ -163,32 +163,39 @@ class HTC_Scheduler(SchedulerBase):
 
         return_list = []
 
+        if req_job_type:
+            req_job_types = req_job_type.split(',')
+            jobs = [job for job in jobs if job.get("jobType") in req_job_types]
+
+        # One SELECT for every job on the page, one INSERT for the new ones
+        # and one UPDATE flush at the end, all off the event loop.
+        batch = JobStateBatch(self.UID, self.CLUSTER_TYPE)
+        await asyncio.to_thread(batch.load, [job.get("jobId") for job in jobs])
+        missing = {
+            str(job.get("jobId")): {
+                "outpath": job.get("joboutpath") or "",
+                "errpath": job.get("joberrpath") or "",
+                "job_type": job.get("jobType"),
+                "job_path": job.get("jobiwd") or "",
+            }
+            for job in jobs if job.get("jobId") not in batch
+        }
+        if missing:
+            await asyncio.to_thread(batch.insert_missing, missing)
+
         for job in jobs:
             job_id = job.get("jobId")
-            job_condor_type = job.get("jobType")
             job_status = job.get("jobStatus")
-            job_output_path = job.get("joboutpath") or ""
-            job_err_path = job.get("joberrpath") or ""
-            job_iwd = job.get("jobiwd") or ""
             job_submit_time = job.get("jobSubmitTime") or ""
             job_start_time = job.get("jobStartTime") or ""
             job_node_list = job.get("jobNodeList") or ""
             job_runos = job.get("jobrunos") or ""
             job_hold_reason = job.get("hold_reason") or ""
 
-            if req_job_type:
-                req_job_types = req_job_type.split(',')
-                if job_condor_type not in req_job_types:
-                    continue
-
-            try:
-                job_type, db_job_status, job_iptables_status, job_iptables_clean = get_job_info(self.UID, job_id, self.CLUSTER_TYPE)
-                logger.debug(f"HTC-LOG: Find the job {job_id} in the DB, and the details are: {job_type}, {db_job_status}, {job_iptables_status}, {job_iptables_clean}")       
-            except NoResultFound:
-                job_path = job_iwd
-                insert_job_info(self.UID, job_id, job_output_path, job_err_path, job_condor_type, job_path, self.CLUSTER_TYPE)
-                job_type, db_job_status, job_iptables_status, job_iptables_clean = get_job_info(self.UID, job_id, self.CLUSTER_TYPE)
-            connect_sign, = get_job_connect_info(self.UID, job_id, self.CLUSTER_TYPE)
+            row = batch.get(job_id)
+            job_type, db_job_status = row["job_type"], row["job_status"]
+            job_iptables_status, job_iptables_clean = row["iptable_status"], row["iptable_clean"]
+            connect_sign = row["connect_sign"]
 
             if job_status == '1': 
                 job_status = "QUEUEING" 
@@ -206,8 +213,7 @@ class HTC_Scheduler(SchedulerBase):
                             except Exception as e:
                                 connect_sign = "False"
                                 logger.error(f"HTC-LOG: {job_id} iptables set failed, the details: {e}")
-                        update_connect_status(self.UID, job_id, connect_sign, self.CLUSTER_TYPE)
-                        update_start_time(self.UID, job_id, job_start_time, self.CLUSTER_TYPE)
+                        batch.set(job_id, connect_sign=connect_sign, job_start_time=job_start_time)
             
             elif job_status == '4': 
                 job_status = "COMPLETED" 
@@ -221,7 +227,7 @@ class HTC_Scheduler(SchedulerBase):
                     continue
             
             if db_job_status != job_status: 
-                update_job_status(self.UID, job_id, job_status, self.CLUSTER_TYPE)
+                batch.set(job_id, job_status=job_status)
             
             return_list.append({
                 "clusterId": self.CLUSTER_TYPE,
@@ -237,6 +243,8 @@ class HTC_Scheduler(SchedulerBase):
                 "jobtimelimit": "24:00:00",
             })
 
+        await asyncio.to_thread(batch.flush)
+
         raw_jobs = await r.lrange(f"{self.USERNAME}_submitting_jobs", 0, -1)
         logger.debug(f"HTC-LOG: Get {self.USERNAME} submitting_jobs from redis: {raw_jobs}")
         
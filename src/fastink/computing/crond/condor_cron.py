@@ -1,13 +1,17 @@
+import asyncio
 import htcondor
 import json, shlex
+from datetime import datetime
 from shlex import quote
 from fastink.common.logger import logger
 from fastink.common.config import get_config
 from fastink.inkdb.inkredis import redis_connect
-from fastink.computing.tools.db.db_tools import update_end_time, update_job_status, update_start_time, get_jobs_with_null_times, delete_jobinfo_by_jobids, insert_job_info, needto_change_status_jobs
-from fastink.computing.tools.common.utils import safe_get, safe_int, ts_to_str, sub_command, delete_iptables, change_username_to_uid, init_job_dir, generate_condor_submit, generate_submit_command, clean_query_value, check_user_kerberos_ticket
+from fastink.computing.tools.db.db_tools import update_end_time, update_start_time, get_jobs_with_null_times, delete_jobinfo_by_jobids, insert_job_info, needto_change_status_jobs, update_jobs_info_bulk
+from fastink.computing.tools.common.utils import safe_get, safe_int, ts_to_str, sub_command, change_username_to_uid, init_job_dir, generate_condor_submit, generate_submit_command, clean_query_value, check_user_kerberos_ticket
+from fastink.computing.tools.gateway.gateway_utils import delete_gateway_iptable
 from fastink.computing.tools.common.failed_jobs import record_failed_job
 from fastink.computing.apps import registry as computing_registry
+from fastink.computing.crond.condor_tracker import CondorJobTracker
 
 
 def query_cluster_jobs():
@@ -66,25 +70,57 @@ def get_history_records(jobid):
     return results
 
 
-def get_condor_history_command(job_id: str) -> str:
+# ClusterIds per condor_history constraint
+_HISTORY_CHUNK = 1000
+
+
+def get_condor_history_command(job_ids) -> str:
+    """One condor_history over all ``job_ids``: tab-separated ClusterId,
+    end time, start time (QDate if the job never started), job type and
+    Owner, newest first."""
     SCHEDD_HOST = get_config("computing", "schedd_host")
-    BASE_CMD = f"condor_history -name {quote(SCHEDD_HOST)} -limit 1"
+    BASE_CMD = f"condor_history -name {quote(SCHEDD_HOST)}"
+    constraint = f"member(ClusterId, {{{','.join(str(j) for j in job_ids)}}})"
     ATTRS = [
+        "ClusterId",
         'formatTime(EnteredCurrentStatus,"%Y-%m-%d %H:%M:%S")',
-        'ifThenElse(isUndefined(JobStartDate),"NULL",formatTime(JobStartDate,"%Y-%m-%d"))',
-        'ifThenElse(isUndefined(JobStartDate),"NULL",formatTime(JobStartDate,"%H:%M:%S"))',
-        'formatTime(QDate,"%Y-%m-%d %H:%M:%S")',
+        'formatTime(ifThenElse(isUndefined(JobStartDate),QDate,JobStartDate),"%Y-%m-%d %H:%M:%S")',
         'ifThenElse(isUndefined(HepJob_JobType) || HepJob_JobType == "", "batch", HepJob_JobType)',
         "Owner"
     ]
-    attrs_quoted = " ".join(quote(a) for a in ATTRS)   # 关键：给每个字段加 shell 引号
-    command = f"{BASE_CMD} {quote(str(job_id))} -af {attrs_quoted}"
+    attrs_quoted = " ".join(quote(a) for a in ATTRS)
+    command = f"{BASE_CMD} -constraint {quote(constraint)} -af:t {attrs_quoted}"
 
-    logger.info(f"The history command: {command}")
+    logger.debug(f"The history command: {command}")
 
     return command
 
 
+def _history_time(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+async def get_condor_history_records(job_ids) -> dict:
+    """{ClusterId: (end_time, start_time, job_type, owner)} of the jobs of
+    ``job_ids`` found in the history, one condor_history per chunk."""
+    job_ids = sorted(job_ids)
+    records = {}
+    for i in range(0, len(job_ids), _HISTORY_CHUNK):
+        command = get_condor_history_command(job_ids[i:i + _HISTORY_CHUNK])
+        stdout = await sub_command(command, 60, "Exec condorhistory func failed.", "Exec condorhistory func timeout.")
+        for line in stdout.decode(errors="ignore").splitlines():
+            parts = line.split("\t")
+            if len(parts) != 5 or not parts[0].isdigit():
+                continue
+            # newest first: keep the last proc of each cluster
+            end_time, start_time, job_type, owner = parts[1:]
+            records.setdefault(int(parts[0]), (_history_time(end_time), _history_time(start_time), job_type, owner))
+    return records
+
+
 async def get_redis_all_jobs():
     r = redis_connect()
     cursor = 0
@@ -111,58 +147,73 @@ async def get_redis_all_jobs():
     return jobs
 
 
-def condor_schedd_query():
-
+def _schedd_jobs(constraint: str = "true"):
+    """Queued jobs matching ``constraint`` as Redis job hashes; raises on
+    schedd errors."""
     SCHEDD_HOST = get_config("computing", "schedd_host")
-    try:
-        coll = htcondor.Collector()
-        schedd_ad = coll.locate(htcondor.DaemonTypes.Schedd, SCHEDD_HOST)
-        schedd = htcondor.Schedd(schedd_ad)
-        
-        jobs = schedd.query(
-            projection=["ClusterId", "Owner", "Qdate", "JobStatus", "JobStartDate", "RemoteHost", "HepJob_JobType", "HepJob_RequestOS", "IWD", "Out", "Err", "Holdreason"]
-        )
+    coll = htcondor.Collector()
+    schedd_ad = coll.locate(htcondor.DaemonTypes.Schedd, SCHEDD_HOST)
+    schedd = htcondor.Schedd(schedd_ad)
 
-        job_list = []
-
-        for job in jobs:
-            cluster_id = job.get("ClusterId")
-            owner = job.get("Owner", "Unknown")
-            status_code = job.get("JobStatus")
-            qdate = ts_to_str(job.get("Qdate"))
-            starttime = ts_to_str(job.get("JobStartDate"))
-            host = job.get("RemoteHost")
-            jobtype = job.get("HepJob_JobType")
-            job_request_os = job.get("HepJob_RequestOS")
-            job_out_path = job.get("Out")
-            job_err_path = job.get("Err")
-            job_hold_reason = job.get("Holdreason")
-            job_iwd = job.get("IWD")
-
-            job_info = {
-                "ClusterId": "HTCondor",
-                "jobId": clean_query_value(f"{cluster_id}"),
-                "jobType": clean_query_value(jobtype),
-                "jobOwner": clean_query_value(owner),
-                "jobStatus": clean_query_value(status_code),
-                "jobSubmitTime": clean_query_value(qdate),
-                "jobStartTime": clean_query_value(starttime),
-                "jobNodeList": clean_query_value(host),
-                "jobrunos": clean_query_value(job_request_os),
-                "jobiwd": clean_query_value(job_iwd),
-                "joboutpath": clean_query_value(job_out_path),
-                "joberrpath": clean_query_value(job_err_path),
-                "hold_reason": clean_query_value(job_hold_reason)
-            }
-            job_list.append(job_info)
-
-        return job_list
+    jobs = schedd.query(
+        constraint=constraint,
+        projection=["ClusterId", "Owner", "Qdate", "JobStatus", "JobStartDate", "RemoteHost", "HepJob_JobType", "HepJob_RequestOS", "IWD", "Out", "Err", "Holdreason"]
+    )
+
+    job_list = []
+
+    for job in jobs:
+        cluster_id = job.get("ClusterId")
+        owner = job.get("Owner", "Unknown")
+        status_code = job.get("JobStatus")
+        qdate = ts_to_str(job.get("Qdate"))
+        starttime = ts_to_str(job.get("JobStartDate"))
+        host = job.get("RemoteHost")
+        jobtype = job.get("HepJob_JobType")
+        job_request_os = job.get("HepJob_RequestOS")
+        job_out_path = job.get("Out")
+        job_err_path = job.get("Err")
+        job_hold_reason = job.get("Holdreason")
+        job_iwd = job.get("IWD")
+
+        job_info = {
+            "ClusterId": "HTCondor",
+            "jobId": clean_query_value(f"{cluster_id}"),
+            "jobType": clean_query_value(jobtype),
+            "jobOwner": clean_query_value(owner),
+            "jobStatus": clean_query_value(status_code),
+            "jobSubmitTime": clean_query_value(qdate),
+            "jobStartTime": clean_query_value(starttime),
+            "jobNodeList": clean_query_value(host),
+            "jobrunos": clean_query_value(job_request_os),
+            "jobiwd": clean_query_value(job_iwd),
+            "joboutpath": clean_query_value(job_out_path),
+            "joberrpath": clean_query_value(job_err_path),
+            "hold_reason": clean_query_value(job_hold_reason)
+        }
+        job_list.append(job_info)
+
+    return job_list
+
+
+def condor_schedd_query():
+    try:
+        return _schedd_jobs()
 
     except Exception as e:
         logger.error(f"HTC-CROND-LOG: Condor API query job failed, and details: {e}")
         return []
 
 
+# Errors propagate from _schedd_jobs: a failed query must not read as an
+# empty queue and wipe the Redis mirror.
+job_tracker = CondorJobTracker(
+    _schedd_jobs,
+    event_log=get_config("crond", "condor_event_log", fallback=""),
+    full_resync_interval=get_config("crond", "condor_full_resync_interval", fallback=300, type=float),
+)
+
+
 async def update_completed_jobs():
     try:
         r = redis_connect()
@@ -173,7 +224,6 @@ async def update_completed_jobs():
         stdout = await sub_command(query_command, 10, "Query user jobs failed.", "Query user jobs timeout.")
         lines = stdout.decode().strip().split('\n')
         logger.debug(f"HTC-CROND-QUEUE-LOG: Queue jobs {lines}")
-        to_delete = []
         
         if lines != ['']:
             for line in lines:
@@ -185,40 +235,38 @@ async def update_completed_jobs():
 
         if need_change_status_jobs:
             logger.debug(f"HTC-CROND-QUEUE-LOG: Need change status jobs: {need_change_status_jobs}")
-            for key in need_change_status_jobs:
-                query_history_command = get_condor_history_command(key)
-                stdout = await sub_command(query_history_command, 30, "Exec condorhistory func failed.", "Exec condorhistory func timeout.")
-                history_job_lines = stdout.decode().strip().split('\n')
-
-                if history_job_lines != [""]:
-                    job_param_list = history_job_lines[0].split()
-                    job_end_time = f"{job_param_list[0]} {job_param_list[1]}" 
-                    if job_param_list[2] != "NULL":
-                        job_start_time = f"{job_param_list[2]} {job_param_list[3]}"
-                    else:
-                        job_start_time = f"{job_param_list[4]} {job_param_list[5]}"
-                    job_type = job_param_list[6]
-                    job_user = job_param_list[7]
-                    job_uid = change_username_to_uid(job_user)
-
-                    if job_type in iptables_jobtype:
-                        gateway_port = need_change_status_jobs[key][1]
-                        sshd_job_iptables_clean = need_change_status_jobs[key][2]
-                        if gateway_port != 0 and sshd_job_iptables_clean == 0:
-                            delete_iptables(job_uid, key, gateway_port, "htcondor")
-                    
-                    update_job_status(job_uid, key, 'COMPLETED', "htcondor")
-                    update_start_time(job_uid, key, job_start_time, "htcondor")
-                    update_end_time(job_uid, key, job_end_time, "htcondor")
-                    logger.debug(f"HTC-CROND-QUEUE-LOG: Update job {key} status to COMPLETED.")
-                    
-                    JOB_KEY = f"cluster_jobs:{job_user}:{key}"
-                    IDX_KEY = f"cluster_jobs:{job_user}:job_ids"
-                    await r.delete(JOB_KEY)
-                    await r.srem(IDX_KEY, str(key))
-                else:
-                    to_delete.append(key)
-                    
+            history = await get_condor_history_records(need_change_status_jobs)
+
+            updates = []
+            finished = []
+            for key, (job_end_time, job_start_time, job_type, job_user) in history.items():
+                _, gateway_port, sshd_job_iptables_clean, row_id = need_change_status_jobs[key]
+                update = {
+                    "id": row_id,
+                    "job_status": "COMPLETED",
+                    "job_start_time": job_start_time,
+                    "job_end_time": job_end_time,
+                }
+                if job_type in iptables_jobtype and gateway_port != 0 and sshd_job_iptables_clean == 0:
+                    try:
+                        await asyncio.to_thread(delete_gateway_iptable, gateway_port)
+                        update.update(iptable_status=0, iptable_clean=1)
+                    except Exception as e:
+                        logger.error(f"HTC-CROND-QUEUE-LOG: Delete gateway iptable of job {key} failed: {e}")
+                updates.append(update)
+                finished.append((job_user, key))
+
+            if updates:
+                await asyncio.to_thread(update_jobs_info_bulk, updates)
+                logger.debug(f"HTC-CROND-QUEUE-LOG: Update {len(updates)} jobs status to COMPLETED.")
+
+                pipe = r.pipeline(transaction=False)
+                for job_user, key in finished:
+                    pipe.delete(f"cluster_jobs:{job_user}:{key}")
+                    pipe.srem(f"cluster_jobs:{job_user}:job_ids", str(key))
+                await pipe.execute()
+
+            to_delete = [key for key in need_change_status_jobs if key not in history]
             if to_delete:
                 logger.debug(f"HTC-CROND-QUEUE-LOG: Need to delete jobs: {to_delete}")
                 delete_jobinfo_by_jobids(to_delete)
@@ -229,39 +277,8 @@ async def update_completed_jobs():
 
 async def refresh_redis_job_status():
     try:
-        r = redis_connect()
-        pipe = r.pipeline(transaction=False)
-
-        condor_joblist = []
-        condor_q_jobs = condor_schedd_query()
-        for job in condor_q_jobs:
-            job_owner = job.get("jobOwner")
-            job_clusterid = job.get("jobId")
-            condor_joblist.append(job_clusterid)
-
-            tomb = await r.exists(f"cluster_jobs:deleted:{job_owner}:{job_clusterid}")
-            if tomb:
-                continue
-
-            JOB_KEY = f"cluster_jobs:{job_owner}:{job_clusterid}"
-            IDX_KEY = f"cluster_jobs:{job_owner}:job_ids"
-            pipe.sadd(IDX_KEY, job_clusterid)
-            pipe.hset(JOB_KEY, mapping=job)
-
-        await pipe.execute()
-
-        redis_jobs = await get_redis_all_jobs()
-
-        for job in redis_jobs:
-            job_id = job.get("job_id")
-            job_user = job.get("user")
-            if job_id not in condor_joblist:
-                # delete redis record
-                JOB_KEY = f"cluster_jobs:{job_user}:{job_id}"
-                IDX_KEY = f"cluster_jobs:{job_user}:job_ids"
-                await r.delete(JOB_KEY)
-                await r.srem(IDX_KEY, str(job_id))
-                logger.debug(f"HTC-CROND-QUEUE-LOG: delete the redis expire job {JOB_KEY}")
+        stats = await job_tracker.run()
+        logger.debug(f"HTC-CROND-QUEUE-LOG: refresh_redis_job_status {stats}")
 
     except Exception as e:
         logger.exception(f"HTC-CROND-QUEUE-LOG: refresh_redis_job_status failed, the details: {e}")
@@ -0,0 +1,194 @@
+"""Event-driven mirror of the HTCondor queue in Redis.
+
+``refresh_redis_job_status`` keeps one ``cluster_jobs:{owner}:{job_id}``
+hash per queued job, plus the ``cluster_jobs:{owner}:job_ids`` index,
+in step with the schedd; ``HTC_Scheduler.query_job`` reads them. It used
+to query every job of every user from the schedd every 5 seconds and then
+SCAN the whole keyspace for leftovers, one awaited command per key.
+
+When ``crond.condor_event_log`` points at the schedd's job event log
+(its ``EVENT_LOG``, mounted into the cron container),
+:class:`CondorJobTracker` reads only the events written since the
+previous cycle through ``htcondor.JobEventLog``. It then queries the
+schedd for just the clusters those events touch and applies the
+difference: changed jobs are rewritten and jobs that left the queue are
+deleted. The read position is kept in the ``condor_tracker:event_log``
+hash, so a restarted cron container does not re-parse the whole log.
+
+A full resync runs on the first cycle, every
+``crond.condor_full_resync_interval`` seconds, after an event log read
+error, and on every cycle when no event log is configured. It queries
+every queued job, diffs them as sets against the job keys found in
+Redis, and applies writes and deletes through pipelines. Jobs with a
+``cluster_jobs:deleted:{owner}:{job_id}`` tombstone (just removed by
+their owner) are never written back.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import htcondor
+
+from fastink.common.logger import logger
+from fastink.inkdb.inkredis import redis_connect
+
+STATE_KEY = "condor_tracker:event_log"
+
+# Events that never change what query_job shows
+_IGNORED_EVENTS = frozenset({
+    htcondor.JobEventType.IMAGE_SIZE,
+    htcondor.JobEventType.FILE_TRANSFER,
+})
+
+# ClusterIds per schedd query constraint
+_QUERY_CHUNK = 500
+
+
+def _job_key(owner: str, job_id: str) -> str:
+    return f"cluster_jobs:{owner}:{job_id}"
+
+
+def _index_key(owner: str) -> str:
+    return f"cluster_jobs:{owner}:job_ids"
+
+
+def _tombstone_key(owner: str, job_id: str) -> str:
+    return f"cluster_jobs:deleted:{owner}:{job_id}"
+
+
+async def scan_redis_jobs(r) -> List[Tuple[str, str]]:
+    """(owner, job_id) of every job hash in Redis."""
+    jobs = []
+    async for key in r.scan_iter(match="cluster_jobs:*:*", count=1000):
+        if isinstance(key, bytes):
+            key = key.decode()
+        parts = key.split(":")
+        if len(parts) == 3 and parts[2].isdigit():
+            jobs.append((parts[1], parts[2]))
+    return jobs
+
+
+class CondorJobTracker:
+    def __init__(
+        self,
+        query: Callable[[str], List[dict]],
+        event_log: str = "",
+        full_resync_interval: float = 300,
+    ):
+        #: ``query(constraint)`` returns the queued jobs as Redis job hashes
+        self.query = query
+        self.event_log = event_log
+        self.full_resync_interval = full_resync_interval
+        #: job_id -> owner of the jobs mirrored in Redis
+        self.owners: Dict[str, str] = {}
+        self._log: Optional[htcondor.JobEventLog] = None
+        self._last_full = 0.0
+        self._lock = asyncio.Lock()
+
+    async def run(self) -> dict:
+        """One cycle. Called periodically by the cron runner."""
+        async with self._lock:
+            r = redis_connect()
+            if self._log is not None and time.time() - self._last_full < self.full_resync_interval:
+                try:
+                    clusters = await self._read_events(r)
+                except Exception as e:
+                    logger.warning(f"HTC-CROND-QUEUE-LOG: reading {self.event_log} failed, full resync: {e}")
+                    self._log = None
+                else:
+                    return await self._apply_delta(r, clusters)
+            return await self._full_resync(r)
+
+    #### Event log
+
+    async def _open_log(self, r) -> htcondor.JobEventLog:
+        log = htcondor.JobEventLog(self.event_log)
+        state = await r.hgetall(STATE_KEY)
+        if state and state.get("path") == self.event_log:
+            log.__setstate__(({}, int(state["time"]), int(state["offset"])))
+        return log
+
+    def _drain(self) -> Set[str]:
+        """ClusterIds of the events written since the last call."""
+        clusters = set()
+        for event in self._log.events(stop_after=0):
+            if event.type not in _IGNORED_EVENTS:
+                clusters.add(str(event.cluster))
+        return clusters
+
+    async def _read_events(self, r) -> Set[str]:
+        clusters = await asyncio.to_thread(self._drain)
+        _, log_time, offset = self._log.__getstate__()
+        await r.hset(STATE_KEY, mapping={"path": self.event_log, "time": log_time, "offset": offset})
+        return clusters
+
+    #### Redis writes
+
+    async def _write(self, r, jobs: List[dict]) -> int:
+        if not jobs:
+            return 0
+        pipe = r.pipeline(transaction=False)
+        for job in jobs:
+            pipe.exists(_tombstone_key(job["jobOwner"], job["jobId"]))
+        tombstones = await pipe.execute()
+
+        written = 0
+        pipe = r.pipeline(transaction=False)
+        for job, tomb in zip(jobs, tombstones):
+            if tomb:
+                continue
+            pipe.sadd(_index_key(job["jobOwner"]), job["jobId"])
+            pipe.hset(_job_key(job["jobOwner"], job["jobId"]), mapping=job)
+            written += 1
+        await pipe.execute()
+        return written
+
+    async def _delete(self, r, jobs: Iterable[Tuple[str, str]]) -> int:
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        pipe = r.pipeline(transaction=False)
+        for owner, job_id in jobs:
+            pipe.delete(_job_key(owner, job_id))
+            pipe.srem(_index_key(owner), job_id)
+        await pipe.execute()
+        logger.debug(f"HTC-CROND-QUEUE-LOG: deleted {len(jobs)} redis jobs no longer queued")
+        return len(jobs)
+
+    #### Cycles
+
+    async def _apply_delta(self, r, clusters: Set[str]) -> dict:
+        ids = sorted(clusters, key=int)
+        live = {}
+        for i in range(0, len(ids), _QUERY_CHUNK):
+            constraint = " || ".join(f"ClusterId == {j}" for j in ids[i:i + _QUERY_CHUNK])
+            for job in await asyncio.to_thread(self.query, constraint):
+                live[job["jobId"]] = job
+
+        written = await self._write(r, list(live.values()))
+        gone = [(self.owners.pop(j), j) for j in ids if j not in live and j in self.owners]
+        deleted = await self._delete(r, gone)
+        self.owners.update((j, job["jobOwner"]) for j, job in live.items())
+        return {"full": False, "events": len(ids), "written": written, "deleted": deleted}
+
+    async def _full_resync(self, r) -> dict:
+        if self.event_log:
+            # skip to the end first: what happens during the resync is
+            # read on the next cycle
+            try:
+                if self._log is None:
+                    self._log = await self._open_log(r)
+                await self._read_events(r)
+            except Exception as e:
+                logger.warning(f"HTC-CROND-QUEUE-LOG: opening {self.event_log} failed: {e}")
+                self._log = None
+
+        live = {job["jobId"]: job for job in await asyncio.to_thread(self.query, "true")}
+        written = await self._write(r, list(live.values()))
+        stale = [(owner, j) for owner, j in await scan_redis_jobs(r) if j not in live]
+        deleted = await self._delete(r, stale)
+
+        self.owners = {j: job["jobOwner"] for j, job in live.items()}
+        self._last_full = time.time()
+        return {"full": True, "events": 0, "written": written, "deleted": deleted}
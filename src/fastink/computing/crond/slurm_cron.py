@@ -4,26 +4,8 @@ import asyncio
 from fastink.inkdb.inkredis import redis_connect
 from fastink.computing.adapter.strategy import get_scheduler
 from functools import wraps
-from fastink.computing.tools.common.utils import (
-    sub_command,
-    change_username_to_uid,
-    parse_sbatch_out_err
-)
 from fastink.computing.tools.common.failed_jobs import record_failed_job
-from fastink.computing.tools.common.slurm_states import (
-    normalize_slurm_state,
-    normalize_slurm_text_field,
-)
-from fastink.computing.tools.db.db_tools import (
-    insert_job_info, 
-    update_job_status, 
-    get_active_cluster_jobs,
-    get_starttime_info,
-    get_endtime_info,
-    update_start_time,
-    update_end_time,
-    job_exists
-)
+from fastink.computing.crond.slurm_reconcile import reconciler
 
 import logging
 logger = logging.getLogger("ink.hpcadapter.slurm_cron")
@@ -32,7 +14,7 @@ def is_cluster_enabled(cluster: str) -> bool:
     """
     Check whether submit worker for the given cluster is enabled via YAML config.
     """
-    enabled_clusters = get_config("crond", "submit_workers")
+    enabled_clusters = get_config("crond", "submit_workers", fallback=[])
 
     if not isinstance(enabled_clusters, (list, tuple)):
         logger.error("crond.submit_workers must be a list")
@@ -249,199 +231,17 @@ async def _remove_user_submitting_job_by_uuid(r, cluster: str, username: str, su
     return False
         
         
-def _map_slurm_status_to_internal(db_status: str, slurm_state: str) -> str:
-    normalized = normalize_slurm_state(slurm_state)
-    if normalized:
-        return normalized
-
-    logger.debug(
-        "Unrecognized slurm state in reconciliation: raw_state=%s normalized_state=%s db_status=%s",
-        slurm_state,
-        (slurm_state or "").strip().upper(),
-        db_status,
-    )
-
-    return db_status
-
 async def slurm_update_job_state(cluster: str):
     """
-    Cluster-level Slurm reconciliation using full sacct metadata.
+    Incremental Slurm reconciliation: jobs active since the previous
+    cycle. Also publishes the sacct snapshot query_job serves from.
     """
+    await reconciler(cluster).run()
 
-    r = redis_connect()
-
-    sacct_cmd = (
-        "sacct -S now-1day "
-        "--format=JobID,User,Partition,State,Elapsed,"
-        "NNodes,NodeList,WCkey,Submit,Start,End,"
-        "WorkDir,Time,SubmitLine "
-        "-P -X -n"
-    )
-
-    stdout = await sub_command(
-        sacct_cmd,
-        30,
-        "Slurm state sync failed",
-        "Slurm state sync timeout",
-    )
-
-    lines = stdout.decode().strip().split("\n")
-
-    slurm_jobs = {}
-
-    for line in lines:
-        if not line:
-            continue
-
-        fields = line.split("|")
-        if len(fields) < 14:
-            logger.debug("slurm_update_job_state: skip malformed sacct line: %s", line)
-            continue
-
-        job_id = fields[0].strip()
-
-        slurm_jobs[job_id] = {
-            "username": fields[1],
-            "partition": fields[2],
-            "state": fields[3],
-            "job_type": fields[7],
-            "submit": fields[8],
-            "start": fields[9],
-            "end": fields[10],
-            "workdir": fields[11],
-            "submit_line": fields[13],
-        }
-
-    if not slurm_jobs:
-        return
-
-    db_jobs = get_active_cluster_jobs(cluster)
-    db_job_map = {j["jobid"]: j for j in db_jobs}
-
-    # -----------------------------------------------------
-    # Case A: Slurm has but DB missing -> insert full info
-    # -----------------------------------------------------
-    for job_id, info in slurm_jobs.items():
-
-        if job_id not in db_job_map:
-
-            if job_exists(job_id, cluster):
-                continue  # Job already exists in DB
-
-            uid = change_username_to_uid(info["username"])
-            if not uid:
-                continue
-
-            # Parse out/err from submit line
-            out_path, err_path = parse_sbatch_out_err(
-                info["submit_line"],
-                job_id,
-            )
-
-            insert_job_info(
-                uid=uid,
-                jobid=job_id,
-                outpath=out_path,
-                errpath=err_path,
-                job_type=info["job_type"],
-                job_path=info["workdir"],
-                clusterid=cluster,
-            )
-
-    # -----------------------------------------------------
-    # Case B/C: reconcile state
-    # -----------------------------------------------------
-    for job in db_jobs:
-
-        job_id = job["jobid"]
-        db_status = job["status"]
-
-        slurm_info = slurm_jobs.get(job_id)
-        if not slurm_info:
-            continue
-
-        new_status = _map_slurm_status_to_internal(
-            db_status,
-            slurm_info["state"],
-        )
-
-        if new_status != db_status:
-
-            update_job_status(job["uid"], job_id, new_status, cluster)
-
-            uuid_val = await r.get(
-                f"job_id_to_submit_uuid:{cluster}:{job_id}"
-            )
-
-            if uuid_val:
-                submit_uuid = (
-                    uuid_val.decode()
-                    if isinstance(uuid_val, bytes)
-                    else uuid_val
-                )
-
-                await r.hset(
-                    f"job_status:{cluster}:{submit_uuid}",
-                    "jobStatus",
-                    new_status,
-                )
-                
 
 async def slurm_update_job_time(cluster: str):
     """
-    Synchronize start and end times from Slurm into DB.
-    Uses single sacct call (last 1 day).
+    Full Slurm reconciliation of the last day: states and start/end
+    times of every job, repairing anything an incremental cycle missed.
     """
-
-    sacct_cmd = (
-        "sacct -S now-1day "
-        "--format=JobID,User,Start,End "
-        "-P -X -n"
-    )
-
-    stdout = await sub_command(
-        sacct_cmd,
-        20,
-        "Slurm time sync failed",
-        "Slurm time sync timeout",
-    )
-
-    lines = stdout.decode().strip().split("\n")
-
-    for line in lines:
-        if not line:
-            continue
-
-        fields = line.split("|")
-        if len(fields) < 4:
-            logger.debug("slurm_update_job_time: skip malformed sacct line: %s", line)
-            continue
-
-        job_id = fields[0].strip()
-        username = fields[1].strip()
-        start_time = normalize_slurm_text_field(fields[2])
-        end_time = normalize_slurm_text_field(fields[3])
-
-        uid = change_username_to_uid(username)
-        if not uid:
-            continue
-
-        if start_time:
-            if not get_starttime_info(uid, job_id, cluster):
-
-                update_start_time(
-                    uid,
-                    job_id,
-                    start_time.replace("T", " "),
-                    cluster,
-                )
-
-        if end_time:
-            if not get_endtime_info(uid, job_id, cluster):
-
-                update_end_time(
-                    uid,
-                    job_id,
-                    end_time.replace("T", " "),
-                    cluster,
-                )
+    await reconciler(cluster).run(full=True)
@@ -0,0 +1,279 @@
+"""Incremental Slurm reconciliation for the cron runner.
+
+``slurm_update_job_state`` used to pull the whole last day from sacct every
+5 seconds and check every job against the database one row at a time, and
+``slurm_update_job_time`` pulled the same day again to sync start/end
+times. :class:`SlurmReconciler` keeps that day of sacct lines in memory
+and, per cycle, only asks sacct for the jobs active since its high-water
+mark (the start of the previous pull, minus ``WINDOW_OVERLAP`` seconds of
+accounting lag):
+
+- only jobs whose State/Start/End differ from the previous pull are
+  reconciled, in one pass for status and times: one bulk SELECT, one
+  INSERT for jobs the database lacks, one executemany UPDATE, then one
+  MGET and one pipeline for the ``job_status:{cluster}:{submit_uuid}``
+  hashes of async jobs;
+- the in-memory day is published as the sacct snapshot that query_job
+  reads (see :mod:`fastink.computing.tools.common.sacct_snapshot`).
+
+A full pull (``sacct -S now-1day``) reconciling every job runs on the
+first cycle of a process and every time ``slurm_update_job_time`` fires,
+so anything an incremental window missed is repaired within that job's
+interval. Usernames are resolved to uids once per process.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from fastink.inkdb.inkredis import redis_connect
+from fastink.computing.tools.common import sacct_snapshot
+from fastink.computing.tools.common.utils import (
+    sub_command,
+    change_username_to_uid,
+    parse_sbatch_out_err
+)
+from fastink.computing.tools.common.slurm_states import (
+    normalize_slurm_state,
+    normalize_slurm_text_field,
+)
+from fastink.computing.tools.db.db_tools import (
+    get_jobs_info_bulk,
+    insert_jobs_info_bulk,
+    update_jobs_info_bulk,
+)
+
+logger = logging.getLogger("ink.hpcadapter.slurm_reconcile")
+
+SACCT_FORMAT = (
+    "JobID,User,Partition,State,Elapsed,"
+    "NNodes,NodeList,WCkey,Submit,Start,End,"
+    "WorkDir,Time,SubmitLine"
+)
+
+# Seconds re-read before the high-water mark, for jobs slurmdbd records late.
+WINDOW_OVERLAP = 60
+
+# Field indexes in SACCT_FORMAT
+_USER, _STATE, _WCKEY, _START, _END, _WORKDIR, _SUBMIT_LINE = 1, 3, 7, 9, 10, 11, 13
+
+
+def _map_slurm_status_to_internal(db_status: str, slurm_state: str) -> str:
+    normalized = normalize_slurm_state(slurm_state)
+    if normalized:
+        return normalized
+
+    logger.debug(
+        "Unrecognized slurm state in reconciliation: raw_state=%s normalized_state=%s db_status=%s",
+        slurm_state,
+        (slurm_state or "").strip().upper(),
+        db_status,
+    )
+
+    return db_status
+
+
+def _sacct_time(value: str):
+    value = normalize_slurm_text_field(value)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _change_key(fields: list) -> tuple:
+    # Elapsed changes every cycle for running jobs; these do not
+    return fields[_STATE], fields[_START], fields[_END]
+
+
+class SlurmReconciler:
+    def __init__(self, cluster: str):
+        self.cluster = cluster
+        #: job_id -> sacct fields, the last day as of ``high_water``
+        self.jobs = {}
+        self.high_water = None
+        self._uids = {}
+        self._lock = asyncio.Lock()
+
+    def _uid(self, username: str):
+        uid = self._uids.get(username)
+        if uid is None:
+            try:
+                uid = change_username_to_uid(username)
+            except ValueError:
+                logger.debug("slurm_reconcile: no local account for %s", username)
+                return None
+            self._uids[username] = uid
+        return uid
+
+    async def _pull(self, since: str) -> dict:
+        stdout = await sub_command(
+            f"sacct -S {since} --format={SACCT_FORMAT} -P -X -n",
+            30,
+            "Slurm state sync failed",
+            "Slurm state sync timeout",
+        )
+        jobs = {}
+        for line in stdout.decode().strip().split("\n"):
+            if not line:
+                continue
+
+            fields = line.split("|")
+            if len(fields) < 14:
+                logger.debug("slurm_reconcile: skip malformed sacct line: %s", line)
+                continue
+
+            jobs[fields[0].strip()] = fields
+        return jobs
+
+    @staticmethod
+    def _prune(jobs: dict) -> dict:
+        cutoff = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S")
+        return {
+            j: f for j, f in jobs.items() if not (f[_END][:1].isdigit() and f[_END] < cutoff)
+        }
+
+    @staticmethod
+    def _user_lines(jobs: dict) -> dict:
+        # query_job's `sacct -u` format is SACCT_FORMAT without User
+        user_lines = {}
+        for job_id, fields in jobs.items():
+            user_lines.setdefault(fields[_USER], {})[job_id] = "|".join(
+                [fields[0]] + fields[2:]
+            )
+        return user_lines
+
+    async def run(self, full: bool = False) -> dict:
+        """One cycle; ``full`` re-pulls and reconciles the whole day."""
+        async with self._lock:
+            return await self._run(full)
+
+    async def _run(self, full: bool) -> dict:
+        started = time.time()
+        full = full or self.high_water is None
+        if full:
+            since = "now-1day"
+        else:
+            since = datetime.fromtimestamp(
+                self.high_water - WINDOW_OVERLAP
+            ).strftime("%Y-%m-%dT%H:%M:%S")
+
+        pulled = await self._pull(since)
+        if full:
+            changed = list(pulled)
+            jobs = pulled
+        else:
+            changed = [
+                job_id for job_id, fields in pulled.items()
+                if job_id not in self.jobs or _change_key(self.jobs[job_id]) != _change_key(fields)
+            ]
+            jobs = self._prune({**self.jobs, **pulled})
+
+        r = redis_connect()
+        try:
+            await sacct_snapshot.publish(r, self.cluster, self._user_lines(jobs), started)
+        except Exception as e:
+            logger.warning("slurm_reconcile: publishing sacct snapshot failed: %s", e)
+
+        updated = await self._reconcile(r, pulled, changed) if changed else 0
+        # only now: if reconciling failed, the next cycle sees the same changes
+        self.jobs, self.high_water = jobs, started
+        stats = {
+            "full": full,
+            "pulled": len(pulled),
+            "changed": len(changed),
+            "updated": updated,
+            "tracked": len(jobs),
+            "duration": round(time.time() - started, 3),
+        }
+        logger.debug("slurm_reconcile: %s %s", self.cluster, stats)
+        return stats
+
+    async def _reconcile(self, r, pulled: dict, changed: list) -> int:
+        rows = await asyncio.to_thread(get_jobs_info_bulk, None, changed, self.cluster)
+
+        # -----------------------------------------------------
+        # Slurm has but DB missing -> insert full info
+        # -----------------------------------------------------
+        missing = {}
+        for job_id in changed:
+            # job_info.jobid is an integer column: array/het job ids
+            # ("123_4", "123+1") cannot be stored
+            if job_id in rows or not job_id.isdigit():
+                continue
+            fields = pulled[job_id]
+            uid = self._uid(fields[_USER])
+            if not uid:
+                continue
+            out_path, err_path = parse_sbatch_out_err(fields[_SUBMIT_LINE], job_id)
+            missing.setdefault(uid, {})[job_id] = {
+                "outpath": out_path or "",
+                "errpath": err_path or "",
+                "job_type": fields[_WCKEY],
+                "job_path": fields[_WORKDIR],
+            }
+        for uid, user_jobs in missing.items():
+            await asyncio.to_thread(insert_jobs_info_bulk, uid, user_jobs, self.cluster)
+        if missing:
+            inserted = [job_id for user_jobs in missing.values() for job_id in user_jobs]
+            rows.update(await asyncio.to_thread(get_jobs_info_bulk, None, inserted, self.cluster))
+
+        # -----------------------------------------------------
+        # Reconcile state and start/end times
+        # -----------------------------------------------------
+        updates = []
+        new_statuses = {}
+        for job_id in changed:
+            row = rows.get(job_id)
+            if row is None:
+                continue
+            fields = pulled[job_id]
+            change = {}
+
+            new_status = _map_slurm_status_to_internal(row["job_status"], fields[_STATE])
+            if new_status != row["job_status"]:
+                change["job_status"] = new_status
+                new_statuses[job_id] = new_status
+
+            start_time = _sacct_time(fields[_START])
+            if start_time and not row["job_start_time"]:
+                change["job_start_time"] = start_time
+            end_time = _sacct_time(fields[_END])
+            if end_time and not row["job_end_time"]:
+                change["job_end_time"] = end_time
+
+            if change:
+                updates.append({"id": row["id"], **change})
+
+        if updates:
+            await asyncio.to_thread(update_jobs_info_bulk, updates)
+        if new_statuses:
+            await self._publish_statuses(r, new_statuses)
+        return len(updates)
+
+    async def _publish_statuses(self, r, new_statuses: dict) -> None:
+        """Mirror status changes into the job_status hashes of async jobs."""
+        job_ids = list(new_statuses)
+        uuid_vals = await r.mget(
+            [f"job_id_to_submit_uuid:{self.cluster}:{job_id}" for job_id in job_ids]
+        )
+        pipe = r.pipeline(transaction=False)
+        for job_id, uuid_val in zip(job_ids, uuid_vals):
+            if not uuid_val:
+                continue
+            submit_uuid = uuid_val.decode() if isinstance(uuid_val, bytes) else uuid_val
+            pipe.hset(f"job_status:{self.cluster}:{submit_uuid}", "jobStatus", new_statuses[job_id])
+        await pipe.execute()
+
+
+_reconcilers = {}
+
+
+def reconciler(cluster: str) -> SlurmReconciler:
+    """The process-wide reconciler of ``cluster``."""
+    if cluster not in _reconcilers:
+        _reconcilers[cluster] = SlurmReconciler(cluster)
+    return _reconcilers[cluster]
@@ -6,8 +6,8 @@ Behavior is driven entirely by configuration:
   user's home directory; otherwise it supports ``{username}``,
   ``{user_group}``, ``{experiment_group}``, and
   ``{experiment_group_lower}``.
-- ``common.krb5_enabled``: when true, a Kerberos ticket is created for
-  the user and uploaded alongside the job script.
+- ``common.krb5_enabled``: when true, the user's Kerberos ticket (from
+  ``common.ccache_store``) is uploaded alongside the job script.
 - ``computing.schedd_host`` / ``computing.cm_host``: HTCondor schedd and
   central manager used by the htcondor submitter.
 
@@ -16,12 +16,11 @@ name; anything they do not customize falls back to these
 implementations.
 """
 
-import base64
 import pwd
 from datetime import datetime
 from shlex import quote
 
-from fastink.auth.backends.krb5 import get_krb5
+from fastink.common.ccache_store import ccache_store
 from fastink.common.config import get_config
 from fastink.common.logger import logger
 from fastink.computing.site.strategy import register_site, register_submitter
@@ -45,24 +44,14 @@ async def build_job_env(uid, jobtype, rawjobPath, jobfilename):
     token_filename = ""
     xrootd_path = get_config("storage", "xrd_host")
 
-    krb5_decoded_bytes = None
-    if krb5_enabled:
-        token = get_krb5(username)
-        if not token:
-            raise Exception("Init KRB5 token failed.")
-        krb5_decoded_bytes = base64.b64decode(token)
-
-        token_filename = f"/tmp/krb5cc_{uid}_{time_stamp}"
-        if not os.path.exists(token_filename):
-            with open(token_filename, 'wb') as file:
-                file.write(krb5_decoded_bytes)
-
     is_exist, _ = await common.path_exist(name=job_dir, username=username, mgm=xrootd_path)
     if not is_exist:
         await common.mkdir(dname=job_dir, username=username, mode="700", exist_ok=False, mgm=xrootd_path)
 
-    if krb5_decoded_bytes is not None:
-        await common.upload_file(src_data=krb5_decoded_bytes, dst=f"{job_dir}/krb5cc_{uid}", username=username, mgm=xrootd_path)
+    if krb5_enabled:
+        with ccache_store.lease(username, uid) as ccache:
+            await common.upload_file(src_data=ccache.data, dst=f"{job_dir}/krb5cc_{uid}", username=username, mgm=xrootd_path)
+        token_filename = ccache.path
 
     with open(rawjobPath, "rb") as file:
         jobfile_content = file.read()
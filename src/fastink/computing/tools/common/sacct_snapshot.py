@@ -0,0 +1,135 @@
+"""Cluster-wide sacct snapshot in Redis, sliced per user.
+
+The Slurm reconciler behind ``slurm_update_job_state`` (cron, every few
+seconds) tracks the last day of cluster-wide sacct output. It publishes
+that day here so that ``HPC_Scheduler.query_job`` serves the user's slice
+from Redis instead of running its own ``sacct -u <user>`` for every
+dashboard refresh.
+
+Schema
+------
+::
+
+    sacct_snapshot:{cluster}:generation          counter, INCR per publish
+    sacct_snapshot:{cluster}:current             hash
+        generation  generation of the newest complete snapshot
+        taken_at    epoch seconds when its sacct started
+    sacct_snapshot:{cluster}:{gen}:{username}    hash, TTL = generation_ttl()
+        {job_id}    the job's line in the ``sacct -u`` format of query_job
+    sacct_snapshot:{cluster}:changed:{username}  epoch seconds of the user's
+                                                 last submit/cancel
+
+A generation's user hashes are written before ``current`` points at it,
+so readers never see a half-written snapshot; old generations expire on
+their own. Users without a hash in the current generation have no jobs.
+
+:func:`read_user_lines` returns None -- and the caller runs sacct
+itself -- when there is no snapshot, when it is older than
+``computing.sacct_snapshot_max_age`` seconds (0 disables the snapshot),
+or when the user submitted or cancelled a job after it was taken.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+# Index of End in the per-user line (JobID,Partition,State,Elapsed,NNodes,
+# NodeList,WCkey,Submit,Start,End,WorkDir,Time,SubmitLine).
+_END_FIELD = 9
+
+
+def _prefix(cluster: str) -> str:
+    return f"sacct_snapshot:{cluster}"
+
+
+def _user_key(cluster: str, generation, username: str) -> str:
+    return f"{_prefix(cluster)}:{generation}:{username}"
+
+
+def _changed_key(cluster: str, username: str) -> str:
+    return f"{_prefix(cluster)}:changed:{username}"
+
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+
+def max_age() -> float:
+    return get_config("computing", "sacct_snapshot_max_age", fallback=30, type=float)
+
+
+def generation_ttl() -> int:
+    # long enough for a reader that fetched ``current`` just before the
+    # next publish to still find the user hash
+    return max(60, int(3 * max_age()))
+
+
+async def publish(r, cluster: str, user_lines: Dict[str, Dict[str, str]], taken_at: float) -> int:
+    """Publish ``{username: {job_id: line}}`` as a new generation."""
+    generation = await r.incr(f"{_prefix(cluster)}:generation")
+    ttl = generation_ttl()
+    pipe = r.pipeline(transaction=False)
+    for username, lines in user_lines.items():
+        key = _user_key(cluster, generation, username)
+        pipe.hset(key, mapping=lines)
+        pipe.expire(key, ttl)
+    await pipe.execute()
+    await r.hset(
+        f"{_prefix(cluster)}:current",
+        mapping={"generation": generation, "taken_at": taken_at},
+    )
+    logger.debug(
+        "sacct_snapshot: published %s generation %s (%d users)",
+        cluster, generation, len(user_lines),
+    )
+    return generation
+
+
+async def mark_user_changed(r, cluster: str, username: str) -> None:
+    """Make ``read_user_lines`` bypass snapshots taken before now."""
+    try:
+        await r.set(_changed_key(cluster, username), time.time(), ex=generation_ttl())
+    except Exception as e:
+        logger.warning("sacct_snapshot: marking %s changed failed: %s", username, e)
+
+
+async def read_user_lines(r, cluster: str, username: str) -> Optional[List[str]]:
+    """The user's sacct lines from the current snapshot, None on a miss."""
+    limit = max_age()
+    if limit <= 0:
+        return None
+
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.hgetall(f"{_prefix(cluster)}:current")
+        pipe.get(_changed_key(cluster, username))
+        current, changed = await pipe.execute()
+        current = {_str(k): _str(v) for k, v in (current or {}).items()}
+        if not current.get("generation"):
+            return None
+        taken_at = float(current["taken_at"])
+        if time.time() - taken_at > limit:
+            return None
+        if changed is not None and float(_str(changed)) >= taken_at:
+            return None
+        lines = await r.hvals(_user_key(cluster, current["generation"], username))
+    except Exception as e:
+        logger.warning("sacct_snapshot: reading %s slice failed: %s", username, e)
+        return None
+
+    # The snapshot covers the last day; ``sacct -u`` without -S starts at
+    # midnight, so drop jobs that ended before today.
+    midnight = datetime.now().strftime("%Y-%m-%dT00:00:00")
+    result = []
+    for line in map(_str, lines):
+        fields = line.split("|")
+        end = fields[_END_FIELD] if len(fields) > _END_FIELD else ""
+        if end[:1].isdigit() and end < midnight:
+            continue
+        result.append(line)
+    return result
@@ -1,6 +1,5 @@
 import signal
 import asyncio, json
-import grp
 import pwd, os, base64
 from pathlib import Path
 from shlex import quote, split
@@ -10,6 +9,7 @@ from zoneinfo import ZoneInfo
 from pathlib import Path, PurePath
 from fastink.storage import common
 from fastink.auth.backends.krb5 import get_krb5
+from fastink.auth.groups import lookup_user_groups, primary_group_name
 from fastapi import HTTPException
 from fastink.common.logger import logger
 from fastink.common.config import get_config
@@ -174,11 +174,8 @@ def delete_iptables(uid, jobId, gateway_port, clusterid):
 
 
 def get_user_exp_group(uid):
-    # 查询用户信息 → 主组 GID
-    gid = pwd.getpwuid(uid).pw_gid
-
-    # 查询组信息 → 组名
-    group_name = grp.getgrgid(gid).gr_name
+    # 主组 GID → 组名 (served from the group index)
+    group_name = primary_group_name(uid)
     return map_group_to_experiment(group_name), group_name
 
 
@@ -209,19 +206,7 @@ def get_extra_job_config(username: str, groupname: str, job_type: str, request_o
 
 
 def get_all_user_groups(username: str, uid: int) -> list[str]:
-    primary_gid = pwd.getpwuid(uid).pw_gid
-    group_ids = os.getgrouplist(username, primary_gid)
-    groups = []
-    for gid in group_ids:
-        try:
-            groups.append(grp.getgrgid(gid).gr_name)
-        except KeyError:
-            continue
-    deduped = []
-    for group_name in groups:
-        if group_name not in deduped:
-            deduped.append(group_name)
-    return deduped
+    return lookup_user_groups(username)
 
 
 def resolve_user_experiments(username: str, uid: int) -> tuple[list[str], list[str]]:
@@ -370,7 +355,7 @@ async def generate_condor_submit(
         config[f"{key}"] = value
 
     if extra_param:
-        groupname = grp.getgrgid(pwd.getpwuid(uid).pw_gid).gr_name
+        groupname = primary_group_name(uid)
         extra_job_config = get_extra_job_config(username, groupname, jobtype, request_os)
         for key, value in extra_job_config.items():
             logger.info(f"key: {key}, value: {value}")
@@ -515,7 +500,7 @@ async def generate_condor_sync_submit(
 
     XROOTD_PATH = get_config("storage", "xrd_host")
     uid = change_username_to_uid(username)
-    groupname = grp.getgrgid(pwd.getpwuid(uid).pw_gid).gr_name
+    groupname = primary_group_name(uid)
 
     if script_path:
         extra_param = True
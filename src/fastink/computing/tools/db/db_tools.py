@@ -1,6 +1,6 @@
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Session
-from sqlalchemy import select, update, delete, or_
+from sqlalchemy import select, update, delete, insert, or_
 from fastink.database.sqla import models
 from fastink.database.sqla.session import read_session, transactional_session
 from fastink.common.logger import logger
@@ -182,6 +182,124 @@ def update_end_time(uid, jobid, endtime, clusterid):
     return update_jobinfo_db(uid, jobid, clusterid, 'job_end_time', endtime) 
 
 
+
+#### Bulk job-state access for query_job: one SELECT, one INSERT and one
+#### UPDATE per page instead of several round-trips per job.
+_IN_CHUNK = 1000
+
+
+@read_session
+def get_jobs_info_bulk(uid, jobids, clusterid, *, session: Session):
+    """Rows of ``jobids`` for one user (None: any user) and cluster, keyed
+    by str(jobid)."""
+    jobids = list(dict.fromkeys(str(j) for j in jobids))
+    rows = {}
+    for i in range(0, len(jobids), _IN_CHUNK):
+        stmt = (
+            select(models.JobInfo)
+            .where(models.JobInfo.clusterid == clusterid)
+            .where(models.JobInfo.jobid.in_(jobids[i:i + _IN_CHUNK]))
+        )
+        if uid is not None:
+            stmt = stmt.where(models.JobInfo.uid == uid)
+        for result in session.execute(stmt).scalars():
+            rows[str(result.jobid)] = result.to_dict()
+    return rows
+
+
+@transactional_session
+def insert_jobs_info_bulk(uid, jobs, clusterid, *, session: Session):
+    """Insert ``{jobid: {outpath, errpath, job_type, job_path}}`` with one
+    executemany. Jobs inserted meanwhile by a concurrent request are skipped."""
+    if not jobs:
+        return
+    rows = [
+        {"uid": uid, "jobid": jobid, "clusterid": clusterid, **fields}
+        for jobid, fields in jobs.items()
+    ]
+    stmt = (
+        insert(models.JobInfo)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    try:
+        session.execute(stmt, rows)
+        session.flush()
+        logger.debug(f"Insert User {uid} job info to DB, {len(rows)} jobs, cluster: {clusterid}")
+    except Exception as e:
+        raise Exception(f"Insert User({uid}) job info failed: {e}")
+
+
+@transactional_session
+def update_jobs_info_bulk(updates, *, session: Session):
+    """Apply ``[{"id": row id, field: value, ...}, ...]`` with executemany
+    UPDATEs by primary key (grouped by the set of fields)."""
+    if not updates:
+        return
+    try:
+        session.execute(update(models.JobInfo), updates)
+        session.flush()
+    except Exception as e:
+        raise Exception(f"ERR : \'{e.__str__()}\' in bulk update of {len(updates)} jobs.")
+
+
+def _db_time(value):
+    """Scheduler time strings to datetime; empty means unknown."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+class JobStateBatch:
+    """Job rows of one user on one cluster, read and written in bulk.
+
+    ``load`` fetches the rows, ``insert_missing`` adds unknown jobs,
+    ``set`` records changes and ``flush`` writes them all at once.
+    """
+
+    def __init__(self, uid, clusterid):
+        self.uid = uid
+        self.clusterid = clusterid
+        self.rows = {}
+        self._changes = {}
+
+    def load(self, jobids):
+        self.rows.update(get_jobs_info_bulk(self.uid, jobids, self.clusterid))
+
+    def insert_missing(self, jobs):
+        jobs = {str(j): fields for j, fields in jobs.items() if str(j) not in self.rows}
+        if jobs:
+            insert_jobs_info_bulk(self.uid, jobs, self.clusterid)
+            self.load(jobs)
+
+    def __contains__(self, jobid):
+        return str(jobid) in self.rows
+
+    def get(self, jobid):
+        try:
+            return self.rows[str(jobid)]
+        except KeyError:
+            raise NoResultFound(f"ERR : No records found for user({self.uid}), job({jobid}), cluster({self.clusterid}).")
+
+    def set(self, jobid, **fields):
+        for name in ("job_start_time", "job_end_time"):
+            if name in fields:
+                fields[name] = _db_time(fields[name])
+        row = self.get(jobid)
+        row.update(fields)
+        self._changes.setdefault(row["id"], {}).update(fields)
+
+    def flush(self):
+        updates = [{"id": row_id, **fields} for row_id, fields in self._changes.items()]
+        self._changes = {}
+        update_jobs_info_bulk(updates)
+
+
 @read_session
 def find_completed_jobs(uid, jobtype, *, session:Session):
     
@@ -204,7 +322,7 @@ def find_completed_jobs(uid, jobtype, *, session:Session):
         raise Exception(f"ERR : {e} in find completed jobs for for user({uid})")
     
     for result in results:
-        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean]
+        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean, result.id]
         
     return job_list
 
@@ -237,7 +355,7 @@ def find_active_jobs(uid, jobtype, clusterid=None, *, session:Session):
         raise Exception(f"ERR : {e} in find active jobs for user({uid})")
 
     for result in results:
-        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean]
+        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean, result.id]
 
     return job_list
 
@@ -256,7 +374,7 @@ def needto_change_status_jobs(*, session:Session):
         raise Exception(f"ERR : {e} in change_status_job func.")
     
     for result in results:
-        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean]
+        job_list[result.jobid] = [result.job_type, result.iptable_status, result.iptable_clean, result.id]
         
     return job_list
 
@@ -263,6 +263,7 @@ class KerberosTokens(BASE, ModelBase):
     __table_args__ = (
         ForeignKeyConstraint(["user_id"], ["users.id"], name="KERBEROS_TOKENS_USER_FK"),
         Index("KERBEROS_TOKENS_USER_IDX", "user_id"),
+        Index("KERBEROS_TOKENS_EXPIRED_AT_IDX", "expired_at"),
     )
 
 
@@ -10,7 +10,7 @@ from fastink.routers.headers import (
     TimerMiddleware,
     UserValidationMiddleware,
 )
-from fastink.common.config import get_config
+from fastink.common.config import get_config, install_sighup_handler
 from fastink.routers.plugin_loader import load_router_plugins
 from fastink.common.bootstrap import init_plugins
 from fastink.common.logger import logger
@@ -18,24 +18,11 @@ from fastink.common.plugin_interface import plugin_manager
 
 app = FastAPI()
 if get_config("common", "security_access") is True:
-    skip_routers = get_config("security", "skip_routers")
-    app.add_middleware(UserValidationMiddleware, skip_routers=skip_routers)
+    app.add_middleware(UserValidationMiddleware, watch_config=True)
 if get_config("common", "ip_whitelist_access") is True:
-    ip_whitelist = get_config("security", "ip_whitelist")
-    forbidden_routers = get_config("security", "ip_controlled_routers")
-    # fallback keeps old configs (not yet re-rendered) bootable; the
-    # trailing `or list()` also covers a present-but-null key, which
-    # get_config would return as None and list(None) would reject
-    token_bypass_routers = get_config(
-        "security", "ip_whitelist_token_bypass_routers", fallback=list()
-    ) or list()
-    app.add_middleware(
-        IPWhitelistMiddleware,
-        ip_whitelist=ip_whitelist,
-        forbidden_routers=forbidden_routers,
-        token_bypass_routers=token_bypass_routers,
-    )
+    app.add_middleware(IPWhitelistMiddleware, watch_config=True)
 app.add_middleware(TimerMiddleware)
+install_sighup_handler()
 
 # Load unified plugins and activate hooks (shared with the cron runner)
 init_plugins()
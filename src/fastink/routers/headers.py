@@ -1,55 +1,67 @@
-import ipaddress
 import time
+import weakref
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
+from fastink.auth.backends.aio import as_async, run_blocking
 from fastink.auth.backends.registry import get_auth_backend
-from fastink.common.config import get_config
+from fastink.auth.revocation import revocation_list
+from fastink.auth.token_cache import token_cache
+from fastink.common.config import get_config, on_config_change
 from fastink.common.logger import logger
+from fastink.routers.matchers import IPMatcher, PathMatcher
 from fastink.routers.status import InkStatus
 
 
-def _path_matches(path: str, patterns: list) -> bool:
-    """Match a request path against a list of router patterns.
+def _watch_config(method):
+    """Subscribe a bound method to config reloads without keeping its
+    instance alive (middleware stacks are rebuilt, e.g. per TestClient)."""
+    ref = weakref.WeakMethod(method)
 
-    Two matching modes, distinguished by a trailing slash so that the two
-    security config lists (skip_routers, ip_controlled_routers) share one
-    predictable semantics:
+    def callback(old, new):
+        bound = ref()
+        if bound is not None:
+            bound(old, new)
 
-      - pattern ending with "/"  -> PREFIX match. "/api/v1/" matches
-        "/api/v1/foo" and also the bare "/api/v1".
-      - pattern without trailing "/" -> EXACT match. "/api/v2/auth/get_token"
-        matches only that exact path, never "/api/v2/auth/get_token_x" or
-        "/api/v2/auth/get_token/y".
-    """
-    for pattern in patterns:
-        if pattern.endswith("/"):
-            # prefix match; also treat the bare path (pattern minus the
-            # trailing slash) as a match so "/api/v1/" covers "/api/v1"
-            if path.startswith(pattern) or path == pattern.rstrip("/"):
-                return True
-        else:
-            if path == pattern:
-                return True
-    return False
+    on_config_change(callback)
 
 
-class UserValidationMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, skip_routers: list = list()):
-        super().__init__(app)
-        self.skip_routers = skip_routers
+class UserValidationMiddleware:
+    """Reject API requests without a valid Ink-Username/Ink-Token pair.
+
+    Plain ASGI middleware: no per-request task or body stream wrapping as
+    with BaseHTTPMiddleware, and the token check is awaited so a slow
+    backend only delays its own request.
+    """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app, skip_routers: list = list(), watch_config: bool = False):
+        """With ``watch_config``, skip_routers come from
+        ``security.skip_routers`` and follow config reloads."""
+        self.app = app
+        if watch_config:
+            skip_routers = get_config("security", "skip_routers")
+            _watch_config(self._on_config_change)
+        self.skip_routers = PathMatcher(skip_routers)
+
+    def _on_config_change(self, old, new):
+        if old.data.get("security") != new.data.get("security"):
+            self.skip_routers = PathMatcher(get_config("security", "skip_routers"))
+            logger.info("Reloaded skip_routers")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
         # only execute for API requests
         if not request.url.path.startswith("/api"):
             logger.debug("Not an API request, skip middleware")
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
-        if _path_matches(request.url.path, self.skip_routers):
+        if self.skip_routers.matches(request.url.path):
             logger.debug("Skip authentication for %s", request.url.path)
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         # extract username and token from headers
         username = request.headers.get("Ink-Username")
@@ -58,7 +70,7 @@ class UserValidationMiddleware(BaseHTTPMiddleware):
         # TODO: option-in in next version
         if not username or not token:
             logger.warning("No username or token provided")
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=200,
                 content={
                     "status": InkStatus.TOKEN_INVALID,
@@ -66,14 +78,12 @@ class UserValidationMiddleware(BaseHTTPMiddleware):
                     "data": None,
                 },
             )
-
-        # request.state.username = username
-        # request.state.token = token
+            return await response(scope, receive, send)
 
         # validate user
-        if not validate_token(username, token):
+        if not await validate_token_async(username, token):
             logger.warning("Invalid user %s with token %s", username, token)
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=200,
                 content={
                     "status": InkStatus.USER_INVALID,
@@ -81,39 +91,70 @@ class UserValidationMiddleware(BaseHTTPMiddleware):
                     "data": None,
                 },
             )
-        return await call_next(request)
+            return await response(scope, receive, send)
+        return await self.app(scope, receive, send)
 
 
-class IPWhitelistMiddleware(BaseHTTPMiddleware):
+class IPWhitelistMiddleware:
     def __init__(
         self,
         app,
         ip_whitelist: list = list(),
         forbidden_routers: list = list(),
         token_bypass_routers: list = list(),
+        watch_config: bool = False,
     ):
-        super().__init__(app)
-        self.allowed_networks = list()
-        self.forbidden_routers = list(forbidden_routers)
-        self.token_bypass_routers = list(token_bypass_routers)
-        for router in self.token_bypass_routers:
-            if not _path_matches(router, self.forbidden_routers):
+        """With ``watch_config``, the lists come from the ``security``
+        section and the parsed networks are rebuilt on config reloads."""
+        self.app = app
+        if watch_config:
+            self._configure(**self._from_config())
+            _watch_config(self._on_config_change)
+        else:
+            self._configure(ip_whitelist, forbidden_routers, token_bypass_routers)
+
+    @staticmethod
+    def _from_config() -> dict:
+        return dict(
+            ip_whitelist=get_config("security", "ip_whitelist"),
+            forbidden_routers=get_config("security", "ip_controlled_routers"),
+            # fallback keeps old configs (not yet re-rendered) bootable; the
+            # trailing `or list()` also covers a present-but-null key, which
+            # get_config would return as None and list(None) would reject
+            token_bypass_routers=get_config(
+                "security", "ip_whitelist_token_bypass_routers", fallback=list()
+            ) or list(),
+        )
+
+    def _on_config_change(self, old, new):
+        if old.data.get("security") != new.data.get("security"):
+            self._configure(**self._from_config())
+            logger.info("Reloaded IP whitelist (%d entries)", len(self.allowed_networks))
+
+    def _configure(self, ip_whitelist, forbidden_routers, token_bypass_routers):
+        forbidden_routers = PathMatcher(forbidden_routers)
+        token_bypass_routers = PathMatcher(token_bypass_routers)
+        for router in token_bypass_routers.patterns:
+            if not forbidden_routers.matches(router):
                 logger.warning(
                     "Token bypass router %s is not IP-controlled; the "
                     "bypass will never take effect",
                     router,
                 )
-        for entry in ip_whitelist:
-            if "/" in entry:
-                self.allowed_networks.append(ipaddress.ip_network(entry, strict=False))
-            else:
-                self.allowed_networks.append(ipaddress.ip_address(entry))
+        # swap all three together so a request never sees a mix
+        self.allowed_networks, self.forbidden_routers, self.token_bypass_routers = (
+            IPMatcher(ip_whitelist), forbidden_routers, token_bypass_routers
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-    async def dispatch(self, request: Request, call_next):
+        request = Request(scope)
         # only works on ip_controlled_routers
-        if not _path_matches(request.url.path, self.forbidden_routers):
+        if not self.forbidden_routers.matches(request.url.path):
             logger.debug("IP whitelist will not be applied to %s", request.url.path)
-            return await call_next(request)
+            return await self.app(scope, receive, send)
 
         # get client ip
         client_ip = request.headers.get("X-Real-IP") or request.client.host
@@ -121,24 +162,10 @@ class IPWhitelistMiddleware(BaseHTTPMiddleware):
 
         # skip testclient
         if client_ip == "testclient":
-            return await call_next(request)
-
-        ip_obj = ipaddress.ip_address(client_ip)
-
-        allowed = False
-        for entry in self.allowed_networks:
-            if isinstance(entry, ipaddress.IPv4Network) or isinstance(
-                entry, ipaddress.IPv6Network
-            ):
-                if ip_obj in entry:
-                    allowed = True
-                    break
-            elif ip_obj == entry:
-                allowed = True
-                break
+            return await self.app(scope, receive, send)
 
-        if allowed:
-            return await call_next(request)
+        if self.allowed_networks.allows(client_ip):
+            return await self.app(scope, receive, send)
 
         # Non-whitelisted IPs may still pass on token_bypass_routers when
         # the request carries a VALID Ink-Username/Ink-Token pair (e.g.
@@ -148,19 +175,18 @@ class IPWhitelistMiddleware(BaseHTTPMiddleware):
         # credentials. The queried identity must also match the validated
         # header identity, otherwise any valid account could enumerate
         # other users' permissions. Whitelisted IPs are allowed above
-        # without paying the token-validation cost (krb5 validation
-        # shells out to klist).
-        if _path_matches(request.url.path, self.token_bypass_routers):
+        # without paying the token-validation cost.
+        if self.token_bypass_routers.matches(request.url.path):
             username = request.headers.get("Ink-Username")
             token = request.headers.get("Ink-Token")
-            if username and token and validate_token(username, token):
+            if username and token and await validate_token_async(username, token):
                 if request.query_params.get("username") == username:
                     logger.debug(
                         "IP whitelist bypassed for authenticated user %s on %s",
                         username,
                         request.url.path,
                     )
-                    return await call_next(request)
+                    return await self.app(scope, receive, send)
                 logger.warning(
                     "Bypass denied for %s on %s: queried username %r does not "
                     "match the validated identity",
@@ -174,7 +200,7 @@ class IPWhitelistMiddleware(BaseHTTPMiddleware):
                     request.url.path,
                 )
 
-        return JSONResponse(
+        response = JSONResponse(
                 status_code=200,
                 content={
                     "status": InkStatus.IP_BANNED,
@@ -182,13 +208,29 @@ class IPWhitelistMiddleware(BaseHTTPMiddleware):
                     "data": None,
                 },
             )
+        return await response(scope, receive, send)
 
 
-class TimerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class TimerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = Request(scope)
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         start_time = time.perf_counter()
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             process_time = time.perf_counter() - start_time
             url = mask_url_query(str(request.url), {"password"})
@@ -197,33 +239,111 @@ class TimerMiddleware(BaseHTTPMiddleware):
             )
             raise
         process_time = time.perf_counter() - start_time
-        # response.headers["X-Process-Time"] = f"{process_time:.4f}"
         url = mask_url_query(str(request.url), {"password"})
         logger.debug(
-            "%.4fs | Request: %s %s %s", process_time, request.method, response.status_code, url
+            "%.4fs | Request: %s %s %s", process_time, request.method, status_code, url
         )
-        return response
+
+
+_auth_settings = None
+
+
+def _load_auth_settings() -> dict:
+    """Auth options read on every validation, refreshed on config change."""
+    global _auth_settings
+    _auth_settings = {
+        "type": get_config("auth", "type"),
+        "issuer": get_config("auth", "issuer"),
+        "client_id": get_config("auth", "client_id"),
+        "client_secret": get_config("auth", "client_secret"),
+    }
+    return _auth_settings
+
+
+@on_config_change
+def _refresh_auth_settings(old, new):
+    if _auth_settings is not None and old.data.get("auth") != new.data.get("auth"):
+        _load_auth_settings()
+
+
+def _backend_kwargs(username: str, token: str) -> dict:
+    settings = _auth_settings or _load_auth_settings()
+    logger.debug("Validating user %s, issuer %s, type %s",
+                 username, settings["issuer"], settings["type"])
+    return dict(
+        username=username,
+        token=token,
+        client_id=settings["client_id"],
+        client_secret=settings["client_secret"],
+        issuer=settings["issuer"],
+    )
+
+
+def _revoked(username: str, token: str) -> bool:
+    """Check a cached acceptance against the shared revocation list, so a
+    token revoked by another worker is not served from this cache."""
+    if revocation_list.is_revoked(token):
+        token_cache.discard(username, token)
+        return True
+    return False
 
 
 def validate_token(username: str, token: str) -> bool:
-    issuer = get_config("auth", "issuer")
-    client_id = get_config("auth", "client_id")
-    client_secret = get_config("auth", "client_secret")
-    type = get_config("auth", "type")
-    logger.debug("Validating user %s, issuer %s, type %s", username, issuer, type)
+    cached = token_cache.get(username, token)
+    if cached is not None:
+        if cached and revocation_list.enabled:
+            return not _revoked(username, token)
+        return cached
+    kwargs = _backend_kwargs(username, token)
+    valid_until = None
     try:
-        backend = get_auth_backend(type)
-        if backend.validate_token(
-            username=username,
-            token=token,
-            client_id=client_id,
-            client_secret=client_secret,
-            issuer=issuer,
-        ):
-            return True
+        backend = get_auth_backend(_auth_settings["type"])
+        if hasattr(backend, "validated_until"):
+            valid_until = backend.validated_until(**kwargs)
+            valid = True
+        else:
+            valid = bool(backend.validate_token(**kwargs))
+    except Exception as e:
+        #### Not cached: a backend or database hiccup must not keep
+        #### rejecting the user once it is over
+        logger.error("User validation failed: %s", e)
+        return False
+    token_cache.put(username, token, valid, valid_until)
+    return valid
+
+
+async def validate_token_async(username: str, token: str) -> bool:
+    """Awaitable ``validate_token`` for the middlewares and async routes.
+
+    Synchronous backends run on the auth thread pool (see
+    ``fastink.auth.backends.aio``); cache lookups only leave the event
+    loop when they may go to Redis.
+    """
+    if token_cache.redis_enabled:
+        cached = await run_blocking(token_cache.get, username, token)
+    else:
+        cached = token_cache.get(username, token)
+    if cached is not None:
+        if cached and revocation_list.enabled:
+            return not await run_blocking(_revoked, username, token)
+        return cached
+    kwargs = _backend_kwargs(username, token)
+    valid_until = None
+    try:
+        backend = as_async(get_auth_backend(_auth_settings["type"]))
+        if hasattr(backend, "validated_until"):
+            valid_until = await backend.validated_until(**kwargs)
+            valid = True
+        else:
+            valid = bool(await backend.validate_token(**kwargs))
     except Exception as e:
         logger.error("User validation failed: %s", e)
         return False
+    if token_cache.redis_enabled:
+        await run_blocking(token_cache.put, username, token, valid, valid_until)
+    else:
+        token_cache.put(username, token, valid, valid_until)
+    return valid
 
 
 def mask_url_query(url: str, sensitive_keys: set[str]) -> str:
@@ -0,0 +1,84 @@
+"""Precompiled matchers for the request middlewares.
+
+Both run on every request, so the per-request cost must not grow with the
+size of the security config:
+
+- :class:`PathMatcher` compiles a router pattern list shared by
+  ``skip_routers`` and ``ip_controlled_routers``: a pattern ending with "/"
+  is a prefix match that also covers the bare path ("/api/v1/" matches
+  "/api/v1" and "/api/v1/foo"); any other pattern matches only that exact
+  path. Exact patterns live in a set; prefix patterns in a set of
+  "/"-terminated prefixes, probed once per "/" in the path. Results are
+  memoized per distinct path.
+- :class:`IPMatcher` merges whitelist addresses and networks into sorted,
+  disjoint integer intervals per address family and answers membership
+  with a binary search, memoized per distinct client address.
+"""
+
+import bisect
+import ipaddress
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+CACHE_SIZE = 4096
+
+
+class PathMatcher:
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        self.exact = frozenset(p for p in self.patterns if not p.endswith("/"))
+        self.prefixes = frozenset(p for p in self.patterns if p.endswith("/"))
+        # "/api/v1/" also covers the bare "/api/v1"
+        self.bare = frozenset(p.rstrip("/") for p in self.prefixes)
+        self.matches = lru_cache(maxsize=CACHE_SIZE)(self._matches)
+
+    def _matches(self, path: str) -> bool:
+        if path in self.exact or path in self.bare:
+            return True
+        i = path.find("/")
+        while i != -1:
+            if path[: i + 1] in self.prefixes:
+                return True
+            i = path.find("/", i + 1)
+        return False
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class IPMatcher:
+    def __init__(self, entries: Iterable[str]):
+        intervals = {4: [], 6: []}
+        for entry in entries:
+            if "/" in entry:
+                net = ipaddress.ip_network(entry, strict=False)
+            else:
+                net = ipaddress.ip_network(ipaddress.ip_address(entry))
+            intervals[net.version].append(
+                (int(net.network_address), int(net.broadcast_address))
+            )
+        self.size = sum(len(v) for v in intervals.values())
+        self.tables = {version: _merge(v) for version, v in intervals.items()}
+        self.allows = lru_cache(maxsize=CACHE_SIZE)(self._allows)
+
+    def _allows(self, client_ip: str) -> bool:
+        """Raises ValueError for strings that are not IP addresses."""
+        ip = ipaddress.ip_address(client_ip)
+        starts, ends = self.tables[ip.version]
+        value = int(ip)
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,10 +1,13 @@
+import asyncio
 from fastapi import APIRouter, Body, Query, Header, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from fastink.auth import user
+from fastink.auth import groups, user
 from fastink.auth.backends.registry import get_auth_backend
-from fastink.auth.permission import query_user_permissions
+from fastink.auth.permission import query_user_permissions, query_users_by_permission
+from fastink.auth.permission_cache import permission_cache
+from fastink.auth.token_cache import token_cache
 from fastink.common.logger import logger
 from fastink.common.config import get_config
 from fastink.routers import headers
@@ -128,7 +131,7 @@ async def validate_token(
     username: str = Header(None, alias="Ink-Username"),
     token: str = Header(None, alias="Ink-Token"),
 ) -> dict:
-    if headers.validate_token(username, token):
+    if await headers.validate_token_async(username, token):
         return {
             "status": InkStatus.SUCCESS,
             "msg": "Token validation successful",
@@ -145,6 +148,57 @@ async def validate_token(
         )
 
 
+@router.post("/revoke_token")
+async def revoke_token(
+    username: str = Header(None, alias="Ink-Username"),
+    token: str = Header(None, alias="Ink-Token"),
+) -> dict:
+    backend = get_auth_backend()
+    if not hasattr(backend, "revoke_token"):
+        return {
+            "status": InkStatus.TOKEN_INVALID,
+            "msg": "Token revocation not supported by this auth backend",
+            "data": None,
+        }
+    try:
+        await asyncio.to_thread(backend.revoke_token, username, token)
+    except NotImplementedError:
+        return {
+            "status": InkStatus.RESOURCE_NOT_SUPPORT,
+            "msg": "Token revocation is disabled (auth.password_revocation_redis is off)",
+            "data": None,
+        }
+    except Exception as err:
+        return {
+            "status": InkStatus.TOKEN_INVALID,
+            "msg": f"Token revocation failed: {err}",
+            "data": None,
+        }
+    return {
+        "status": InkStatus.SUCCESS,
+        "msg": "Token revoked",
+        "data": None,
+    }
+
+
+@router.get("/token_cache_stats")
+async def token_cache_stats() -> dict:
+    return {
+        "status": InkStatus.SUCCESS,
+        "msg": "OK",
+        "data": token_cache.stats(),
+    }
+
+
+@router.get("/permission_cache_stats")
+async def permission_cache_stats() -> dict:
+    return {
+        "status": InkStatus.SUCCESS,
+        "msg": "OK",
+        "data": permission_cache.stats(),
+    }
+
+
 @router.get("/auth_request")
 async def auth_request(
     username: str = Header(None, alias="Ink-Username"),
@@ -160,7 +214,7 @@ async def auth_request(
             },
         )
 
-    if headers.validate_token(username, token):
+    if await headers.validate_token_async(username, token):
         return Response(
             status_code=204,
             headers={
@@ -207,6 +261,33 @@ async def get_permission(username: str = Query(None)) -> dict:
     return result
 
 
+@router.get("/get_users_by_permission")
+async def get_users_by_permission(permission: str = Query(...)) -> dict:
+    try:
+        usernames = await asyncio.to_thread(query_users_by_permission, permission)
+    except Exception as err:
+        return {
+            "status": InkStatus.PERMISSION_QUERY_FAILURE,
+            "msg": f"Permission query failed: {err}",
+            "data": None,
+        }
+    return {
+        "status": InkStatus.SUCCESS,
+        "msg": "Users obtained successfully",
+        "data": {"permission": permission, "users": usernames},
+    }
+
+
+@router.post("/refresh_group_index")
+async def refresh_group_index() -> dict:
+    stats = await asyncio.to_thread(groups.refresh_group_index)
+    return {
+        "status": InkStatus.SUCCESS,
+        "msg": "Group index rebuilt",
+        "data": stats,
+    }
+
+
 @router.post("/create_user")
 async def create_user(username: str = Body(..., embed=True)) -> dict:
     try:
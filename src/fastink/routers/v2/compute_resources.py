@@ -29,7 +29,7 @@ async def get_job_credentials(
     x_original_uri: str = Header(None, alias="X-Original-URI"),
 ):
     """Return app-specific credentials for an authenticated proxy request."""
-    if not username or not token or not headers.validate_token(username, token):
+    if not username or not token or not await headers.validate_token_async(username, token):
         return Response(status_code=401)
     if not x_original_uri:
         return Response(status_code=400)
@@ -73,7 +73,7 @@ async def resolve_job_proxy(
     fallback when the scheduler has no usable job. The nginx layer caches
     the response for 600 s.
     """
-    if not username or not token or not headers.validate_token(username, token):
+    if not username or not token or not await headers.validate_token_async(username, token):
         return Response(status_code=401)
 
     uid = change_username_to_uid(username)
@@ -4,11 +4,14 @@ import os, traceback, urllib.parse, sys, time
 from typing import List, Dict, Any
 
 from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query, Depends, Request
-from fastapi.responses import StreamingResponse, UJSONResponse
+from fastapi.responses import Response, StreamingResponse, UJSONResponse
 
 from fastink.common.utils import get_uname_from_uid
-from fastink.storage import common
-from fastink.storage.utils import PathType, extract_param, unquote_expand_user
+from fastink.storage import common, multipart
+from fastink.storage.utils import PathType, extract_param, parse_range, unquote_expand_user
+from fastink.storage.archive import compressions
+from fastink.storage.cache import meta_cache
+from fastink.storage.listing import sort_keys, sort_entries, paginate
 from fastink.common.logger import logger
 from fastink.common.exception import TokenExpiredException
 
@@ -18,9 +21,10 @@ import jwt
 from pydantic import BaseModel
 
 params = common.storage_init()
-mgm_url, krb5_enabled = params['mgm_url'], params['krb5_enabled']
+mgm_url, krb5_enabled, max_file_size = params['mgm_url'], params['krb5_enabled'], params['max_file_size']
 
 xrd_host = mgm_url
+upload_chunk_size = 1024 * 1024
 
 router = APIRouter()
 
@@ -41,6 +45,10 @@ async def user_home(username: str = Depends(get_username),
         logger.error(f"Failed to get user {username}'s home directory.\nErr:{sys.exc_info()[0]}.\nMsg:{sys.exc_info()[1]}.")
         return  {"status": InkStatus.USER_INVALID, "msg": f"Failed to get {username}'s home directory. Err:{str(e)}", "data": None}
 
+@router.get("/meta_cache_stats", response_class=UJSONResponse)
+async def meta_cache_stats() -> dict:
+    return {"status": InkStatus.OK, "msg": "OK", "data": meta_cache.stats()}
+
 @router.post("/create_dir", response_class=UJSONResponse)
 async def mkdir( req: Request,
                  username: str = Depends(get_username)):
@@ -74,8 +82,14 @@ async def mkdir( req: Request,
 async def fileList(workdir:str = Query(default=None, description = "Directory to list"),
                    recursive:bool = Query(default=False, description = "list in detail"),
                    showhidden:bool = Query(default=False, description = "Show hidden files/dirs"),
+                   offset:int = Query(default=0, ge=0, description = "Index of the first entry to return"),
+                   limit:int = Query(default=None, ge=1, description = "Max entries to return. All when unset"),
+                   sort:str = Query(default="name", description = f"Sort key: {', '.join(sort_keys)}. Directories come first"),
+                   reverse:bool = Query(default=False, description = "Sort descending"),
                    username: str = Depends(get_username)):
     logger.info(f"List {workdir}")
+    if sort not in sort_keys:
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Unknown sort key {sort}. Use one of {', '.join(sort_keys)}.", "data": None}
     try:
         # _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
         logger.debug(f"Processing list request. workdir={workdir}.")
@@ -97,7 +111,12 @@ async def fileList(workdir:str = Query(default=None, description = "Directory to
         # List all entries excluding those starting with a dot
         #tm_start = time.time()
         # sorted_results = await common.list_path(dname = work_directory, krb5ccname = krb5ccname, username = username, long = True, recursive = recursive, showhidden = showhidden, mgm = xrd_host)
-        sorted_results = await common.list_path(dname = work_directory, username = username, long = True, recursive = recursive, showhidden = showhidden, mgm = xrd_host)
+        #### Raw sizes so that size sorting works; the page is formatted below.
+        #### Later pages of the same directory are served by the meta cache.
+        entries = await common.list_path(dname = work_directory, username = username, long = True, recursive = recursive, showhidden = showhidden, mgm = xrd_host, raw = True)
+        if sort != "name" or reverse:
+            entries = sort_entries(entries, key = sort, reverse = reverse)
+        sorted_results = paginate(entries, offset = offset, limit = limit)
         #tm_elapsed  = time.time() - tm_start
         #logger.debug(f"Timer. list_path for {username} cost: {tm_elapsed:.4f} seconds.")
     except TokenExpiredException as e:
@@ -106,7 +125,7 @@ async def fileList(workdir:str = Query(default=None, description = "Directory to
     except Exception as e:
         logger.error(f"Failed to list {workdir}.\nErr:{str(e)}.")
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to list {workdir}. Err:{str(e)}", "data": None}
-    return {"status": InkStatus.OK, "msg": "OK", "data": sorted_results, "num": len(sorted_results)}
+    return {"status": InkStatus.OK, "msg": "OK", "data": sorted_results, "num": len(sorted_results), "total": len(entries), "offset": offset}
 
 #### Delete a file
 @router.post("/delete_path", response_class=UJSONResponse)
@@ -138,16 +157,22 @@ async def fileDelete(req: Request,
             return {"status": InkStatus.PATH_NOT_EXIST, "msg": f"Failed to delete {TargetPath}. {TargetPath} doesn't exist.", "data": None}
         logger.debug(f"Try to delete {TargetPath}.")
         # status = await common.delete_path(target_path, krb5ccname = krb5ccname, username = username, mgm = xrd_host)
-        status = await common.delete_path(target_path, username = username, mgm = xrd_host)
-        if not status or status is None:
+        report = await common.delete_path(target_path, username = username, mgm = xrd_host)
+        if not report or report is None:
             logger.error(f"Failed to delete {TargetPath}")
-            return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to delete {TargetPath}.", "data": None}
+            data = report.as_dict() if hasattr(report, "as_dict") else None
+            return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to delete {TargetPath}.", "data": data}
         logger.info(f"{TargetPath} is deleted.")
 
     except Exception as e:
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to delete file {TargetPath}. Err: {str(e)}", "data": None}
 
-    return {"status": InkStatus.OK, "msg": "OK", "data": None}
+    return {"status": InkStatus.OK, "msg": "OK", "data": report.as_dict() if hasattr(report, "as_dict") else None}
+
+#### Read an UploadFile chunk by chunk instead of loading it at once
+async def upload_chunks(file: UploadFile, chunk_size: int = upload_chunk_size):
+    while chunk := await file.read(chunk_size):
+        yield chunk
 
 #### Upload a file
 @router.post("/upload_file")
@@ -196,7 +221,7 @@ async def fileUpload(req: Request, upload_dir: str = Form(...), overWrite:bool =
         
         try:
             # await common.upload_file(src_data = file.file.read(), dst = file_path, krb5ccname = krb5ccname, username = username, mgm = xrd_host)
-            await common.upload_file(src_data = file.file.read(), dst = file_path, username = username, mgm = xrd_host)
+            await common.upload_stream(upload_chunks(file), dst = file_path, username = username, mgm = xrd_host)
         except PermissionError as e:
             return {"status": InkStatus.PERMMISSION_DENIED, "msg": f"Failed to upload {filename}. Permission Denied.", "data": None}
         except Exception as e:
@@ -215,6 +240,112 @@ async def fileUpload(req: Request, upload_dir: str = Form(...), overWrite:bool =
         logger.error(f"An unexpected error occurred: {str(e)}\n{traceback.format_exc()}")
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to upload file to {upload_dir}/{file.filename}. An unexpected error occurred:: {str(e)}", "data": None}
 
+#### Resumable multipart upload: upload_init -> upload_part * N -> upload_complete -> upload_status until done
+@router.post("/upload_init", response_class=UJSONResponse)
+async def uploadInit(req: Request, username: str = Depends(get_username)):
+    try:
+        body = await req.json()
+        TargetPath = body['TargetPath']
+        overWrite = bool(body.get('overWrite', False))
+    except Exception as e:
+        logger.error(f"Failed to get parameters when init upload. Err:{str(e)}")
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to extract param. Err:{str(e)}", "data": None}
+
+    if not TargetPath:
+        return {"status": InkStatus.EMPTY_PATH, "msg": "TargetPath is EMPTY.", "data": None}
+    file_path = unquote_expand_user(dname = TargetPath, username = username, url = True)
+    if ".." in file_path.split("/") or not os.path.isabs(file_path):
+        return {"status": InkStatus.PATH_INVALID, "msg": f"Failed to upload {TargetPath}. Invalid path.", "data": None}
+    try:
+        is_exist, path_type = await common.path_exist(name = file_path, username = username, mgm = xrd_host)
+        if is_exist and (path_type != PathType.FILE or not overWrite):
+            logger.error(f"Target file {file_path} exists. We will not overwrite it.")
+            return {"status": InkStatus.NOT_OVERWRITE, "msg": f"Target file {file_path} exists. We will not overwrite it.", "data": None}
+        upload_id = await multipart.init_upload(file_path, username, overwrite = overWrite, mgm = xrd_host)
+    except PermissionError as e:
+        return {"status": InkStatus.PERMMISSION_DENIED, "msg": f"Failed to init upload of {file_path}. Permission Denied.", "data": None}
+    except Exception as e:
+        logger.error(f"Failed to init upload of {file_path}. Err:{str(e)}")
+        return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to init upload of {file_path}. Err:{str(e)}", "data": None}
+    return {"status": InkStatus.OK, "msg": "OK", "data": {"upload_id": upload_id, "path": file_path}}
+
+@router.put("/upload_part", response_class=UJSONResponse)
+async def uploadPart(req: Request,
+                     upload_id: str = Query(..., description = "Id returned by upload_init"),
+                     part_number: int = Query(..., description = "1-based part number"),
+                     username: str = Depends(get_username)):
+    try:
+        declared = req.headers.get("content-length")
+        size = await multipart.upload_part(upload_id, part_number, req.stream(), username,
+                                           size = int(declared) if declared else None, mgm = xrd_host)
+    except ValueError as e:
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to upload part {part_number}. Err:{str(e)}", "data": None}
+    except FileNotFoundError as e:
+        return {"status": InkStatus.PATH_NOT_EXIST, "msg": f"Failed to upload part {part_number}. Err:{str(e)}", "data": None}
+    except PermissionError as e:
+        return {"status": InkStatus.PERMMISSION_DENIED, "msg": f"Failed to upload part {part_number}. Permission Denied.", "data": None}
+    except Exception as e:
+        logger.error(f"Failed to upload part {part_number} of {upload_id}. Err:{str(e)}")
+        return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to upload part {part_number}. Err:{str(e)}", "data": None}
+    return {"status": InkStatus.OK, "msg": "OK", "data": {"upload_id": upload_id, "part": part_number, "size": size}}
+
+@router.get("/upload_status", response_class=UJSONResponse)
+async def uploadStatus(upload_id: str = Query(..., description = "Id returned by upload_init"),
+                       username: str = Depends(get_username)):
+    try:
+        status = await multipart.upload_status(upload_id, username, mgm = xrd_host)
+    except ValueError as e:
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to query upload {upload_id}. Err:{str(e)}", "data": None}
+    except FileNotFoundError as e:
+        return {"status": InkStatus.PATH_NOT_EXIST, "msg": f"Failed to query upload {upload_id}. Err:{str(e)}", "data": None}
+    except Exception as e:
+        logger.error(f"Failed to query upload {upload_id}. Err:{str(e)}")
+        return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to query upload {upload_id}. Err:{str(e)}", "data": None}
+    return {"status": InkStatus.OK, "msg": "OK", "data": status}
+
+@router.post("/upload_complete", response_class=UJSONResponse)
+async def uploadComplete(req: Request, username: str = Depends(get_username)):
+    try:
+        body = await req.json()
+        upload_id = body['upload_id']
+        parts = body.get('parts')
+        parts = [int(p) for p in parts] if parts else None
+    except Exception as e:
+        logger.error(f"Failed to get parameters when complete upload. Err:{str(e)}")
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to extract param. Err:{str(e)}", "data": None}
+    try:
+        result = await multipart.complete_upload(upload_id, username, parts = parts, mgm = xrd_host)
+    except ValueError as e:
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to complete upload {upload_id}. Err:{str(e)}", "data": None}
+    except FileNotFoundError as e:
+        return {"status": InkStatus.PATH_NOT_EXIST, "msg": f"Failed to complete upload {upload_id}. Err:{str(e)}", "data": None}
+    except FileExistsError as e:
+        return {"status": InkStatus.NOT_OVERWRITE, "msg": f"Failed to complete upload {upload_id}. Err:{str(e)}", "data": None}
+    except PermissionError as e:
+        return {"status": InkStatus.PERMMISSION_DENIED, "msg": f"Failed to complete upload {upload_id}. Permission Denied.", "data": None}
+    except Exception as e:
+        logger.error(f"Failed to complete upload {upload_id}. Err:{str(e)}")
+        return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to complete upload {upload_id}. Err:{str(e)}", "data": None}
+    #### Assembly runs in the background: poll upload_status until state is done or failed
+    return {"status": InkStatus.OK, "msg": f"Upload {upload_id} is {result['state']}.", "data": {**result, "upload_id": upload_id}}
+
+@router.post("/upload_abort", response_class=UJSONResponse)
+async def uploadAbort(req: Request, username: str = Depends(get_username)):
+    try:
+        body = await req.json()
+        upload_id = body['upload_id']
+        multipart.staging_path(username, upload_id)
+    except Exception as e:
+        logger.error(f"Failed to get parameters when abort upload. Err:{str(e)}")
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Failed to extract param. Err:{str(e)}", "data": None}
+    try:
+        if not await multipart.abort_upload(upload_id, username, mgm = xrd_host):
+            return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to abort upload {upload_id}.", "data": None}
+    except Exception as e:
+        logger.error(f"Failed to abort upload {upload_id}. Err:{str(e)}")
+        return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to abort upload {upload_id}. Err:{str(e)}", "data": None}
+    return {"status": InkStatus.OK, "msg": "OK", "data": None}
+
 @router.post("/create_file")
 async def create_file(TargetPath:str, username: str = Depends(get_username), mode:str = '644'):
     TargetPath = urllib.parse.unquote(TargetPath, encoding='utf-8')
@@ -243,7 +374,7 @@ async def create_file(TargetPath:str, username: str = Depends(get_username), mod
 async def dirUpload(upload_dir: str = Form(...), file: UploadFile = File(...)):
     pass
 
-async def file_download(TargetPath:str, username:str, krb5_enabled:bool = True):
+async def file_download(TargetPath:str, username:str, krb5_enabled:bool = True, range_header:str = None):
     logger.debug(f"Start downloading raw: {TargetPath}")
     TargetPath = urllib.parse.unquote(TargetPath, encoding='utf-8')
     logger.debug(f"Start downloading decoded: {TargetPath}")
@@ -258,32 +389,55 @@ async def file_download(TargetPath:str, username:str, krb5_enabled:bool = True):
         if not TargetPath:
             return {"status": InkStatus.EMPTY_PATH, "msg": f"Failed to download {TargetPath}. TargetPath is empty", "data": None}
         logger.debug(f"Start downloading {TargetPath}")
+        #### Stat before the response starts so errors still get an Ink envelope
+        fsize = await common.get_file_size(fname = TargetPath, username = username, mgm = xrd_host, krb5_enabled = krb5_enabled)
+        if fsize >= max_file_size:
+            return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download {TargetPath}. File is too large.", "data": None}
         quoted_name=urllib.parse.quote(os.path.basename(TargetPath),'utf-8')
-        headers = {"Content-Disposition": f'attachment; filename="{quoted_name}"'}
-        # return StreamingResponse(common.get_file_stream(fname = TargetPath, krb5ccname = '', username = username, mgm = xrd_host, krb5_enabled = krb5_enabled), media_type="application/octet-stream", headers=headers)
-        return StreamingResponse(common.get_file_stream(fname = TargetPath, username = username, mgm = xrd_host, krb5_enabled = krb5_enabled), media_type="application/octet-stream", headers=headers)
+        headers = {"Content-Disposition": f'attachment; filename="{quoted_name}"', "Accept-Ranges": "bytes"}
+        try:
+            byte_range = parse_range(range_header, fsize)
+        except ValueError:
+            return Response(status_code = 416, headers = {"Content-Range": f"bytes */{fsize}"})
+        if byte_range is None:
+            headers["Content-Length"] = str(fsize)
+            return StreamingResponse(common.get_file_stream(fname = TargetPath, username = username, mgm = xrd_host, krb5_enabled = krb5_enabled, fsize = fsize), media_type="application/octet-stream", headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{fsize}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(common.get_file_stream(fname = TargetPath, username = username, mgm = xrd_host, krb5_enabled = krb5_enabled, offset = start, length = end - start + 1, fsize = fsize),
+                                 status_code = 206, media_type="application/octet-stream", headers=headers)
+    except TokenExpiredException as e:
+        logger.error(f"User {username}'s token expired...")
+        return {"status": InkStatus.TOKEN_EXPIRED, "msg": f"Failed to download {TargetPath}. User {username}'s token expired.", "data": None}
     except ValueError as e:
         logger.error(f'User token is expired or invalid')
         return {"status": InkStatus.TOKEN_INVALID, "msg": f"Failed to download {TargetPath}. User token is expired or invalid.", "data": None}
     except PermissionError as e:
         logger.error(f'Permission denied when access {TargetPath}')
         return {"status": InkStatus.PERMMISSION_DENIED, "msg": f"Failed to download {TargetPath}. Permission denied when access {TargetPath}.", "data": None}
+    except TypeError as e:
+        logger.error(f'{TargetPath} is not a file')
+        return {"status": InkStatus.TYPE_INVALID, "msg": f"Failed to download {TargetPath}. {TargetPath} is not a file.", "data": None}
     except Exception as e:
         logger.error(f'Err:{sys.exc_info()[0]}. Msg:{sys.exc_info()[1]}')
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download {TargetPath}. An unexpected error occurred: {str(e)}", "data": None}
 
 #### FIXME
 @router.get("/download_file", response_class=StreamingResponse)
-async def fileDownload(TargetPath:str = Query(..., description = "Filename to download"),
+async def fileDownload(req: Request,
+                       TargetPath:str = Query(..., description = "Filename to download"),
                        username: str = Depends(get_username)):
-        return await file_download(TargetPath = TargetPath, username = username)
+        return await file_download(TargetPath = TargetPath, username = username, range_header = req.headers.get("Range"))
 
 
-async def download_list(TargetPath:str, flist:List[Dict[str,Any]], username:str = "", mgm:str = mgm_url, krb5_enabled = True):
+async def download_list(TargetPath:str, flist:List[Dict[str,Any]], username:str = "", mgm:str = mgm_url, krb5_enabled = True, compression:str = "deflate"):
+    if compression not in compressions:
+        return {"status": InkStatus.PARAM_ERROR, "msg": f"Unknown compression {compression}. Choose from {list(compressions)}.", "data": None}
     try:
         quoted_name=urllib.parse.quote(os.path.basename(TargetPath),'utf-8')
         headers = {"Content-Disposition": f'attachment; filename="{quoted_name}.zip"'}
-        return StreamingResponse(common.download_list(TargetPath = TargetPath, flist = flist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled), media_type="application/octet-stream", headers=headers)
+        return StreamingResponse(common.download_list(TargetPath = TargetPath, flist = flist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled, compression = compression), media_type="application/octet-stream", headers=headers)
     except Exception as e:
         logger.error(f"Failed to download list for {username}. Err:{str(e)}")
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download dir {TargetPath}. Err:{str(e)}", "data": None}
@@ -293,6 +447,7 @@ async def download_list(TargetPath:str, flist:List[Dict[str,Any]], username:str
 async def dirDownload(TargetPath:str = Query(..., description = "Dir to download"),
                       recursive:bool = Query(False, description = "Recursively download"),
                       showhidden:bool = Query(False, description = "Download hidden files"),
+                      compression:str = Query("deflate", description = "Zip compression: deflate or store"),
                       username:str = Depends(get_username)):
     if not TargetPath:
         return {"status": InkStatus.EMPTY_PATH, "msg": f"Failed to download {TargetPath}. TargetPath is empty", "data": None}
@@ -310,7 +465,7 @@ async def dirDownload(TargetPath:str = Query(..., description = "Dir to download
         if path_type != PathType.DIR:
             raise TypeError(f"{TargetPath} is not an directory.")
         flist = await common.list_path(dname = TargetPath, username = username, long = True, recursive = recursive, showhidden = showhidden, mgm = mgm_url, raw = True)
-        return await download_list(TargetPath = TargetPath, flist = flist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled)
+        return await download_list(TargetPath = TargetPath, flist = flist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled, compression = compression)
     except Exception as e:
         logger.error(f"Failed to download dir {TargetPath}...\nErr:{str(e)}")
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download dir {TargetPath}. Err:{str(e)}", "data": None}
@@ -319,6 +474,7 @@ async def dirDownload(TargetPath:str = Query(..., description = "Dir to download
 async def listDownload(flist:str = Query(..., description = "Download file list"), TargetPath:str = Query(..., description = "Dir to download"),
                        recursive:bool = Query(False, description = "Recursively download"),
                        showhidden:bool = Query(False, description = "Download hidden files"),
+                       compression:str = Query("deflate", description = "Zip compression: deflate or store"),
                        username:str = Depends(get_username)):
     if not TargetPath:
             return {"status": InkStatus.EMPTY_PATH, "msg": f"Failed to download {TargetPath}. TargetPath is empty", "data": None}
@@ -340,7 +496,7 @@ async def listDownload(flist:str = Query(..., description = "Download file list"
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download files for {username}. Err:{str(e)}", "data": None}
     try:
         TargetPath = unquote_expand_user(dname = TargetPath, username = username, url = True)
-        return await download_list(TargetPath = TargetPath, flist = fflist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled)
+        return await download_list(TargetPath = TargetPath, flist = fflist, username = username, mgm = mgm_url, krb5_enabled = krb5_enabled, compression = compression)
     except Exception as e:
         logger.error(f"Failed to download files for {username}...\nErr:{str(e)}")
         return {"status": InkStatus.FS_UNKNOWN_ERROR, "msg": f"Failed to download list for {username}. Err:{str(e)}", "data": None}
@@ -384,7 +540,7 @@ async def download_shared_file(req: Request, TargetPath:str = Query(..., descrip
     except Exception as e:
         logger.error(f"Failed to get Ink-Username when download. Err:{str(e)}")
     logger.debug(f"Download shared file {file_path} from {owner}")
-    return await file_download(TargetPath = file_path, username = owner, krb5_enabled = False)
+    return await file_download(TargetPath = file_path, username = owner, krb5_enabled = False, range_header = req.headers.get("Range"))
 
 @router.get("/view_file", response_class=UJSONResponse)
 async def fileCat(TargetPath:str = Query(..., description = "Filename to cat"),
@@ -6,14 +6,11 @@
 # Last modified : Mon Jan 05 17:26:54 2026 CST
 # Description   :
 
-import base64
-import os
-from datetime import datetime
 from shlex import quote
 
 import paramiko
 
-from fastink.auth.backends.krb5 import get_krb5
+from fastink.common.ccache_store import ccache_store
 from fastink.common.config import get_config
 from fastink.common.logger import logger
 from fastink.common.utils import query_pwd_group
@@ -96,34 +93,23 @@ def push_root_script(ssh: paramiko.SSHClient):
 
 async def create_krb5_file(username: str):
     """
-    First, obtain the krb5 credential and write it to /dev/shm.
+    First, obtain the user's krb5 credential from the ccache store.
     Then, use the src.storage interface with the krb5 to write
     it into the user's directory, ensuring the necessary
     permissions for execution.
     """
 
-    time_stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-
     xrootd_path = get_config("storage", "xrd_host")
     user_group = query_pwd_group(username)
     ink_dir = get_config("service", "ink_dir")
     logger.info(f"ink_dir : {ink_dir}")
     ink_dir = ink_dir.format(user_group=user_group, username=username)
     krb5_dir = f"{ink_dir}/.ink/envs/"
-    token_filename = f"/dev/shm/krb5cc_{username}_{time_stamp}"
-
-    token = get_krb5(username)
-    if token != "":
-        krb5_decoded_bytes = base64.b64decode(token)
-    else:
-        raise Exception("Init KRB5 token failed.")
 
     try:
-        if not os.path.exists(token_filename):
-            with open(token_filename, "wb") as file:
-                file.write(krb5_decoded_bytes)
-    except:
-        raise Exception(f"krb5cc file {token_filename} create failed.")
+        krb5_decoded_bytes = ccache_store.materialize(username).data
+    except Exception as e:
+        raise Exception(f"Init KRB5 token failed: {e}")
 
     try:
         is_exist, _ = await common.path_exist(
@@ -148,7 +134,5 @@ async def create_krb5_file(username: str):
         )
     except Exception as e:
         raise Exception(f"Upload krb5cc file to {krb5_dir} failed: {e}")
-    finally:
-        os.remove(token_filename)
 
     return f"{krb5_dir}/krb5cc_{username}"
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import asyncio, io, os, time
+from datetime import datetime
+from typing import List, Dict, Any, AsyncIterator, Callable
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+compressions = {"deflate": ZIP_DEFLATED, "store": ZIP_STORED}
+queue_chunks = 4
+zip_parallel = get_config("storage", "zip_parallel", fallback=4, type=int)
+
+#### Write-only sink that hands every byte ZipFile produces to the caller
+class ZipSink(io.RawIOBase):
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        #### ZipFile needs the running offset for local headers even when
+        #### the stream itself cannot seek.
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def zip_members(TargetPath:str, flist:List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+    """
+    Map list_path(raw = True) entries onto archive members relative to TargetPath.
+    """
+    members = []
+    now = time.localtime(time.time())[:6]
+    for l in flist:
+        arcname = os.path.relpath(l['path'], TargetPath)
+        try:
+            mtime = datetime.strptime(l['time'], "%Y-%m-%d %H:%M:%S").timetuple()[:6]
+        except (KeyError, TypeError, ValueError):
+            mtime = now
+        if l['type'] == "directory":
+            members.append({"arcname": arcname.rstrip("/") + "/", "path": l['path'], "size": 0, "is_dir": True, "mtime": mtime})
+        elif l['type'] == "file":
+            members.append({"arcname": arcname, "path": l['path'], "size": int(l['size']), "is_dir": False, "mtime": mtime})
+        else:
+            logger.error(f"Unknown Path Type....")
+            raise ValueError(f"Unknown Path Type {l['type']}...")
+    return members
+
+async def stream_zip(
+    members: List[Dict[str,Any]],
+    fetch: Callable[[str, int], AsyncIterator[bytes]],
+    compression: str = "deflate",
+    parallel: int = 4,
+) -> AsyncIterator[bytes]:
+    """
+    Build a ZIP (ZIP64 when needed) on the fly and yield its bytes.
+
+    Members are fetched in a sliding window of ``parallel``, starting with
+    the one being written, each through a small bounded queue. A fetch
+    starts only when the window reaches its member, so tasks, queues and
+    memory (roughly parallel * queue_chunks * chunk size) stay bounded
+    whatever the number of files is.
+    """
+    if compression not in compressions:
+        raise ValueError(f"Unknown compression {compression}. Choose from {list(compressions)}.")
+    method = compressions[compression]
+    window = max(parallel, 1)
+    queues: Dict[int, asyncio.Queue] = {}
+    tasks: Dict[int, asyncio.Task] = {}
+
+    async def produce(queue: asyncio.Queue, member: Dict[str,Any]):
+        try:
+            if not member["is_dir"]:
+                async for chunk in fetch(member["path"], member["size"]):
+                    await queue.put(chunk)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    def advance(idx: int):
+        #### Retire the member just written and start the ones now in the window
+        queues.pop(idx - 1, None)
+        tasks.pop(idx - 1, None)
+        for ahead in range(idx, min(idx + window, len(members))):
+            if ahead not in tasks:
+                queues[ahead] = asyncio.Queue(maxsize = queue_chunks)
+                tasks[ahead] = asyncio.create_task(produce(queues[ahead], members[ahead]))
+
+    sink = ZipSink()
+    try:
+        with ZipFile(sink, mode = "w", compression = method, allowZip64 = True) as zf:
+            for idx, member in enumerate(members):
+                advance(idx)
+                zinfo = ZipInfo(member["arcname"], date_time = member.get("mtime", time.localtime(time.time())[:6]))
+                if member["is_dir"]:
+                    zinfo.external_attr = (0o40755 << 16) | 0x10
+                    zf.writestr(zinfo, b"")
+                    await queues[idx].get()
+                    yield sink.drain()
+                    continue
+                zinfo.compress_type = method
+                zinfo.external_attr = 0o644 << 16
+                #### Known size lets ZipFile switch to ZIP64 headers up front
+                zinfo.file_size = member["size"]
+                with zf.open(zinfo, mode = "w") as dest:
+                    while True:
+                        chunk = await queues[idx].get()
+                        if chunk is None:
+                            break
+                        if isinstance(chunk, Exception):
+                            logger.error(f"Failed to fetch {member['path']}. Err:{str(chunk)}")
+                            raise chunk
+                        if method == ZIP_DEFLATED:
+                            await asyncio.to_thread(dest.write, chunk)
+                        else:
+                            dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+                logger.debug(f"Archived {member['path']} as {member['arcname']}.")
+        #### Central directory
+        data = sink.drain()
+        if data:
+            yield data
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions = True)
+
+def zip_downloader(get_file_stream: Callable[..., AsyncIterator[bytes]], mgm_url: str, max_file_size: int):
+    """
+    Build a backend's download_list on top of its get_file_stream.
+    """
+    async def download_list(TargetPath:str, flist:List[Dict[str,Any]], username:str = "", mgm:str = mgm_url, krb5_enabled = True, recursive:bool = False, showhidden:bool = False, compression:str = "deflate"):
+        f_sum = sum(f.get('size', 0) for f in flist)
+        if f_sum >= max_file_size:
+            logger.error(f"Total size of file list is larger than {max_file_size}...")
+            raise ValueError(f"Total size of file list is larger than {max_file_size}...")
+
+        def fetch(path:str, size:int):
+            return get_file_stream(path, username = username, mgm = mgm, krb5_enabled = krb5_enabled, fsize = size)
+
+        try:
+            logger.info(f"Now streaming zip archive of {TargetPath} to client...")
+            async for chunk in stream_zip(zip_members(TargetPath, flist), fetch, compression = compression, parallel = zip_parallel):
+                yield chunk
+        except Exception as e:
+            logger.error(f"Failed to stream zip archive to client... Err:{str(e)}")
+            raise e
+    return download_list
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import asyncio, os, time
+from typing import List, Dict, Any, Awaitable, Callable, Tuple
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+delete_parallel = get_config("storage", "delete_parallel", fallback=8, type=int)
+delete_batch_size = get_config("storage", "delete_batch_size", fallback=64, type=int)
+progress_interval = 5
+#### kXR_NotFound is 3011 in XRootD error messages
+not_found_markers = ("no such file", "not found", "[3011]", "enoent", "nosuchkey")
+
+def is_not_found(err: str) -> bool:
+    err = (err or "").lower()
+    return any(marker in err for marker in not_found_markers)
+
+#### Result of a bulk delete
+class DeleteReport:
+    """Per-path outcome of delete_path.
+
+    Truthy only when every path under ``name`` was removed, so callers that
+    used to check the boolean returned by delete_path keep working.
+    """
+    def __init__(self, name: str, total: int = 0):
+        self.name = name
+        self.total = total
+        self.deleted = 0
+        self.failed = {}
+
+    def fail(self, path: str, err: str):
+        self.failed[path] = (err or "Unknown error").strip()
+
+    def __bool__(self) -> bool:
+        return self.total > 0 and not self.failed and self.deleted == self.total
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.name,
+            "total": self.total,
+            "deleted": self.deleted,
+            "failed": [{"path": p, "err": e} for p, e in self.failed.items()],
+        }
+
+def split_tree(name: str, entries: List[Dict[str,Any]]) -> Tuple[List[str], List[str]]:
+    """ Split a recursive list_path of name into files and directories.
+    name itself is appended to the directories. """
+    files, dirs = [], []
+    for f in entries:
+        if f["type"] == "directory":
+            dirs.append(f["path"])
+        else:
+            files.append(f["path"])
+    dirs.append(name)
+    return files, dirs
+
+def depth_levels(dirs: List[str]) -> List[List[str]]:
+    """ Group directories by depth, deepest first, so that every level only
+    contains directories whose children are already gone. """
+    levels = {}
+    for d in dirs:
+        d = os.path.normpath(d)
+        levels.setdefault(d.count("/"), []).append(d)
+    return [levels[k] for k in sorted(levels, reverse = True)]
+
+async def bulk_delete(
+    name: str,
+    files: List[str],
+    dirs: List[str],
+    rm_files: Callable[[List[str]], Awaitable[Tuple[int, str]]],
+    rm_dir: Callable[[str], Awaitable[Tuple[int, str]]],
+    parallel: int = delete_parallel,
+    batch_size: int = delete_batch_size,
+    progress: Callable[[int, int], None] = None,
+) -> DeleteReport:
+    """
+    Remove files in parallel batches, then directories bottom-up by depth.
+
+    rm_files removes a batch of files in one call and rm_dir a single empty
+    directory; both return (returncode, stderr). A failed batch is retried
+    path by path to find out which entries could not be removed. A batch
+    goes on past a failing path, so a retry that finds its path already
+    gone counts as removed. Directories that still contain a failed entry
+    are reported without being tried.
+    """
+    report = DeleteReport(name, total = len(files) + len(dirs))
+    slots = asyncio.Semaphore(max(parallel, 1))
+    batch_size = max(batch_size, 1)
+    last_report = [time.monotonic()]
+
+    def advance(count: int):
+        report.deleted += count
+        if progress is not None:
+            progress(report.deleted, report.total)
+        now = time.monotonic()
+        if now - last_report[0] >= progress_interval:
+            last_report[0] = now
+            logger.info(f"Deleting {name}: {report.deleted}/{report.total} removed, {len(report.failed)} failed.")
+
+    async def remove_batch(batch: List[str], retry: bool = False):
+        async with slots:
+            try:
+                returncode, err = await rm_files(batch)
+            except Exception as e:
+                returncode, err = 1, str(e)
+            if (returncode == 0 and not err) or (retry and is_not_found(err)):
+                advance(len(batch))
+                return
+            if len(batch) == 1:
+                logger.error(f"Failed to delete {batch[0]}. Err:{err}")
+                report.fail(batch[0], err)
+                return
+        #### Outside the slot: each retry takes its own
+        logger.debug(f"Batch delete of {len(batch)} files failed, retrying one by one. Err:{err}")
+        await asyncio.gather(*[remove_batch([f], retry = True) for f in batch])
+
+    async def remove_dir(d: str):
+        async with slots:
+            try:
+                returncode, err = await rm_dir(d)
+            except Exception as e:
+                returncode, err = 1, str(e)
+        if returncode == 0 and not err:
+            advance(1)
+        else:
+            logger.error(f"Failed to delete {d}. Err:{err}")
+            report.fail(d, err)
+
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    await asyncio.gather(*[remove_batch(b) for b in batches])
+
+    for level in depth_levels(dirs):
+        blocked = set()
+        for p in report.failed:
+            parent = os.path.dirname(os.path.normpath(p))
+            while parent and parent not in blocked:
+                blocked.add(parent)
+                parent = os.path.dirname(parent) if parent != "/" else ""
+        todo = []
+        for d in level:
+            if d in blocked:
+                report.fail(d, "Directory not empty: some entries could not be deleted.")
+            else:
+                todo.append(d)
+        await asyncio.gather(*[remove_dir(d) for d in todo])
+
+    logger.info(f"Deleted {report.deleted}/{report.total} entries of {name}, {len(report.failed)} failed.")
+    return report
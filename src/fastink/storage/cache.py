@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import asyncio, inspect, os, time
+from collections import OrderedDict
+from functools import wraps
+from fastink.storage.utils import unquote_expand_user
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+#### Per-user metadata cache for path_exist/list_path
+class MetaCache:
+    """TTL + LRU cache of stat and listing results keyed by (username, path).
+
+    Entries live in one OrderedDict per user so that write-through
+    invalidation only scans the entries of the user who wrote. Concurrent
+    misses on the same key share one backend call. Only existing paths are
+    cached by path_exist: callers poll for files written by running jobs.
+    """
+    def __init__(self, ttl: float = 5, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}
+        self._inflight = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    @staticmethod
+    def normpath(path: str, username: str = "") -> str:
+        path = unquote_expand_user(dname = path, username = username, url = False) if path else path
+        return os.path.normpath(path) if path else path
+
+    def _user(self, username: str) -> OrderedDict:
+        return self._entries.setdefault(username, OrderedDict())
+
+    def get(self, username: str, key):
+        entries = self._entries.get(username)
+        if not entries or key not in entries:
+            return None
+        expire_at, value = entries[key]
+        if expire_at < time.monotonic():
+            del entries[key]
+            self._size -= 1
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def put(self, username: str, key, value):
+        entries = self._user(username)
+        if key not in entries:
+            self._size += 1
+        entries[key] = (time.monotonic() + self.ttl, value)
+        entries.move_to_end(key)
+        while self._size > self.maxsize:
+            self._evict()
+
+    def _evict(self):
+        #### Drop the oldest entry of the user with the stalest head
+        victim, oldest = None, None
+        for username, entries in self._entries.items():
+            if not entries:
+                continue
+            expire_at, _ = next(iter(entries.values()))
+            if oldest is None or expire_at < oldest:
+                victim, oldest = username, expire_at
+        if victim is None:
+            self._size = 0
+            return
+        self._entries[victim].popitem(last = False)
+        self._size -= 1
+        self.evictions += 1
+
+    async def get_or_load(self, username: str, key, loader, cacheable = lambda value: True):
+        value = self.get(username, key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        flight = (username, key)
+        if flight in self._inflight:
+            return await asyncio.shield(self._inflight[flight])
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        try:
+            value = await loader()
+            if cacheable(value):
+                self.put(username, key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            #### Nobody else may be waiting; avoid "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[flight]
+
+    def invalidate(self, username: str, path: str, recursive: bool = True):
+        """ Drop cached entries for path, its parent listing, recursive
+        listings above it and (optionally) everything below path. """
+        entries = self._entries.get(username)
+        if not entries or not path:
+            return
+        path = self.normpath(path, username)
+        parent = os.path.dirname(path)
+        prefix = path.rstrip("/") + "/"
+        for key in list(entries):
+            kpath = key[1]
+            if kpath == path or kpath == parent or (recursive and kpath.startswith(prefix)) \
+                    or (key[0] == "list" and key[2] and path.startswith(kpath.rstrip("/") + "/")):
+                del entries[key]
+                self._size -= 1
+                self.invalidations += 1
+
+    def clear(self, username: str = None):
+        if username is None:
+            self._entries.clear()
+            self._size = 0
+        else:
+            self._size -= len(self._entries.pop(username, {}))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": self._size,
+            "users": len(self._entries),
+        }
+
+meta_cache = MetaCache(
+    ttl = get_config("storage", "meta_cache_ttl", fallback=5, type=float),
+    maxsize = get_config("storage", "meta_cache_size", fallback=10000, type=int),
+)
+
+#### Wrappers around the backend functions exported by storage.common
+def cached_path_exist(func, cache: MetaCache = meta_cache):
+    @wraps(func)
+    async def wrapper(name: str, username: str = "", *args, **kwargs):
+        if not cache.enabled or not name:
+            return await func(name, username, *args, **kwargs)
+        key = ("stat", cache.normpath(name, username), args, tuple(sorted(kwargs.items())))
+        return await cache.get_or_load(
+            username, key,
+            lambda: func(name, username, *args, **kwargs),
+            cacheable = lambda value: bool(value[0]),
+        )
+    return wrapper
+
+def cached_list_path(func, cache: MetaCache = meta_cache):
+    @wraps(func)
+    async def wrapper(dname: str, username: str = "", long: bool = True, recursive: bool = False,
+                      showhidden: bool = False, *args, **kwargs):
+        if not cache.enabled or not dname:
+            return await func(dname, username, long, recursive, showhidden, *args, **kwargs)
+        key = ("list", cache.normpath(dname, username), recursive, showhidden, long, args, tuple(sorted(kwargs.items())))
+        contents = await cache.get_or_load(
+            username, key,
+            lambda: func(dname, username, long, recursive, showhidden, *args, **kwargs),
+        )
+        #### Callers may mutate the result and its entries
+        return [dict(entry) for entry in contents]
+    return wrapper
+
+def invalidating(func, *path_args, cache: MetaCache = meta_cache):
+    """ Invalidate the cache for the named path arguments of a write
+    operation once it returns, whether or not it succeeded. """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            try:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                username = bound.get("username") or ""
+                for arg in path_args:
+                    if bound.get(arg):
+                        cache.invalidate(username, bound[arg])
+            except Exception as e:
+                logger.debug(f"MetaCache. Failed to invalidate after {func.__name__}. Err:{str(e)}")
+    return wrapper
@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
 
-from fastink.storage import fuse, http, s3, xrd
+from fastink.storage import fuse, http, s3, xrd, xrdcl
 from fastink.storage.utils import storage_init
+from fastink.storage.cache import meta_cache, cached_path_exist, cached_list_path, invalidating
 
 params = storage_init()
 fs_backend, krb5_enabled = params['fs_backend'], params['krb5_enabled']
 
-fs_backends = ['eos', 'lustre', 'nfs', 'xrootd', 'http', 's3', 'fuse']
+fs_backends = ['eos', 'lustre', 'nfs', 'xrootd', 'xrdcl', 'http', 's3', 'fuse']
 
 fs_mod = None
 
 if fs_backend == 'xrootd' or fs_backend == "eos":
     fs_mod = xrd
+elif fs_backend == 'xrdcl':
+    fs_mod = xrdcl
 elif fs_backend == 'lustre' or fs_backend == 'nfs' or fs_backend == 'fuse' :
     fs_mod = fuse
 elif fs_backend == 'http':
@@ -26,17 +29,21 @@ def _unsupported_backend(*args, **kwargs):
     raise NotImplementedError(f"{fs_backend} backend does not implement this operation")
 
 #### Export method
-mkdir = fs_mod.mkdir
-list_path = fs_mod.list_path
-upload_file = fs_mod.upload_file
+#### path_exist/list_path are served from the per-user metadata cache; our
+#### own writes invalidate it (see fastink.storage.cache).
+mkdir = invalidating(fs_mod.mkdir, "dname")
+list_path = cached_list_path(fs_mod.list_path)
+upload_file = invalidating(fs_mod.upload_file, "dst")
+upload_stream = invalidating(getattr(fs_mod, "upload_stream", _unsupported_backend), "dst")
 cat_file = fs_mod.cat_file
 get_file = fs_mod.get_file
 get_file_stream = fs_mod.get_file_stream
+get_file_size = getattr(fs_mod, "get_file_size", _unsupported_backend)
 download_list = getattr(fs_mod, "download_list", _unsupported_backend)
-delete_path = fs_mod.delete_path
-path_exist = fs_mod.path_exist
-chmod = fs_mod.chmod
-rename = fs_mod.rename
+delete_path = invalidating(fs_mod.delete_path, "name")
+path_exist = cached_path_exist(fs_mod.path_exist)
+chmod = invalidating(fs_mod.chmod, "fname")
+rename = invalidating(fs_mod.rename, "src", "dst")
 init_ink_space = fs_mod.init_ink_space
 
 if __name__ == "__main__":
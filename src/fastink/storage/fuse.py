@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
-import subprocess, os, sys, re, asyncio, uuid
-from dateutil import parser, tz
-from fastink.storage.utils import storage_init, PathType, nice_size, mode_map, async_exec, path_stat, unquote_expand_user, async_timer
+import subprocess, os, sys, asyncio
+from typing import List
+from fastink.storage.listing import parse_listing
+from fastink.storage.utils import storage_init, PathType, mode_map, async_exec, async_stream_exec, async_feed_exec, path_stat, stat_size, unquote_expand_user, async_timer
+from fastink.storage.archive import zip_downloader
+from fastink.storage.bulk import DeleteReport, bulk_delete, split_tree
 from fastink.common.logger import logger
 from fastink.common.exception import TokenExpiredException
 from shlex import quote
@@ -10,6 +13,7 @@ from shlex import quote
 params = storage_init()
 mgm_url, max_file_size = params['mgm_url'], params['max_file_size']
 nsize = 1024 * 1024 * 20
+chunk_size = 1024 * 1024
 
 async def path_exist(
     name: str, username: str = "", mgm: str = mgm_url
@@ -95,7 +99,6 @@ async def list_path(
     raw: bool = False
 ):
     option = ""
-    contents = []
     sorted_contents = []
 
     if long:
@@ -113,80 +116,12 @@ async def list_path(
 
         logger.debug(f"Executing ls {option} {dname}. CMD: {cmd}")
         _, ret, err = await async_exec(cmd = cmd, env = {}, timeout = 120, decode = True)
-        logger.debug(f"contents:\n{len(ret)}:\n{ret}")
         if len(ret) == 0:
             logger.debug(f"{dname} is empty.")
             return []
 
-        for l in ret.split("\n"):
-            logger.debug(f"Now processing {l}")
-            if len(l) == 0 or l[0:5] == "total":
-                logger.debug(f'{dname}. Skip line "{l}"')
-                continue
-
-            if l[4] == " ":
-                ll = re.split(r"\s+", l, maxsplit=4)
-                logger.debug(f"Link: '{l}' : '{ll}' : '{ll[4:]}'")
-                fname = os.path.basename(ll[4])
-                if fname[0] == "." and not showhidden:
-                    continue
-                else:
-                    contents.append({"type": "directory", "path": ll[4]})
-            else:
-                if l[0] == "l":
-                    idx = l.index(" -> ")
-                    l = l[:idx]
-                # ll = l.split(' ', 6)
-
-                ll = re.split(r"\s+", l, maxsplit=6)
-                fname = os.path.basename(ll[6])
-
-                if fname[0] == "." and not showhidden:
-                    continue
-                else:
-                    if ll[0][0] == "l":
-                        full_path = os.path.join(dname, ll[-1])
-                        if os.path.isdir(full_path):
-                            ll[0] = "drwxrwxrwx"  # f'd{ll[0][1:]}'
-                            logger.debug(f"Link. {full_path} is a directory")
-                        else:
-                            # ll[0] == '-' + ll[0][1:]
-                            ll[0] = "-rwxrwxrwx"  # f'd{ll[0][1:]}'
-                            logger.debug(f"Link. {full_path} is a file")
-
-                    fsize = nice_size(int(ll[3]), raw)
-                    if ll[0][0] == "d":
-                        logger.debug(f"Directory: '{l}' : '{ll}' : '{ll[6:]}'")
-                        contents.append(
-                            {
-                                "type": "directory",
-                                "permission": ll[0],
-                                "user": ll[1],
-                                "group": ll[2],
-                                "size": fsize,
-                                "time": str(parser.parse(f"{ll[4]} {ll[5]}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None)),
-                                "path": ll[6],
-                            }
-                        )
-                    else:
-                        logger.debug(f"File: '{l}' : '{ll}' : '{ll[6:]}'")
-                        contents.append(
-                            {
-                                "type": "file",
-                                "permission": ll[0],
-                                "user": ll[1],
-                                "group": ll[2],
-                                "size": fsize,
-                                "time": str(parser.parse(f"{ll[4]} {ll[5]}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None)),
-                                "path": ll[6],
-                            }
-                        )
+        sorted_contents = await parse_listing(ret, dname, showhidden = showhidden, raw = raw)
         logger.debug(f"Xrdfs: Successfully ls {dname}.")
-        # Sort directories before files
-        if contents != []:
-            sorted_contents = sorted(
-                contents, key=lambda x: (x["type"] != "directory", x["path"])
-            )
 
     except asyncio.TimeoutError as e:
         logger.error(f"Xrdfs: timeout when listing directory {dname}'s content")
@@ -205,24 +140,24 @@ async def delete_path(
     username: str = "",
     mgm: str = mgm_url,
     krb5_enabled: bool = True,
-) -> bool:
+) -> DeleteReport:
 
     if username == "" or username is None:
         logger.error(f"Username cannot be empty")
         raise ValueError("Username cannot be empty")
 
     name = unquote_expand_user(dname = name, username = username, url = False)
+    report = DeleteReport(name)
     try:
         is_exist, path_type = await path_exist(name, username, mgm)
 
         if not is_exist:
             logger.error(f"PATH {name} doesn't exist.")
-            return False
+            report.fail(name, "Path doesn't exist.")
+            return report
     except Exception as e:
         raise e
 
-    files = []
-    dirs = []
     if name[0:4] == "/afs":
         cmd = f"sudo -E -u {username} rm -rf ".split()
         cmd.append(f'''{name}''') if '"' in name else cmd.append(f"""{name}""")
@@ -233,51 +168,33 @@ async def delete_path(
         returncode, _, err = await async_exec(cmd = cmd, env = {}, timeout = 120, decode = True)
 
         logger.debug(f"Xrd Del. err:{err}.")
-        status = True
+        report.total = 1
         if returncode != 0 or err != "":
-            msg = f"Failed to delete {name}."
-            status = False
-        return status
+            report.fail(name, err)
+        else:
+            report.deleted = 1
+        return report
 
     if path_type == PathType.DIR:
-        raw_files = await list_path(name, long=True, recursive=True, mgm=mgm)
-        for f in raw_files:
-            if f["type"] == "directory":
-                dirs.append(f["path"])
-            else:
-                files.append(f["path"])
-        dirs.append(name)
-        logger.debug(dirs)
-        logger.debug(files)
+        raw_files = await list_path(name, username = username, long=True, recursive=True, showhidden = True, mgm=mgm)
+        files, dirs = split_tree(name, raw_files)
     else:
-        files.append(name)
-    cmd = ""
+        files, dirs = [name], []
+    logger.debug(f"Deleting {len(files)} files and {len(dirs)} directories under {name}.")
+
+    #### xrdfs rm takes several paths, rmdir only one
+    async def rm_files(batch: List[str]):
+        cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "rm"] + batch
+        returncode, _, err = await async_exec(cmd = cmd, env = {}, timeout = 120 + len(batch), decode = True)
+        return returncode, err
+
+    async def rm_dir(d: str):
+        cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "rmdir", d]
+        returncode, _, err = await async_exec(cmd = cmd, env = {}, timeout = 120, decode = True)
+        return returncode, err
+
     try:
-        status = True
-        #### delete files
-        for f in files:
-            cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "rm"]
-            cmd.append(f'''{f}''') if '"' in f else cmd.append(f"""{f}""")
-
-            logger.info(f"Xrd DEL CMD: {cmd}")
-            returncode, _, err = await async_exec(cmd = cmd, env = {}, timeout = 120, decode = True)
-            logger.debug(f"Xrd Del. {f} err:{err}.")
-            if returncode == 0 and err == "":
-                msg = f"{f} is deleted."
-                logger.error(f"Xrd Del. {returncode}. err:{err}.")
-            else:
-                logger.error(f"Xrd Del. {returncode}. err:{err}.")
-                msg = f"Failed to delete {f}."
-                status = False
-        for f in dirs:
-            cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "rmdir"]
-            cmd.append(f'''{f}''') if '"' in f else cmd.append(f"""{f}""")
-            returncode, _, err = await async_exec(cmd = cmd, env = {}, timeout = 120, decode = True)
-            logger.debug(f"Xrd Del. err:{err}")
-            if returncode != 0 or err != "":
-                msg = f"Failed to delete {f}."
-                status = False
-        return status
+        return await bulk_delete(name, files, dirs, rm_files, rm_dir)
     except Exception as e:
         logger.error(
             f"Failed to delete {name}. Err:\n{sys.exc_info()[0]}\n.Msg:\n{sys.exc_info()[1]}"
@@ -347,72 +264,102 @@ async def upload_file(
         raise e
     return upload_status, msg
 
+#### Upload from an async iterator of chunks without buffering the payload
+async def upload_stream(
+    source,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    try:
+        dst = unquote_expand_user(dname = dst, username = username, url = False)
+        cmd = ["sudo", "-E", "-u", username, "xrdcp", "-f", "--retry", "3", "-"]
+        if dst[0:4] == "/afs":
+            subprocess.check_output(
+                f"sudo -E -u {username} aklog", shell=True, timeout=2
+            )
+            cmd.append(dst)
+        else:
+            cmd.append(f"{mgm}/{dst}")
+        returncode, ret, err = await async_feed_exec(cmd = cmd, source = source, env = {}, timeout = 1200, decode = True)
+
+        logger.debug(f"Xrdfs. Upload_stream\nret:{ret}\nerr:{err}")
+        if returncode != 0:
+            logger.error(f"Failed uploading file to {dst}. Err:{returncode} Msg:{err}")
+            if "permission denied" in err.lower():
+                raise PermissionError(f"Failed uploading file to {dst}. Permission Denied.")
+            raise IOError(f"Failed uploading file to {dst}. Err:{returncode} Msg:{err}")
+        if mode:
+            await chmod(fname = dst, username = username, mode = mode, mgm = mgm)
+    except PermissionError as e:
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed uploading file to {dst}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+    return True, f"File has been uploaded to {dst} successfully."
+
 async def upload_dir(
     dname: str, krb5cc: bytes, recursive: bool = False, mgm: str = mgm_url
 ):
     pass
 
+#@async_timer
+async def get_file_size(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> int:
+    """
+    Stat fname once. Return its size, raise if it is missing or not a file.
+    """
+    if username == "" or username is None:
+        logger.error(f"Username cannot be empty")
+        raise ValueError("Username cannot be empty")
+    fname = unquote_expand_user(dname = fname, username = username, url = False)
+    cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "stat"]
+    cmd.append(f'''{fname}''') if '"' in fname else cmd.append(f"""{fname}""")
+    returncode, stdout, stderr = await async_exec(cmd = cmd, env = {}, timeout = 20, decode = True)
+    is_exist, path_type = path_stat(fname, returncode, stdout, stderr)
+    if not is_exist:
+        logger.error(f"{fname} doesn't exist.")
+        raise PermissionError(f"Cannot access {fname}")
+    elif path_type != PathType.FILE:
+        logger.error(f"{fname} is not a file.")
+        raise TypeError(f"{fname} is not a file.")
+    return stat_size(stdout)
+
 #@async_timer
 async def get_file_stream(
     fname: str,
     username: str = "",
     mgm: str = mgm_url,
     krb5_enabled: bool = True,
+    offset: int = 0,
+    length: int = None,
+    fsize: int = None,
 ):
+    """
+    Stream fname (or length bytes from offset) straight from xrdcp's stdout.
+    """
     try:
-        if username == "" or username is None:
-            logger.error(f"Username cannot be empty")
-            raise ValueError("Username cannot be empty")
-        tmpfile=f"/tmp/ink/tmp-{str(uuid.uuid1())}"
-        logger.debug(f"Xrdfs. Start downloading {fname}. Tmpfile {tmpfile}")
         fname = unquote_expand_user(dname = fname, username = username, url = False)
-        is_exist, path_type = await path_exist(fname, username, mgm)
-        if not is_exist:
-            logger.error(f"{fname} doesn't exist.")
-            raise PermissionError(f"Cannot access {fname}")
-        elif path_type != PathType.FILE:
-            logger.error(f"{fname} is not a file.")
-            raise TypeError(f"{fname} is note a file.")
-        else:
-            logger.info(f"Start downloading {fname}.")
-
-        cmd = ["sudo", "-E", "-u", username, "xrdfs", mgm, "ls", "-l"]
-        cmd.append(f"""{fname}""") if "'" in fname else cmd.append(f'''{fname}''')
-        _, ret, err = await async_exec(cmd = cmd, env = {}, timeout = 1200, decode = True)
-        fsize = ret.split()[3]
-        logger.debug(f"XrdFS. get_file. ret: {ret}")
-
-        if ret == "" or int(fsize) >= max_file_size:
+        if fsize is None:
+            fsize = await get_file_size(fname, username, mgm, krb5_enabled)
+        if fsize >= max_file_size:
             logger.error(f"Error. {fname} is too large.")
             raise IOError(f"Error. {fname} is too large.")
-        if "'" in fname:
-            cmd = ["sudo", "-E", "-u", username, "xrdcp", f"""{mgm}/{fname}""", tmpfile]
-        else:
-            cmd = ["sudo", "-E", "-u", username, 'xrdcp', f'''{mgm}/{fname}''', tmpfile]
-
-        returncode, ret, err = await async_exec(cmd = cmd, env = {}, timeout = 1200, decode = True)
-        if returncode != 0 or err != '':
-            # err = err.decode("utf-8")
-            logger.error(f"Failed to download file {fname}... Err:{err}")
-            raise Exception(f"Failed to download file {fname}... Err:{err}")
-        try:
-            logger.debug(f"Now streaming {fname}...")
-            cmd = f"chown root:root {tmpfile}".split()
-            _, _, _  = await async_exec(cmd = cmd, env = {}, timeout = 1200, decode = True)
-            with open(tmpfile, 'rb') as infile:
-                while chunk := infile.read(nsize):
-                    yield chunk
-
-            cmd = f"rm -f {tmpfile}".split()
-            _, _, _ = await async_exec(cmd = cmd, env = {}, timeout = 1200, decode = True)
-            logger.debug(f"Temp file {tmpfile} deleted.")
-        except Exception as e:
-            logger.error(f"Error when downloading file {fname}.")
-            raise e
 
-        if returncode != 0:
-            logger.error(f"Failed to download file {fname}. Err:{err}")
-            raise PermissionError(f"Permission denied when download {fname}.")
+        logger.info(f"Start downloading {fname}. offset: {offset} length: {length}")
+        cmd = ["sudo", "-E", "-u", username, "xrdcp", "-N", "-f", "--retry", "3"]
+        cmd.append(f"""{mgm}/{fname}""") if "'" in fname else cmd.append(f'''{mgm}/{fname}''')
+        cmd.append("-")
+        async for chunk in async_stream_exec(cmd = cmd, env = {}, offset = offset, length = length, chunk_size = chunk_size, timeout = 1200):
+            yield chunk
+        logger.debug(f"Finished streaming {fname}.")
     except PermissionError as e:
         logger.error(f"Permission denied when access {fname}.")
         raise e
@@ -420,6 +367,9 @@ async def get_file_stream(
         logger.error(f"Failed to download file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}")
         raise e
 
+#### Download multiple files as a zip archive generated on the fly
+download_list = zip_downloader(get_file_stream, mgm_url, max_file_size)
+
 #@async_timer
 async def get_file(
     fname: str,
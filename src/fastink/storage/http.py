@@ -1 +1,473 @@
 #!/usr/bin/env python3
+
+import asyncio, base64, os, sys, time, urllib.parse
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any
+import aiohttp
+from fastink.storage.utils import storage_init, PathType, nice_size, unquote_expand_user
+from fastink.storage.archive import zip_downloader
+from fastink.storage.bulk import DeleteReport
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+from fastink.common.utils import get_krb5cc
+
+#### SPNEGO needs the gssapi bindings; bearer tokens and anonymous access do not
+try:
+    import gssapi
+except ImportError:
+    gssapi = None
+
+params = storage_init()
+mgm_url, max_file_size, krb5_enabled = params['mgm_url'], params['max_file_size'], params['krb5_enabled']
+endpoint = (get_config("storage", "http_endpoint", fallback="") or mgm_url).rstrip("/")
+auth_mode = get_config("storage", "http_auth", fallback="krb5")
+token_file = get_config("storage", "http_token_file", fallback="/tmp/bt_u{uid}")
+user_roots = get_config("storage", "http_user_roots", fallback=["~"])
+pool_size = get_config("storage", "http_pool_size", fallback=100, type=int)
+op_timeout = get_config("storage", "http_timeout", fallback=60, type=int)
+verify_ssl = get_config("storage", "http_verify_ssl", fallback=True, type=bool)
+list_parallel = get_config("storage", "http_list_parallel", fallback=8, type=int)
+chunk_size = 1024 * 1024
+DAV = "{DAV:}"
+propfind_body = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<D:propfind xmlns:D="DAV:"><D:prop>'
+    '<D:resourcetype/><D:getcontentlength/><D:getlastmodified/>'
+    '</D:prop></D:propfind>'
+)
+
+if params['fs_backend'] == 'http':
+    if not endpoint.startswith("http"):
+        logger.error(f"storage.http_endpoint {endpoint} is not an http(s) URL.")
+    if auth_mode == "krb5" and gssapi is None:
+        logger.error("gssapi is not installed. The http backend cannot do krb5 (SPNEGO) auth.")
+
+#### Shared keep-alive session
+class SessionPool:
+    """One aiohttp session per event loop, shared by every user.
+
+    Connections are kept alive and reused across users; identity travels in
+    the Authorization header of each request. Cookies are disabled so that a
+    server-side session of one user can never leak into another's request.
+    """
+    def __init__(self):
+        self._session = None
+        self._loop = None
+
+    async def get(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit = pool_size, ssl = None if verify_ssl else False, keepalive_timeout = 60)
+            self._session = aiohttp.ClientSession(
+                connector = connector,
+                cookie_jar = aiohttp.DummyCookieJar(),
+                timeout = aiohttp.ClientTimeout(total = None, sock_connect = op_timeout, sock_read = op_timeout),
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session, self._loop = None, None
+
+pool = SessionPool()
+
+#### Per-user authentication
+def negotiate_token(krb5ccname: str, host: str) -> str:
+    creds = gssapi.Credentials(usage = "initiate", store = {"ccache": f"FILE:{krb5ccname}"})
+    name = gssapi.Name(f"HTTP@{host}", gssapi.NameType.hostbased_service)
+    ctx = gssapi.SecurityContext(name = name, creds = creds, usage = "initiate")
+    return base64.b64encode(ctx.step()).decode()
+
+async def auth_headers(username: str) -> Dict[str, str]:
+    if auth_mode == "none" or not username:
+        return {}
+    if auth_mode == "bearer":
+        uid, _, _ = get_krb5cc(uid = None, name = username, krb5 = False)
+        fname = token_file.format(uid = uid, username = username)
+        try:
+            with open(fname) as f:
+                return {"Authorization": f"Bearer {f.read().strip()}"}
+        except OSError as e:
+            logger.error(f"Cannot read bearer token {fname} of {username}. Err:{str(e)}")
+            raise PermissionError(f"No bearer token for {username}.")
+    if gssapi is None:
+        raise ImportError("gssapi is required by krb5 auth of the http backend.")
+    _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = True)
+    host = urllib.parse.urlparse(endpoint).hostname
+    #### The first step may talk to the KDC
+    token = await asyncio.to_thread(negotiate_token, krb5ccname, host)
+    return {"Authorization": f"Negotiate {token}"}
+
+#### Path <-> URL mapping
+def check_path(path: str, username: str = "") -> str:
+    path = os.path.normpath(unquote_expand_user(dname = path, username = username, url = False))
+    if not path.startswith("/"):
+        logger.error(f"Http. Path {path} is not absolute.")
+        raise ValueError(f"Path {path} is not absolute.")
+    #### Without per-user credentials the server cannot tell users apart
+    if auth_mode == "none" and username:
+        roots = [user_roots] if isinstance(user_roots, str) else list(user_roots)
+        roots = [os.path.normpath(unquote_expand_user(dname = r.format(username = username), username = username, url = False)) for r in roots]
+        if not any(path == r or path.startswith(r.rstrip("/") + "/") for r in roots):
+            logger.error(f"Http. {username} is not allowed to access {path}.")
+            raise PermissionError(f"Permission denied when access {path}")
+    return path
+
+def to_url(path: str, collection: bool = False) -> str:
+    url = endpoint + urllib.parse.quote(path)
+    return url.rstrip("/") + "/" if collection else url
+
+def href_path(href: str) -> str:
+    base = urllib.parse.urlparse(endpoint).path.rstrip("/")
+    path = urllib.parse.unquote(urllib.parse.urlparse(href).path)
+    if base and path.startswith(base):
+        path = path[len(base):]
+    return os.path.normpath(path) if path else "/"
+
+def http_error(status: int, path: str, text: str = ""):
+    if status in (401, 403):
+        logger.error(f"Http. Permission denied when access {path}.")
+        raise PermissionError(f"Permission denied when access {path}")
+    if status == 404:
+        raise FileNotFoundError(f"Http: {path} not found.")
+    logger.error(f"Http. Request on {path} failed. status:{status}. {text[:200]}")
+    raise IOError(f"Request on {path} failed. status:{status}")
+
+def parse_multistatus(body: str) -> List[Dict[str, Any]]:
+    """ Parse a PROPFIND multistatus into path/is_dir/size/mtime dicts. """
+    entries = []
+    for resp in ET.fromstring(body).iter(f"{DAV}response"):
+        href = resp.findtext(f"{DAV}href")
+        if href is None:
+            continue
+        prop = None
+        for propstat in resp.iter(f"{DAV}propstat"):
+            if " 200 " in (propstat.findtext(f"{DAV}status") or " 200 "):
+                prop = propstat.find(f"{DAV}prop")
+                break
+        if prop is None:
+            continue
+        rtype = prop.find(f"{DAV}resourcetype")
+        is_dir = rtype is not None and rtype.find(f"{DAV}collection") is not None
+        size = prop.findtext(f"{DAV}getcontentlength")
+        mtime = prop.findtext(f"{DAV}getlastmodified")
+        try:
+            mtime = parsedate_to_datetime(mtime).timestamp() if mtime else None
+        except (TypeError, ValueError):
+            mtime = None
+        entries.append({"path": href_path(href), "is_dir": is_dir, "size": int(size) if size and not is_dir else 0, "mtime": mtime})
+    return entries
+
+async def propfind(path: str, username: str, depth: str = "1") -> List[Dict[str, Any]]:
+    session = await pool.get()
+    headers = {"Depth": depth, "Content-Type": "application/xml; charset=utf-8", **await auth_headers(username)}
+    async with session.request("PROPFIND", to_url(path), data = propfind_body, headers = headers) as resp:
+        text = await resp.text()
+        if resp.status != 207:
+            http_error(resp.status, path, text)
+    return parse_multistatus(text)
+
+async def stat(path: str, username: str):
+    try:
+        entries = await propfind(path, username, depth = "0")
+    except FileNotFoundError:
+        return None
+    return entries[0] if entries else None
+
+def entry(e: Dict[str, Any], username: str, raw: bool = False) -> Dict[str, Any]:
+    mtime = time.localtime(e["mtime"] if e["mtime"] is not None else time.time())
+    return {
+        "type": "directory" if e["is_dir"] else "file",
+        "permission": "drwxr-xr-x" if e["is_dir"] else "-rw-r--r--",
+        "user": username,
+        "group": "",
+        "size": nice_size(e["size"], raw),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S", mtime),
+        "path": e["path"],
+    }
+
+async def path_exist(
+    name: str, username: str = "", mgm: str = mgm_url
+):
+    path = check_path(name, username)
+    st = await stat(path, username)
+    if st is None:
+        return False, PathType.UNKNOWN
+    return True, PathType.DIR if st["is_dir"] else PathType.FILE
+
+async def mkcol(path: str, username: str, exist_ok: bool = True) -> bool:
+    session = await pool.get()
+    async with session.request("MKCOL", to_url(path, collection = True), headers = await auth_headers(username)) as resp:
+        status, text = resp.status, await resp.text()
+    if status == 201:
+        logger.info(f"Created {path} successfully.")
+        return True
+    if status == 405:
+        #### Already exists
+        st = await stat(path, username)
+        if st is not None and st["is_dir"] and exist_ok:
+            return True
+        raise FileExistsError(f"Failed to create {path}. It exists.")
+    if status == 409 and path != "/":
+        #### Parent missing: mkdir -p
+        await mkcol(os.path.dirname(path), username, True)
+        return await mkcol(path, username, exist_ok)
+    http_error(status, path, text)
+
+async def mkdir(
+    dname: str,
+    username: str = None,
+    mode:str = "755",
+    exist_ok: bool = True,
+    mgm: str = mgm_url,
+) -> bool:
+    return await mkcol(check_path(dname, username), username, exist_ok)
+
+async def chmod(fname:str, username:str, mode:str, mgm:str = mgm_url) -> bool:
+    """
+    WebDAV has no mode bits; only check that fname exists.
+    """
+    is_exist, _ = await path_exist(fname, username, mgm)
+    if not is_exist:
+        raise FileNotFoundError(f"Http: {fname} not found.")
+    logger.debug(f"Http. Ignoring chmod {mode} on {fname}.")
+    return True
+
+async def list_path(
+    dname: str,
+    username: str = "",
+    long: bool = True,
+    recursive: bool = False,
+    showhidden: bool = False,
+    mgm: str = mgm_url,
+    raw: bool = False
+):
+    dname = check_path(dname, username)
+    slots = asyncio.Semaphore(max(list_parallel, 1))
+    contents = []
+
+    #### Depth: infinity is disabled on most servers, so walk with Depth: 1
+    async def walk(path: str):
+        async with slots:
+            entries = await propfind(path, username, depth = "1")
+        subdirs = []
+        for e in entries:
+            if e["path"] == path:
+                continue
+            if os.path.basename(e["path"]).startswith(".") and not showhidden:
+                continue
+            contents.append(entry(e, username, raw))
+            if recursive and e["is_dir"]:
+                subdirs.append(e["path"])
+        await asyncio.gather(*[walk(d) for d in subdirs])
+
+    try:
+        await walk(dname)
+    except (PermissionError, FileNotFoundError) as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Http: Failed to list directory {dname}'s content. Err:{str(e)}")
+        raise ValueError(f"Http: Failed to list directory {dname}'s content:")
+    logger.debug(f"Http: Successfully ls {dname}.")
+    return sorted(contents, key = lambda x: (x["type"] != "directory", x["path"]))
+
+#### Streaming PUT: the body is sent with chunked transfer encoding as the
+#### source produces it
+async def upload_stream(
+    source,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    path = check_path(dst, username)
+    session = await pool.get()
+    try:
+        async with session.put(to_url(path), data = source, headers = await auth_headers(username)) as resp:
+            status, text = resp.status, await resp.text()
+        if status not in (200, 201, 204):
+            http_error(status, path, text)
+    except PermissionError as e:
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed uploading file to {path}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+    logger.info(f"File has been uploaded to {path} successfully.")
+    return True, f"File has been uploaded to {path} successfully."
+
+async def upload_file(
+    src_data: bytes,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    async def single():
+        yield src_data.encode("utf-8") if isinstance(src_data, str) else bytes(src_data or b"")
+    return await upload_stream(single(), dst, username = username, mgm = mgm, mode = mode)
+
+async def get_file_size(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+) -> int:
+    """
+    Stat fname once. Return its size, raise if it is missing or not a file.
+    """
+    path = check_path(fname, username)
+    st = await stat(path, username)
+    if st is None:
+        logger.error(f"{path} doesn't exist.")
+        raise PermissionError(f"Cannot access {path}")
+    if st["is_dir"]:
+        logger.error(f"{path} is not a file.")
+        raise TypeError(f"{path} is not a file.")
+    return st["size"]
+
+async def get_file_stream(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+    offset: int = 0,
+    length: int = None,
+    fsize: int = None,
+):
+    """
+    GET fname, with a Range header for partial reads. Servers that ignore
+    Range answer 200; the leading bytes are then skipped here.
+    """
+    path = check_path(fname, username)
+    headers = await auth_headers(username)
+    if offset or length is not None:
+        headers["Range"] = f"bytes={offset}-" + (f"{offset + length - 1}" if length is not None else "")
+    session = await pool.get()
+    async with session.get(to_url(path), headers = headers) as resp:
+        if resp.status == 416:
+            return
+        if resp.status not in (200, 206):
+            http_error(resp.status, path, await resp.text())
+        skip = offset if resp.status == 200 else 0
+        remaining = length
+        async for chunk in resp.content.iter_chunked(chunk_size):
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk[skip:], 0
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            if chunk:
+                yield chunk
+            if remaining is not None and remaining <= 0:
+                break
+
+async def get_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+):
+    size = await get_file_size(fname, username, mgm)
+    if size >= max_file_size:
+        logger.error(f"Error. {fname} is too large.")
+        raise IOError(f"Error. {fname} is too large.")
+    return b"".join([chunk async for chunk in get_file_stream(fname, username, mgm, krb5_enabled, fsize = size)])
+
+async def cat_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> str:
+    path = check_path(fname, username)
+    st = await stat(path, username)
+    if st is None:
+        raise FileNotFoundError(f"Http: File {path} not found.")
+    if st["is_dir"]:
+        raise TypeError(f"{path} is a directory.")
+    return b"".join([chunk async for chunk in get_file_stream(path, username, mgm, krb5_enabled, fsize = st["size"])]).decode("utf-8")
+
+#### Download multiple files as a zip archive generated on the fly
+download_list = zip_downloader(get_file_stream, mgm_url, max_file_size)
+
+#### DELETE removes a collection recursively on the server; members that
+#### could not be removed come back in a 207 multistatus
+async def delete_path(
+    name: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> DeleteReport:
+    path = check_path(name, username)
+    report = DeleteReport(path, total = 1)
+    st = await stat(path, username)
+    if st is None:
+        logger.error(f"PATH {path} doesn't exist.")
+        report.total = 0
+        report.fail(path, "Path doesn't exist.")
+        return report
+    session = await pool.get()
+    async with session.delete(to_url(path, collection = st["is_dir"]), headers = await auth_headers(username)) as resp:
+        status, text = resp.status, await resp.text()
+    if status in (200, 204):
+        report.deleted = 1
+    elif status == 207:
+        for resp_el in ET.fromstring(text).iter(f"{DAV}response"):
+            report.fail(href_path(resp_el.findtext(f"{DAV}href") or path), resp_el.findtext(f"{DAV}status") or "")
+        if not report.failed:
+            report.deleted = 1
+    else:
+        logger.error(f"Failed to delete {path}. status:{status}")
+        report.fail(path, f"HTTP {status}")
+    return report
+
+#### Rename file or directory
+async def rename(src: str, dst:str, username:str, mgm: str = mgm_url) -> bool:
+    try:
+        src_name = check_path(src, username)
+        dst_name = check_path(dst, username)
+        st = await stat(src_name, username)
+        if st is None:
+            raise FileNotFoundError(f"Http: Source {src_name} not found.")
+        is_exist, _ = await path_exist(dst_name, username, mgm)
+        if is_exist:
+            raise FileExistsError(f"Http: Dest {dst_name} exist.")
+
+        session = await pool.get()
+        headers = {"Destination": to_url(dst_name, collection = st["is_dir"]), "Overwrite": "F", **await auth_headers(username)}
+        async with session.request("MOVE", to_url(src_name, collection = st["is_dir"]), headers = headers) as resp:
+            status, text = resp.status, await resp.text()
+        if status in (201, 204):
+            return True
+        if status in (401, 403):
+            http_error(status, src_name, text)
+        logger.error(f"Failed to rename {src_name} to {dst_name}. status:{status}. {text[:200]}")
+        return False
+    except Exception as e:
+        logger.error(
+            f"Http. Failed to perform rename operation.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+async def init_ink_space(username: str, krb5ccname:str, user_group:str, ink_dir:str):
+    if not username:
+        logger.error(f"init_ink_space: username is EMPTY!")
+        raise ValueError(f"init_ink_space: username is EMPTY!")
+    ink_tag = f"{ink_dir}/{user_group}/{username}/.ink"
+    try:
+        #### No symlinks over WebDAV: the workspace directory is enough
+        return await mkdir(ink_tag, username = username, mode = "755", exist_ok = True, mgm = mgm_url)
+    except Exception as e:
+        logger.error(f"Failed to init ink space {ink_tag} for {username}. Err:{str(e)}")
+        return False
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import asyncio, calendar, os, time
+from typing import List, Dict, Any, NamedTuple, Tuple
+from dateutil import parser, tz
+from fastink.storage.utils import nice_size
+
+#### Parser for `xrdfs ls -l` output, shared by the xrootd and fuse backends.
+#### A line looks like
+####   drwxr-xr-x alice users 4096 2024-01-05 10:00:00 /path/to/name
+#### with times in UTC. Lines are split once with str.split, timestamps are
+#### converted to local time through a per-hour cache and symlinks are
+#### resolved in one batch, off the event loop.
+
+sort_keys = ("name", "size", "time")
+
+class Entry(NamedTuple):
+    type: str
+    permission: str
+    user: str
+    group: str
+    size: int
+    time: str
+    path: str
+
+    def as_dict(self, raw: bool = False) -> Dict[str, Any]:
+        if self.permission is None:
+            return {"type": self.type, "path": self.path}
+        return {
+            "type": self.type,
+            "permission": self.permission,
+            "user": self.user,
+            "group": self.group,
+            "size": nice_size(self.size, raw),
+            "time": self.time,
+            "path": self.path,
+        }
+
+class LocalTime:
+    """ Convert "YYYY-MM-DD", "HH:MM:SS" in UTC to "YYYY-MM-DD HH:MM:SS" in
+    local time. The UTC offset only changes on DST switches, so the local
+    prefix is computed once per UTC hour (per minute for zones whose offset
+    is not a whole number of hours) and the rest of the string is reused. """
+    def __init__(self, size: int = 65536):
+        self.size = size
+        self._hours = {}
+        self._minutes = {}
+
+    def _local(self, date: str, clock: str) -> Tuple[str, bool]:
+        ts = calendar.timegm((int(date[0:4]), int(date[5:7]), int(date[8:10]), int(clock[0:2]), int(clock[3:5]), 0, 0, 0, 0))
+        local = time.localtime(ts)
+        return time.strftime("%Y-%m-%d %H:%M", local), local.tm_gmtoff % 3600 == 0
+
+    def __call__(self, date: str, clock: str) -> str:
+        if len(date) != 10 or len(clock) != 8 or date[4] != "-" or clock[2] != ":":
+            return str(parser.parse(f"{date} {clock}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None))
+        key = date + clock[0:2]
+        hour = self._hours.get(key)
+        if hour is None:
+            if len(self._hours) >= self.size:
+                self._hours.clear()
+            prefix, whole = self._local(date, clock)
+            hour = self._hours[key] = prefix[:13] if whole else ""
+        if hour:
+            return hour + clock[2:]
+        #### Half-hour zones: cache per minute
+        key = date + clock[0:5]
+        minute = self._minutes.get(key)
+        if minute is None:
+            if len(self._minutes) >= self.size:
+                self._minutes.clear()
+            minute = self._minutes[key] = self._local(date, clock)[0]
+        return minute + clock[5:]
+
+local_time = LocalTime()
+
+def parse_ls(output: str, showhidden: bool = False) -> Tuple[List[Entry], List[int]]:
+    """ Parse `xrdfs ls -l` output. Returns the entries and the indexes of
+    symlinks, whose type still has to be resolved. """
+    entries, links = [], []
+    append = entries.append
+    convert = local_time
+    for l in output.split("\n"):
+        if not l or l.startswith("total"):
+            continue
+        if l[4] == " ":
+            #### Entry without stat information
+            ll = l.split(None, 4)
+            path = ll[-1]
+            if not showhidden and path[path.rfind("/") + 1:][:1] == ".":
+                continue
+            append(Entry("directory", None, None, None, 0, None, path))
+            continue
+        if l[0] == "l":
+            l = l[:l.index(" -> ")]
+        ll = l.split(None, 6)
+        path = ll[6]
+        if not showhidden and path[path.rfind("/") + 1:][:1] == ".":
+            continue
+        perm = ll[0]
+        if perm[0] == "l":
+            links.append(len(entries))
+        append(Entry("directory" if perm[0] == "d" else "file", perm, ll[1], ll[2], int(ll[3]), convert(ll[4], ll[5]), path))
+    return entries, links
+
+def resolve_links(entries: List[Entry], links: List[int], dname: str) -> List[Entry]:
+    """ Symlinks are reported as directories when their target, seen
+    through the local mount, is one. """
+    for i, is_dir in zip(links, [os.path.isdir(os.path.join(dname, entries[i].path)) for i in links]):
+        e = entries[i]
+        entries[i] = e._replace(type = "directory" if is_dir else "file", permission = "drwxrwxrwx" if is_dir else "-rwxrwxrwx")
+    return entries
+
+async def parse_listing(output: str, dname: str, showhidden: bool = False, raw: bool = False) -> List[Dict[str, Any]]:
+    """ list_path result for `xrdfs ls -l` output: directories first, then
+    by path. """
+    entries, links = parse_ls(output, showhidden)
+    if links:
+        await asyncio.to_thread(resolve_links, entries, links, dname)
+    entries.sort(key = lambda e: (e.type != "directory", e.path))
+    return [e.as_dict(raw) for e in entries]
+
+#### Sorting and paging of list_path results (raw sizes)
+def sort_entries(contents: List[Dict[str, Any]], key: str = "name", reverse: bool = False) -> List[Dict[str, Any]]:
+    """ Directories always come first; key orders entries within each group. """
+    if key not in sort_keys:
+        raise ValueError(f"Unknown sort key {key}. Use one of {', '.join(sort_keys)}.")
+    if key == "name":
+        field = lambda x: x["path"]
+    elif key == "size":
+        field = lambda x: (x.get("size") or 0, x["path"])
+    else:
+        field = lambda x: (x.get("time") or "", x["path"])
+    dirs = sorted((x for x in contents if x["type"] == "directory"), key = field, reverse = reverse)
+    files = sorted((x for x in contents if x["type"] != "directory"), key = field, reverse = reverse)
+    return dirs + files
+
+def paginate(contents: List[Dict[str, Any]], offset: int = 0, limit: int = None, raw: bool = False) -> List[Dict[str, Any]]:
+    page = contents[offset:] if limit is None else contents[offset:offset + limit]
+    if raw:
+        return page
+    return [{**x, "size": nice_size(x["size"])} if "size" in x else x for x in page]
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+import asyncio, json, os, re, time, uuid
+from datetime import datetime
+from typing import List, Dict, Any, AsyncIterator
+from fastink.storage import common
+from fastink.storage.utils import PathType, unquote_expand_user
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+from fastink.inkdb.inkredis import redis_connect
+
+#### Resumable multipart uploads
+#### Parts are staged on the user's own storage, under
+#### <staging_dir>/<upload_id>/part-NNNNN, so any API worker can receive any
+#### part and the final assembly runs with the user's identity. A part is
+#### streamed to a temporary name and only renamed to part-NNNNN once the
+#### whole declared body arrived, so an interrupted part is never listed.
+#### Assembly runs in the background, claimed through redis so only one
+#### worker assembles an upload, into a temporary name next to the
+#### destination that is renamed over it on success. Its progress is kept
+#### in complete.json for upload_status.
+params = common.storage_init()
+mgm_url, krb5_enabled, max_file_size = params['mgm_url'], params['krb5_enabled'], params['max_file_size']
+staging_dir = get_config("storage", "upload_staging_dir", fallback="~/.ink/uploads")
+upload_expire = get_config("storage", "upload_expire", fallback=86400, type=int)
+assemble_timeout = get_config("storage", "upload_assemble_timeout", fallback=3600, type=int)
+max_parts = 10000
+manifest_name = "manifest.json"
+state_name = "complete.json"
+upload_id_re = re.compile(r"^[0-9a-f]{32}$")
+part_re = re.compile(r"^part-(\d{5})$")
+
+def staging_path(username: str, upload_id: str = "") -> str:
+    root = unquote_expand_user(dname = staging_dir, username = username, url = False)
+    if not upload_id:
+        return root
+    if not upload_id_re.match(upload_id):
+        logger.error(f"Invalid upload id {upload_id}.")
+        raise ValueError(f"Invalid upload id {upload_id}.")
+    return f"{root}/{upload_id}"
+
+def part_path(username: str, upload_id: str, part_number: int) -> str:
+    if part_number < 1 or part_number > max_parts:
+        raise ValueError(f"Part number must be between 1 and {max_parts}.")
+    return f"{staging_path(username, upload_id)}/part-{part_number:05d}"
+
+async def purge_expired(username: str, mgm: str = mgm_url):
+    """ Best-effort removal of staging directories older than upload_expire. """
+    root = staging_path(username)
+    is_exist, _ = await common.path_exist(name = root, username = username, mgm = mgm)
+    if not is_exist:
+        return
+    now = time.time()
+    for entry in await common.list_path(dname = root, username = username, long = True, showhidden = True, mgm = mgm, raw = True):
+        try:
+            mtime = datetime.strptime(entry['time'], "%Y-%m-%d %H:%M:%S").timestamp()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if entry['type'] == "directory" and now - mtime > upload_expire:
+            logger.info(f"Removing expired upload {entry['path']}.")
+            try:
+                await common.delete_path(name = entry['path'], username = username, mgm = mgm)
+            except Exception as e:
+                logger.warning(f"Failed to remove expired upload {entry['path']}. Err:{str(e)}")
+
+async def init_upload(dst: str, username: str, overwrite: bool = False, mgm: str = mgm_url) -> str:
+    try:
+        await purge_expired(username, mgm)
+    except Exception as e:
+        logger.warning(f"Failed to purge expired uploads of {username}. Err:{str(e)}")
+
+    upload_id = uuid.uuid4().hex
+    staging = staging_path(username, upload_id)
+    await common.mkdir(staging, username, mode = "700", exist_ok = True, mgm = mgm)
+    manifest = {"dst": dst, "overwrite": overwrite, "created": time.time()}
+    await common.upload_file(src_data = json.dumps(manifest).encode("utf-8"), dst = f"{staging}/{manifest_name}", username = username, mgm = mgm)
+    logger.info(f"Multipart upload {upload_id} of {username} to {dst} started.")
+    return upload_id
+
+async def read_manifest(upload_id: str, username: str, mgm: str = mgm_url) -> Dict[str, Any]:
+    staging = staging_path(username, upload_id)
+    is_exist, _ = await common.path_exist(name = f"{staging}/{manifest_name}", username = username, mgm = mgm)
+    if not is_exist:
+        logger.error(f"Upload {upload_id} of {username} doesn't exist.")
+        raise FileNotFoundError(f"Upload {upload_id} doesn't exist.")
+    return json.loads(await common.cat_file(fname = f"{staging}/{manifest_name}", username = username, mgm = mgm))
+
+async def read_state(upload_id: str, username: str, mgm: str = mgm_url) -> Dict[str, Any]:
+    """ Assembly state written by complete_upload, None before it ran. """
+    fname = f"{staging_path(username, upload_id)}/{state_name}"
+    #### Written by whichever worker runs the assembly
+    common.meta_cache.invalidate(username, fname, recursive = False)
+    is_exist, _ = await common.path_exist(name = fname, username = username, mgm = mgm)
+    if not is_exist:
+        return None
+    return json.loads(await common.cat_file(fname = fname, username = username, mgm = mgm))
+
+async def write_state(upload_id: str, username: str, state: Dict[str, Any], mgm: str = mgm_url):
+    fname = f"{staging_path(username, upload_id)}/{state_name}"
+    await common.upload_file(src_data = json.dumps(state).encode("utf-8"), dst = fname, username = username, mgm = mgm)
+
+async def list_parts(upload_id: str, username: str, mgm: str = mgm_url) -> Dict[int, int]:
+    """ Received parts as {part_number: size}. """
+    staging = staging_path(username, upload_id)
+    #### Parts may have been written through another worker
+    common.meta_cache.invalidate(username, staging)
+    parts = {}
+    for entry in await common.list_path(dname = staging, username = username, long = True, showhidden = True, mgm = mgm, raw = True):
+        m = part_re.match(os.path.basename(entry['path']))
+        if m and entry['type'] == "file":
+            parts[int(m.group(1))] = int(entry['size'])
+    return parts
+
+async def upload_part(upload_id: str, part_number: int, source: AsyncIterator[bytes], username: str, size: int = None, mgm: str = mgm_url) -> int:
+    """ Stream one part into staging. Re-sending a part replaces it.
+    size is the declared body length; a part that falls short of it is
+    dropped. """
+    await read_manifest(upload_id, username, mgm)
+    if await read_state(upload_id, username, mgm) is not None:
+        raise ValueError(f"Upload {upload_id} is already being completed.")
+    dst = part_path(username, upload_id, part_number)
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+    received = 0
+
+    async def counted():
+        nonlocal received
+        async for chunk in source:
+            received += len(chunk)
+            yield chunk
+
+    try:
+        await common.upload_stream(counted(), tmp, username = username, mgm = mgm)
+        if size is not None and received != size:
+            raise ValueError(f"Part {part_number} is incomplete: received {received} of {size} bytes.")
+        is_exist, _ = await common.path_exist(name = dst, username = username, mgm = mgm)
+        if is_exist:
+            await common.delete_path(name = dst, username = username, mgm = mgm)
+        common.meta_cache.invalidate(username, dst, recursive = False)
+        if not await common.rename(tmp, dst, username = username, mgm = mgm):
+            raise IOError(f"Failed to store part {part_number} of upload {upload_id}.")
+    except BaseException:
+        try:
+            await asyncio.shield(common.delete_path(name = tmp, username = username, mgm = mgm))
+        except Exception as e:
+            logger.warning(f"Failed to remove {tmp}. Err:{str(e)}")
+        raise
+    logger.debug(f"Upload {upload_id}: part {part_number} ({received} bytes) stored.")
+    return received
+
+async def upload_status(upload_id: str, username: str, mgm: str = mgm_url) -> Dict[str, Any]:
+    """ Received parts and, once upload_complete was called, the assembly
+    state: assembling, done or failed (with error). """
+    manifest = await read_manifest(upload_id, username, mgm)
+    parts = await list_parts(upload_id, username, mgm)
+    state = await read_state(upload_id, username, mgm) or {"state": "receiving"}
+    return {
+        **state,
+        "upload_id": upload_id,
+        "path": manifest["dst"],
+        "parts": [{"part": n, "size": parts[n]} for n in sorted(parts)],
+    }
+
+#### Assemblies running in this worker; keeps their tasks referenced
+_assembling = set()
+
+def assembly_key(username: str, upload_id: str) -> str:
+    return f"ink:upload:{username}:{upload_id}"
+
+async def claim_assembly(username: str, upload_id: str) -> bool:
+    """ Claim the assembly of upload_id for this worker. The claim expires
+    with assemble_timeout, like a stale "assembling" state. """
+    r = redis_connect()
+    try:
+        return bool(await r.set(assembly_key(username, upload_id), os.getpid(), nx = True, ex = assemble_timeout))
+    except Exception as e:
+        #### Without redis concurrent assemblies only duplicate work: each
+        #### writes its own temporary file and renames it over the target.
+        logger.warning(f"Failed to claim the assembly of upload {upload_id}. Err:{str(e)}")
+        return True
+    finally:
+        await r.aclose()
+
+async def release_assembly(username: str, upload_id: str):
+    r = redis_connect()
+    try:
+        await r.delete(assembly_key(username, upload_id))
+    except Exception as e:
+        logger.warning(f"Failed to release the assembly of upload {upload_id}. Err:{str(e)}")
+    finally:
+        await r.aclose()
+
+async def complete_upload(upload_id: str, username: str, parts: List[int] = None, mgm: str = mgm_url) -> Dict[str, Any]:
+    """
+    Check the staged parts and start concatenating them, in order, into the
+    destination in the background. Poll upload_status for the outcome.
+
+    Without an explicit part list every received part is used and they must
+    be numbered 1..N without gaps.
+    """
+    manifest = await read_manifest(upload_id, username, mgm)
+    state = await read_state(upload_id, username, mgm)
+    if state and (state["state"] == "done" or
+                  (state["state"] == "assembling" and time.time() - state["started"] < assemble_timeout)):
+        return state
+
+    received = await list_parts(upload_id, username, mgm)
+    numbers = sorted(received) if parts is None else list(parts)
+    if not numbers:
+        raise ValueError(f"Upload {upload_id} has no parts.")
+    if parts is None:
+        missing = sorted(set(range(1, numbers[-1] + 1)) - set(received))
+    else:
+        missing = [n for n in numbers if n not in received]
+    if missing:
+        logger.error(f"Upload {upload_id} misses parts {missing}.")
+        raise ValueError(f"Upload {upload_id} misses parts {missing}.")
+
+    size = sum(received[n] for n in numbers)
+    if size >= max_file_size:
+        logger.error(f"Upload {upload_id} is too large: {size} bytes.")
+        raise ValueError(f"Upload {upload_id} is larger than {max_file_size} bytes.")
+
+    dst = manifest["dst"]
+    is_exist, path_type = await common.path_exist(name = dst, username = username, mgm = mgm)
+    if is_exist and (path_type != PathType.FILE or not manifest.get("overwrite")):
+        logger.error(f"Target {dst} exists. We will not overwrite it.")
+        raise FileExistsError(f"Target {dst} exists. We will not overwrite it.")
+
+    if not await claim_assembly(username, upload_id):
+        logger.info(f"Upload {upload_id} of {username} is being assembled by another worker.")
+        return await read_state(upload_id, username, mgm) or {"state": "assembling", "path": dst}
+    state = {"state": "assembling", "path": dst, "size": size, "parts": len(numbers), "started": time.time()}
+    try:
+        await write_state(upload_id, username, state, mgm)
+    except BaseException:
+        await release_assembly(username, upload_id)
+        raise
+    task = asyncio.create_task(assemble(upload_id, username, numbers, received, state, mgm))
+    _assembling.add(task)
+    task.add_done_callback(_assembling.discard)
+    return state
+
+async def assemble(upload_id: str, username: str, numbers: List[int], received: Dict[int, int], state: Dict[str, Any], mgm: str = mgm_url):
+    try:
+        await assemble_claimed(upload_id, username, numbers, received, state, mgm)
+    finally:
+        await release_assembly(username, upload_id)
+
+async def assemble_claimed(upload_id: str, username: str, numbers: List[int], received: Dict[int, int], state: Dict[str, Any], mgm: str = mgm_url):
+    dst = state["path"]
+    #### The target is only replaced once the whole file is written
+    tmp = f"{dst}.{uuid.uuid4().hex[:8]}.tmp"
+
+    async def concat():
+        for n in numbers:
+            async for chunk in common.get_file_stream(fname = part_path(username, upload_id, n), username = username, mgm = mgm,
+                                                      krb5_enabled = krb5_enabled, fsize = received[n]):
+                yield chunk
+
+    try:
+        await common.upload_stream(concat(), tmp, username = username, mgm = mgm)
+        is_exist, _ = await common.path_exist(name = dst, username = username, mgm = mgm)
+        if is_exist:
+            await common.delete_path(name = dst, username = username, mgm = mgm)
+        common.meta_cache.invalidate(username, dst, recursive = False)
+        if not await common.rename(tmp, dst, username = username, mgm = mgm):
+            raise IOError(f"Failed to move the assembled file to {dst}.")
+    except BaseException as e:
+        try:
+            await asyncio.shield(common.delete_path(name = tmp, username = username, mgm = mgm))
+        except Exception as err:
+            logger.warning(f"Failed to remove {tmp}. Err:{str(err)}")
+        if not isinstance(e, Exception):
+            raise
+        logger.error(f"Failed to assemble upload {upload_id} of {username} into {dst}. Err:{str(e)}")
+        try:
+            await write_state(upload_id, username, {**state, "state": "failed", "error": str(e)}, mgm)
+        except Exception as err:
+            logger.error(f"Failed to record the state of upload {upload_id}. Err:{str(err)}")
+        return
+    logger.info(f"Multipart upload {upload_id} of {username} assembled into {dst} ({state['size']} bytes).")
+    await write_state(upload_id, username, {**state, "state": "done", "finished": time.time()}, mgm)
+    #### The staging directory itself, holding the state, goes with purge_expired or abort
+    for n in numbers:
+        try:
+            await common.delete_path(name = part_path(username, upload_id, n), username = username, mgm = mgm)
+        except Exception as e:
+            logger.warning(f"Failed to remove part {n} of upload {upload_id}. Err:{str(e)}")
+
+async def abort_upload(upload_id: str, username: str, mgm: str = mgm_url) -> bool:
+    staging = staging_path(username, upload_id)
+    report = await common.delete_path(name = staging, username = username, mgm = mgm)
+    if not report:
+        logger.warning(f"Failed to clean up upload {upload_id} of {username}.")
+    return bool(report)
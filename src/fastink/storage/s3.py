@@ -1 +1,551 @@
 #!/usr/bin/env python3
+
+import asyncio, os, sys
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Any
+from fastink.storage.utils import storage_init, PathType, nice_size, unquote_expand_user
+from fastink.storage.archive import zip_downloader
+from fastink.storage.bulk import DeleteReport, bulk_delete
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+
+#### aiobotocore is only needed when fs_backend is s3 (pip install fastink[s3])
+try:
+    from aiobotocore.session import get_session
+    from aiobotocore.config import AioConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    get_session = None
+    ClientError = type("ClientError", (Exception,), {})
+
+params = storage_init()
+mgm_url, max_file_size, krb5_enabled = params['mgm_url'], params['max_file_size'], params['krb5_enabled']
+endpoint = get_config("storage", "s3_endpoint", fallback="") or None
+region = get_config("storage", "s3_region", fallback="") or None
+bucket = get_config("storage", "s3_bucket", fallback="")
+access_key = get_config("storage", "s3_access_key", fallback="") or None
+secret_key = get_config("storage", "s3_secret_key", fallback="") or None
+key_prefix = get_config("storage", "s3_prefix", fallback="")
+user_roots = get_config("storage", "s3_user_roots", fallback=["~"])
+pool_size = get_config("storage", "s3_pool_size", fallback=64, type=int)
+#### S3 rejects multipart parts below 5 MiB (except the last one)
+part_size = max(get_config("storage", "s3_part_size", fallback=8 * 1024 * 1024, type=int), 5 * 1024 * 1024)
+parallel = get_config("storage", "s3_parallel", fallback=8, type=int)
+chunk_size = 1024 * 1024
+copy_limit = 5 * 1024 ** 3
+copy_part_size = 512 * 1024 * 1024
+delete_batch = 1000
+
+if params['fs_backend'] == 's3':
+    if get_session is None:
+        logger.error("aiobotocore is not installed. The s3 backend cannot work without it.")
+    if not bucket:
+        logger.error("storage.s3_bucket is EMPTY.")
+
+#### Shared client
+class S3Client:
+    """One aiobotocore client per event loop.
+
+    The client keeps a pool of up to ``s3_pool_size`` HTTP connections, so
+    every request of every user reuses warm connections instead of paying a
+    TLS handshake (or a fork, as the xrootd backend does) per operation.
+    """
+    def __init__(self):
+        self._client = None
+        self._context = None
+        self._loop = None
+        self._lock = None
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop:
+            return self._client
+        if get_session is None:
+            raise ImportError("aiobotocore is required by the s3 backend.")
+        if self._lock is None or self._loop is not loop:
+            self._lock, self._loop, self._client = asyncio.Lock(), loop, None
+        async with self._lock:
+            if self._client is None:
+                self._context = get_session().create_client(
+                    "s3",
+                    endpoint_url = endpoint,
+                    region_name = region,
+                    aws_access_key_id = access_key,
+                    aws_secret_access_key = secret_key,
+                    config = AioConfig(max_pool_connections = pool_size, retries = {"max_attempts": 3, "mode": "standard"}),
+                )
+                self._client = await self._context.__aenter__()
+        return self._client
+
+    async def close(self):
+        if self._context is not None:
+            await self._context.__aexit__(None, None, None)
+        self._client, self._context, self._loop, self._lock = None, None, None, None
+
+pool = S3Client()
+
+#### Path <-> key mapping
+def allowed_roots(username: str) -> List[str]:
+    roots = [user_roots] if isinstance(user_roots, str) else list(user_roots)
+    return [os.path.normpath(unquote_expand_user(dname = r.format(username = username), username = username, url = False)) for r in roots]
+
+def to_key(path: str, username: str = "") -> str:
+    """ Map an absolute POSIX path onto an object key. Without per-user
+    credentials on the bucket, access is limited to the user's roots. """
+    path = os.path.normpath(unquote_expand_user(dname = path, username = username, url = False))
+    if not path.startswith("/"):
+        logger.error(f"S3. Path {path} is not absolute.")
+        raise ValueError(f"Path {path} is not absolute.")
+    if username and not any(path == r or path.startswith(r.rstrip("/") + "/") for r in allowed_roots(username)):
+        logger.error(f"S3. {username} is not allowed to access {path}.")
+        raise PermissionError(f"Permission denied when access {path}")
+    return key_prefix + path.lstrip("/")
+
+def to_path(key: str) -> str:
+    return "/" + key[len(key_prefix):].rstrip("/")
+
+def error_code(e: Exception) -> str:
+    return str(getattr(e, "response", {}).get("Error", {}).get("Code", ""))
+
+def is_missing(e: Exception) -> bool:
+    return error_code(e) in ("404", "NoSuchKey", "NotFound")
+
+def raise_denied(e: Exception, path: str):
+    if error_code(e) in ("403", "AccessDenied"):
+        logger.error(f"S3. Permission denied when access {path}.")
+        raise PermissionError(f"Permission denied when access {path}")
+
+def local_time(dt) -> str:
+    if dt is None:
+        return str(datetime.now().replace(microsecond = 0))
+    return str(dt.astimezone().replace(tzinfo = None, microsecond = 0))
+
+def entry(path: str, is_dir: bool, username: str, size: int = 0, mtime = None, raw: bool = False) -> Dict[str, Any]:
+    return {
+        "type": "directory" if is_dir else "file",
+        "permission": "drwxr-xr-x" if is_dir else "-rw-r--r--",
+        "user": username,
+        "group": "",
+        "size": nice_size(size, raw),
+        "time": local_time(mtime),
+        "path": path,
+    }
+
+async def iter_objects(client, prefix: str, delimiter: str = ""):
+    """ Yield (contents, common_prefixes) page by page. """
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+    async for page in client.get_paginator("list_objects_v2").paginate(**kwargs):
+        yield page.get("Contents", []), page.get("CommonPrefixes", [])
+
+async def path_exist(
+    name: str, username: str = "", mgm: str = mgm_url
+):
+    key = to_key(name, username)
+    client = await pool.get()
+    if key == key_prefix:
+        return True, PathType.DIR
+    try:
+        await client.head_object(Bucket = bucket, Key = key)
+        return True, PathType.FILE
+    except ClientError as e:
+        raise_denied(e, name)
+        if not is_missing(e):
+            raise e
+    resp = await client.list_objects_v2(Bucket = bucket, Prefix = key + "/", MaxKeys = 1)
+    if resp.get("KeyCount", 0) > 0:
+        return True, PathType.DIR
+    return False, PathType.UNKNOWN
+
+#### Create directory. Object stores have no directories: a zero-byte
+#### "<key>/" marker keeps empty ones visible.
+async def mkdir(
+    dname: str,
+    username: str = None,
+    mode:str = "755",
+    exist_ok: bool = True,
+    mgm: str = mgm_url,
+) -> bool:
+    key = to_key(dname, username)
+    is_exist, path_type = await path_exist(dname, username, mgm)
+    if is_exist and path_type == PathType.FILE:
+        logger.error(f"Failed to create {dname}. A file with that name exists.")
+        raise FileExistsError(f"Failed to create {dname}. A file with that name exists.")
+    client = await pool.get()
+    try:
+        await client.put_object(Bucket = bucket, Key = key.rstrip("/") + "/", Body = b"")
+    except ClientError as e:
+        raise_denied(e, dname)
+        logger.error(f"Failed to create directory {dname}. Err:{str(e)}")
+        raise e
+    logger.info(f"Created {dname} successfully.")
+    return True
+
+async def chmod(fname:str, username:str, mode:str, mgm:str = mgm_url) -> bool:
+    """
+    Object storage has no POSIX modes; only check that fname exists.
+    """
+    is_exist, _ = await path_exist(fname, username, mgm)
+    if not is_exist:
+        raise FileNotFoundError(f"S3: {fname} not found.")
+    logger.debug(f"S3. Ignoring chmod {mode} on {fname}.")
+    return True
+
+async def list_path(
+    dname: str,
+    username: str = "",
+    long: bool = True,
+    recursive: bool = False,
+    showhidden: bool = False,
+    mgm: str = mgm_url,
+    raw: bool = False
+):
+    dname = os.path.normpath(unquote_expand_user(dname = dname, username = username, url = False))
+    key = to_key(dname, username)
+    prefix = key.rstrip("/") + "/" if key != key_prefix else key_prefix
+    client = await pool.get()
+
+    def visible(path: str) -> bool:
+        return showhidden or not any(p.startswith(".") for p in os.path.relpath(path, dname).split("/"))
+
+    files, dirs = {}, {}
+    try:
+        async for contents, prefixes in iter_objects(client, prefix, "" if recursive else "/"):
+            for cp in prefixes:
+                path = to_path(cp["Prefix"])
+                dirs.setdefault(path, None)
+            for obj in contents:
+                if obj["Key"] == prefix:
+                    continue
+                path = to_path(obj["Key"])
+                if obj["Key"].endswith("/"):
+                    dirs[path] = obj.get("LastModified")
+                else:
+                    files[path] = obj
+                if recursive:
+                    #### Intermediate directories may only exist implicitly
+                    parent = os.path.dirname(path)
+                    while parent != dname and parent.startswith(dname):
+                        dirs.setdefault(parent, None)
+                        parent = os.path.dirname(parent)
+    except ClientError as e:
+        raise_denied(e, dname)
+        logger.error(f"S3: Failed to list directory {dname}'s content. Err:{str(e)}")
+        raise ValueError(f"S3: Failed to list directory {dname}'s content:")
+
+    contents = [entry(p, True, username, 0, t, raw) for p, t in dirs.items() if visible(p)]
+    contents += [entry(p, False, username, int(o.get("Size", 0)), o.get("LastModified"), raw) for p, o in files.items() if visible(p)]
+    logger.debug(f"S3: Successfully ls {dname}.")
+    return sorted(contents, key = lambda x: (x["type"] != "directory", x["path"]))
+
+#### Multipart upload with up to s3_parallel parts in flight
+async def upload_stream(
+    source,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    key = to_key(dst, username)
+    client = await pool.get()
+    slots = asyncio.Semaphore(max(parallel, 1))
+    buf = bytearray()
+    upload_id, number, parts, tasks = None, 0, [], set()
+
+    async def send(number: int, body: bytes):
+        try:
+            resp = await client.upload_part(Bucket = bucket, Key = key, UploadId = upload_id, PartNumber = number, Body = body)
+            parts.append({"PartNumber": number, "ETag": resp["ETag"]})
+        finally:
+            slots.release()
+
+    async def schedule(body: bytes):
+        nonlocal number
+        number += 1
+        await slots.acquire()
+        for task in [t for t in tasks if t.done()]:
+            tasks.discard(task)
+            task.result()
+        tasks.add(asyncio.create_task(send(number, body)))
+
+    try:
+        async for chunk in source:
+            buf += chunk
+            while len(buf) >= part_size:
+                if upload_id is None:
+                    upload_id = (await client.create_multipart_upload(Bucket = bucket, Key = key))["UploadId"]
+                body = bytes(buf[:part_size])
+                del buf[:part_size]
+                await schedule(body)
+        if upload_id is None:
+            await client.put_object(Bucket = bucket, Key = key, Body = bytes(buf))
+        else:
+            if buf:
+                await schedule(bytes(buf))
+            await asyncio.gather(*tasks)
+            await client.complete_multipart_upload(
+                Bucket = bucket, Key = key, UploadId = upload_id,
+                MultipartUpload = {"Parts": sorted(parts, key = lambda p: p["PartNumber"])},
+            )
+    except BaseException as e:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+        if upload_id is not None:
+            try:
+                await asyncio.shield(client.abort_multipart_upload(Bucket = bucket, Key = key, UploadId = upload_id))
+            except Exception as abort_err:
+                logger.warning(f"S3. Failed to abort multipart upload of {dst}. Err:{str(abort_err)}")
+        if isinstance(e, ClientError):
+            raise_denied(e, dst)
+        logger.error(
+            f"Failed uploading file to {dst}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+    logger.info(f"File has been uploaded to {dst} successfully.")
+    return True, f"File has been uploaded to {dst} successfully."
+
+async def upload_file(
+    src_data: bytes,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    async def single():
+        yield src_data.encode("utf-8") if isinstance(src_data, str) else bytes(src_data or b"")
+    return await upload_stream(single(), dst, username = username, mgm = mgm, mode = mode)
+
+async def get_file_size(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+) -> int:
+    """
+    Stat fname once. Return its size, raise if it is missing or not a file.
+    """
+    key = to_key(fname, username)
+    client = await pool.get()
+    try:
+        resp = await client.head_object(Bucket = bucket, Key = key)
+        return int(resp["ContentLength"])
+    except ClientError as e:
+        raise_denied(e, fname)
+        if not is_missing(e):
+            raise e
+    is_exist, _ = await path_exist(fname, username, mgm)
+    if is_exist:
+        logger.error(f"{fname} is not a file.")
+        raise TypeError(f"{fname} is not a file.")
+    logger.error(f"{fname} doesn't exist.")
+    raise PermissionError(f"Cannot access {fname}")
+
+async def get_file_stream(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+    offset: int = 0,
+    length: int = None,
+    fsize: int = None,
+):
+    """
+    Stream fname with up to s3_parallel ranged GETs of s3_part_size in
+    flight; parts are yielded in order.
+    """
+    key = to_key(fname, username)
+    if fsize is None:
+        fsize = await get_file_size(fname, username, mgm, krb5_enabled)
+    end = fsize if length is None else min(offset + length, fsize)
+    client = await pool.get()
+
+    async def fetch(start: int, stop: int) -> bytes:
+        resp = await client.get_object(Bucket = bucket, Key = key, Range = f"bytes={start}-{stop - 1}")
+        async with resp["Body"] as body:
+            return await body.read()
+
+    starts = iter(range(offset, end, part_size))
+    pending = deque()
+
+    def schedule():
+        start = next(starts, None)
+        if start is not None:
+            pending.append(asyncio.create_task(fetch(start, min(start + part_size, end))))
+
+    try:
+        for _ in range(max(parallel, 1)):
+            schedule()
+        while pending:
+            data = await pending.popleft()
+            schedule()
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+    except ClientError as e:
+        raise_denied(e, fname)
+        logger.error(f"Failed to stream {fname}. Err:{str(e)}")
+        raise IOError(f"Failed to stream {fname}. Err:{str(e)}")
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions = True)
+
+async def get_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+):
+    size = await get_file_size(fname, username, mgm)
+    if size >= max_file_size:
+        logger.error(f"Error. {fname} is too large.")
+        raise IOError(f"Error. {fname} is too large.")
+    return b"".join([chunk async for chunk in get_file_stream(fname, username, mgm, krb5_enabled, fsize = size)])
+
+async def cat_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> str:
+    try:
+        return (await get_file(fname, username, mgm, krb5_enabled)).decode("utf-8")
+    except PermissionError as e:
+        is_exist, _ = await path_exist(fname, username, mgm)
+        if not is_exist:
+            raise FileNotFoundError(f"S3: File {fname} not found.")
+        raise e
+
+#### Download multiple files as a zip archive generated on the fly
+download_list = zip_downloader(get_file_stream, mgm_url, max_file_size)
+
+async def all_keys(client, key: str) -> List[Dict[str, Any]]:
+    prefix = key.rstrip("/") + "/"
+    objs = []
+    async for contents, _ in iter_objects(client, prefix):
+        objs.extend(contents)
+    return objs
+
+#### Delete file or directory with batched DeleteObjects calls
+async def delete_path(
+    name: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> DeleteReport:
+    name = os.path.normpath(unquote_expand_user(dname = name, username = username, url = False))
+    key = to_key(name, username)
+    is_exist, path_type = await path_exist(name, username, mgm)
+    if not is_exist:
+        logger.error(f"PATH {name} doesn't exist.")
+        report = DeleteReport(name)
+        report.fail(name, "Path doesn't exist.")
+        return report
+    client = await pool.get()
+
+    if path_type == PathType.DIR:
+        objs = await all_keys(client, key)
+        files = [to_path(o["Key"]) for o in objs if not o["Key"].endswith("/")]
+        dirs = [to_path(o["Key"]) for o in objs if o["Key"].endswith("/") and o["Key"] != key + "/"] + [name]
+    else:
+        files, dirs = [name], []
+
+    async def rm_files(batch: List[str]):
+        resp = await client.delete_objects(
+            Bucket = bucket,
+            Delete = {"Objects": [{"Key": to_key(p)} for p in batch], "Quiet": True},
+        )
+        errs = [f"{e.get('Key')}: {e.get('Message', e.get('Code'))}" for e in resp.get("Errors", [])]
+        return (1, "; ".join(errs)) if errs else (0, "")
+
+    async def rm_dir(d: str):
+        #### Deleting an absent marker succeeds, so implicit directories are fine
+        await client.delete_object(Bucket = bucket, Key = to_key(d).rstrip("/") + "/")
+        return 0, ""
+
+    return await bulk_delete(name, files, dirs, rm_files, rm_dir, batch_size = delete_batch)
+
+async def copy_key(client, src_key: str, dst_key: str, size: int):
+    source = {"Bucket": bucket, "Key": src_key}
+    if size <= copy_limit:
+        await client.copy_object(Bucket = bucket, Key = dst_key, CopySource = source)
+        return
+    upload_id = (await client.create_multipart_upload(Bucket = bucket, Key = dst_key))["UploadId"]
+    try:
+        parts = []
+        for number, start in enumerate(range(0, size, copy_part_size), 1):
+            stop = min(start + copy_part_size, size) - 1
+            resp = await client.upload_part_copy(Bucket = bucket, Key = dst_key, UploadId = upload_id, PartNumber = number,
+                                                 CopySource = source, CopySourceRange = f"bytes={start}-{stop}")
+            parts.append({"PartNumber": number, "ETag": resp["CopyPartResult"]["ETag"]})
+        await client.complete_multipart_upload(Bucket = bucket, Key = dst_key, UploadId = upload_id, MultipartUpload = {"Parts": parts})
+    except BaseException:
+        await client.abort_multipart_upload(Bucket = bucket, Key = dst_key, UploadId = upload_id)
+        raise
+
+#### Rename file or directory: server-side copy, then delete the sources
+async def rename(src: str, dst:str, username:str, mgm: str = mgm_url) -> bool:
+    try:
+        src_name = os.path.normpath(unquote_expand_user(dname = src, username = username, url = False))
+        dst_name = os.path.normpath(unquote_expand_user(dname = dst, username = username, url = False))
+        src_key, dst_key = to_key(src_name, username), to_key(dst_name, username)
+
+        is_exist, path_type = await path_exist(src_name, username, mgm)
+        if not is_exist:
+            raise FileNotFoundError(f"S3: Source {src_name} not found.")
+        if path_type == PathType.UNKNOWN:
+            raise TypeError(f"S3. Source {src_name} UNKNOWN.")
+        is_exist, _ = await path_exist(dst_name, username, mgm)
+        if is_exist:
+            raise FileExistsError(f"S3: Dest {dst_name} exist.")
+        if dst_name.startswith(src_name.rstrip("/") + "/"):
+            raise ValueError(f"S3: Cannot move {src_name} into itself.")
+
+        client = await pool.get()
+        if path_type == PathType.FILE:
+            size = int((await client.head_object(Bucket = bucket, Key = src_key))["ContentLength"])
+            moves = [(src_key, dst_key, size)]
+        else:
+            moves = [(o["Key"], dst_key + o["Key"][len(src_key):], int(o.get("Size", 0))) for o in await all_keys(client, src_key)]
+
+        slots = asyncio.Semaphore(max(parallel, 1))
+        async def copy(move):
+            async with slots:
+                await copy_key(client, *move)
+        await asyncio.gather(*[copy(m) for m in moves])
+
+        for i in range(0, len(moves), delete_batch):
+            resp = await client.delete_objects(
+                Bucket = bucket,
+                Delete = {"Objects": [{"Key": m[0]} for m in moves[i:i + delete_batch]], "Quiet": True},
+            )
+            if resp.get("Errors"):
+                logger.error(f"Renamed {src_name} to {dst_name} but failed to remove some sources: {resp['Errors']}")
+                return False
+        return True
+    except ClientError as e:
+        raise_denied(e, src)
+        logger.error(f"S3. Failed to rename {src} to {dst}. Err:{str(e)}")
+        return False
+    except Exception as e:
+        logger.error(
+            f"S3. Failed to perform rename operation.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+async def init_ink_space(username: str, krb5ccname:str, user_group:str, ink_dir:str):
+    if not username:
+        logger.error(f"init_ink_space: username is EMPTY!")
+        raise ValueError(f"init_ink_space: username is EMPTY!")
+    ink_tag = f"{ink_dir}/{user_group}/{username}/.ink"
+    try:
+        #### No symlinks in object storage: the workspace marker is enough
+        return await mkdir(ink_tag, username = username, mode = "755", exist_ok = True, mgm = mgm_url)
+    except Exception as e:
+        logger.error(f"Failed to init ink space {ink_tag} for {username}. Err:{str(e)}")
+        return False
+
+if __name__ == "__main__":
+    pass
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-import logging, math, asyncio, os, time, urllib.parse
+import logging, math, asyncio, os, signal, time, urllib.parse
 from fastink.common.config import get_config
 from fastink.routers.status import InkStatus
 from enum import Enum
@@ -142,6 +142,139 @@ async def async_exec(cmd, env = {}, timeout = 60, decode = False, src_data = Non
     
     return process.returncode, ret, err
 
+#### Kill a command started with start_new_session=True together with its
+#### children: killing "sudo -u user xrdcp" alone would leave xrdcp running
+#### with our pipes open.
+def kill_group(process):
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    except PermissionError:
+        process.kill()
+
+#### Stop a command. wait() only returns once the pipes have reached EOF,
+#### which a paused stdout never reads. With the whole group killed nothing
+#### writes any more, so only what is already buffered is left to discard.
+async def _discard(stream):
+    while stream is not None and await stream.read(1024 * 1024):
+        pass
+
+async def stop_process(process, timeout = 10):
+    kill_group(process)
+    if process.stdin is not None:
+        process.stdin.close()
+    try:
+        await asyncio.wait_for(asyncio.gather(_discard(process.stdout), _discard(process.stderr), process.wait()), timeout=timeout)
+    except asyncio.TimeoutError:
+        #### A child we could not kill still holds the pipes open
+        logger.warning(f"Process {process.pid} did not release its pipes after kill.")
+
+#### Async streaming run. Yields stdout in chunks of at most chunk_size
+#### bytes; the pipe is only drained as fast as the consumer iterates.
+async def async_stream_exec(cmd, env = {}, offset:int = 0, length:int = None, chunk_size:int = 1024 * 1024, timeout = 120):
+    process = await asyncio.create_subprocess_exec(
+            *cmd,
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=chunk_size,
+            start_new_session=True
+        )
+    skip, remaining = offset, length
+    try:
+        while remaining is None or remaining > 0:
+            chunk = await asyncio.wait_for(process.stdout.read(chunk_size), timeout=timeout)
+            if not chunk:
+                break
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk[skip:], 0
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            yield chunk
+        if remaining is None or remaining > 0:
+            await asyncio.wait_for(process.wait(), timeout=timeout)
+            if process.returncode != 0:
+                err = (await process.stderr.read()).decode("utf-8", errors="replace")
+                raise IOError(f"Command {cmd[-2:]} failed. returncode: {process.returncode}. err: {err}")
+    finally:
+        #### Range satisfied, client went away or timeout: stop the copy
+        await stop_process(process)
+
+#### Async run with stdin fed from an async iterator of bytes. Each chunk
+#### waits for drain(), so the source is only pulled as fast as the command
+#### consumes it. timeout applies once the source is exhausted.
+async def async_feed_exec(cmd, source, env = {}, timeout = 1200, decode = False):
+    process = await asyncio.create_subprocess_exec(
+            *cmd,
+            env=env,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+    readers = asyncio.gather(process.stdout.read(), process.stderr.read())
+    try:
+        try:
+            async for chunk in source:
+                if chunk:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            #### The command gave up early; its returncode and stderr say why
+            pass
+        process.stdin.close()
+        ret, err = await asyncio.wait_for(readers, timeout=timeout)
+        await process.wait()
+    except BaseException:
+        #### Source failed or timed out: kill before stdin is closed, so the
+        #### command never sees a clean EOF. What it already wrote stays, so
+        #### callers that must never expose a truncated file (multipart parts
+        #### and their assembly) write to a temporary name and rename on success.
+        kill_group(process)
+        readers.cancel()
+        await asyncio.gather(readers, return_exceptions=True)
+        await stop_process(process)
+        raise
+    if decode:
+        ret, err = ret.decode("utf-8"), err.decode("utf-8")
+    return process.returncode, ret, err
+
+#### Parse a single-range HTTP Range header against a file size.
+#### Returns (start, end) inclusive, None without a usable header, or
+#### raises ValueError when the range cannot be satisfied.
+def parse_range(header:str, size:int):
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[6:].strip().partition("-")
+    try:
+        if start == "":
+            #### Suffix range: last N bytes
+            length = int(end)
+            if length <= 0:
+                raise ValueError(f"Invalid range {header}")
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        raise ValueError(f"Invalid range {header}")
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for size {size}")
+    return start, min(end, size - 1)
+
+#### Size field of xrdfs stat output
+def stat_size(stdout:str) -> int:
+    for line in stdout.splitlines():
+        if line.strip().startswith("Size:"):
+            return int(line.split(":", 1)[1])
+    raise ValueError("No size in stat output")
+
 #### Async shell
 async def async_shell(cmd, env = {}, timeout = 60):
     process = await asyncio.create_subprocess_shell(cmd, env=env)
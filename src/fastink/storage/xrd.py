@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
-import subprocess, os, sys, re, asyncio
+import subprocess, os, sys, asyncio
 from typing import List, Dict, Any
-from dateutil import parser, tz
-from fastink.storage.utils import storage_init, PathType, mode_map, nice_size, async_exec, async_shell, path_stat, unquote_expand_user, async_timer, sync_timer, gen_empty_zip
-from fastink.storage.fuse import get_file_stream, init_ink_space
+from fastink.storage.listing import parse_listing
+from fastink.storage.utils import storage_init, PathType, mode_map, async_exec, async_stream_exec, async_feed_exec, path_stat, stat_size, unquote_expand_user, async_timer, sync_timer
+from fastink.storage.archive import zip_downloader
+from fastink.storage.bulk import DeleteReport, bulk_delete, split_tree
+from fastink.storage.fuse import init_ink_space
 from fastink.common.logger import logger
 from fastink.common.utils import get_krb5cc
 from fastink.common.exception import TokenExpiredException
@@ -12,6 +14,7 @@ from fastink.common.exception import TokenExpiredException
 params = storage_init()
 mgm_url, max_file_size, krb5_enabled = params['mgm_url'], params['max_file_size'], params['krb5_enabled']
 nsize = 1024 * 1024 * 20
+chunk_size = 1024 * 1024
 
 def xrd_env(krb5ccname:str, krb5_enabled:bool = True):
     if not krb5_enabled or krb5ccname == "" or krb5ccname is None:
@@ -127,7 +130,6 @@ async def list_path(
     _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
     env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
     option = ""
-    contents = []
     sorted_contents = []
 
     if long:
@@ -145,80 +147,12 @@ async def list_path(
         logger.debug(f"Executing ls {option} {dname}. CMD: {cmd}")
         _, ret, err = await async_exec(cmd = cmd, env = env, timeout = 120, decode = True)
 
-        logger.debug(f"contents:\n{len(ret)}:\n{ret}")
         if len(ret) == 0:
             logger.debug(f"{dname} is empty.")
             return []
 
-        for l in ret.split("\n"):
-            logger.debug(f"Now processing {l}")
-            if len(l) == 0 or l[0:5] == "total":
-                logger.debug(f'{dname}. Skip line "{l}"')
-                continue
-
-            if l[4] == " ":
-                ll = re.split(r"\s+", l, maxsplit=4)
-                # logger.debug(f"Link: '{l}' : '{ll}' : '{ll[4:]}'")
-                fname = os.path.basename(ll[4])
-                if fname[0] == "." and not showhidden:
-                    continue
-                else:
-                    contents.append({"type": "directory", "path": ll[4]})
-            else:
-                if l[0] == "l":
-                    idx = l.index(" -> ")
-                    l = l[:idx]
-                # ll = l.split(' ', 6)
-
-                ll = re.split(r"\s+", l, maxsplit=6)
-                fname = os.path.basename(ll[6])
-
-                if fname[0] == "." and not showhidden:
-                    continue
-                else:
-                    if ll[0][0] == "l":
-                        full_path = os.path.join(dname, ll[-1])
-                        if os.path.isdir(full_path):
-                            ll[0] = "drwxrwxrwx"  # f'd{ll[0][1:]}'
-                            # logger.debug(f"Link. {full_path} is a directory")
-                        else:
-                            # ll[0] == '-' + ll[0][1:]
-                            ll[0] = "-rwxrwxrwx"  # f'd{ll[0][1:]}'
-                            # logger.debug(f"Link. {full_path} is a file")
-
-                    fsize = nice_size(int(ll[3]), raw)
-                    if ll[0][0] == "d":
-                        # logger.debug(f"Directory: '{l}' : '{ll}' : '{ll[6:]}'")
-                        contents.append(
-                            {
-                                "type": "directory",
-                                "permission": ll[0],
-                                "user": ll[1],
-                                "group": ll[2],
-                                "size": fsize,
-                                "time": str(parser.parse(f"{ll[4]} {ll[5]}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None)),
-                                "path": ll[6],
-                            }
-                        )
-                    else:
-                        # logger.debug(f"File: '{l}' : '{ll}' : '{ll[6:]}'")
-                        contents.append(
-                            {
-                                "type": "file",
-                                "permission": ll[0],
-                                "user": ll[1],
-                                "group": ll[2],
-                                "size": fsize,
-                                "time": str(parser.parse(f"{ll[4]} {ll[5]}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None)),
-                                "path": ll[6],
-                            }
-                        )
+        sorted_contents = await parse_listing(ret, dname, showhidden = showhidden, raw = raw)
         logger.debug(f"Xrdfs: Successfully ls {dname}.")
-        # Sort directories before files
-        if contents != []:
-            sorted_contents = sorted(
-                contents, key=lambda x: (x["type"] != "directory", x["path"])
-            )
 
     except asyncio.TimeoutError as e:
         logger.error(f"Xrdfs: timeout when listing directory {dname}'s content")
@@ -237,15 +171,17 @@ async def delete_path(
     username: str = "",
     mgm: str = mgm_url,
     krb5_enabled: bool = True,
-) -> bool:
+) -> DeleteReport:
     _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
     env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+    report = DeleteReport(name)
     try:
         logger.debug(f"Check if {username}'s {name} exists")
         is_exist, path_type = await path_exist(name, username, mgm)
         if not is_exist:
             logger.error(f"PATH {name} doesn't exist.")
-            return False
+            report.fail(name, "Path doesn't exist.")
+            return report
     except ValueError as e:
         logger.error(f"Token for {username} expired...")
         raise e
@@ -253,8 +189,6 @@ async def delete_path(
         logger.error(f"Unknown Error for {username}'s {name}. {str(e)}")
         raise e
 
-    files = []
-    dirs = []
     if name[0:4] == "/afs":
         cmd = f"sudo -E -u {username} rm -rf ".split()
         cmd.append(f'''{name}''') if '"' in name else cmd.append(f"""{name}""")
@@ -264,51 +198,34 @@ async def delete_path(
         logger.debug(f"Xrd DEL CMD: {cmd}")
         returncode, _, err = await async_exec(cmd = cmd, env = env, timeout = 120, decode = True)
         logger.debug(f"Xrd Del. err:{err}.")
-        status = True
+        report.total = 1
         if returncode != 0 or err != "":
-            msg = f"Failed to delete {name}."
-            status = False
-        return status
+            report.fail(name, err)
+        else:
+            report.deleted = 1
+        return report
 
     if path_type == PathType.DIR:
         raw_files = await list_path(dname = name, username = username, long=True, recursive=True, showhidden = True, mgm = mgm)
-        for f in raw_files:
-            if f["type"] == "directory":
-                dirs.append(f["path"])
-            else:
-                files.append(f["path"])
-        dirs.append(name)
-        logger.debug(dirs)
-        logger.debug(files)
+        files, dirs = split_tree(name, raw_files)
     else:
-        files.append(name)
-    cmd = ""
+        files, dirs = [name], []
+    logger.debug(f"Deleting {len(files)} files and {len(dirs)} directories under {name}.")
+
+    #### xrdfs rm takes several paths, rmdir only one
+    async def rm_files(batch: List[str]):
+        cmd = xrd_cmd(["xrdfs", mgm, "rm"], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+        cmd.extend(batch)
+        returncode, _, err = await async_exec(cmd = cmd, env = env, timeout = 120 + len(batch), decode = True)
+        return returncode, err
+
+    async def rm_dir(d: str):
+        cmd = xrd_cmd(["xrdfs", mgm, "rmdir", d], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+        returncode, _, err = await async_exec(cmd = cmd, env = env, timeout = 120, decode = True)
+        return returncode, err
+
     try:
-        status = True
-        #### delete files
-        for f in files:
-            cmd = xrd_cmd(["xrdfs", mgm, "rm"], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
-            cmd.append(f'''{f}''') if '"' in f else cmd.append(f"""{f}""")
-            logger.debug(f"Xrd DEL CMD: {cmd}")
-
-            returncode, _, err = await async_exec(cmd = cmd, env = env, timeout = 120, decode = True)
-            logger.debug(f"Xrd Del. {f} err:{err}.")
-            if returncode == 0 and err == "":
-                msg = f"{f} is deleted."
-                logger.error(f"Xrd Del. {returncode}. err:{err}.")
-            else:
-                logger.error(f"Xrd Del. {returncode}. err:{err}.")
-                msg = f"Failed to delete {f}."
-                status = False
-        for f in dirs:
-            cmd = xrd_cmd(["xrdfs", mgm, "rmdir"], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
-            cmd.append(f'''{f}''') if '"' in f else cmd.append(f"""{f}""")
-            returncode, _, err = await async_exec(cmd = cmd, env = env, timeout = 120, decode = True)
-            logger.debug(f"Xrd Del. err:{err}")
-            if returncode != 0 or err != "":
-                msg = f"Failed to delete {f}."
-                status = False
-        return status
+        return await bulk_delete(name, files, dirs, rm_files, rm_dir)
     except Exception as e:
         logger.error(
             f"Failed to delete {name}. Err:\n{sys.exc_info()[0]}\n.Msg:\n{sys.exc_info()[1]}"
@@ -379,6 +296,45 @@ async def upload_file(
         raise e
     return upload_status, msg
 
+#### Upload from an async iterator of chunks without buffering the payload
+async def upload_stream(
+    source,
+    dst: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    mode: str = ""
+):
+    _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
+    env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+    try:
+        if dst[0:4] == "/afs":
+            subprocess.check_output(
+                f"sudo -E -u {username} aklog", env=env, shell=True, timeout=2
+            )
+            cmd = f"sudo -E -u {username} xrdcp -f --retry 3 -".split() + [dst]
+        else:
+            dst = unquote_expand_user(dname = dst, username = username, url = False)
+            cmd = xrd_cmd(['xrdcp', '-f', '--retry', '3', '-'], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled) + [f"{mgm}/{dst}"]
+        logger.debug(f"Xrd Upload stream CMD: {cmd}")
+        returncode, ret, err = await async_feed_exec(cmd = cmd, source = source, env = env, timeout = 1200, decode = True)
+
+        logger.debug(f"Xrdfs. Upload_stream\nret:{ret}\nerr:{err}")
+        if returncode != 0:
+            logger.error(f"Failed uploading file to {dst}. Err:{returncode} Msg:{err}")
+            if "permission denied" in err.lower():
+                raise PermissionError(f"Failed uploading file to {dst}. Permission Denied.")
+            raise IOError(f"Failed uploading file to {dst}. Err:{returncode} Msg:{err}")
+        if mode:
+            await chmod(fname = dst, username = username, mode = mode, mgm = mgm)
+    except PermissionError as e:
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed uploading file to {dst}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+    return True, f"File has been uploaded to {dst} successfully."
+
 async def upload_dir(
     dname: str, krb5cc: bytes, recursive: bool = False, mgm: str = mgm_url
 ):
@@ -436,83 +392,87 @@ async def get_file(
         )
         raise e
 
+# @async_timer
+async def get_file_size(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+) -> int:
+    """
+    Stat fname once. Return its size, raise if it is missing or not a file.
+    """
+    _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
+    env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+    fname = unquote_expand_user(dname = fname, username = username, url = False)
+    cmd = xrd_cmd(["xrdfs", mgm, "stat"], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+    cmd.append(f'''{fname}''') if '"' in fname else cmd.append(f"""{fname}""")
+    returncode, stdout, stderr = await async_exec(cmd = cmd, env = env, timeout = 20, decode = True)
+    is_exist, path_type = path_stat(fname, returncode, stdout, stderr)
+    if not is_exist:
+        logger.error(f"{fname} doesn't exist.")
+        raise PermissionError(f"Cannot access {fname}")
+    elif path_type != PathType.FILE:
+        logger.error(f"{fname} is not a file.")
+        raise TypeError(f"{fname} is not a file.")
+    return stat_size(stdout)
+
+# @async_timer
+async def get_file_stream(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+    offset: int = 0,
+    length: int = None,
+    fsize: int = None,
+):
+    """
+    Stream fname (or length bytes from offset) straight from xrdcp's stdout.
+    xrdcp cannot seek, so a ranged request still skips the leading bytes.
+    """
+    _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
+    env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+    try:
+        fname = unquote_expand_user(dname = fname, username = username, url = False)
+        if fsize is None:
+            fsize = await get_file_size(fname, username, mgm, krb5_enabled)
+        if fsize >= max_file_size:
+            logger.error(f"Error. {fname} is too large.")
+            raise IOError(f"Error. {fname} is too large.")
+
+        logger.info(f"Start downloading {fname}. offset: {offset} length: {length}")
+        cmd = xrd_cmd(["xrdcp", "-N", "-f", "--retry", "3", f'''{mgm}/{fname}''', "-"], username = username, krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
+        async for chunk in async_stream_exec(cmd = cmd, env = env, offset = offset, length = length, chunk_size = chunk_size, timeout = 1200):
+            yield chunk
+        logger.debug(f"Finished streaming {fname}.")
+    except PermissionError as e:
+        logger.error(f"Permission denied when access {fname}.")
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed to download file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
 
 #### Prepare zip file
-async def prepare_zip_file(zipfile:str, TargetPath:str, flist:List[Dict[str,Any]], username:str = '', mgm:str = mgm_url, krb5_enabled = True) -> bool:
+async def prepare_zip_file(zipfile:str, TargetPath:str, flist:List[Dict[str,Any]], username:str = '', mgm:str = mgm_url, krb5_enabled = True, compression:str = "deflate") -> bool:
     logger.info(f"Starting prepare temporary zipfile {zipfile}.")
     try:
-        await gen_empty_zip(zipfile)
-        _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
-        env = xrd_env(krb5ccname = krb5ccname, krb5_enabled = krb5_enabled)
-        for l in flist:
-            fname = os.path.relpath(l['path'], TargetPath)
-            if l['type'] == "directory":
-                logger.debug(f"{l['path']} is a dir....")
-                if '"' in fname:
-                    cmd = f"cd /tmp && mkdir -p '''/tmp/{fname}''' && zip -r {zipfile} '''{fname}''' && rm -rf '''/tmp/{fname}'''"
-                else:
-                    cmd = f'cd /tmp && mkdir -p """/tmp/{fname}""" && zip -r {zipfile} """{fname}""" && rm -rf """/tmp/{fname}"""'
-            elif l['type'] == 'file':
-                logger.debug(f"Starting to archieve {l['path']}")
-                if l['path'][0:4] == "/afs":
-                # cmd.append(f'''{dst}''') if '"' in dst else cmd.append(f"""{dst}""")
-                    cmd = f"sudo -E -u {username} xrdcp -f --retry 3 {mgm}/{l['path']} - | zip -u {zipfile} - && echo -e '@ -\n@={fname}\n' | zipnote -w {zipfile}"
-                    subprocess.check_output(f"sudo -E -u {username} aklog", env=env, shell=True, timeout=2)
-                else:
-                    if '"' in fname:
-                        cmd = f"sudo -E -u {username} xrdcp -f --retry 3 '''{mgm}/{l['path']}''' - | zip -u {zipfile} - && echo -e '@ -\n@={fname}\n' | zipnote -w {zipfile}"
-                    else:
-                        cmd = f'sudo -E -u {username} xrdcp -f --retry 3 """{mgm}/{l["path"]}""" - | zip -u {zipfile} - && echo -e \'@ -\n@={fname}\n\' | zipnote -w {zipfile}'
-            else:
-                logger.error(f"Unknown Path Type....")
-                raise ValueError(f"Unknown Path Type {l['type']}...")
-            returncode, ret, err = await async_shell(cmd = cmd, env = env, timeout = 1200)
-            if returncode != 0:
-                logger.error(f"Failed to download file {fname}...\nErr:{err}")
-                raise Exception(f"Failed to download file {fname}...Err:{err}")
-            else:
-                logger.debug(f"Successfully archived {l['path']}...")
+        with open(zipfile, 'wb') as ofile:
+            async for chunk in download_list(TargetPath, flist, username = username, mgm = mgm, krb5_enabled = krb5_enabled, compression = compression):
+                ofile.write(chunk)
         logger.info(f"Successfully archieved all files in {zipfile}.")
     except Exception as e:
         logger.error(f"Failed to archieve all files into {zipfile}...\nErr:{str(e)}")
         logger.error(f"Removing temporary zip file {zipfile}...")
-        os.remove(zipfile)
+        if os.path.exists(zipfile):
+            os.remove(zipfile)
         return False
     return True
 
-#### Download multiple files
-async def download_list(TargetPath:str, flist:List[Dict[str,Any]], username:str = "", mgm:str = mgm_url, krb5_enabled = True, recursive:bool = False, showhidden:bool = False):
-    
-    f_sum = 0
-    for f in flist:
-       f_sum += f['size']
-    if f_sum >= max_file_size:
-       logger.error(f"Total size of file list is larger than {max_file_size}...")
-       raise ValueError(f"Total size of file list is larger than {max_file_size}...")
-
-    zipfile = f"{username}-archive.zip"
-    try:
-        status = await prepare_zip_file(zipfile, TargetPath = TargetPath, flist = flist, username = username, mgm = mgm, krb5_enabled = krb5_enabled)
-        if not status:
-            logger.error(f"Failed to prepare zipfile to download files... Unknown Error...")
-            raise ValueError(f"Failed to prepare zipfile to download files... Unknown Error...")
-    except Exception as e:
-        logger.error(f"Failed to prepare zipfile to download files... Err:{str(e)}")
-        raise e
-
-    #### Stream zipfile to client
-    try:
-        logger.info(f"Now streaming zipfile to client...")
-        with open(zipfile, 'rb') as infile:
-            while chunk := infile.read(nsize):
-                yield chunk
-    except Exception as e:
-        logger.error(f"Failed to stream zipfile to client... Err:{str(e)}")
-        raise e
-    finally:
-        logger.error(f"Removing temporary zip file {zipfile}...")
-        os.remove(zipfile)
-        logger.debug(f"Temp zipfile {zipfile} deleted.")
+#### Download multiple files as a zip archive generated on the fly
+download_list = zip_downloader(get_file_stream, mgm_url, max_file_size)
 
 # @async_timer
 async def cat_file(
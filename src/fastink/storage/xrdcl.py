@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+
+import asyncio, os, sys
+from typing import List, Dict, Any
+from collections import OrderedDict
+from datetime import datetime
+from fastink.storage.utils import storage_init, PathType, nice_size, unquote_expand_user
+from fastink.storage import xrd
+from fastink.storage.xrd import upload_file, upload_stream, init_ink_space, checksum
+from fastink.storage.archive import zip_downloader
+from fastink.storage.bulk import DeleteReport, bulk_delete, split_tree
+from fastink.common.config import get_config
+from fastink.common.logger import logger
+from fastink.common.utils import get_krb5cc
+from fastink.common.exception import TokenExpiredException
+
+#### XRootD python bindings are optional. Without them (or without krb5,
+#### which is the only way to carry the user's identity in-process) every
+#### call falls back to the xrdfs/xrdcp based implementation in xrd.py.
+try:
+    from XRootD import client as xrd_client
+    from XRootD.client.flags import DirListFlags, MkDirFlags, OpenFlags, StatInfoFlags
+except ImportError:
+    xrd_client = None
+
+params = storage_init()
+mgm_url, max_file_size, krb5_enabled = params['mgm_url'], params['max_file_size'], params['krb5_enabled']
+pool_size = get_config("storage", "xrdcl_pool_size", fallback=256, type=int)
+op_timeout = get_config("storage", "xrdcl_timeout", fallback=20, type=int)
+channel_ttl = get_config("storage", "xrdcl_channel_ttl", fallback=120, type=int)
+nsize = 1024 * 1024 * 20
+chunk_size = 1024 * 1024
+
+native_enabled = xrd_client is not None and bool(krb5_enabled)
+if params['fs_backend'] == 'xrdcl':
+    if xrd_client is None:
+        logger.warning("XRootD python bindings are not installed. xrdcl backend falls back to xrdfs commands.")
+    elif not krb5_enabled:
+        logger.warning("krb5 is disabled. xrdcl backend falls back to xrdfs commands.")
+    else:
+        os.environ.setdefault("XrdSecPROTOCOL", "krb5,sss,unix")
+        #### Idle channels, e.g. of evicted clients, are disconnected after this
+        for _ttl_key in ("DataServerTTL", "LoadBalancerTTL"):
+            xrd_client.EnvPutInt(_ttl_key, channel_ttl)
+
+#### Per-user client pool
+class ClientPool:
+    """LRU pool of XRootD FileSystem clients keyed on (username, krb5 ccache).
+
+    Every URL carries the user's ccache as ``xrd.k5ccname``. XrdCl keys its
+    channels on ``user@host`` plus that parameter and forwards ``xrd.*``
+    parameters on redirects, so each identity authenticates (and later
+    re-authenticates, on reconnect or against a data server) with its own
+    ccache; KRB5CCNAME of the process is never consulted. Concurrent first
+    logins of one key share a single login.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._clients = OrderedDict()
+        self._logins = {}
+
+    @staticmethod
+    def user_url(mgm: str, username: str) -> str:
+        scheme, _, host = mgm.partition("://")
+        host = host.split("@")[-1].rstrip("/")
+        return f"{scheme}://{username}@{host}" if username else f"{scheme}://{host}"
+
+    @classmethod
+    def channel_url(cls, mgm: str, username: str, krb5ccname: str, path: str = "/") -> str:
+        """URL of path on the channel of (username, krb5ccname)."""
+        url = f"{cls.user_url(mgm, username)}/{path}"
+        return f"{url}?xrd.k5ccname={krb5ccname}" if krb5ccname else url
+
+    def _login(self, url: str):
+        fs = xrd_client.FileSystem(url)
+        status, _ = fs.ping(timeout = op_timeout)
+        if not status.ok:
+            raise PermissionError(f"Failed to login to {url}. Err:{status.message}")
+        return fs
+
+    async def get(self, username: str, krb5ccname: str, mgm: str = mgm_url):
+        key = (username, krb5ccname, mgm)
+        fs = self._clients.get(key)
+        if fs is not None:
+            self._clients.move_to_end(key)
+            return fs
+
+        login = self._logins.get(key)
+        if login is None:
+            url = self.channel_url(mgm, username, krb5ccname)
+            logger.debug(f"XrdCl. New client for {username} on {url}.")
+            login = asyncio.ensure_future(asyncio.to_thread(self._login, url))
+            self._logins[key] = login
+            login.add_done_callback(lambda _: self._logins.pop(key, None))
+        fs = await asyncio.shield(login)
+
+        if key not in self._clients:
+            self._clients[key] = fs
+            while len(self._clients) > self.maxsize:
+                self._close(*self._clients.popitem(last = False))
+        self._clients.move_to_end(key)
+        return fs
+
+    def _close(self, key, fs):
+        """ The bindings cannot disconnect a channel directly. Dropping the
+        client leaves the channel without users, and XrdCl closes it after
+        the idle TTL set below. """
+        logger.debug(f"XrdCl. Evicted client of {key[0]} ({key[1]}).")
+
+    def drop(self, username: str):
+        for key in [k for k in self._clients if k[0] == username]:
+            self._close(key, self._clients.pop(key))
+
+pool = ClientPool(maxsize = pool_size)
+
+#### Await a XrdCl asynchronous request
+async def xrd_call(method, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _resolve(status, response):
+        if not future.done():
+            future.set_result((status, response))
+
+    def _callback(status, response, hostlist):
+        loop.call_soon_threadsafe(_resolve, status, response)
+
+    status = method(*args, callback = _callback, **kwargs)
+    if not status.ok:
+        _resolve(status, None)
+    return await future
+
+def user_ccache(username: str) -> str:
+    _, _, krb5ccname = get_krb5cc(uid = None, name = username, krb5 = krb5_enabled)
+    return krb5ccname
+
+async def user_client(username: str, mgm: str = mgm_url):
+    return await pool.get(username, user_ccache(username), mgm)
+
+#### Open fname for reading on the user's own channel
+async def open_file(fname: str, username: str, mgm: str = mgm_url):
+    f = xrd_client.File()
+    url = pool.channel_url(mgm, username, user_ccache(username), fname)
+    status, _ = await xrd_call(f.open, url, OpenFlags.READ, timeout = op_timeout)
+    if not status.ok:
+        raise PermissionError(f"Permission denied when download {fname}. Err:{status.message}")
+    return f
+
+def stat_type(info) -> PathType:
+    if info.flags & StatInfoFlags.IS_DIR:
+        return PathType.DIR
+    return PathType.FILE
+
+def stat_permission(info) -> str:
+    """ Build a ls-like permission string. Extended stat (XRootD >= 5.6) carries
+    the real mode, otherwise it is approximated from the stat flags. """
+    kind = "d" if info.flags & StatInfoFlags.IS_DIR else "-"
+    mode = getattr(info, "mode", None)
+    if isinstance(mode, int):
+        bits = "".join(c if mode & (1 << (8 - i)) else "-" for i, c in enumerate("rwxrwxrwx"))
+        return f"{kind}{bits}"
+    r = "r" if info.flags & StatInfoFlags.IS_READABLE else "-"
+    w = "w" if info.flags & StatInfoFlags.IS_WRITABLE else "-"
+    x = "x" if info.flags & StatInfoFlags.X_BIT_SET or kind == "d" else "-"
+    return f"{kind}{r}{w}{x}{r}-{x}{r}-{x}"
+
+def stat_entry(path: str, info, raw: bool = False):
+    return {
+        "type": "directory" if info.flags & StatInfoFlags.IS_DIR else "file",
+        "permission": stat_permission(info),
+        "user": getattr(info, "owner", "") or "",
+        "group": getattr(info, "group", "") or "",
+        "size": nice_size(int(info.size), raw),
+        "time": str(datetime.fromtimestamp(info.modtime)),
+        "path": path,
+    }
+
+async def path_exist(
+    name: str, username: str = "", mgm: str = mgm_url
+):
+    if not native_enabled:
+        return await xrd.path_exist(name, username, mgm)
+    try:
+        name = unquote_expand_user(dname = name, username = username, url = False)
+        fs = await user_client(username, mgm)
+        status, info = await xrd_call(fs.stat, name, timeout = op_timeout)
+        logger.debug(f"XrdCl. Stat {name}. status:{status.message}")
+        if not status.ok or info is None:
+            return False, PathType.UNKNOWN
+        return True, stat_type(info)
+    except PermissionError as e:
+        logger.error(f"Permission denied when access {name}")
+        raise PermissionError(f"Permission denied when access {name}")
+    except TokenExpiredException as e:
+        raise e
+
+#### Create directory
+async def mkdir(
+    dname: str,
+    username: str = None,
+    mode:str = "755",
+    exist_ok: bool = True,
+    mgm: str = mgm_url,
+) -> bool:
+    if not native_enabled or dname[0:4] == "/afs":
+        return await xrd.mkdir(dname, username, mode, exist_ok, mgm)
+    try:
+        dname = unquote_expand_user(dname = dname, username = username, url = False)
+        fs = await user_client(username, mgm)
+        status, _ = await xrd_call(fs.mkdir, dname, MkDirFlags.MAKEPATH, int(mode, 8), timeout = op_timeout)
+        if not status.ok:
+            logger.error(f"Failed to create {dname}.")
+            raise PermissionError(f"Failed to create {dname}.\n{status.message}")
+        logger.info(f"Created {dname} successfully.")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to create directory {dname}")
+        raise e
+
+async def chmod(fname:str, username:str, mode:str, mgm:str = mgm_url) -> bool:
+    """
+    mode format: 111, 755
+    """
+    if not native_enabled or fname[0:4] == "/afs":
+        return await xrd.chmod(fname, username, mode, mgm)
+    fname = unquote_expand_user(dname = fname, username = username, url = False)
+    fs = await user_client(username, mgm)
+    status, _ = await xrd_call(fs.chmod, fname, int(mode, 8), timeout = op_timeout)
+    if not status.ok:
+        logger.error(f"Failed to change {fname}'s permission to {mode}. err: {status.message}")
+        raise PermissionError(f"Failed to change {fname}'s permission to {mode}.")
+    return True
+
+async def list_path(
+    dname: str,
+    username: str = "",
+    long: bool = True,
+    recursive: bool = False,
+    showhidden: bool = False,
+    mgm: str = mgm_url,
+    raw: bool = False
+):
+    if not native_enabled:
+        return await xrd.list_path(dname, username, long, recursive, showhidden, mgm, raw)
+    contents = []
+    try:
+        dname = unquote_expand_user(dname = dname, username = username, url = False)
+        fs = await user_client(username, mgm)
+        pending = [dname]
+        while pending:
+            cur = pending.pop()
+            status, listing = await xrd_call(fs.dirlist, cur, DirListFlags.STAT, timeout = op_timeout * 6)
+            if not status.ok:
+                raise ValueError(f"{status.message}")
+            for entry in listing:
+                if entry.name[0] == "." and not showhidden:
+                    continue
+                path = os.path.join(cur, entry.name)
+                if entry.statinfo is None:
+                    contents.append({"type": "directory", "path": path})
+                    continue
+                item = stat_entry(path, entry.statinfo, raw)
+                contents.append(item)
+                if recursive and item["type"] == "directory":
+                    pending.append(path)
+        logger.debug(f"XrdCl: Successfully ls {dname}.")
+    except asyncio.TimeoutError as e:
+        logger.error(f"XrdCl: timeout when listing directory {dname}'s content")
+        raise asyncio.TimeoutError(
+            f"XrdCl: timeout when listing directory {dname}'s content"
+        )
+    except TokenExpiredException as e:
+        raise e
+    except:
+        logger.error(f"XrdCl: Failed to list directory {dname}'s content")
+        logger.error(f"Err:{sys.exc_info()[0]}\n. Msg:{sys.exc_info()[1]}")
+        raise ValueError(f"XrdCl: Failed to list directory {dname}'s content:")
+    # Sort directories before files
+    return sorted(contents, key=lambda x: (x["type"] != "directory", x["path"]))
+
+#### Read a whole file through a pooled client
+async def read_all(fname: str, username: str, mgm: str = mgm_url) -> bytes:
+    f = await open_file(fname, username, mgm)
+    try:
+        chunks = []
+        offset = 0
+        while True:
+            status, data = await xrd_call(f.read, offset, nsize, timeout = op_timeout * 6)
+            if not status.ok:
+                raise IOError(f"Failed to read {fname}. Err:{status.message}")
+            if not data:
+                break
+            chunks.append(data)
+            offset += len(data)
+        return b"".join(chunks)
+    finally:
+        await xrd_call(f.close, timeout = op_timeout)
+
+async def get_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+):
+    if not native_enabled:
+        return await xrd.get_file(fname, username, mgm, krb5_enabled)
+    try:
+        fname = unquote_expand_user(dname = fname, username = username, url = False)
+        fs = await user_client(username, mgm)
+        status, info = await xrd_call(fs.stat, fname, timeout = op_timeout)
+        if not status.ok or info is None:
+            logger.error(f"{fname} doesn't exist.")
+            raise PermissionError(f"Cannot access {fname}")
+        elif stat_type(info) != PathType.FILE:
+            logger.error(f"{fname} is not a file.")
+            raise TypeError(f"{fname} is not a file.")
+        if int(info.size) >= max_file_size:
+            logger.error(f"Error. {fname} is too large.")
+            raise IOError(f"Error. {fname} is too large.")
+        return await read_all(fname, username, mgm)
+    except PermissionError as e:
+        logger.error(f"Permission denied when access {fname}.")
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed to download file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+async def get_file_size(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+) -> int:
+    if not native_enabled or not krb5_enabled:
+        return await xrd.get_file_size(fname, username, mgm, krb5_enabled)
+    fname = unquote_expand_user(dname = fname, username = username, url = False)
+    fs = await user_client(username, mgm)
+    status, info = await xrd_call(fs.stat, fname, timeout = op_timeout)
+    if not status.ok or info is None:
+        logger.error(f"{fname} doesn't exist.")
+        raise PermissionError(f"Cannot access {fname}")
+    elif stat_type(info) != PathType.FILE:
+        logger.error(f"{fname} is not a file.")
+        raise TypeError(f"{fname} is not a file.")
+    return int(info.size)
+
+async def get_file_stream(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = krb5_enabled,
+    offset: int = 0,
+    length: int = None,
+    fsize: int = None,
+):
+    """
+    Stream fname with positioned reads, so ranged requests start at offset.
+    """
+    if not native_enabled or not krb5_enabled:
+        async for chunk in xrd.get_file_stream(fname, username, mgm, krb5_enabled, offset, length, fsize):
+            yield chunk
+        return
+    try:
+        fname = unquote_expand_user(dname = fname, username = username, url = False)
+        if fsize is None:
+            fsize = await get_file_size(fname, username, mgm, krb5_enabled)
+        if fsize >= max_file_size:
+            logger.error(f"Error. {fname} is too large.")
+            raise IOError(f"Error. {fname} is too large.")
+        end = fsize if length is None else min(fsize, offset + length)
+
+        f = await open_file(fname, username, mgm)
+        try:
+            while offset < end:
+                status, data = await xrd_call(f.read, offset, min(chunk_size, end - offset), timeout = op_timeout * 6)
+                if not status.ok:
+                    raise IOError(f"Failed to read {fname}. Err:{status.message}")
+                if not data:
+                    break
+                offset += len(data)
+                yield data
+        finally:
+            await xrd_call(f.close, timeout = op_timeout)
+    except PermissionError as e:
+        logger.error(f"Permission denied when access {fname}.")
+        raise e
+    except Exception as e:
+        logger.error(
+            f"Failed to download file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+#### Download multiple files as a zip archive generated on the fly
+download_list = zip_downloader(get_file_stream, mgm_url, max_file_size)
+
+async def cat_file(
+    fname: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> str:
+    if not native_enabled:
+        return await xrd.cat_file(fname, username, mgm, krb5_enabled)
+    try:
+        fname = unquote_expand_user(dname = fname, username = username, url = False)
+        is_exist, path_type = await path_exist(fname, username, mgm)
+        if not is_exist:
+            raise FileNotFoundError(f"XrdCl: File {fname} not found.")
+        if path_type == PathType.DIR:
+            raise TypeError(f"{fname} is a directory.")
+        try:
+            data = await read_all(fname, username, mgm)
+        except (PermissionError, IOError) as e:
+            raise FileNotFoundError(f"Failed to cat file {fname}. Err:{str(e)}")
+        return data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        logger.error(
+            f"XrdCl. Failed to cat file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+    except Exception as e:
+        logger.error(
+            f"XrdCl. Failed to cat file {fname}.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+#### Delete file or directory
+async def delete_path(
+    name: str,
+    username: str = "",
+    mgm: str = mgm_url,
+    krb5_enabled: bool = True,
+) -> DeleteReport:
+    if not native_enabled or name[0:4] == "/afs":
+        return await xrd.delete_path(name, username, mgm, krb5_enabled)
+    name = unquote_expand_user(dname = name, username = username, url = False)
+    is_exist, path_type = await path_exist(name, username, mgm)
+    if not is_exist:
+        logger.error(f"PATH {name} doesn't exist.")
+        report = DeleteReport(name)
+        report.fail(name, "Path doesn't exist.")
+        return report
+
+    if path_type == PathType.DIR:
+        raw_files = await list_path(name, username, long = True, recursive = True, showhidden = True, mgm = mgm)
+        files, dirs = split_tree(name, raw_files)
+    else:
+        files, dirs = [name], []
+    fs = await user_client(username, mgm)
+
+    #### Requests of one batch are pipelined over the user's channel
+    async def rm_files(batch: List[str]):
+        results = await asyncio.gather(*[xrd_call(fs.rm, f, timeout = op_timeout) for f in batch])
+        errs = [status.message for status, _ in results if not status.ok]
+        return (1, "; ".join(errs)) if errs else (0, "")
+
+    async def rm_dir(d: str):
+        status, _ = await xrd_call(fs.rmdir, d, timeout = op_timeout)
+        return (0, "") if status.ok else (1, status.message)
+
+    return await bulk_delete(name, files, dirs, rm_files, rm_dir)
+
+#### Rename file or directory
+async def rename(src: str, dst:str, username:str, mgm: str = mgm_url) -> bool:
+    if not native_enabled or src[0:4] == "/afs" or dst[0:4] == "/afs":
+        return await xrd.rename(src, dst, username, mgm)
+    try:
+        src_name = unquote_expand_user(dname = src, username = username, url = False)
+        dst_name = unquote_expand_user(dname = dst, username = username, url = False)
+
+        is_exist, path_type = await path_exist(src_name, username, mgm)
+        if not is_exist:
+            raise FileNotFoundError(f"XrdCl: Source {src_name} not found.")
+        if path_type == PathType.UNKNOWN:
+            raise TypeError(f"XrdCl. Source {src_name} UNKNOWN.")
+        is_exist, path_type = await path_exist(dst_name, username, mgm)
+        if is_exist:
+            raise FileExistsError(f"XrdCl: Dest {dst_name} exist.")
+
+        fs = await user_client(username, mgm)
+        status, _ = await xrd_call(fs.mv, src_name, dst_name, timeout = op_timeout)
+        if status.ok:
+            return True
+        logger.error(f"Failed to rename {src_name} to {dst_name}. Err:{status.message}.")
+        return False
+    except Exception as e:
+        logger.error(
+            f"XrdCl. Failed to perform rename operation.\nErr:\n{sys.exc_info()[0]}\nMsg:\n{sys.exc_info()[1]}"
+        )
+        raise e
+
+if __name__ == "__main__":
+    pass
@@ -142,6 +142,39 @@ class TestTokenAPI:
         assert data["status"] == InkStatus.TOKEN_INVALID
         assert data["msg"] == "Token validation failed"
 
+    def test_auth_request_validates_off_the_event_loop(self, monkeypatch):
+        from fastink.routers import headers
+
+        async def validate_token_async(username, token):
+            return token == "async-token"
+
+        def validate_token(username, token):
+            raise AssertionError("auth_request must not validate synchronously")
+
+        monkeypatch.setattr(headers, "validate_token_async", validate_token_async)
+        monkeypatch.setattr(headers, "validate_token", validate_token)
+        response = client.get(
+            "/api/v2/auth/auth_request",
+            headers={"Ink-Username": "alice", "Ink-Token": "async-token"},
+        )
+        assert response.status_code == 204
+        assert response.headers["X-Auth-Request-User"] == "alice"
+
+    def test_revoke_token_reports_disabled_revocation(self, monkeypatch):
+        from fastink.routers.v2 import auth_manager
+
+        class Backend:
+            def revoke_token(self, username, token):
+                raise NotImplementedError("Token revocation needs auth.password_revocation_redis")
+
+        monkeypatch.setattr(auth_manager, "get_auth_backend", lambda: Backend())
+        data = client.post(
+            "/api/v2/auth/revoke_token",
+            headers={"Ink-Username": "alice", "Ink-Token": "t"},
+        ).json()
+        assert data["status"] == InkStatus.RESOURCE_NOT_SUPPORT
+        assert "disabled" in data["msg"]
+
     def test_ip_whitelist(self):
         if get_config("common", "ip_whitelist_access"):
             response = client.get(
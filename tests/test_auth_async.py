@@ -0,0 +1,131 @@
+"""Tests for awaitable auth validation (fastink.auth.backends.aio) and the
+ASGI middlewares that use it."""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastink.auth.backends import aio
+from fastink.auth.backends.base import AsyncAuthBackend
+from fastink.auth.token_cache import TokenCache
+from fastink.routers import headers
+from fastink.routers.headers import UserValidationMiddleware
+from fastink.routers.status import InkStatus
+
+
+class SlowBackend:
+    """Blocks the calling thread for tokens named "slow"."""
+
+    name = "slow"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.threads = set()
+
+    def create_token(self, username, password=None): ...
+
+    def get_token(self, username): ...
+
+    def validate_token(self, username, token, **kw):
+        self.threads.add(threading.get_ident())
+        if token == "slow":
+            time.sleep(self.delay)
+        return token != "bad"
+
+
+class NativeBackend:
+    name = "native"
+
+    def create_token(self, username, password=None): ...
+
+    def get_token(self, username): ...
+
+    async def validate_token(self, username, token, **kw):
+        return token == "ok"
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    monkeypatch.setattr(headers, "token_cache", TokenCache(ttl=0))
+
+    def use(backend):
+        monkeypatch.setattr(headers, "get_auth_backend", lambda _type=None: backend)
+        return backend
+    return use
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(UserValidationMiddleware, skip_routers=[])
+
+    @app.get("/api/v2/ping")
+    async def ping():
+        return {"status": InkStatus.SUCCESS, "msg": "ok", "data": None}
+
+    return app
+
+
+class TestAsyncBackends:
+    def test_native_backend_is_used_directly(self):
+        backend = NativeBackend()
+        assert isinstance(backend, AsyncAuthBackend)
+        assert aio.as_async(backend) is backend
+
+    def test_sync_backend_runs_on_the_pool(self):
+        backend = SlowBackend(delay=0)
+        wrapped = aio.as_async(backend)
+        assert wrapped is aio.as_async(backend)
+        assert not hasattr(wrapped, "validated_until")
+        assert asyncio.run(wrapped.validate_token(username="alice", token="t")) is True
+        assert threading.get_ident() not in backend.threads
+
+    def test_validated_until_is_wrapped_when_present(self):
+        class Expiring(SlowBackend):
+            def validated_until(self, username, token, **kw):
+                return 42.0
+
+        wrapped = aio.as_async(Expiring(delay=0))
+        assert asyncio.run(wrapped.validated_until(username="alice", token="t")) == 42.0
+
+    def test_validate_token_async(self, use_backend):
+        use_backend(NativeBackend())
+        assert asyncio.run(headers.validate_token_async("alice", "ok")) is True
+        assert asyncio.run(headers.validate_token_async("alice", "nope")) is False
+        use_backend(SlowBackend(delay=0))
+        assert asyncio.run(headers.validate_token_async("alice", "bad")) is False
+
+
+class TestMiddlewareLoad:
+    def test_tail_latency_flat_while_one_validation_is_slow(self, use_backend):
+        """One request whose backend call blocks for 1s must not hold up
+        the 100 requests issued behind it on the same event loop."""
+        use_backend(SlowBackend(delay=1.0))
+        transport = httpx.ASGITransport(app=_app())
+
+        async def timed(client, token):
+            tm_start = time.perf_counter()
+            resp = await client.get("/api/v2/ping", headers={"Ink-Username": "alice", "Ink-Token": token})
+            return resp.json()["status"], time.perf_counter() - tm_start
+
+        async def run():
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                slow = asyncio.ensure_future(timed(client, "slow"))
+                await asyncio.sleep(0.05)
+                fast = await asyncio.gather(*[timed(client, f"t{i}") for i in range(100)])
+                return await slow, fast
+
+        (slow_status, slow_latency), fast = asyncio.run(run())
+        latencies = sorted(latency for _, latency in fast)
+        assert slow_status == InkStatus.SUCCESS and slow_latency >= 1.0
+        assert all(status == InkStatus.SUCCESS for status, _ in fast)
+        assert latencies[98] < 0.5
+
+    def test_invalid_token_rejected(self, use_backend):
+        use_backend(SlowBackend(delay=0))
+        resp = TestClient(_app()).get("/api/v2/ping", headers={"Ink-Username": "alice", "Ink-Token": "bad"})
+        assert resp.json()["status"] == InkStatus.USER_INVALID
@@ -1,6 +1,10 @@
 """Unit tests for the auth backend protocol + registry."""
 
+import time
+from datetime import datetime, timedelta
+
 import pytest
+from cryptography.fernet import Fernet
 
 from fastink.auth.backends.base import AuthBackend
 from fastink.auth.backends import registry
@@ -92,3 +96,78 @@ class TestPasswordBackendValidate:
             raise ValueError("corrupt")
         monkeypatch.setattr(pw, "_decrypt", boom)
         assert pw.PasswordBackend().validate_token("alice", "garbage") is False
+
+
+class TestPasswordSignedTokens:
+    @pytest.fixture
+    def pw(self, monkeypatch):
+        from fastink.auth.backends import password as pw
+
+        pw._fernet.cache_clear()
+        monkeypatch.setattr(pw, "_fernet_key", lambda: Fernet.generate_key())
+        yield pw
+        pw._fernet.cache_clear()
+
+    def test_cipher_built_once(self, pw, monkeypatch):
+        built = []
+        monkeypatch.setattr(pw, "Fernet", lambda key: built.append(key) or Fernet(key))
+        for _ in range(3):
+            pw._decrypt(pw._encrypt("alice"))
+        assert len(built) == 1
+
+    def test_signed_expiry(self, pw):
+        backend = pw.PasswordBackend()
+        valid = pw._issue("alice", datetime.now() + timedelta(hours=1))
+        expired = pw._issue("alice", datetime.now() - timedelta(seconds=1))
+        assert backend.validate_token("alice", valid) is True
+        assert backend.validated_until("alice", valid) > time.time()
+        assert backend.validate_token("bob", valid) is False
+        assert backend.validate_token("alice", expired) is False
+        # flipping payload bytes breaks the Fernet signature
+        assert backend.validate_token("alice", valid[:-4] + "AAAA") is False
+
+    def test_legacy_tokens(self, pw, monkeypatch):
+        backend = pw.PasswordBackend()
+        legacy = pw._encrypt("alice")
+        assert backend.validated_until("alice", legacy) is None
+        monkeypatch.setattr(pw, "get_config", lambda *a, **kw: False)
+        assert backend.validate_token("alice", legacy) is False
+
+    def test_revocation(self, pw, monkeypatch):
+        from fastink.auth import revocation
+
+        store = {}
+
+        class FakeRedis:
+            def set(self, key, value, px=None):
+                store[key] = px
+
+            def exists(self, key):
+                return key in store
+
+            def delete(self, key):
+                store.pop(key, None)
+
+        revoked = revocation.RevocationList(enabled=True)
+        revoked._redis = FakeRedis()
+        monkeypatch.setattr(pw, "revocation_list", revoked)
+        monkeypatch.setattr(pw, "get_user", lambda **kw: (_ for _ in ()).throw(Exception("no db")))
+        backend = pw.PasswordBackend()
+        token = pw._issue("alice", datetime.now() + timedelta(hours=1))
+        assert backend.validate_token("alice", token) is True
+        backend.revoke_token("alice", token)
+        assert backend.validate_token("alice", token) is False
+        assert 0 < store[revoked.key(token)] <= 3600 * 1000
+        with pytest.raises(NotImplementedError):
+            revocation.RevocationList().revoke("alice", token)
+
+    def test_get_token_reissues_expiring_tokens(self, pw, monkeypatch):
+        stored = {"token": pw._encrypt("alice"), "expired_at": datetime.now() + timedelta(hours=5)}
+        updates = []
+        monkeypatch.setattr(pw, "get_user", lambda **kw: {"id": 1})
+        monkeypatch.setattr(pw, "get_token", lambda user_id: dict(stored))
+        monkeypatch.setattr(pw, "get_authentication", lambda authentication: {"id": 2})
+        monkeypatch.setattr(pw, "update_token", lambda **kw: updates.append(kw))
+        token = pw.PasswordBackend().get_token("alice")
+        assert pw._claims(token) == ("alice", float(int(stored["expired_at"].timestamp())))
+        assert updates[0]["token"] == token
@@ -0,0 +1,127 @@
+"""Tests for the group-membership index (fastink.auth.groups)."""
+
+import threading
+
+import pytest
+
+from fastink.auth import groups, permission
+from fastink.computing.tools.common import utils as computing_utils
+
+SWEEP = {
+    "groups": [("physics", 100, ["alice", "bob"]), ("alice", 1000, []), ("admins", 200, ["alice"]),
+               ("bob", 1001, [])],
+    "users": [("alice", 1000, 1000), ("bob", 1001, 1001)],
+    "complete": True,
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    calls = {"sweep": 0, "nss": []}
+
+    def sweep():
+        calls["sweep"] += 1
+        return SWEEP
+
+    def nss(username):
+        calls["nss"].append(username)
+        return ["ldap-only"]
+
+    idx = groups.GroupIndex(ttl=60)
+    monkeypatch.setattr(groups, "group_index", idx)
+    monkeypatch.setattr(groups, "sweep_group_database", sweep)
+    monkeypatch.setattr(groups, "_nss_user_groups", nss)
+    idx.refresh()
+    return idx, calls
+
+
+class TestGroupIndex:
+    def test_primary_first_then_supplemental(self, index):
+        assert groups.get_user_groups("alice") == ["alice", "physics", "admins"]
+        assert groups.get_users_groups(["alice", "bob"]) == {
+            "alice": ["alice", "physics", "admins"], "bob": ["bob", "physics"]}
+        assert index[1] == {"sweep": 1, "nss": []}
+
+    def test_unswept_users_fall_back_once(self, index):
+        assert groups.get_user_groups("carol") == ["ldap-only"]
+        assert groups.get_user_groups("carol") == ["ldap-only"]
+        assert index[1]["nss"] == ["carol"]
+
+    def test_stale_index_is_rebuilt(self, index):
+        idx, calls = index
+        groups.get_user_groups("alice")
+        idx.built_at -= 61
+        groups.get_user_groups("alice")
+        idx.wait()
+        assert calls["sweep"] == 2
+
+    def test_stale_maps_are_served_during_the_rebuild(self, index, monkeypatch):
+        idx, calls = index
+        release = threading.Event()
+
+        def slow_sweep():
+            release.wait(5)
+            return {"groups": [("physics", 100, ["alice"]), ("alice", 1000, [])],
+                    "users": [("alice", 1000, 1000)], "complete": True}
+
+        monkeypatch.setattr(groups, "sweep_group_database", slow_sweep)
+        idx.built_at -= 61
+        assert groups.get_user_groups("alice") == ["alice", "physics", "admins"]
+        assert groups.get_user_groups("alice") == ["alice", "physics", "admins"]
+        release.set()
+        idx.wait()
+        assert groups.get_user_groups("alice") == ["alice", "physics"]
+
+    def test_unbuilt_index_does_not_block(self, index, monkeypatch):
+        idx = groups.GroupIndex(ttl=60)
+        monkeypatch.setattr(groups, "group_index", idx)
+        release = threading.Event()
+        monkeypatch.setattr(groups, "sweep_group_database", lambda: release.wait(5) and SWEEP)
+        assert groups.get_user_groups("alice") == ["ldap-only"]
+        release.set()
+        idx.wait()
+        assert groups.get_user_groups("bob") == ["bob", "physics"]
+
+    def test_incomplete_sweeps_resolve_users_one_by_one(self, index, monkeypatch):
+        calls = index[1]
+        idx = groups.GroupIndex(ttl=60)
+        monkeypatch.setattr(groups, "group_index", idx)
+        monkeypatch.setattr(groups, "sweep_group_database", lambda: {**SWEEP, "complete": False})
+        idx.refresh()
+        assert groups.get_user_groups("alice") == ["ldap-only"]
+        assert groups.get_user_groups("alice") == ["ldap-only"]
+        assert calls["nss"] == ["alice"]
+        assert groups.primary_group_name(1001) == "bob"
+        idx.refresh()
+        assert calls["nss"] == ["alice", "alice"]
+
+    def test_forced_refresh_clears_permission_cache(self, index, monkeypatch):
+        cleared = []
+        monkeypatch.setattr("fastink.auth.permission_cache.permission_cache.clear", lambda: cleared.append(1))
+        assert groups.refresh_group_index()["users"] == 2
+        assert index[1]["sweep"] == 2 and cleared == [1]
+
+    def test_disabled_index_uses_per_user_lookups(self, index, monkeypatch):
+        monkeypatch.setattr(groups, "group_index", groups.GroupIndex(ttl=0))
+        assert groups.get_user_groups("alice") == ["ldap-only"]
+        assert index[1]["sweep"] == 1
+
+    def test_computing_helpers(self, index, monkeypatch):
+        monkeypatch.setattr(computing_utils, "map_group_to_experiment", lambda name: None)
+        assert computing_utils.get_user_exp_group(1001) == (None, "bob")
+        assert computing_utils.get_all_user_groups("bob", 1001) == ["bob", "physics"]
+        assert index[1]["sweep"] == 1
+
+    def test_default_sweep_reads_nss(self):
+        sweep = groups.sweep_group_database()
+        assert any(name == "root" and uid == 0 for name, uid, _ in sweep["users"])
+        assert sweep["complete"] is False
+
+
+class TestUsersByPermission:
+    def test_direct_and_group_holders(self, index, monkeypatch):
+        monkeypatch.setattr(permission.common, "get_users_by_permission", lambda permission_name: [{"username": "bob"}])
+        monkeypatch.setattr(permission.common, "get_group_names_by_permission", lambda permission_name: ["admins"])
+        monkeypatch.setattr(permission.common, "get_users", lambda: [{"username": "alice"}, {"username": "bob"}])
+        assert permission.query_users_by_permission("gpu") == ["bob", "alice"]
+        assert index[1]["nss"] == []
@@ -5,7 +5,7 @@ These build a throwaway FastAPI app with the middleware explicitly attached
 (independent of the global ip_whitelist_access / security_access config
 switches, which are off in the test environment) so we can assert:
 
-  - ip_controlled_routers uses exact/prefix matching via _path_matches
+  - ip_controlled_routers uses exact/prefix matching via PathMatcher
   - a whitelisted IP passes, a non-whitelisted IP is rejected with the
     FastINK IP_BANNED envelope (HTTP 200, status=IP_BANNED)
   - endpoints NOT in ip_controlled_routers bypass the IP check entirely
@@ -108,6 +108,15 @@ class TestExactMatchIsolation:
         assert resp.json()["status"] == InkStatus.SUCCESS
 
 
+def _patch_validate(monkeypatch, fake):
+    """The middlewares await validate_token_async; wrap a sync fake."""
+
+    async def fake_async(username, token):
+        return fake(username, token)
+
+    monkeypatch.setattr("fastink.routers.headers.validate_token_async", fake_async)
+
+
 BY_PASS = ["/api/v2/auth/get_permission"]
 AUTH_HEADERS = {"Ink-Username": "alice", "Ink-Token": "valid-token"}
 PERMISSION_URL = "/api/v2/auth/get_permission?username=alice"
@@ -125,7 +134,7 @@ class TestIPTokenBypass:
             calls.append((username, token))
             return True
 
-        monkeypatch.setattr("fastink.routers.headers.validate_token", fake_validate)
+        _patch_validate(monkeypatch, fake_validate)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             PERMISSION_URL,
@@ -139,9 +148,7 @@ class TestIPTokenBypass:
 
     def test_query_username_mismatch_still_ip_checked(self, monkeypatch):
         # a valid account must not enumerate another user's permissions
-        monkeypatch.setattr(
-            "fastink.routers.headers.validate_token", lambda username, token: True
-        )
+        _patch_validate(monkeypatch, lambda username, token: True)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             "/api/v2/auth/get_permission?username=bob",
@@ -150,18 +157,14 @@ class TestIPTokenBypass:
         assert resp.json()["status"] == InkStatus.IP_BANNED
 
     def test_no_token_still_ip_checked(self, monkeypatch):
-        monkeypatch.setattr(
-            "fastink.routers.headers.validate_token", lambda username, token: True
-        )
+        _patch_validate(monkeypatch, lambda username, token: True)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(PERMISSION_URL, headers={"X-Real-IP": "8.8.8.8"})
         assert resp.json()["status"] == InkStatus.IP_BANNED
 
     def test_empty_headers_still_ip_checked(self, monkeypatch):
         # present-but-empty headers must not trigger validation
-        monkeypatch.setattr(
-            "fastink.routers.headers.validate_token", lambda username, token: True
-        )
+        _patch_validate(monkeypatch, lambda username, token: True)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             PERMISSION_URL,
@@ -171,9 +174,7 @@ class TestIPTokenBypass:
 
     def test_invalid_token_still_ip_checked(self, monkeypatch):
         # header presence alone must NOT bypass — the token must validate
-        monkeypatch.setattr(
-            "fastink.routers.headers.validate_token", lambda username, token: False
-        )
+        _patch_validate(monkeypatch, lambda username, token: False)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             PERMISSION_URL,
@@ -190,7 +191,7 @@ class TestIPTokenBypass:
             calls.append((username, token))
             return False
 
-        monkeypatch.setattr("fastink.routers.headers.validate_token", fake_validate)
+        _patch_validate(monkeypatch, fake_validate)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             PERMISSION_URL, headers={"X-Real-IP": "192.168.51.96"}
@@ -201,9 +202,7 @@ class TestIPTokenBypass:
     def test_controlled_without_bypass_still_ip_checked(self, monkeypatch):
         # get_token is IP-controlled but NOT in the bypass list -> a valid
         # token does not lift the IP restriction (it returns credentials)
-        monkeypatch.setattr(
-            "fastink.routers.headers.validate_token", lambda username, token: True
-        )
+        _patch_validate(monkeypatch, lambda username, token: True)
         client = _build_ip_app(WHITELIST, CONTROLLED, token_bypass=BY_PASS)
         resp = client.get(
             "/api/v2/auth/get_token",
@@ -0,0 +1,153 @@
+"""Tests for effective-permission resolution (auth.permission.resolve_effective),
+its cache and the joined DAL query behind it."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session
+
+from fastink.auth import common, permission
+from fastink.auth.permission_cache import (
+    EffectivePermissions,
+    PermissionCache,
+    invalidates_permissions,
+)
+from fastink.database.sqla import models
+
+TABLES = (models.Users, models.Permissions, models.Apps, models.UserPermissions,
+          models.GroupPermissions, models.UserApps)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    models.BASE.metadata.create_all(engine, tables=[m.__table__ for m in TABLES])
+    with Session(engine) as session:
+        alice = models.Users(username="alice")
+        perms = {name: models.Permissions(permission=name) for name in ("gpu", "CentOS7", "admin", "unused")}
+        app = models.Apps(app="jupyter")
+        session.add_all([alice, app, *perms.values()])
+        session.flush()
+        session.add_all([
+            models.UserPermissions(user_id=alice.id, permission_id=perms["gpu"].id),
+            models.GroupPermissions(group_name="physics", permission_id=perms["CentOS7"].id),
+            models.GroupPermissions(group_name="physics", permission_id=perms["gpu"].id),
+            models.GroupPermissions(group_name="admins", permission_id=perms["admin"].id),
+            models.UserApps(user_id=alice.id, app_id=app.id),
+        ])
+        session.flush()
+        yield session
+
+
+class TestEffectivePermissionsQuery:
+    def test_direct_group_and_app_grants(self, session):
+        granted = common.get_effective_permissions.__wrapped__("alice", ["admins", "physics", "nobody"], session=session)
+        assert granted["permissions"] == ["gpu", "admin", "CentOS7"]
+        assert granted["apps"] == ["jupyter"]
+
+    def test_no_groups(self, session):
+        assert common.get_effective_permissions.__wrapped__("alice", [], session=session)["permissions"] == ["gpu"]
+
+    def test_unknown_user(self, session):
+        with pytest.raises(NoResultFound):
+            common.get_effective_permissions.__wrapped__("bob", ["physics"], session=session)
+
+
+class TestResolveEffective:
+    @pytest.fixture
+    def db(self, monkeypatch):
+        monkeypatch.setattr(permission, "permission_cache", PermissionCache(ttl=60, size=10))
+        calls = {"groups": 0, "db": 0}
+
+        def get_user_groups(username):
+            calls["groups"] += 1
+            return [f"group{i}" for i in range(40)] + ["physics"]
+
+        def get_effective_permissions(username, group_names):
+            calls["db"] += 1
+            if username != "alice":
+                raise NoResultFound("User not found")
+            granted = ["CentOS7"] if "physics" in group_names else []
+            return {"user_id": "u1", "permissions": ["gpu", "AlmaLinux9", *granted], "apps": ["jupyter"]}
+
+        monkeypatch.setattr(permission, "get_user_groups", get_user_groups)
+        monkeypatch.setattr(permission.common, "get_effective_permissions", get_effective_permissions)
+        return calls
+
+    def test_one_lookup_for_many_groups_and_checks(self, db):
+        for _ in range(10):
+            assert permission.check_user_permission("alice", "CentOS7")
+            assert not permission.check_user_permission("alice", "admin")
+            assert permission.check_user_app("alice", "jupyter")
+        assert db == {"groups": 1, "db": 1}
+
+    def test_query_keeps_default_ordering(self, db):
+        assert permission.query_user_permissions(username="alice") == ["CentOS7", "AlmaLinux9", "gpu"]
+
+    def test_unknown_user_raises(self, db):
+        with pytest.raises(NoResultFound):
+            permission.check_user_permission("bob", "gpu")
+
+    def test_decorators_use_the_cache(self, db):
+        @permission.has_permission(permission="gpu")
+        def run(user):
+            return "ran"
+
+        @permission.has_app(app="vscode")
+        def open_app(user):
+            return "opened"
+
+        assert run(user="alice") == "ran"
+        with pytest.raises(PermissionError):
+            open_app(user="alice")
+        assert db["db"] == 1
+
+
+class TestPermissionCache:
+    def _entry(self, username, user_id):
+        return EffectivePermissions(user_id, username, ("gpu",), frozenset())
+
+    def test_user_writes_drop_only_that_user(self, monkeypatch):
+        cache = PermissionCache(ttl=60)
+        monkeypatch.setattr("fastink.auth.permission_cache.permission_cache", cache)
+        cache.put(self._entry("alice", "u1"), cache.generation)
+        cache.put(self._entry("bob", "u2"), cache.generation)
+
+        @invalidates_permissions("user")
+        def add_user_permission(user_id, permission_id):
+            return True
+
+        @invalidates_permissions()
+        def add_group_permission(group_name, permission_id):
+            return True
+
+        assert add_user_permission(user_id="u1", permission_id="p")
+        assert cache.get("alice") is None and cache.get("bob") is not None
+        add_group_permission(group_name="physics", permission_id="p")
+        assert cache.get("bob") is None
+
+    def test_failed_writes_keep_the_cache(self, monkeypatch):
+        cache = PermissionCache(ttl=60)
+        monkeypatch.setattr("fastink.auth.permission_cache.permission_cache", cache)
+        cache.put(self._entry("alice", "u1"), cache.generation)
+
+        @invalidates_permissions()
+        def delete_group_permission(group_name, permission_id):
+            raise RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            delete_group_permission(group_name="physics", permission_id="p")
+        assert cache.get("alice") is not None
+
+    def test_resolution_racing_a_write_is_not_stored(self):
+        cache = PermissionCache(ttl=60)
+        generation = cache.generation
+        cache.clear()
+        cache.put(self._entry("alice", "u1"), generation)
+        assert cache.get("alice") is None
+
+    def test_common_writes_are_decorated(self):
+        for name in ("add_user_permission", "delete_user_permission", "add_group_permission",
+                     "delete_group_permission", "delete_permission", "add_user_app", "delete_user"):
+            # invalidates_permissions -> transactional_session -> function
+            assert hasattr(getattr(common, name).__wrapped__, "__wrapped__"), name
@@ -0,0 +1,232 @@
+"""Tests for the validated-token cache (fastink.auth.token_cache) and its use
+in routers.headers.validate_token."""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from fastink.auth import common, token_cache as token_cache_module
+from fastink.auth.token_cache import REDIS_PREFIX, REDIS_USER_PREFIX, TokenCache, invalidates_tokens
+from fastink.database.sqla import models
+from fastink.routers import headers
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is None or value[1] <= time.time():
+            return None
+        return value[0]
+
+    def pttl(self, key):
+        return int((self.data[key][1] - time.time()) * 1000)
+
+    def set(self, key, value, px):
+        self.data[key] = (value, time.time() + px / 1000)
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def expire(self, key, seconds):
+        pass
+
+    def smembers(self, key):
+        return self.data.get(key, set())
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class CountingBackend:
+    name = "counting"
+
+    def __init__(self, valid=True):
+        self.valid = valid
+        self.calls = 0
+
+    def validate_token(self, username, token, **kw):
+        self.calls += 1
+        if self.valid is None:
+            raise RuntimeError("backend down")
+        return self.valid
+
+
+class ExpiringBackend(CountingBackend):
+    def __init__(self, until):
+        super().__init__()
+        self.until = until
+
+    def validated_until(self, username, token, **kw):
+        self.calls += 1
+        return self.until
+
+
+class TestTokenCache:
+    def test_positive_and_negative_entries(self):
+        cache = TokenCache(ttl=60, negative_ttl=60, size=10)
+        assert cache.get("alice", "t") is None
+        cache.put("alice", "t", True)
+        cache.put("alice", "bad", False)
+        assert cache.get("alice", "t") is True
+        assert cache.get("alice", "bad") is False
+        assert cache.get("bob", "t") is None
+        assert cache.stats() == {"hits": 1, "negative_hits": 1, "misses": 2, "redis_hits": 0,
+                                 "redis_errors": 0, "evictions": 0, "size": 2}
+
+    def test_entries_never_outlive_the_credential(self):
+        cache = TokenCache(ttl=60, size=10)
+        cache.put("alice", "t", True, valid_until=time.time() + 0.05)
+        assert cache.get("alice", "t") is True
+        time.sleep(0.06)
+        assert cache.get("alice", "t") is None
+        cache.put("alice", "old", True, valid_until=time.time() - 1)
+        assert cache.stats()["size"] == 0
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TokenCache(ttl=60, size=2)
+        cache.put("a", "t", True)
+        cache.put("b", "t", True)
+        cache.get("a", "t")
+        cache.put("c", "t", True)
+        assert cache.get("b", "t") is None
+        assert cache.get("a", "t") is True
+        assert cache.stats()["evictions"] == 1
+
+    def test_keys_do_not_contain_the_token(self):
+        key = TokenCache.key("alice", "secret-token")
+        assert "secret" not in key and len(key) == 64
+        assert key != TokenCache.key("alice\0secret", "-token")
+
+    def test_results_are_shared_through_redis(self):
+        shared = FakeRedis()
+        first, second = TokenCache(ttl=60, redis_enabled=True), TokenCache(ttl=60, redis_enabled=True)
+        first._redis = second._redis = shared
+        first.put("alice", "t", True)
+        assert REDIS_PREFIX + TokenCache.key("alice", "t") in shared.data
+        assert second.get("alice", "t") is True
+        assert second.stats()["redis_hits"] == 1
+
+    def test_redis_failures_fall_back_to_the_backend(self):
+        cache = TokenCache(ttl=60, redis_enabled=True)
+        cache._redis = object()
+        cache.put("alice", "t", True)
+        cache.clear()
+        assert cache.get("alice", "t") is None
+        assert cache.stats()["redis_errors"] == 2
+
+    def test_discard_user_drops_local_and_shared_results(self):
+        shared = FakeRedis()
+        first, second = TokenCache(ttl=60, redis_enabled=True), TokenCache(ttl=60, redis_enabled=True)
+        first._redis = second._redis = shared
+        first.put("alice", "t", True)
+        second.put("alice", "t2", True)
+        first.put("bob", "t", True)
+        first.discard_user("alice")
+        assert first.get("alice", "t") is None and first.get("alice", "t2") is None
+        assert REDIS_USER_PREFIX + "alice" not in shared.data
+        assert second.get("bob", "t") is True
+        assert first.stats()["size"] == 1
+
+
+class TestInvalidatesTokens:
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        cache = TokenCache(ttl=60, size=10)
+        monkeypatch.setattr(token_cache_module, "token_cache", cache)
+        monkeypatch.setattr(token_cache_module, "_username", {"u1": "alice", "u2": "bob"}.get)
+        cache.put("alice", "t", True)
+        cache.put("bob", "t", True)
+        return cache
+
+    def test_writes_drop_only_that_user(self, cache):
+        @invalidates_tokens
+        def update_token(user_id, token):
+            return True
+
+        assert update_token(user_id="u1", token="new")
+        assert cache.get("alice", "t") is None and cache.get("bob", "t") is True
+
+    def test_failed_writes_keep_the_cache(self, cache):
+        @invalidates_tokens
+        def delete_user(user_id):
+            raise RuntimeError("db down")
+
+        with pytest.raises(RuntimeError):
+            delete_user(user_id="u1")
+        assert cache.get("alice", "t") is True
+
+    def test_username_is_read_before_the_write(self):
+        engine = create_engine("sqlite://")
+        models.BASE.metadata.create_all(engine, tables=[models.Users.__table__])
+        with Session(engine) as session:
+            alice = models.Users(username="alice")
+            session.add(alice)
+            session.flush()
+            assert common.get_username.__wrapped__(alice.id, session=session) == "alice"
+
+    def test_common_writes_are_decorated(self):
+        for name in ("update_token", "update_kerberos_token", "delete_kerberos_token",
+                     "update_user", "delete_user"):
+            assert getattr(common, name).__module__ == "fastink.auth.common", name
+            assert getattr(common, name).__code__ is invalidates_tokens(lambda: None).__code__, name
+
+
+class TestValidateToken:
+    @pytest.fixture
+    def use_backend(self, monkeypatch):
+        monkeypatch.setattr(headers, "token_cache", TokenCache(ttl=60, negative_ttl=60, size=10))
+
+        def use(backend):
+            monkeypatch.setattr(headers, "get_auth_backend", lambda _type=None: backend)
+            return backend
+        return use
+
+    def test_backend_is_called_once_per_token(self, use_backend):
+        backend = use_backend(CountingBackend(valid=True))
+        assert all(headers.validate_token("alice", "t") for _ in range(5))
+        assert backend.calls == 1
+
+    def test_rejections_are_cached(self, use_backend):
+        backend = use_backend(CountingBackend(valid=False))
+        assert not headers.validate_token("alice", "bad")
+        assert not headers.validate_token("alice", "bad")
+        assert backend.calls == 1
+
+    def test_backend_errors_are_not_cached(self, use_backend):
+        backend = use_backend(CountingBackend(valid=None))
+        assert not headers.validate_token("alice", "tok")
+        assert not asyncio.run(headers.validate_token_async("alice", "tok"))
+        assert backend.calls == 2
+        backend.valid = True
+        assert headers.validate_token("alice", "tok")
+
+    def test_cached_acceptances_check_the_revocation_list(self, use_backend, monkeypatch):
+        from fastink.auth.revocation import RevocationList
+
+        revoked = set()
+        revocations = RevocationList(enabled=True)
+        monkeypatch.setattr(revocations, "is_revoked", revoked.__contains__)
+        monkeypatch.setattr(headers, "revocation_list", revocations)
+        backend = use_backend(CountingBackend(valid=True))
+        assert headers.validate_token("alice", "t")
+        assert headers.validate_token("bob", "u")
+        revoked.update({"t", "u"})  # revoked by another worker
+        assert not headers.validate_token("alice", "t")
+        assert not asyncio.run(headers.validate_token_async("bob", "u"))
+        assert backend.calls == 2
+        assert headers.token_cache.stats()["size"] == 0
+
+    def test_credential_expiry_bounds_the_cache(self, use_backend):
+        backend = use_backend(ExpiringBackend(until=time.time() + 0.05))
+        assert headers.validate_token("alice", "t")
+        assert headers.validate_token("alice", "t")
+        time.sleep(0.06)
+        assert headers.validate_token("alice", "t")
+        assert backend.calls == 2
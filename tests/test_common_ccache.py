@@ -0,0 +1,133 @@
+"""Tests for the in-process ccache reader (fastink.common.ccache) and the
+krb5 helpers built on it."""
+
+import base64
+import struct
+import time
+
+import pytest
+
+from fastink.auth.backends import krb5
+from fastink.common import utils
+from fastink.common.ccache import parse_ccache, parse_token, read_ccache
+
+
+def _data(value) -> bytes:
+    if isinstance(value, str):
+        value = value.encode()
+    return struct.pack(">I", len(value)) + value
+
+
+def _principal(name: str, realm: str) -> bytes:
+    components = name.split("/")
+    return struct.pack(">II", 1, len(components)) + _data(realm) + b"".join(_data(c) for c in components)
+
+
+def _credential(version, client, server, endtime, renew_till=0, authtime=1000) -> bytes:
+    enctype = struct.pack(">H", 18) * (2 if version == 3 else 1)
+    return (
+        _principal(*client.split("@"))
+        + _principal(*server.rsplit("@", 1))
+        + enctype + _data(b"k" * 32)
+        + struct.pack(">IIIIBI", authtime, authtime, endtime, renew_till, 0, 0x40e00000)
+        + struct.pack(">I", 1) + struct.pack(">H", 2) + _data(b"\x7f\x00\x00\x01")
+        + struct.pack(">I", 0)
+        + _data(b"ticket") + _data(b"")
+    )
+
+
+def build_ccache(principal="alice@EXAMPLE.ORG", version=4, credentials=None) -> bytes:
+    """Serialise a FILE ccache the way MIT krb5 writes one."""
+    realm = principal.split("@")[1]
+    if credentials is None:
+        now = int(time.time())
+        credentials = [(f"krbtgt/{realm}@{realm}", now + 3600, now + 7 * 86400)]
+    header = b"\x05" + bytes([version])
+    if version == 4:
+        tag = struct.pack(">HH", 1, 8) + struct.pack(">ii", 0, 0)
+        header += struct.pack(">H", len(tag)) + tag
+    body = _principal(*principal.split("@"))
+    body += _credential(version, principal, f"krb5_ccache_conf_data/fast_avail/krbtgt\\/{realm}\\@{realm}@X-CACHECONF:", 0)
+    for server, endtime, renew_till in credentials:
+        body += _credential(version, principal, server, endtime, renew_till)
+    return header + body
+
+
+def token_of(buf: bytes) -> str:
+    return base64.b64encode(buf).decode()
+
+
+class TestParseCCache:
+    @pytest.mark.parametrize("version", [3, 4])
+    def test_principal_and_tickets(self, version):
+        cc = parse_ccache(build_ccache(version=version, credentials=[
+            ("host/web.example.org@EXAMPLE.ORG", 2000, 0),
+            ("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", 5000, 9000),
+        ]))
+        assert cc.version == version
+        assert (cc.principal, cc.username, cc.realm) == ("alice@EXAMPLE.ORG", "alice", "EXAMPLE.ORG")
+        # The X-CACHECONF entry is configuration, not a ticket.
+        assert [c.server for c in cc.credentials] == [
+            "host/web.example.org@EXAMPLE.ORG", "krbtgt/EXAMPLE.ORG@EXAMPLE.ORG"]
+        tgt = cc.tgt()
+        assert (tgt.endtime, tgt.renew_till, tgt.starttime) == (5000, 9000, 1000)
+
+    def test_tgt_falls_back_to_first_ticket(self):
+        cc = parse_ccache(build_ccache(credentials=[("host/a@EXAMPLE.ORG", 2000, 0)]))
+        assert cc.tgt().server == "host/a@EXAMPLE.ORG"
+        assert parse_ccache(build_ccache(credentials=[])).tgt() is None
+
+    def test_malformed_input_raises_value_error(self):
+        buf = build_ccache()
+        for bad in (b"", b"\x04\x04", b"\x05\x02" + buf[2:], buf[:-3], buf[:40]):
+            with pytest.raises(ValueError):
+                parse_ccache(bad)
+        with pytest.raises(ValueError):
+            parse_token("not base64!")
+
+    def test_read_from_file(self, tmp_path):
+        path = tmp_path / "krb5cc_1000"
+        path.write_bytes(build_ccache())
+        assert read_ccache(str(path)).username == "alice"
+
+
+class TestKrb5Helpers:
+    def test_resolve_tgt(self, tmp_path):
+        path = tmp_path / "cc"
+        path.write_bytes(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", 5000, 0)]))
+        assert krb5.resolve_tgt(str(path)) == {"username": "alice", "expired_at": 5000, "renew_until": 5000}
+        with pytest.raises(ValueError):
+            krb5.resolve_tgt(str(tmp_path / "missing"))
+
+    def test_token_until(self):
+        now = int(time.time())
+        token = token_of(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now + 60, now + 600)]))
+        assert krb5.krb5_token_until("alice", token) == now + 600
+        with pytest.raises(Exception, match="username not match"):
+            krb5.krb5_token_until("bob", token)
+        with pytest.raises(Exception, match="Invalid Kerberos token"):
+            krb5.krb5_token_until("alice", "garbage")
+        stale = token_of(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now - 600, now - 60)]))
+        with pytest.raises(Exception, match="expired"):
+            krb5.krb5_token_until("alice", stale)
+
+    def test_check_krb5_validity(self, tmp_path, monkeypatch):
+        path = tmp_path / "cc"
+        path.write_bytes(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", 10000, 0)]))
+        monkeypatch.setattr(utils.time, "time", lambda: 10000 - 3600)
+        assert utils.check_krb5_validity(str(path))
+        monkeypatch.setattr(utils.time, "time", lambda: 10000 - 600)
+        assert not utils.check_krb5_validity(str(path))
+        assert not utils.check_krb5_validity(str(tmp_path / "missing"))
+
+    def test_validate_user_krb5_writes_only_valid_tokens(self, tmp_path, monkeypatch):
+        written = []
+        monkeypatch.setattr(utils, "query_pwd_uid", lambda username: 1000)
+        monkeypatch.setattr(utils, "token_to_ccachefile", lambda token, ccachefile: written.append(ccachefile))
+        now = int(time.time())
+        token = token_of(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now + 7200, 0)]))
+        assert not utils.validate_user_krb5("bob", token)
+        assert not utils.validate_user_krb5("alice", "garbage")
+        assert written == []
+        assert utils.validate_user_krb5("alice", token)
+        assert written == ["/tmp/krb5cc_1000"]
@@ -0,0 +1,93 @@
+"""Tests for the per-user ccache materialization store
+(fastink.common.ccache_store)."""
+
+import os
+import time
+
+import pytest
+
+from fastink.auth.backends import krb5
+from fastink.common import utils
+from fastink.common.ccache_store import CCacheStore
+from fastink.common.exception import TokenExpiredException
+from tests.test_common_ccache import build_ccache, token_of
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    now = int(time.time())
+    current = {"alice": token_of(build_ccache())}
+    calls = []
+
+    def get_krb5(username):
+        calls.append(username)
+        return current[username]
+
+    monkeypatch.setattr(krb5, "get_krb5", get_krb5)
+    return current, calls, now
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CCacheStore(directory=str(tmp_path / "ccache"), gc_interval=0)
+
+
+class TestMaterialize:
+    def test_one_file_rewritten_only_on_change(self, store, tokens):
+        current, _, now = tokens
+        first = store.materialize("alice", 1000)
+        assert first.path == store.path_for(1000)
+        assert os.stat(first.path).st_mode & 0o777 == 0o600
+        mtime = os.stat(first.path).st_mtime_ns
+
+        assert store.materialize("alice", 1000) == first
+        assert os.stat(first.path).st_mtime_ns == mtime
+        assert store.stats()["writes"] == 1
+
+        current["alice"] = token_of(build_ccache(credentials=[
+            ("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now + 7200, now + 86400)]))
+        second = store.materialize("alice", 1000)
+        assert second.endtime == now + 7200
+        with open(second.path, "rb") as f:
+            assert f.read() == second.data
+        assert os.listdir(store.directory) == ["krb5cc_1000"]
+
+    def test_rewritten_when_file_disappears(self, store, tokens):
+        path = store.materialize("alice", 1000).path
+        os.unlink(path)
+        store.materialize("alice", 1000)
+        assert os.path.exists(path)
+
+
+class TestGarbageCollection:
+    def test_expired_files_removed_unless_leased(self, store, tokens):
+        current, _, now = tokens
+        current["alice"] = token_of(build_ccache(credentials=[
+            ("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now - 10, now + 86400)]))
+        with store.lease("alice", 1000) as ccache:
+            assert store.gc() == 0
+            assert os.path.exists(ccache.path)
+        # files left by other workers are judged by their content
+        stale = store.path_for(1001)
+        with open(stale, "wb") as f:
+            f.write(build_ccache(credentials=[("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now - 10, 0)]))
+        assert store.gc() == 2
+        assert os.listdir(store.directory) == []
+
+    def test_valid_files_kept(self, store, tokens):
+        store.materialize("alice", 1000)
+        assert store.gc() == 0
+
+
+class TestGetKrb5cc:
+    def test_uses_store(self, store, tokens, monkeypatch):
+        monkeypatch.setattr("fastink.common.ccache_store.ccache_store", store)
+        assert utils.get_krb5cc(uid=1000, name="alice") == (1000, "alice", store.path_for(1000))
+
+    def test_expiring_ticket_rejected(self, store, tokens, monkeypatch):
+        current, _, now = tokens
+        current["alice"] = token_of(build_ccache(credentials=[
+            ("krbtgt/EXAMPLE.ORG@EXAMPLE.ORG", now + 60, now + 86400)]))
+        monkeypatch.setattr("fastink.common.ccache_store.ccache_store", store)
+        with pytest.raises(TokenExpiredException):
+            utils.get_krb5cc(uid=1000, name="alice")
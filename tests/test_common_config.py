@@ -0,0 +1,98 @@
+"""Tests for config snapshots and change notifications (fastink.common.config)."""
+
+import gc
+import os
+import weakref
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastink.common import config
+from fastink.routers.headers import IPWhitelistMiddleware, UserValidationMiddleware
+from fastink.routers.status import InkStatus
+
+BASE = """common:
+  config_reload_interval: 0
+security:
+  ip_whitelist: [{ip}]
+  ip_controlled_routers: [/api/v2/auth/get_token]
+  skip_routers: []
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.yml"
+
+    def write(ip="127.0.0.1", text=None):
+        path.write_text(text if text is not None else BASE.format(ip=ip))
+        # make the change visible even within one mtime tick
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        return str(path)
+
+    monkeypatch.setenv("INK_CONFIG_FILE", write())
+    monkeypatch.setattr(config, "_SUBSCRIBERS", [])
+    yield write
+    config._SNAPSHOTS.pop(str(path), None)
+
+
+class TestSnapshot:
+    def test_reads_without_stat(self, config_file, monkeypatch):
+        assert config.get_config("security", "ip_whitelist") == ["127.0.0.1"]
+        monkeypatch.setattr(config.os, "stat", lambda *a: pytest.fail("stat on the hot path"))
+        assert config.get_config("security", "skip_routers") == []
+
+    def test_values_cannot_mutate_the_snapshot(self, config_file):
+        config.get_config("security", "ip_whitelist").append("8.8.8.8")
+        config.get_config("security")["skip_routers"] = None
+        assert config.get_config("security", "ip_whitelist") == ["127.0.0.1"]
+        assert config.get_config("security", "skip_routers") == []
+
+    def test_reload_swaps_and_notifies_on_change_only(self, config_file):
+        changes = []
+        config.on_config_change(lambda old, new: changes.append((old.version, new.version)))
+        assert config.snapshot().version == 1
+        assert not config.reload_config()
+        config_file(ip="10.0.0.1")
+        assert config.reload_config()
+        assert config.get_config("security", "ip_whitelist") == ["10.0.0.1"]
+        assert config.reload_config(force=True)
+        assert changes == [(1, 2)]
+
+    def test_broken_file_keeps_previous_snapshot(self, config_file):
+        config.snapshot()
+        config_file(text="security: [unbalanced")
+        assert not config.reload_config()
+        assert config.get_config("security", "ip_whitelist") == ["127.0.0.1"]
+
+    def test_fallback_and_missing(self, config_file):
+        assert config.get_config("auth", "type", fallback="krb5") == "krb5"
+        with pytest.raises(ValueError):
+            config.get_config("security", "missing")
+
+
+class TestWatchers:
+    def test_whitelist_follows_reload(self, config_file):
+        app = FastAPI()
+        app.add_middleware(IPWhitelistMiddleware, watch_config=True)
+
+        @app.get("/api/v2/auth/get_token")
+        async def get_token():
+            return {"status": InkStatus.SUCCESS, "msg": "ok", "data": None}
+
+        client = TestClient(app)
+        headers = {"X-Real-IP": "10.0.0.1"}
+        assert client.get("/api/v2/auth/get_token", headers=headers).json()["status"] == InkStatus.IP_BANNED
+        config_file(ip="10.0.0.0/8")
+        config.reload_config()
+        assert client.get("/api/v2/auth/get_token", headers=headers).json()["status"] == InkStatus.SUCCESS
+
+    @pytest.mark.parametrize("middleware", [IPWhitelistMiddleware, UserValidationMiddleware])
+    def test_watching_does_not_keep_middleware_alive(self, config_file, middleware):
+        ref = weakref.ref(middleware(app=None, watch_config=True))
+        gc.collect()
+        assert ref() is None
+        config_file(ip="10.0.0.1")
+        assert config.reload_config()
@@ -9,6 +9,10 @@ from fastink.main import app
 client = TestClient(app)
 
 
+async def _validate_token(username, token):
+    return (username, token) == ("alice", "valid-token")
+
+
 def test_job_credentials(monkeypatch):
     from fastink.routers.v2 import compute_resources
 
@@ -25,8 +29,8 @@ def test_job_credentials(monkeypatch):
 
     monkeypatch.setattr(
         compute_resources.headers,
-        "validate_token",
-        lambda u, t: (u, t) == ("alice", "valid-token"),
+        "validate_token_async",
+        _validate_token,
     )
     monkeypatch.setattr(
         compute_resources, "change_username_to_uid", lambda username: 1234
@@ -54,7 +58,10 @@ def test_job_credentials(monkeypatch):
 def test_job_credentials_rejects_bypass_header(monkeypatch):
     from fastink.routers.v2 import compute_resources
 
-    monkeypatch.setattr(compute_resources.headers, "validate_token", lambda _u, _t: False)
+    async def reject(_u, _t):
+        return False
+
+    monkeypatch.setattr(compute_resources.headers, "validate_token_async", reject)
 
     response = client.get(
         "/api/v2/cr/get_job_credentials",
@@ -0,0 +1,129 @@
+"""Unit tests for the batched condor_history lookup of update_completed_jobs."""
+
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from fastink.computing.crond import condor_cron
+from fastink.computing.tools.db import db_tools
+from fastink.database.sqla import models
+from tests.test_condor_tracker import _FakeRedis
+
+
+def _history(cluster, owner="alice", job_type="batch", end="2026-10-18 10:05:00", start="2026-10-18 10:01:00"):
+    return "\t".join([str(cluster), end, start, job_type, owner])
+
+
+class _Commands:
+    """Stands in for sub_command: condor_q, then condor_history."""
+
+    def __init__(self):
+        self.queue = []
+        self.history = []
+        self.commands = []
+
+    async def __call__(self, cmd, *args):
+        self.commands.append(cmd)
+        if cmd.startswith("condor_q"):
+            lines = [f'"alice" {j} 0 "grp" 0 2 0 undefined "batch" "el9"' for j in self.queue]
+        else:
+            lines = self.history
+        return "\n".join(lines).encode()
+
+
+@pytest.fixture
+def env(monkeypatch):
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    models.BASE.metadata.create_all(engine, tables=[models.JobInfo.__table__])
+    with Session(engine) as session:
+        for name in ("needto_change_status_jobs", "update_jobs_info_bulk", "delete_jobinfo_by_jobids"):
+            monkeypatch.setattr(
+                condor_cron, name, partial(getattr(db_tools, name).__wrapped__, session=session)
+            )
+        r = _FakeRedis()
+        commands = _Commands()
+        gateways = []
+        monkeypatch.setattr(condor_cron, "redis_connect", lambda: r)
+        monkeypatch.setattr(condor_cron, "sub_command", commands)
+        monkeypatch.setattr(condor_cron, "get_config", lambda *a, **kw: "schedd.example")
+        monkeypatch.setattr(condor_cron, "delete_gateway_iptable", gateways.append)
+        monkeypatch.setattr(condor_cron.computing_registry, "iptables_jobtypes", lambda: ["sshd"])
+        yield session, r, commands, gateways
+
+
+def _add(session, jobid, job_type="batch", port=0):
+    session.add(models.JobInfo(
+        uid=1000, jobid=jobid, clusterid="htcondor", job_status="RUNNING",
+        job_type=job_type, outpath="", errpath="", job_path="", iptable_status=port, iptable_clean=0,
+    ))
+    session.flush()
+
+
+def _rows(session):
+    session.expire_all()
+    return {j.jobid: j for j in session.query(models.JobInfo)}
+
+
+class TestUpdateCompletedJobs:
+    def test_one_history_call_for_the_batch(self, env):
+        session, r, commands, gateways = env
+        for jobid in (1, 2, 3, 4):
+            _add(session, jobid)
+        _add(session, 5, job_type="sshd", port=30022)
+        r.data["cluster_jobs:alice:2"] = {"jobId": "2"}
+        r.data["cluster_jobs:alice:job_ids"] = {"1", "2"}
+        commands.queue = [1]
+        commands.history = [
+            _history(2),
+            _history(2, end="2026-10-18 09:00:00"),  # older proc of the same cluster
+            _history(3, start="2026-10-18 10:00:00"),
+            _history(5, job_type="sshd"),
+        ]
+
+        asyncio.run(condor_cron.update_completed_jobs())
+
+        history_commands = [c for c in commands.commands if c.startswith("condor_history")]
+        assert len(history_commands) == 1
+        assert "member(ClusterId, {2,3,4,5})" in history_commands[0]
+
+        rows = _rows(session)
+        assert rows[1].job_status == "RUNNING"
+        assert rows[2].job_status == "COMPLETED"
+        assert rows[2].job_end_time == datetime(2026, 10, 18, 10, 5)
+        assert rows[3].job_start_time == datetime(2026, 10, 18, 10, 0)
+        assert 4 not in rows  # not in the queue nor in the history
+        assert (rows[5].iptable_status, rows[5].iptable_clean) == (0, 1)
+        assert gateways == [30022]
+
+        assert "cluster_jobs:alice:2" not in r.data
+        assert r.data["cluster_jobs:alice:job_ids"] == {"1"}
+        assert r.round_trips == 1
+
+    def test_history_failure_changes_nothing(self, env, monkeypatch):
+        session, r, commands, gateways = env
+        _add(session, 1)
+
+        async def failing(cmd, *args):
+            if cmd.startswith("condor_history"):
+                raise Exception("Exec condorhistory func timeout.")
+            return b""
+
+        monkeypatch.setattr(condor_cron, "sub_command", failing)
+        asyncio.run(condor_cron.update_completed_jobs())
+        assert _rows(session)[1].job_status == "RUNNING"
+
+    def test_large_batches_are_chunked(self, env, monkeypatch):
+        session, r, commands, gateways = env
+        monkeypatch.setattr(condor_cron, "_HISTORY_CHUNK", 2)
+        commands.history = [_history(1), _history(2), _history(3)]
+        records = asyncio.run(condor_cron.get_condor_history_records([3, 1, 2]))
+        assert len(commands.commands) == 2
+        assert "member(ClusterId, {1,2})" in commands.commands[0]
+        assert records[3][3] == "alice"
@@ -0,0 +1,173 @@
+"""Unit tests for the event-driven HTCondor queue mirror."""
+
+import asyncio
+
+import pytest
+
+from fastink.computing.crond import condor_tracker
+from fastink.computing.crond.condor_tracker import STATE_KEY, CondorJobTracker
+
+
+def _submit(cluster):
+    return f"000 ({cluster:03d}.000.000) 2026-10-18 10:00:00 Job submitted from host: <10.0.0.1:9618>\n...\n"
+
+
+def _abort(cluster):
+    return f"009 ({cluster:03d}.000.000) 2026-10-18 10:01:00 Job was aborted.\n\tvia condor_rm (by user alice)\n...\n"
+
+
+def _image_size(cluster):
+    return (
+        f"006 ({cluster:03d}.000.000) 2026-10-18 10:01:00 Image size of job updated: 100\n"
+        "\t1  -  MemoryUsage of job (MB)\n\t100  -  ResidentSetSize of job (KB)\n...\n"
+    )
+
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r = r
+        self._ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        self.r.round_trips += 1
+        return [await getattr(self.r, name)(*a, **kw) for name, a, kw in self._ops]
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    async def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def scan_iter(self, match=None, count=None):
+        for key in list(self.data):
+            if key.startswith("cluster_jobs:"):
+                yield key
+
+
+class _Schedd:
+    """Stands in for the schedd query; records the constraints used."""
+
+    def __init__(self):
+        self.queue = {}
+        self.constraints = []
+
+    def add(self, job_id, owner="alice", status="1"):
+        self.queue[str(job_id)] = {"jobId": str(job_id), "jobOwner": owner, "jobStatus": status}
+
+    def __call__(self, constraint):
+        self.constraints.append(constraint)
+        if constraint == "true":
+            return list(self.queue.values())
+        wanted = {c.split("==")[1].strip() for c in constraint.split("||")}
+        return [job for job_id, job in self.queue.items() if job_id in wanted]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    r = _FakeRedis()
+    monkeypatch.setattr(condor_tracker, "redis_connect", lambda: r)
+    return r
+
+
+class TestFullResync:
+    def test_without_event_log_every_cycle_is_full(self, redis):
+        schedd = _Schedd()
+        schedd.add(1)
+        schedd.add(2, owner="bob")
+        redis.data["cluster_jobs:alice:9"] = {"jobId": "9"}
+        redis.data["cluster_jobs:alice:job_ids"] = {"9"}
+        tracker = CondorJobTracker(schedd)
+
+        stats = asyncio.run(tracker.run())
+        assert stats == {"full": True, "events": 0, "written": 2, "deleted": 1}
+        assert redis.data["cluster_jobs:alice:job_ids"] == {"1"}
+        assert redis.data["cluster_jobs:bob:2"]["jobOwner"] == "bob"
+        assert "cluster_jobs:alice:9" not in redis.data
+
+        assert asyncio.run(tracker.run())["full"]
+
+    def test_tombstoned_jobs_are_not_written_back(self, redis):
+        schedd = _Schedd()
+        schedd.add(1)
+        redis.data["cluster_jobs:deleted:alice:1"] = "1"
+        asyncio.run(CondorJobTracker(schedd).run())
+        assert "cluster_jobs:alice:1" not in redis.data
+
+
+class TestEventLog:
+    def test_applies_only_changed_clusters(self, redis, tmp_path):
+        log = tmp_path / "EventLog"
+        log.write_text(_submit(1))
+        schedd = _Schedd()
+        schedd.add(1)
+        tracker = CondorJobTracker(schedd, event_log=str(log))
+        assert asyncio.run(tracker.run())["full"]
+
+        schedd.add(2, owner="bob")
+        schedd.queue.pop("1")
+        with log.open("a") as f:
+            f.write(_submit(2) + _abort(1) + _image_size(3))
+        stats = asyncio.run(tracker.run())
+
+        assert stats == {"full": False, "events": 2, "written": 1, "deleted": 1}
+        assert schedd.constraints[-1] == "ClusterId == 1 || ClusterId == 2"
+        assert "cluster_jobs:alice:1" not in redis.data
+        assert redis.data["cluster_jobs:bob:job_ids"] == {"2"}
+
+        # nothing new: no schedd query at all
+        queries = len(schedd.constraints)
+        assert asyncio.run(tracker.run())["events"] == 0
+        assert len(schedd.constraints) == queries
+
+    def test_offset_is_persisted(self, redis, tmp_path):
+        log = tmp_path / "EventLog"
+        log.write_text(_submit(1) + _submit(2))
+        asyncio.run(CondorJobTracker(_Schedd(), event_log=str(log)).run())
+        state = redis.data[STATE_KEY]
+        assert state["path"] == str(log)
+        assert int(state["offset"]) == log.stat().st_size
+
+        # a restarted tracker resumes there and only sees the new event
+        with log.open("a") as f:
+            f.write(_submit(3))
+        tracker = CondorJobTracker(_Schedd(), event_log=str(log))
+        tracker._log = asyncio.run(tracker._open_log(redis))
+        assert tracker._drain() == {"3"}
+
+    def test_full_resync_when_interval_elapsed(self, redis, tmp_path):
+        log = tmp_path / "EventLog"
+        log.write_text(_submit(1))
+        tracker = CondorJobTracker(_Schedd(), event_log=str(log), full_resync_interval=0)
+        asyncio.run(tracker.run())
+        assert asyncio.run(tracker.run())["full"]
+
+    def test_missing_log_falls_back_to_full_resync(self, redis, tmp_path):
+        tracker = CondorJobTracker(_Schedd(), event_log=str(tmp_path / "missing"))
+        assert asyncio.run(tracker.run())["full"]
+        assert asyncio.run(tracker.run())["full"]
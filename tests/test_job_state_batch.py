@@ -0,0 +1,137 @@
+"""Unit tests for the bulk job-state access used by query_job."""
+
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session
+
+from fastink.computing.adapter.hpcadapter import HPC_Scheduler
+from fastink.computing.tools.db import db_tools
+from fastink.database.sqla import models
+
+
+@pytest.fixture
+def session(monkeypatch):
+    engine = create_engine("sqlite://")
+    models.BASE.metadata.create_all(engine, tables=[models.JobInfo.__table__])
+    with Session(engine) as session:
+        for name in ("get_jobs_info_bulk", "insert_jobs_info_bulk", "update_jobs_info_bulk"):
+            monkeypatch.setattr(db_tools, name, partial(getattr(db_tools, name).__wrapped__, session=session))
+        yield session
+
+
+def _job(jobid):
+    return {"outpath": f"/o/{jobid}", "errpath": f"/e/{jobid}", "job_type": "jupyter", "job_path": "/w"}
+
+
+class TestJobStateBatch:
+    def test_insert_missing_then_get(self, session):
+        batch = db_tools.JobStateBatch(1000, "slurm")
+        batch.load(["1", "2"])
+        assert "1" not in batch
+        batch.insert_missing({"1": _job(1), 2: _job(2)})
+        assert batch.get(1)["outpath"] == "/o/1"
+        assert batch.get("2")["job_status"] == "SUBMITTED"
+        assert batch.get("2")["connect_sign"] == "False"
+        with pytest.raises(NoResultFound):
+            batch.get("3")
+
+    def test_duplicate_insert_is_ignored(self, session):
+        db_tools.JobStateBatch(1000, "slurm").insert_missing({"1": _job(1)})
+        # a concurrent request that loaded before the first insert
+        db_tools.insert_jobs_info_bulk(1000, {"1": _job(1), "2": _job(2)}, "slurm")
+        assert session.scalar(select(func.count()).select_from(models.JobInfo)) == 2
+
+    def test_set_and_flush(self, session):
+        batch = db_tools.JobStateBatch(1000, "slurm")
+        batch.insert_missing({"1": _job(1), "2": _job(2)})
+        batch.set("1", connect_sign="True", job_start_time="2026-01-02 03:04:05")
+        batch.set("1", job_status="RUNNING")
+        batch.set("2", job_end_time="")
+        batch.flush()
+
+        fresh = db_tools.JobStateBatch(1000, "slurm")
+        fresh.load(["1", "2"])
+        assert fresh.get("1")["job_status"] == "RUNNING"
+        assert fresh.get("1")["connect_sign"] == "True"
+        assert fresh.get("1")["job_start_time"] == datetime(2026, 1, 2, 3, 4, 5)
+        assert fresh.get("2")["job_status"] == "SUBMITTED"
+        assert fresh.get("2")["job_end_time"] is None
+
+    def test_scoped_to_user_and_cluster(self, session):
+        db_tools.JobStateBatch(1000, "slurm").insert_missing({"1": _job(1)})
+        other = db_tools.JobStateBatch(1001, "slurm")
+        other.load(["1"])
+        assert "1" not in other
+
+    def test_load_chunks_in_queries(self, session, monkeypatch):
+        monkeypatch.setattr(db_tools, "_IN_CHUNK", 2)
+        batch = db_tools.JobStateBatch(1000, "slurm")
+        batch.insert_missing({str(i): _job(i) for i in range(5)})
+        assert len(batch.rows) == 5
+
+
+class _FakeRedis:
+    def __init__(self, strings=None, hashes=None):
+        self.strings = strings or {}
+        self.hashes = hashes or {}
+        self.calls = []
+
+    async def mget(self, keys):
+        self.calls.append("mget")
+        return [self.strings.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r = r
+        self._ops = []
+
+    def hget(self, key, field):
+        self._ops.append((key, field))
+
+    async def execute(self):
+        self.r.calls.append("execute")
+        return [self.r.hashes.get(k, {}).get(f) for k, f in self._ops]
+
+
+def _scheduler():
+    s = HPC_Scheduler.__new__(HPC_Scheduler)
+    s.CLUSTER_TYPE = "slurm"
+    s.USERNAME = "alice"
+    return s
+
+
+class TestRedisLookups:
+    def test_hidden_terminal_job_ids(self):
+        s = _scheduler()
+        r = _FakeRedis(strings={s._hidden_terminal_job_key("2"): b"1"})
+        assert asyncio.run(s._hidden_terminal_job_ids(r, ["1", "2"])) == {"2"}
+        assert r.calls == ["mget"]
+
+    def test_fill_submit_uuids(self):
+        s = _scheduler()
+        r = _FakeRedis(
+            strings={"job_id_to_submit_uuid:slurm:2": b"uuid-2"},
+            hashes={"cluster_jobs:slurm:alice:2": {"submit_time": b"2026-01-01 00:00:00"}},
+        )
+        jobs = [
+            {"jobId": j, "submitUuid": "", "jobAsyncSubmitTime": "", "submitMode": "SYNC"}
+            for j in ("1", "2")
+        ]
+        asyncio.run(s._fill_submit_uuids(r, jobs))
+        assert jobs[0]["submitMode"] == "SYNC"
+        assert jobs[1] == {
+            "jobId": "2",
+            "submitUuid": "uuid-2",
+            "jobAsyncSubmitTime": "2026-01-01 00:00:00",
+            "submitMode": "ASYNC",
+        }
+        assert r.calls == ["mget", "execute"]
@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 import pytest
 
 from fastink.auth.backends import krb5
+from fastink.auth.ticket_cache import TicketCache
 from fastink.common import hooks
 
 
@@ -27,6 +28,12 @@ def clean_hook_registry():
     hooks._HOOKS_REGISTRY.update(saved)
 
 
+@pytest.fixture(autouse=True)
+def empty_ticket_cache(monkeypatch):
+    """Each test stubs the database differently; never reuse tickets."""
+    monkeypatch.setattr(krb5, "ticket_cache", TicketCache(ttl=0))
+
+
 @pytest.fixture
 def stub_user(monkeypatch):
     """get_user returns a fixed record; account status is always valid."""
@@ -115,6 +122,13 @@ class TestExpiredDeadEnd:
 
 
 class TestRenewFailedDeadEnd:
+    @pytest.fixture(autouse=True)
+    def renew_on_read(self, monkeypatch):
+        monkeypatch.setattr(
+            krb5, "get_config",
+            lambda section, option, fallback=None, type=None: option == "krb5_renew_on_read",
+        )
+
     def _expiring_ticket(self):
         # Not expired, but inside the expire_in window -> renew path.
         return {
@@ -0,0 +1,129 @@
+"""Tests for ahead-of-time Kerberos renewal (fastink.auth.krb5_renewal) and
+the read-only, cached get_krb5."""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from fastink.auth import common, krb5_renewal
+from fastink.auth.backends import krb5
+from fastink.auth.ticket_cache import TicketCache
+from fastink.database.sqla import models
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    calls = {"user": 0, "ticket": 0, "renew": 0}
+    ticket = {"user_id": 1, "token": "stored", "expired_at": datetime.now() + timedelta(minutes=10)}
+
+    def get_user(**kw):
+        calls["user"] += 1
+        return {"id": 1, "username": "alice"}
+
+    def get_kerberos_token(user_id):
+        calls["ticket"] += 1
+        return dict(ticket)
+
+    monkeypatch.setattr(krb5, "ticket_cache", TicketCache(ttl=60, size=10))
+    monkeypatch.setattr(krb5, "get_user", get_user)
+    monkeypatch.setattr(krb5, "get_kerberos_token", get_kerberos_token)
+    monkeypatch.setattr(krb5, "_renew_tgt", lambda ccachefile: calls.__setitem__("renew", calls["renew"] + 1))
+    monkeypatch.setattr(
+        krb5, "validate_account_status",
+        lambda username=None: {"account_valid": True, "password_valid": True},
+    )
+    return calls
+
+
+class TestGetKrb5Read:
+    def test_expiring_ticket_is_not_renewed_inline(self, stored):
+        assert krb5.get_krb5(username="alice", expire_in=3600) == "stored"
+        assert stored["renew"] == 0
+
+    def test_cached_until_written(self, stored, monkeypatch):
+        krb5.get_krb5(username="alice")
+        krb5.get_krb5(username="alice")
+        assert (stored["user"], stored["ticket"]) == (1, 1)
+
+        monkeypatch.setattr(krb5, "get_kerberos_token", lambda user_id: (_ for _ in ()).throw(Exception("no row")))
+        monkeypatch.setattr(krb5, "add_kerberos_token", lambda **kw: True)
+        krb5._persist_ccache_token("alice", "new")
+        assert krb5.ticket_cache.stats()["size"] == 0
+
+    def test_never_cached_past_expiry(self):
+        cache = TicketCache(ttl=60)
+        cache.put(("alice", None, None), {"id": 1}, {"expired_at": datetime.now() - timedelta(seconds=1)})
+        assert cache.get(("alice", None, None)) is None
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    models.BASE.metadata.create_all(engine, tables=[models.Users.__table__, models.KerberosTokens.__table__])
+    now = datetime.now()
+    with Session(engine) as session:
+        users = [models.Users(username=name) for name in ("soon", "later", "expired", "far")]
+        session.add_all(users)
+        session.flush()
+        for user, delta in zip(users, (timedelta(minutes=5), timedelta(minutes=50),
+                                       timedelta(minutes=-5), timedelta(hours=20))):
+            session.add(models.KerberosTokens(user_id=user.id, token=user.username,
+                                              generated_at=now, expired_at=now + delta))
+        session.flush()
+        yield session
+
+
+class TestExpiringQuery:
+    def test_window_and_order(self, session):
+        now = datetime.now()
+        rows = common.get_expiring_kerberos_tokens.__wrapped__(
+            now + timedelta(hours=2), now, session=session)
+        assert [r["username"] for r in rows] == ["soon", "later"]
+        assert rows[0]["token"] == "soon"
+        assert len(common.get_expiring_kerberos_tokens.__wrapped__(
+            now + timedelta(hours=2), now, limit=1, session=session)) == 1
+
+
+class TestRenewalCycle:
+    def test_bounded_parallel_renewal(self, monkeypatch):
+        settings = {"krb5_enabled": True, "krb5_renew_workers": 3}
+        monkeypatch.setattr(
+            krb5_renewal, "get_config",
+            lambda section, option, fallback=None, type=None: settings.get(option, fallback),
+        )
+        tickets = [{"user_id": i, "username": f"u{i}", "token": "t",
+                    "expired_at": datetime.now() + timedelta(minutes=i + 1)} for i in range(10)]
+        monkeypatch.setattr(krb5_renewal, "get_expiring_kerberos_tokens", lambda **kw: tickets)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def renew(user_id, principal, token):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            if principal == "u4":
+                raise ValueError("renew failed")
+            return "renewed"
+
+        recorded = []
+
+        async def record(stats):
+            recorded.append(stats)
+
+        monkeypatch.setattr(krb5_renewal, "renew_stored_ticket", renew)
+        monkeypatch.setattr(krb5_renewal, "_record", record)
+        stats = asyncio.run(krb5_renewal.renew_expiring_tickets())
+        assert (stats["candidates"], stats["renewed"], stats["failed"]) == (10, 9, 1)
+        assert peak[0] == 3
+        assert recorded == [stats]
+
+    def test_disabled_without_krb5(self, monkeypatch):
+        monkeypatch.setattr(krb5_renewal, "get_config", lambda *a, **kw: False)
+        assert asyncio.run(krb5_renewal.renew_expiring_tickets()) == {}
@@ -11,6 +11,10 @@ from fastink.main import app
 client = TestClient(app)
 
 
+async def _validate_token(username, token):
+    return (username, token) == ("alice", "valid-token")
+
+
 class _FakeWriter:
     def __init__(self):
         self.closed = False
@@ -202,8 +206,8 @@ def test_resolve_job_proxy_uses_app_fallback(monkeypatch):
 
     monkeypatch.setattr(
         compute_resources.headers,
-        "validate_token",
-        lambda username, token: (username, token) == ("alice", "valid-token"),
+        "validate_token_async",
+        _validate_token,
     )
     monkeypatch.setattr(
         compute_resources,
@@ -262,8 +266,8 @@ def test_resolve_job_proxy_prefers_running_job(monkeypatch):
 
     monkeypatch.setattr(
         compute_resources.headers,
-        "validate_token",
-        lambda username, token: (username, token) == ("alice", "valid-token"),
+        "validate_token_async",
+        _validate_token,
     )
     monkeypatch.setattr(
         compute_resources,
@@ -310,8 +314,8 @@ def test_resolve_job_proxy_reports_fallback_storage_failure(monkeypatch):
 
     monkeypatch.setattr(
         compute_resources.headers,
-        "validate_token",
-        lambda username, token: (username, token) == ("alice", "valid-token"),
+        "validate_token_async",
+        _validate_token,
     )
     monkeypatch.setattr(
         compute_resources,
@@ -1,4 +1,4 @@
-"""Unit tests for the shared path-matching helper used by the auth and
+"""Unit tests for the shared path matcher used by the auth and
 IP-whitelist middlewares.
 
 Matching semantics (agreed design):
@@ -6,11 +6,15 @@ Matching semantics (agreed design):
   - a pattern without trailing "/" -> EXACT match (e.g. "/api/v2/auth/get_token")
 
 Both UserValidationMiddleware (skip_routers) and IPWhitelistMiddleware
-(ip_controlled_routers) rely on this single helper so the two config lists
+(ip_controlled_routers) rely on this single matcher so the two config lists
 have identical, predictable semantics.
 """
 
-from fastink.routers.headers import _path_matches
+from fastink.routers.matchers import PathMatcher
+
+
+def _path_matches(path: str, patterns: list) -> bool:
+    return PathMatcher(patterns).matches(path)
 
 
 class TestPrefixPatterns:
@@ -61,5 +65,5 @@ class TestMixedLists:
     def test_auth_prefix_still_matches_all_auth_when_present(self):
         # Backward-compat: a "/api/v2/auth/" prefix entry catches every
         # auth endpoint (this is the OLD skip_routers behaviour we are
-        # moving away from, but the helper must still support it).
+        # moving away from, but the matcher must still support it).
         assert _path_matches("/api/v2/auth/get_user", ["/api/v2/auth/"]) is True
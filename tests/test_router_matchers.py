@@ -0,0 +1,64 @@
+"""Tests for the precompiled middleware matchers (fastink.routers.matchers)."""
+
+import ipaddress
+import random
+
+import pytest
+
+from fastink.routers.matchers import IPMatcher, PathMatcher
+
+
+def _path_matches(path, patterns):
+    """Linear reference: trailing "/" = prefix (bare path included), else exact."""
+    return any(
+        path.startswith(p) or path == p.rstrip("/") if p.endswith("/") else path == p
+        for p in patterns
+    )
+
+
+class TestPathMatcher:
+    def test_agrees_with_reference_semantics(self):
+        rng = random.Random(17)
+        segments = ["api", "v1", "v2", "auth", "job", "x", ""]
+        patterns = ["/api/v1/", "/api/v2/auth/login", "/docs", "/job/", "/", "/api/v2/auth/"]
+        matcher = PathMatcher(patterns)
+        for _ in range(2000):
+            path = "/" + "/".join(rng.choice(segments) for _ in range(rng.randint(0, 4)))
+            assert matcher.matches(path) == _path_matches(path, patterns), path
+
+    def test_prefix_covers_bare_path(self):
+        matcher = PathMatcher(["/api/v1/"])
+        assert matcher.matches("/api/v1")
+        assert matcher.matches("/api/v1/job/list")
+        assert not matcher.matches("/api/v10")
+
+    def test_empty(self):
+        assert not PathMatcher([])
+        assert not PathMatcher([]).matches("/anything")
+
+
+class TestIPMatcher:
+    def test_networks_and_addresses(self):
+        matcher = IPMatcher(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.128/25", "192.168.1.7", "fd00::/64"])
+        assert len(matcher) == 5
+        assert matcher.allows("10.0.0.1") and matcher.allows("10.0.1.255")
+        assert not matcher.allows("10.0.2.0")
+        assert matcher.allows("192.168.1.7") and not matcher.allows("192.168.1.8")
+        assert matcher.allows("fd00::1") and not matcher.allows("fd00:0:0:1::1")
+        # merged adjacent /24s form one interval
+        assert matcher.tables[4][0][:1] == [int(ipaddress.ip_address("10.0.0.0"))]
+
+    def test_large_whitelist_agrees_with_linear_scan(self):
+        rng = random.Random(5)
+        entries = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.0/{rng.choice([16, 20, 24, 28])}"
+                   for _ in range(500)]
+        networks = [ipaddress.ip_network(e, strict=False) for e in entries]
+        matcher = IPMatcher(entries)
+        for _ in range(2000):
+            ip = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+            addr = ipaddress.ip_address(ip)
+            assert matcher.allows(ip) == any(addr in net for net in networks), ip
+
+    def test_invalid_address(self):
+        with pytest.raises(ValueError):
+            IPMatcher(["10.0.0.0/8"]).allows("not-an-ip")
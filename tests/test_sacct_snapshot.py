@@ -0,0 +1,114 @@
+"""Unit tests for the cluster-wide sacct snapshot served to query_job."""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from fastink.computing.tools.common import sacct_snapshot
+
+
+class _FakePipeline:
+    def __init__(self, r):
+        self.r = r
+        self._ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.r, name)(*a, **kw) for name, a, kw in self._ops]
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        mapping = dict(mapping or {})
+        if field is not None:
+            mapping[field] = value
+        self.data.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    async def hvals(self, key):
+        return list(self.data.get(key, {}).values())
+
+    async def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = str(value)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+
+def _line(job_id, end="Unknown"):
+    return f"{job_id}|cpu|RUNNING|00:01:00|1|node1|jupyter|2026-01-01T00:00:00|2026-01-01T00:00:01|{end}|/w|1-00:00:00|sbatch x.sh"
+
+
+@pytest.fixture
+def max_age(monkeypatch):
+    monkeypatch.setattr(sacct_snapshot, "max_age", lambda: 30)
+
+
+class TestSnapshot:
+    def test_publish_then_read(self, max_age):
+        r = _FakeRedis()
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {"alice": {"1": _line(1)}}, time.time()))
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) == [_line(1)]
+        # user without jobs in a fresh snapshot: empty slice, not a miss
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "bob")) == []
+
+    def test_new_generation_replaces_old(self, max_age):
+        r = _FakeRedis()
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {"alice": {"1": _line(1)}}, time.time()))
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {"alice": {"2": _line(2)}}, time.time()))
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) == [_line(2)]
+
+    def test_miss_when_missing_or_stale(self, max_age):
+        r = _FakeRedis()
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) is None
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {}, time.time() - 60))
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) is None
+
+    def test_miss_after_user_change(self, max_age):
+        r = _FakeRedis()
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {}, time.time() - 1))
+        asyncio.run(sacct_snapshot.mark_user_changed(r, "slurm", "alice"))
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) is None
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "bob")) == []
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(sacct_snapshot, "max_age", lambda: 0)
+        r = _FakeRedis()
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {}, time.time()))
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice")) is None
+
+    def test_drops_jobs_ended_before_midnight(self, max_age):
+        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%dT23:59:59")
+        today = datetime.now().strftime("%Y-%m-%dT00:00:01")
+        r = _FakeRedis()
+        lines = {"1": _line(1, yesterday), "2": _line(2, today), "3": _line(3)}
+        asyncio.run(sacct_snapshot.publish(r, "slurm", {"alice": lines}, time.time()))
+        assert sorted(asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice"))) == [
+            _line(2, today), _line(3)
+        ]
+
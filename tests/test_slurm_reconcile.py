@@ -0,0 +1,132 @@
+"""Unit tests for the incremental Slurm reconciler of the cron runner."""
+
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from fastink.computing.crond import slurm_reconcile
+from fastink.computing.tools.common import sacct_snapshot
+from fastink.computing.tools.db import db_tools
+from fastink.database.sqla import models
+from tests.test_sacct_snapshot import _FakeRedis
+
+
+def _line(job_id, user="alice", state="RUNNING", start="2026-01-01T00:00:01", end="Unknown"):
+    return "|".join([
+        str(job_id), user, "cpu", state, "00:01:00", "1", "node1", "jupyter",
+        "2026-01-01T00:00:00", start, end, "/w", "1-00:00:00", "sbatch x.sh",
+    ])
+
+
+class _Sacct:
+    def __init__(self):
+        self.lines = []
+        self.commands = []
+
+    async def __call__(self, cmd, *args):
+        self.commands.append(cmd)
+        return "\n".join(self.lines).encode()
+
+
+@pytest.fixture
+def env(monkeypatch):
+    # the reconciler queries from worker threads: share one connection
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    models.BASE.metadata.create_all(engine, tables=[models.JobInfo.__table__])
+    with Session(engine) as session:
+        for name in ("get_jobs_info_bulk", "insert_jobs_info_bulk", "update_jobs_info_bulk"):
+            monkeypatch.setattr(
+                slurm_reconcile, name, partial(getattr(db_tools, name).__wrapped__, session=session)
+            )
+        r = _FakeRedis()
+        sacct = _Sacct()
+        lookups = []
+
+        def uid_of(username):
+            lookups.append(username)
+            return {"alice": 1000, "bob": 1001}[username]
+
+        monkeypatch.setattr(slurm_reconcile, "redis_connect", lambda: r)
+        monkeypatch.setattr(slurm_reconcile, "sub_command", sacct)
+        monkeypatch.setattr(slurm_reconcile, "change_username_to_uid", uid_of)
+        monkeypatch.setattr(sacct_snapshot, "max_age", lambda: 30)
+        yield session, r, sacct, lookups
+
+
+def _rows(session):
+    session.expire_all()
+    return {str(j.jobid): j for j in session.query(models.JobInfo)}
+
+
+class TestSlurmReconciler:
+    def test_first_cycle_is_full_and_inserts(self, env):
+        session, r, sacct, lookups = env
+        sacct.lines = [_line(1), _line(2, user="bob", state="COMPLETED", end="2026-01-01T00:05:00"), _line("3_1")]
+        stats = asyncio.run(slurm_reconcile.SlurmReconciler("slurm").run())
+
+        assert "-S now-1day" in sacct.commands[0]
+        assert stats["full"] and stats["changed"] == 3
+        rows = _rows(session)
+        assert sorted(rows) == ["1", "2"]
+        assert rows["1"].job_status == "RUNNING"
+        assert rows["1"].job_start_time == datetime(2026, 1, 1, 0, 0, 1)
+        assert rows["2"].uid == 1001 and rows["2"].job_status == "COMPLETED"
+        assert rows["2"].job_end_time == datetime(2026, 1, 1, 0, 5)
+        assert asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "bob")) is not None
+
+    def test_incremental_cycle_only_reconciles_changes(self, env):
+        session, r, sacct, lookups = env
+        reconciler = slurm_reconcile.SlurmReconciler("slurm")
+        sacct.lines = [_line(1), _line(2)]
+        asyncio.run(reconciler.run())
+        r.data["job_id_to_submit_uuid:slurm:2"] = "uuid-2"
+
+        ended = datetime.now().replace(microsecond=0)
+        sacct.lines = [_line(1), _line(2, state="COMPLETED", end=ended.isoformat())]
+        stats = asyncio.run(reconciler.run())
+
+        assert "now-1day" not in sacct.commands[1]
+        assert (stats["full"], stats["changed"], stats["updated"]) == (False, 1, 1)
+        assert _rows(session)["2"].job_status == "COMPLETED"
+        assert _rows(session)["2"].job_end_time == ended
+        assert r.data["job_status:slurm:uuid-2"] == {"jobStatus": "COMPLETED"}
+        # the snapshot still carries job 1, which this window did not change
+        assert len(asyncio.run(sacct_snapshot.read_user_lines(r, "slurm", "alice"))) == 2
+        assert lookups == ["alice"]
+
+    def test_forced_full_cycle_repairs_db(self, env):
+        session, r, sacct, lookups = env
+        reconciler = slurm_reconcile.SlurmReconciler("slurm")
+        sacct.lines = [_line(1)]
+        asyncio.run(reconciler.run())
+        row = session.query(models.JobInfo).one()
+        row.job_status = "QUEUEING"
+        session.flush()
+
+        assert asyncio.run(reconciler.run())["updated"] == 0
+        assert asyncio.run(reconciler.run(full=True))["updated"] == 1
+        assert _rows(session)["1"].job_status == "RUNNING"
+
+    def test_failed_cycle_is_retried(self, env, monkeypatch):
+        session, r, sacct, lookups = env
+        reconciler = slurm_reconcile.SlurmReconciler("slurm")
+        sacct.lines = [_line(1)]
+        asyncio.run(reconciler.run())
+
+        def broken(updates):
+            raise RuntimeError("db down")
+
+        sacct.lines = [_line(1, state="FAILED", end="2026-01-01T00:05:00")]
+        with monkeypatch.context() as m:
+            m.setattr(slurm_reconcile, "update_jobs_info_bulk", broken)
+            with pytest.raises(RuntimeError):
+                asyncio.run(reconciler.run())
+        assert asyncio.run(reconciler.run())["updated"] == 1
+        assert _rows(session)["1"].job_status == "FAILED"
@@ -0,0 +1,125 @@
+"""Unit tests for the streaming zip writer in fastink.storage.archive."""
+
+import asyncio
+import io
+import zipfile
+
+import pytest
+
+from fastink.storage.archive import stream_zip, zip_downloader, zip_members
+
+DATA = {
+    "/t/a.txt": b"hello" * 1000,
+    "/t/d/b.bin": bytes(range(256)) * 300,
+}
+FLIST = [
+    {"type": "directory", "path": "/t/d", "size": 0, "time": "2026-01-02 03:04:05"},
+    {"type": "file", "path": "/t/a.txt", "size": 5000, "time": "2026-01-02 03:04:05"},
+    {"type": "file", "path": "/t/d/b.bin", "size": 76800, "time": "bad"},
+]
+
+
+async def _fetch(path, size):
+    data = DATA[path]
+    for i in range(0, len(data), 1000):
+        await asyncio.sleep(0)
+        yield data[i:i + 1000]
+
+
+def _build(fetch=_fetch, **kwargs):
+    async def scenario():
+        return [chunk async for chunk in stream_zip(zip_members("/t", FLIST), fetch, **kwargs)]
+    return asyncio.run(scenario())
+
+
+class TestZipMembers:
+    def test_relative_names_and_directory_suffix(self):
+        members = zip_members("/t", FLIST)
+        assert [m["arcname"] for m in members] == ["d/", "a.txt", "d/b.bin"]
+        assert members[0]["is_dir"] and not members[1]["is_dir"]
+        assert members[1]["mtime"] == (2026, 1, 2, 3, 4, 5)
+
+    def test_unknown_type_raises(self):
+        with pytest.raises(ValueError):
+            zip_members("/t", [{"type": "link", "path": "/t/l", "size": 0}])
+
+
+class TestStreamZip:
+    @pytest.mark.parametrize("compression,method", [
+        ("deflate", zipfile.ZIP_DEFLATED),
+        ("store", zipfile.ZIP_STORED),
+    ])
+    def test_archive_round_trips(self, compression, method):
+        chunks = _build(compression=compression, parallel=2)
+        assert len(chunks) > 1
+        zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert zf.testzip() is None
+        assert zf.namelist() == ["d/", "a.txt", "d/b.bin"]
+        assert zf.getinfo("a.txt").compress_type == method
+        assert zf.read("a.txt") == DATA["/t/a.txt"]
+        assert zf.read("d/b.bin") == DATA["/t/d/b.bin"]
+
+    def test_fetches_start_in_a_sliding_window(self):
+        members = [{"arcname": f"f{i}", "path": f"/t/f{i}", "size": 1, "is_dir": False} for i in range(50)]
+        live = {"now": 0, "max": 0, "started": 0}
+
+        async def fetch(path, size):
+            live["now"] += 1
+            live["started"] += 1
+            live["max"] = max(live["max"], live["now"])
+            try:
+                await asyncio.sleep(0)
+                yield b"x"
+            finally:
+                live["now"] -= 1
+
+        async def scenario():
+            stream = stream_zip(members, fetch, compression="store", parallel=3)
+            await stream.__anext__()
+            tasks = len(asyncio.all_tasks()) - 1
+            async for _ in stream:
+                pass
+            return tasks
+
+        assert asyncio.run(scenario()) <= 3
+        assert live["max"] <= 3 and live["started"] == 50
+
+    def test_unknown_compression_raises(self):
+        with pytest.raises(ValueError):
+            _build(compression="bzip2")
+
+    def test_fetch_error_propagates(self):
+        async def broken(path, size):
+            if path.endswith("b.bin"):
+                raise IOError("xrdcp failed")
+            async for chunk in _fetch(path, size):
+                yield chunk
+
+        with pytest.raises(IOError, match="xrdcp failed"):
+            _build(fetch=broken)
+
+
+class TestZipDownloader:
+    def test_backend_stream_gets_user_and_size(self):
+        calls = []
+
+        async def get_file_stream(path, username="", mgm="", krb5_enabled=True, fsize=None):
+            calls.append((path, username, mgm, fsize))
+            async for chunk in _fetch(path, fsize):
+                yield chunk
+
+        download_list = zip_downloader(get_file_stream, "root://mgm", max_file_size=10**6)
+
+        async def scenario():
+            return b"".join([c async for c in download_list("/t", FLIST, username="alice")])
+        zf = zipfile.ZipFile(io.BytesIO(asyncio.run(scenario())))
+        assert zf.read("d/b.bin") == DATA["/t/d/b.bin"]
+        assert sorted(calls) == [("/t/a.txt", "alice", "root://mgm", 5000), ("/t/d/b.bin", "alice", "root://mgm", 76800)]
+
+    def test_total_size_limit(self):
+        download_list = zip_downloader(_fetch, "root://mgm", max_file_size=1000)
+
+        async def scenario():
+            return [c async for c in download_list("/t", FLIST)]
+        with pytest.raises(ValueError):
+            asyncio.run(scenario())
@@ -0,0 +1,30 @@
+"""Smoke test of tools/bench_storage.py and the fake xrdfs/xrdcp commands.
+
+Runs every benchmarked operation of the xrootd backend a few times against
+tools/fake_xrd and checks the number of commands each one forks.
+"""
+
+import argparse
+import asyncio
+
+from tools import bench_storage
+
+
+def test_every_operation_runs_against_the_fake_commands():
+    args = argparse.Namespace(ops=bench_storage.all_ops, iterations=3, concurrency=2, latency=0.0, files=20,
+                              file_size=4096, zip_files=3, tree_files=6, tree_dirs=2, json=None)
+    bench = bench_storage.Bench(args)
+    try:
+        bench.setup()
+        summary = asyncio.run(bench.run())
+    finally:
+        bench.cleanup()
+    results = {r["op"]: r for r in summary["results"]}
+    assert all(r["errors"] == 0 for r in results.values()), results
+    assert results["path_exist"]["forks_per_op"] == 1
+    assert results["list_path"]["forks_per_op"] == 1
+    #### stat + xrdcp
+    assert results["get_file_stream"]["forks_per_op"] == 2
+    assert results["prepare_zip_file"]["forks_per_op"] == 3
+    #### stat, ls -R, one rm batch, 2 + 1 rmdir
+    assert results["delete_path"]["forks_per_op"] == 6
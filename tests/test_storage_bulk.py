@@ -0,0 +1,108 @@
+"""Unit tests for the bulk delete engine in fastink.storage.bulk."""
+
+import asyncio
+
+from fastink.storage.bulk import DeleteReport, bulk_delete, depth_levels, split_tree
+
+
+class FakeStore:
+    """In-memory tree recording every rm/rmdir call."""
+
+    def __init__(self, files, dirs, broken=()):
+        self.files = set(files)
+        self.dirs = set(dirs)
+        self.broken = set(broken)
+        self.rm_calls = []
+        self.rmdir_calls = []
+        self.inflight = 0
+        self.peak = 0
+
+    async def rm_files(self, batch):
+        # Like "xrdfs rm a b c": every path is tried, errors are collected
+        self.rm_calls.append(list(batch))
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        await asyncio.sleep(0)
+        self.inflight -= 1
+        errs = []
+        for path in batch:
+            if path in self.broken:
+                errs.append("[ERROR] Server responded with an error: [3010] Unable to remove")
+            elif path not in self.files:
+                errs.append("[ERROR] Server responded with an error: [3011] No such file or directory")
+            else:
+                self.files.discard(path)
+        return (1, "\n".join(errs)) if errs else (0, "")
+
+    async def rmdir(self, d):
+        self.rmdir_calls.append(d)
+        if any(p.startswith(d + "/") for p in self.files | self.dirs):
+            return 1, "[ERROR] Directory not empty"
+        self.dirs.discard(d)
+        return 0, ""
+
+
+def _tree(nfiles=10):
+    files = [f"/t/a/b/f{i}" for i in range(nfiles)] + ["/t/a/g", "/t/h"]
+    dirs = ["/t/a", "/t/a/b", "/t"]
+    return files, dirs
+
+
+def _run(store, files, dirs, **kwargs):
+    return asyncio.run(bulk_delete("/t", files, dirs, store.rm_files, store.rmdir, **kwargs))
+
+
+class TestHelpers:
+    def test_split_tree_appends_root(self):
+        entries = [{"type": "directory", "path": "/t/a"}, {"type": "file", "path": "/t/a/f"}]
+        assert split_tree("/t", entries) == (["/t/a/f"], ["/t/a", "/t"])
+
+    def test_depth_levels_deepest_first(self):
+        assert depth_levels(["/t", "/t/a", "/t/a/b", "/t/c"]) == [["/t/a/b"], ["/t/a", "/t/c"], ["/t"]]
+
+
+class TestBulkDelete:
+    def test_removes_everything_in_batches(self):
+        files, dirs = _tree()
+        store = FakeStore(files, dirs)
+        report = _run(store, files, dirs, parallel=2, batch_size=4)
+        assert report
+        assert report.deleted == report.total == len(files) + len(dirs)
+        assert not store.files and not store.dirs
+        assert len(store.rm_calls) == 3
+        assert store.peak <= 2
+        assert store.rmdir_calls == ["/t/a/b", "/t/a", "/t"]
+
+    def test_failed_batch_is_retried_per_path(self):
+        files, dirs = _tree()
+        store = FakeStore(files, dirs, broken={"/t/a/b/f3"})
+        report = _run(store, files, dirs, batch_size=4)
+        assert not report
+        assert set(report.failed) == {"/t/a/b/f3", "/t/a/b", "/t/a", "/t"}
+        assert "3010" in report.failed["/t/a/b/f3"]
+        assert store.files == {"/t/a/b/f3"}
+        # The batch already removed its other paths; their retries succeed
+        assert report.deleted == len(files) - 1
+        # Ancestors of a failed path are not tried at all
+        assert store.rmdir_calls == []
+
+    def test_missing_path_only_counts_as_removed_on_retry(self):
+        files, dirs = ["/t/f", "/t/gone"], ["/t"]
+        store = FakeStore(["/t/f"], dirs)
+        report = _run(store, files, dirs, batch_size=2)
+        assert report
+        assert store.rm_calls == [["/t/f", "/t/gone"], ["/t/f"], ["/t/gone"]]
+
+        store = FakeStore([], dirs)
+        report = _run(store, ["/t/gone"], dirs, batch_size=1)
+        assert set(report.failed) == {"/t/gone", "/t"}
+
+    def test_progress_callback_and_report_dict(self):
+        files, dirs = ["/t/f"], ["/t"]
+        seen = []
+        report = _run(FakeStore(files, dirs), files, dirs, progress=lambda done, total: seen.append((done, total)))
+        assert seen == [(1, 2), (2, 2)]
+        assert report.as_dict() == {"path": "/t", "total": 2, "deleted": 2, "failed": []}
+
+    def test_empty_report_is_falsy(self):
+        assert not DeleteReport("/t")
@@ -0,0 +1,130 @@
+"""Unit tests for the per-user storage metadata cache (fastink.storage.cache)."""
+
+import asyncio
+
+from fastink.storage.cache import MetaCache, cached_list_path, cached_path_exist, invalidating
+from fastink.storage.utils import PathType
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class _FakeBackend:
+    def __init__(self):
+        self.calls = {"stat": 0, "list": 0}
+        self.existing = {"/data/alice"}
+
+    async def path_exist(self, name, username="", mgm=""):
+        self.calls["stat"] += 1
+        if name in self.existing:
+            return True, PathType.DIR
+        return False, PathType.UNKNOWN
+
+    async def list_path(self, dname, username="", long=True, recursive=False, showhidden=False, mgm="", raw=False):
+        self.calls["list"] += 1
+        await asyncio.sleep(0)
+        return [{"type": "file", "path": f"{dname}/a.txt"}]
+
+    async def mkdir(self, dname, username=None, mode="755", exist_ok=True, mgm=""):
+        self.existing.add(dname)
+        return True
+
+
+class TestCachedReads:
+    def test_repeated_stat_is_served_from_cache(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        path_exist = cached_path_exist(backend.path_exist, cache)
+
+        async def scenario():
+            for _ in range(3):
+                assert await path_exist("/data/alice", "alice") == (True, PathType.DIR)
+        _run(scenario())
+        assert backend.calls["stat"] == 1
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+
+    def test_missing_path_is_not_cached(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        path_exist = cached_path_exist(backend.path_exist, cache)
+
+        async def scenario():
+            await path_exist("/data/alice/new", "alice")
+            await path_exist("/data/alice/new", "alice")
+        _run(scenario())
+        assert backend.calls["stat"] == 2
+
+    def test_concurrent_misses_share_one_call(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        list_path = cached_list_path(backend.list_path, cache)
+
+        async def scenario():
+            return await asyncio.gather(*[list_path("/data/alice", "alice") for _ in range(5)])
+        results = _run(scenario())
+        assert backend.calls["list"] == 1
+        assert all(r == results[0] for r in results)
+
+    def test_cache_is_per_user(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        list_path = cached_list_path(backend.list_path, cache)
+
+        async def scenario():
+            await list_path("/data/shared", "alice")
+            await list_path("/data/shared", "bob")
+        _run(scenario())
+        assert backend.calls["list"] == 2
+
+    def test_mutating_a_result_does_not_touch_the_cache(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        list_path = cached_list_path(backend.list_path, cache)
+
+        async def scenario():
+            first = await list_path("/data/alice", "alice")
+            first[0]["path"] = "changed"
+            first.append({})
+            return await list_path("/data/alice", "alice")
+        assert _run(scenario()) == [{"type": "file", "path": "/data/alice/a.txt"}]
+        assert backend.calls["list"] == 1
+
+    def test_ttl_zero_disables_cache(self):
+        cache, backend = MetaCache(ttl=0), _FakeBackend()
+        path_exist = cached_path_exist(backend.path_exist, cache)
+
+        async def scenario():
+            await path_exist("/data/alice", "alice")
+            await path_exist("/data/alice", "alice")
+        _run(scenario())
+        assert backend.calls["stat"] == 2
+
+
+class TestInvalidation:
+    def test_write_invalidates_parent_listing(self):
+        cache, backend = MetaCache(ttl=60), _FakeBackend()
+        list_path = cached_list_path(backend.list_path, cache)
+        mkdir = invalidating(backend.mkdir, "dname", cache=cache)
+
+        async def scenario():
+            await list_path("/data/alice", "alice")
+            await mkdir("/data/alice/sub", "alice")
+            await list_path("/data/alice", "alice")
+        _run(scenario())
+        assert backend.calls["list"] == 2
+        assert cache.stats()["invalidations"] == 1
+
+    def test_invalidate_drops_descendants_and_recursive_ancestors(self):
+        cache = MetaCache(ttl=60)
+        cache.put("alice", ("stat", "/data/alice/dir/f"), (True, PathType.FILE))
+        cache.put("alice", ("list", "/data", True, False, True, (), ()), [])
+        cache.put("alice", ("list", "/data", False, False, True, (), ()), [])
+        cache.invalidate("alice", "/data/alice/dir")
+        assert cache.get("alice", ("stat", "/data/alice/dir/f")) is None
+        assert cache.get("alice", ("list", "/data", True, False, True, (), ())) is None
+        assert cache.get("alice", ("list", "/data", False, False, True, (), ())) == []
+
+    def test_lru_eviction(self):
+        cache = MetaCache(ttl=60, maxsize=2)
+        for i in range(3):
+            cache.put("alice", ("stat", f"/p{i}"), (True, PathType.FILE))
+        assert cache.get("alice", ("stat", "/p0")) is None
+        assert cache.stats()["size"] == 2
+        assert cache.stats()["evictions"] == 1
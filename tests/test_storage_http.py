@@ -0,0 +1,146 @@
+"""Unit tests for the HTTP/WebDAV storage backend (fastink.storage.http).
+
+The round-trip tests run against a local wsgidav server and are skipped
+when wsgidav or cheroot are not installed.
+"""
+
+import asyncio
+import importlib.util
+import threading
+
+import pytest
+
+from fastink.storage import http
+from fastink.storage.utils import PathType
+
+needs_dav = pytest.mark.skipif(
+    importlib.util.find_spec("wsgidav") is None or importlib.util.find_spec("cheroot") is None,
+    reason="wsgidav and cheroot are required",
+)
+
+MULTISTATUS = """<?xml version="1.0" encoding="utf-8"?>
+<D:multistatus xmlns:D="DAV:">
+  <D:response>
+    <D:href>/dav/home/alice/</D:href>
+    <D:propstat>
+      <D:prop><D:resourcetype><D:collection/></D:resourcetype>
+      <D:getlastmodified>Tue, 01 Sep 2026 10:00:00 GMT</D:getlastmodified></D:prop>
+      <D:status>HTTP/1.1 200 OK</D:status>
+    </D:propstat>
+  </D:response>
+  <D:response>
+    <D:href>https://eos.example/dav/home/alice/my%20file.txt</D:href>
+    <D:propstat>
+      <D:prop><D:resourcetype/><D:getcontentlength>42</D:getcontentlength></D:prop>
+      <D:status>HTTP/1.1 200 OK</D:status>
+    </D:propstat>
+    <D:propstat>
+      <D:prop><D:getlastmodified/></D:prop>
+      <D:status>HTTP/1.1 404 Not Found</D:status>
+    </D:propstat>
+  </D:response>
+</D:multistatus>"""
+
+
+class TestMultistatus:
+    def test_entries_are_parsed_relative_to_endpoint(self, monkeypatch):
+        monkeypatch.setattr(http, "endpoint", "https://eos.example/dav")
+        d, f = http.parse_multistatus(MULTISTATUS)
+        assert d["path"] == "/home/alice" and d["is_dir"] and d["size"] == 0
+        assert d["mtime"] is not None
+        assert f == {"path": "/home/alice/my file.txt", "is_dir": False, "size": 42, "mtime": None}
+
+    def test_urls_are_quoted(self, monkeypatch):
+        monkeypatch.setattr(http, "endpoint", "https://eos.example/dav")
+        assert http.to_url("/home/alice/my file.txt") == "https://eos.example/dav/home/alice/my%20file.txt"
+        assert http.to_url("/home/alice", collection=True) == "https://eos.example/dav/home/alice/"
+
+    def test_anonymous_access_is_limited_to_user_roots(self, monkeypatch):
+        monkeypatch.setattr(http, "auth_mode", "none")
+        monkeypatch.setattr(http, "user_roots", ["/home/{username}"])
+        assert http.check_path("/home/alice/a/../b", "alice") == "/home/alice/b"
+        for path in ["/home/bob/x", "/home/alice2", "/home/alice/../bob"]:
+            with pytest.raises(PermissionError):
+                http.check_path(path, "alice")
+
+
+@pytest.fixture
+def dav_server(monkeypatch, tmp_path):
+    from cheroot import wsgi
+    from wsgidav.wsgidav_app import WsgiDAVApp
+
+    app = WsgiDAVApp({
+        "provider_mapping": {"/": str(tmp_path)},
+        "simple_dc": {"user_mapping": {"*": True}},
+        "verbose": 0,
+        "logging": {"enable": False},
+    })
+    server = wsgi.Server(("127.0.0.1", 0), app)
+    server.prepare()
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    host, port = server.bind_addr
+    monkeypatch.setattr(http, "endpoint", f"http://{host}:{port}")
+    monkeypatch.setattr(http, "auth_mode", "none")
+    monkeypatch.setattr(http, "user_roots", ["/home/{username}"])
+    monkeypatch.setattr(http, "chunk_size", 1024)
+    monkeypatch.setattr(http, "pool", http.SessionPool())
+    yield tmp_path
+    server.stop()
+
+
+def _scenario(coro_fn):
+    async def run():
+        try:
+            return await coro_fn()
+        finally:
+            await http.pool.close()
+    return asyncio.run(run())
+
+
+@needs_dav
+class TestRoundTrip:
+    def test_mkdir_upload_list_and_read(self, dav_server):
+        data = bytes(range(256)) * 20
+
+        async def source():
+            for i in range(0, len(data), 1000):
+                yield data[i:i + 1000]
+
+        async def scenario():
+            assert await http.mkdir("/home/alice/a/b", "alice")
+            await http.upload_stream(source(), "/home/alice/a/b/f.bin", "alice")
+            await http.upload_file(b"hi", "/home/alice/a/.hidden", "alice")
+            assert await http.path_exist("/home/alice/a", "alice") == (True, PathType.DIR)
+            assert await http.path_exist("/home/alice/a/b/f.bin", "alice") == (True, PathType.FILE)
+            assert await http.path_exist("/home/alice/nope", "alice") == (False, PathType.UNKNOWN)
+            assert [e["path"] for e in await http.list_path("/home/alice/a", "alice")] == ["/home/alice/a/b"]
+            listed = await http.list_path("/home/alice/a", "alice", recursive=True, showhidden=True, raw=True)
+            assert [(e["path"], e["size"]) for e in listed] == [
+                ("/home/alice/a/b", 0), ("/home/alice/a/.hidden", 2), ("/home/alice/a/b/f.bin", len(data))]
+            assert await http.get_file_size("/home/alice/a/b/f.bin", "alice") == len(data)
+            assert await http.get_file("/home/alice/a/b/f.bin", "alice") == data
+            part = b"".join([c async for c in http.get_file_stream("/home/alice/a/b/f.bin", "alice", offset=100, length=3000)])
+            assert part == data[100:3100]
+            assert await http.cat_file("/home/alice/a/.hidden", "alice") == "hi"
+
+        _scenario(scenario)
+        assert (dav_server / "home/alice/a/b/f.bin").read_bytes() == data
+
+    def test_rename_and_delete(self, dav_server):
+        async def scenario():
+            await http.mkdir("/home/alice/d", "alice")
+            await http.upload_file(b"x", "/home/alice/d/f", "alice")
+            await http.upload_file(b"y", "/home/alice/g", "alice")
+            assert await http.rename("/home/alice/d", "/home/alice/e", "alice")
+            with pytest.raises(FileExistsError):
+                await http.rename("/home/alice/g", "/home/alice/e", "alice")
+            assert await http.cat_file("/home/alice/e/f", "alice") == "x"
+            report = await http.delete_path("/home/alice/e", "alice")
+            assert report and report.deleted == 1
+            assert not await http.delete_path("/home/alice/e", "alice")
+            assert await http.path_exist("/home/alice/e", "alice") == (False, PathType.UNKNOWN)
+            with pytest.raises(PermissionError):
+                await http.list_path("/home/bob", "alice")
+
+        _scenario(scenario)
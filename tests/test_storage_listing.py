@@ -0,0 +1,81 @@
+"""Unit tests for the `xrdfs ls -l` parser (fastink.storage.listing)."""
+
+import asyncio
+import os
+import time
+
+import pytest
+from dateutil import parser, tz
+
+from fastink.storage import listing
+
+LS = "\n".join([
+    "drwxr-xr-x alice users 4096 2026-03-29 00:59:59 /home/alice/b dir",
+    "-rw-r--r-- alice users 2048 2026-03-29 01:00:01 /home/alice/a.txt",
+    "-rw-r--r-- alice users 0 2026-01-05 10:30:00 /home/alice/.hidden",
+    "lrwxrwxrwx alice users 9 2026-01-05 10:30:00 /home/alice/link -> /elsewhere",
+    "d--- 2026-01-05 10:30:00 0 /home/alice/nostat",
+    "",
+])
+
+
+def _legacy_time(date, clock):
+    return str(parser.parse(f"{date} {clock}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None))
+
+
+class TestParse:
+    def test_entries_and_links(self):
+        entries, links = listing.parse_ls(LS)
+        assert [e.path for e in entries] == ["/home/alice/b dir", "/home/alice/a.txt", "/home/alice/link", "/home/alice/nostat"]
+        assert links == [2]
+        d = entries[0].as_dict()
+        assert d["type"] == "directory" and d["size"] == "4 KB" and d["user"] == "alice"
+        assert entries[1].as_dict(raw=True)["size"] == 2048
+        assert entries[3].as_dict() == {"type": "directory", "path": "/home/alice/nostat"}
+        assert len(listing.parse_ls(LS, showhidden=True)[0]) == 5
+
+    @pytest.mark.parametrize("zone", ["UTC", "Europe/Zurich", "Asia/Kolkata", "America/St_Johns"])
+    def test_times_match_dateutil(self, monkeypatch, zone):
+        monkeypatch.setenv("TZ", zone)
+        time.tzset()
+        try:
+            convert = listing.LocalTime()
+            for date, clock in [("2026-03-29", "00:59:59"), ("2026-03-29", "01:00:01"),
+                                ("2026-10-25", "00:30:00"), ("2026-10-25", "01:30:00"), ("2026-07-01", "23:59:00")]:
+                assert convert(date, clock) == _legacy_time(date, clock)
+                assert convert(date, clock) == _legacy_time(date, clock)
+        finally:
+            monkeypatch.delenv("TZ")
+            time.tzset()
+
+    def test_links_are_resolved_through_the_mount(self, tmp_path):
+        (tmp_path / "d").mkdir()
+        os.symlink(tmp_path / "d", tmp_path / "ld")
+        os.symlink(tmp_path / "missing", tmp_path / "lf")
+        out = "\n".join(f"lrwxrwxrwx alice users 1 2026-01-05 10:30:00 {tmp_path}/{n} -> x" for n in ["lf", "ld"])
+        result = asyncio.run(listing.parse_listing(out, str(tmp_path)))
+        assert [(e["path"].rsplit("/", 1)[1], e["type"], e["permission"]) for e in result] == [
+            ("ld", "directory", "drwxrwxrwx"), ("lf", "file", "-rwxrwxrwx")]
+
+
+class TestPaging:
+    entries = [
+        {"type": "file", "path": "/a", "size": 5, "time": "2026-01-02 00:00:00"},
+        {"type": "directory", "path": "/z", "size": 0, "time": "2026-01-01 00:00:00"},
+        {"type": "file", "path": "/b", "size": 1, "time": "2026-01-03 00:00:00"},
+        {"type": "directory", "path": "/y"},
+    ]
+
+    def test_directories_stay_first(self):
+        by_size = listing.sort_entries(self.entries, key="size", reverse=True)
+        assert [e["path"] for e in by_size] == ["/z", "/y", "/a", "/b"]
+        by_time = listing.sort_entries(self.entries, key="time")
+        assert [e["path"] for e in by_time] == ["/y", "/z", "/a", "/b"]
+        with pytest.raises(ValueError):
+            listing.sort_entries(self.entries, key="owner")
+
+    def test_pages_are_formatted(self):
+        page = listing.paginate(listing.sort_entries(self.entries), offset=1, limit=2)
+        assert page == [{"type": "directory", "path": "/z", "size": "0B", "time": "2026-01-01 00:00:00"},
+                        {"type": "file", "path": "/a", "size": "5 B", "time": "2026-01-02 00:00:00"}]
+        assert listing.paginate(self.entries, offset=10) == []
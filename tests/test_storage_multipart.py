@@ -0,0 +1,244 @@
+"""Unit tests for resumable multipart uploads (fastink.storage.multipart)."""
+
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from fastink.storage import multipart
+from fastink.storage.bulk import DeleteReport
+from fastink.storage.utils import PathType
+
+
+class FakeStorage:
+    """Minimal in-memory stand-in for the storage.common entry points."""
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = set()
+
+    async def path_exist(self, name, username="", mgm=""):
+        if name in self.dirs:
+            return True, PathType.DIR
+        if name in self.files:
+            return True, PathType.FILE
+        return False, PathType.UNKNOWN
+
+    async def mkdir(self, dname, username=None, mode="755", exist_ok=True, mgm=""):
+        self.dirs.add(dname)
+        return True
+
+    async def upload_file(self, src_data, dst, username="", mgm="", mode=""):
+        self.files[dst] = bytes(src_data)
+        return True, ""
+
+    async def upload_stream(self, source, dst, username="", mgm="", mode=""):
+        # Like xrdcp: bytes land in dst as they arrive, even if the source dies
+        self.files[dst] = b""
+        async for chunk in source:
+            self.files[dst] += chunk
+        return True, ""
+
+    async def rename(self, src, dst, username="", mgm=""):
+        if dst in self.files:
+            raise FileExistsError(dst)
+        self.files[dst] = self.files.pop(src)
+        return True
+
+    async def cat_file(self, fname, username="", mgm=""):
+        return self.files[fname].decode()
+
+    async def list_path(self, dname, username="", long=True, recursive=False, showhidden=False, mgm="", raw=False):
+        return [
+            {"type": "file", "path": p, "size": len(d), "time": "2026-01-01 00:00:00"}
+            for p, d in self.files.items() if os.path.dirname(p) == dname
+        ]
+
+    async def get_file_stream(self, fname, username="", mgm="", krb5_enabled=True, fsize=None):
+        data = self.files[fname]
+        for i in range(0, len(data), 3):
+            yield data[i:i + 3]
+
+    async def delete_path(self, name, username="", mgm=""):
+        report = DeleteReport(name)
+        for p in [p for p in self.files if p == name or p.startswith(name + "/")]:
+            del self.files[p]
+            report.total += 1
+            report.deleted += 1
+        self.dirs.discard(name)
+        return report
+
+
+class FakeRedis:
+    keys = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def delete(self, key):
+        self.keys.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setattr(FakeRedis, "keys", {})
+    monkeypatch.setattr(multipart, "redis_connect", FakeRedis)
+    fake = FakeStorage()
+    names = ["path_exist", "mkdir", "upload_file", "upload_stream", "cat_file",
+             "list_path", "get_file_stream", "delete_path", "rename"]
+    patches = [patch.object(multipart.common, n, getattr(fake, n)) for n in names]
+    for p in patches:
+        p.start()
+    with patch.object(multipart, "staging_dir", "/stage"), patch.object(multipart, "purge_expired", return_value=None):
+        yield fake
+    for p in patches:
+        p.stop()
+
+
+async def _body(*chunks, error=None):
+    for c in chunks:
+        yield c
+    if error is not None:
+        raise error
+
+
+async def _complete(upload_id, username="alice", **kwargs):
+    """upload_complete, then wait for the background assembly."""
+    state = await multipart.complete_upload(upload_id, username, **kwargs)
+    await asyncio.gather(*multipart._assembling)
+    return state
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestMultipartUpload:
+    def test_parts_are_assembled_in_order(self, storage):
+        upload_id = _run(multipart.init_upload("/home/alice/big.bin", "alice"))
+        manifest = json.loads(storage.files[f"/stage/{upload_id}/manifest.json"])
+        assert manifest["dst"] == "/home/alice/big.bin"
+
+        # Parts may arrive out of order and be re-sent
+        assert _run(multipart.upload_part(upload_id, 2, _body(b"world"), "alice")) == 5
+        _run(multipart.upload_part(upload_id, 1, _body(b"hel", b"lo "), "alice"))
+        _run(multipart.upload_part(upload_id, 2, _body(b"there"), "alice"))
+
+        status = _run(multipart.upload_status(upload_id, "alice"))
+        assert status["parts"] == [{"part": 1, "size": 6}, {"part": 2, "size": 5}]
+
+        state = _run(_complete(upload_id))
+        assert state["state"] == "assembling"
+        assert (state["path"], state["size"], state["parts"]) == ("/home/alice/big.bin", 11, 2)
+        assert storage.files["/home/alice/big.bin"] == b"hello there"
+
+        status = _run(multipart.upload_status(upload_id, "alice"))
+        assert status["state"] == "done"
+        assert status["parts"] == []
+        # a repeated complete reports the outcome instead of assembling again
+        assert _run(multipart.complete_upload(upload_id, "alice"))["state"] == "done"
+        with pytest.raises(ValueError, match="already"):
+            _run(multipart.upload_part(upload_id, 3, _body(b"!"), "alice"))
+
+    def test_interrupted_part_is_not_listed(self, storage):
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"good"), "alice"))
+        with pytest.raises(IOError):
+            _run(multipart.upload_part(upload_id, 1, _body(b"ba", error=IOError("client gone")), "alice"))
+        with pytest.raises(ValueError, match="incomplete"):
+            _run(multipart.upload_part(upload_id, 2, _body(b"sh"), "alice", size=5))
+
+        assert _run(multipart.list_parts(upload_id, "alice")) == {1: 4}
+        assert not any(p.endswith(".tmp") for p in storage.files)
+
+    def test_failed_assembly_is_reported(self, storage, monkeypatch):
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"a"), "alice"))
+
+        async def broken(source, dst, **kwargs):
+            raise IOError("quota exceeded")
+
+        monkeypatch.setattr(multipart.common, "upload_stream", broken)
+        _run(_complete(upload_id))
+        status = _run(multipart.upload_status(upload_id, "alice"))
+        assert (status["state"], status["error"]) == ("failed", "quota exceeded")
+        assert status["parts"] == [{"part": 1, "size": 1}]
+
+    def test_interrupted_assembly_keeps_the_old_target(self, storage, monkeypatch):
+        storage.files["/home/alice/x"] = b"old"
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice", overwrite=True))
+        _run(multipart.upload_part(upload_id, 1, _body(b"new data"), "alice"))
+        real_upload_stream = storage.upload_stream
+
+        async def dies_midway(source, dst, **kwargs):
+            async def first_chunk():
+                async for chunk in source:
+                    yield chunk
+                    raise IOError("storage went away")
+            return await real_upload_stream(first_chunk(), dst, **kwargs)
+
+        monkeypatch.setattr(multipart.common, "upload_stream", dies_midway)
+        _run(_complete(upload_id))
+        assert _run(multipart.upload_status(upload_id, "alice"))["state"] == "failed"
+        assert storage.files["/home/alice/x"] == b"old"
+        assert not any(p.endswith(".tmp") for p in storage.files)
+        assert FakeRedis.keys == {}
+
+        # the claim is released, so the upload can be completed again
+        monkeypatch.setattr(multipart.common, "upload_stream", real_upload_stream)
+        _run(_complete(upload_id))
+        assert storage.files["/home/alice/x"] == b"new data"
+
+    def test_concurrent_completes_assemble_once(self, storage, monkeypatch):
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"a"), "alice"))
+        started = []
+        monkeypatch.setattr(multipart, "write_state", lambda *a, **kw: started.append(a) or asyncio.sleep(0))
+
+        async def race():
+            states = await asyncio.gather(*(multipart.complete_upload(upload_id, "alice") for _ in range(3)))
+            await asyncio.gather(*multipart._assembling)
+            return states
+
+        states = _run(race())
+        assert [s["state"] for s in states] == ["assembling"] * 3
+        assert [a[2]["state"] for a in started] == ["assembling", "done"]
+
+    def test_total_size_is_limited(self, storage, monkeypatch):
+        monkeypatch.setattr(multipart, "max_file_size", 4)
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"ab"), "alice"))
+        _run(multipart.upload_part(upload_id, 2, _body(b"cd"), "alice"))
+        with pytest.raises(ValueError, match="larger"):
+            _run(_complete(upload_id))
+        assert FakeRedis.keys == {}
+
+    def test_gap_in_parts_is_rejected(self, storage):
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"a"), "alice"))
+        _run(multipart.upload_part(upload_id, 3, _body(b"c"), "alice"))
+        with pytest.raises(ValueError, match=r"\[2\]"):
+            _run(_complete(upload_id))
+
+    def test_existing_target_needs_overwrite(self, storage):
+        storage.files["/home/alice/x"] = b"old"
+        upload_id = _run(multipart.init_upload("/home/alice/x", "alice"))
+        _run(multipart.upload_part(upload_id, 1, _body(b"new"), "alice"))
+        with pytest.raises(FileExistsError):
+            _run(_complete(upload_id))
+
+    def test_unknown_or_malformed_upload_id(self, storage):
+        with pytest.raises(FileNotFoundError):
+            _run(multipart.upload_part("0" * 32, 1, _body(b"a"), "alice"))
+        with pytest.raises(ValueError):
+            multipart.staging_path("alice", "../../etc")
+        with pytest.raises(ValueError):
+            multipart.part_path("alice", "0" * 32, 0)
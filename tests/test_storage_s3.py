@@ -0,0 +1,126 @@
+"""Unit tests for the S3 storage backend (fastink.storage.s3).
+
+The round-trip tests run against moto's S3 server and are skipped when
+aiobotocore or moto are not installed.
+"""
+
+import asyncio
+import importlib.util
+import uuid
+
+import pytest
+
+from fastink.storage import s3
+from fastink.storage.utils import PathType
+
+needs_s3 = pytest.mark.skipif(
+    importlib.util.find_spec("aiobotocore") is None or importlib.util.find_spec("moto") is None,
+    reason="aiobotocore and moto are required",
+)
+
+
+class TestKeyMapping:
+    def test_paths_map_onto_prefixed_keys(self, monkeypatch):
+        monkeypatch.setattr(s3, "key_prefix", "scratch/")
+        monkeypatch.setattr(s3, "user_roots", ["/home/{username}"])
+        assert s3.to_key("/home/alice/a/../b.txt", "alice") == "scratch/home/alice/b.txt"
+        assert s3.to_path("scratch/home/alice/dir/") == "/home/alice/dir"
+
+    def test_paths_outside_user_roots_are_denied(self, monkeypatch):
+        monkeypatch.setattr(s3, "user_roots", ["/home/{username}", "/scratch/{username}"])
+        assert s3.to_key("/scratch/alice/x", "alice") == "scratch/alice/x"
+        for path in ["/home/bob/x", "/home/alice2/x", "/home/alice/../bob/x"]:
+            with pytest.raises(PermissionError):
+                s3.to_key(path, "alice")
+
+    def test_relative_path_is_rejected(self):
+        with pytest.raises(ValueError):
+            s3.to_key("relative/path", "")
+
+
+@pytest.fixture
+def s3_server(monkeypatch):
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setattr(s3, "endpoint", f"http://{host}:{port}")
+    monkeypatch.setattr(s3, "region", "us-east-1")
+    monkeypatch.setattr(s3, "access_key", "testing")
+    monkeypatch.setattr(s3, "secret_key", "testing")
+    # moto keeps its buckets process-wide, so every test gets its own
+    monkeypatch.setattr(s3, "bucket", f"ink-{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(s3, "key_prefix", "")
+    monkeypatch.setattr(s3, "user_roots", ["/home/{username}"])
+    monkeypatch.setattr(s3, "part_size", 5 * 1024 * 1024)
+    monkeypatch.setattr(s3, "pool", s3.S3Client())
+    yield
+    server.stop()
+
+
+def _scenario(coro_fn):
+    async def run():
+        client = await s3.pool.get()
+        await client.create_bucket(Bucket=s3.bucket)
+        try:
+            return await coro_fn()
+        finally:
+            await s3.pool.close()
+    return asyncio.run(run())
+
+
+async def _chunks(data, size=1024 * 1024):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@needs_s3
+class TestS3RoundTrip:
+    def test_multipart_upload_and_ranged_stream(self, s3_server):
+        data = bytes(range(256)) * (12 * 4096)  # 12 MiB -> 3 parts
+
+        async def run():
+            await s3.upload_stream(_chunks(data), "/home/alice/big.bin", username="alice")
+            assert await s3.get_file_size("/home/alice/big.bin", "alice") == len(data)
+            whole = b"".join([c async for c in s3.get_file_stream("/home/alice/big.bin", "alice")])
+            part = b"".join([c async for c in s3.get_file_stream("/home/alice/big.bin", "alice", offset=5 * 1024 * 1024 - 3, length=10)])
+            return whole, part
+
+        whole, part = _scenario(run)
+        assert whole == data
+        assert part == data[5 * 1024 * 1024 - 3:5 * 1024 * 1024 + 7]
+
+    def test_directories_listing_rename_and_delete(self, s3_server):
+        async def run():
+            await s3.mkdir("/home/alice/empty", "alice")
+            await s3.upload_file(b"a", "/home/alice/d/a.txt", username="alice")
+            await s3.upload_file("b", "/home/alice/d/sub/.b", username="alice")
+            assert await s3.path_exist("/home/alice/d", "alice") == (True, PathType.DIR)
+            assert await s3.path_exist("/home/alice/d/a.txt", "alice") == (True, PathType.FILE)
+            assert await s3.path_exist("/home/alice/nope", "alice") == (False, PathType.UNKNOWN)
+
+            top = await s3.list_path("/home/alice", "alice")
+            flat = await s3.list_path("/home/alice/d", "alice", recursive=True)
+            hidden = await s3.list_path("/home/alice/d", "alice", recursive=True, showhidden=True, raw=True)
+
+            assert await s3.rename("/home/alice/d", "/home/alice/e", "alice")
+            moved = await s3.cat_file("/home/alice/e/sub/.b", "alice")
+            report = await s3.delete_path("/home/alice/e", "alice")
+            gone = await s3.path_exist("/home/alice/e", "alice")
+            return top, flat, hidden, moved, report, gone
+
+        top, flat, hidden, moved, report, gone = _scenario(run)
+        assert [(e["type"], e["path"]) for e in top] == [("directory", "/home/alice/d"), ("directory", "/home/alice/empty")]
+        assert [e["path"] for e in flat] == ["/home/alice/d/sub", "/home/alice/d/a.txt"]
+        assert {"type": "file", "path": "/home/alice/d/sub/.b", "size": 1}.items() <= hidden[-1].items()
+        assert moved == "b"
+        assert report and report.deleted == report.total
+        assert gone == (False, PathType.UNKNOWN)
+
+    def test_other_users_tree_is_denied(self, s3_server):
+        async def run():
+            with pytest.raises(PermissionError):
+                await s3.upload_file(b"x", "/home/bob/x", username="alice")
+
+        _scenario(run)
@@ -0,0 +1,155 @@
+"""Unit tests for the streaming download helpers in fastink.storage.utils."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+from fastink.common.exception import TokenExpiredException
+from fastink.routers.status import InkStatus
+from fastink.storage.utils import async_feed_exec, async_stream_exec, parse_range, stat_size
+
+
+def _collect(cmd, **kwargs):
+    async def scenario():
+        return [chunk async for chunk in async_stream_exec(cmd, **kwargs)]
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def payload_file(tmp_path):
+    data = bytes(range(256)) * 64
+    path = tmp_path / "payload.bin"
+    path.write_bytes(data)
+    return str(path), data
+
+
+class TestAsyncStreamExec:
+    def test_streams_whole_output_in_bounded_chunks(self, payload_file):
+        path, data = payload_file
+        chunks = _collect(["cat", path], chunk_size=1000)
+        assert b"".join(chunks) == data
+        assert max(len(c) for c in chunks) <= 1000
+
+    def test_offset_and_length(self, payload_file):
+        path, data = payload_file
+        chunks = _collect(["cat", path], offset=1500, length=3000, chunk_size=1024)
+        assert b"".join(chunks) == data[1500:4500]
+
+    def test_stopping_early_kills_the_whole_group(self, tmp_path):
+        # sh stands in for sudo: the copy runs in a child process
+        pidfile = tmp_path / "pid"
+        cmd = ["sh", "-c", f"cat /dev/zero & echo $! > {pidfile}; wait"]
+        chunks = _collect(cmd, length=10, chunk_size=4)
+        assert b"".join(chunks) == b"\0" * 10
+
+        status = Path(f"/proc/{pidfile.read_text().strip()}/status")
+        assert not status.exists() or "\tZ" in status.read_text()
+
+    def test_failed_command_raises(self):
+        with pytest.raises(IOError):
+            _collect([sys.executable, "-c", "import sys; sys.exit(3)"])
+
+
+async def _source(n, chunk=b"x" * 65536, error=None):
+    for _ in range(n):
+        await asyncio.sleep(0)
+        yield chunk
+    if error is not None:
+        raise error
+
+
+class TestAsyncFeedExec:
+    def test_feeds_all_chunks(self):
+        rc, out, _ = asyncio.run(async_feed_exec(["wc", "-c"], _source(40), decode=True))
+        assert rc == 0
+        assert int(out) == 40 * 65536
+
+    def test_empty_source_closes_stdin(self):
+        assert asyncio.run(async_feed_exec(["cat"], _source(0))) == (0, b"", b"")
+
+    def test_command_exiting_early_is_not_an_error(self):
+        rc, out, _ = asyncio.run(async_feed_exec(["head", "-c", "10"], _source(40)))
+        assert rc == 0
+        assert out == b"x" * 10
+
+    def test_source_error_kills_command(self, tmp_path):
+        # xrdcp writes to its destination as data arrives: the truncated
+        # output stays, but nothing after the copy runs
+        target, done = tmp_path / "out", tmp_path / "done"
+        with pytest.raises(IOError, match="client gone"):
+            asyncio.run(async_feed_exec(
+                ["sh", "-c", f"cat > {target}; touch {done}"],
+                _source(4, error=IOError("client gone")),
+            ))
+        assert target.stat().st_size <= 4 * 65536
+        assert not done.exists()
+
+
+class TestParseRange:
+    def test_no_header(self):
+        assert parse_range(None, 100) is None
+        assert parse_range("items=0-1", 100) is None
+
+    def test_closed_range(self):
+        assert parse_range("bytes=10-19", 100) == (10, 19)
+
+    def test_open_range(self):
+        assert parse_range("bytes=90-", 100) == (90, 99)
+
+    def test_end_is_clamped(self):
+        assert parse_range("bytes=90-500", 100) == (90, 99)
+
+    def test_suffix_range(self):
+        assert parse_range("bytes=-10", 100) == (90, 99)
+
+    def test_multi_range_is_ignored(self):
+        assert parse_range("bytes=0-1,5-6", 100) is None
+
+    @pytest.mark.parametrize("header", ["bytes=100-", "bytes=20-10", "bytes=a-b", "bytes=-0"])
+    def test_unsatisfiable(self, header):
+        with pytest.raises(ValueError):
+            parse_range(header, 100)
+
+
+def test_stat_size():
+    out = "Path:   /home/alice/a.root\nId:     1\nSize:   12345\nMTime:  2026-01-01 00:00:00\nFlags:  16 (IsReadable)\n"
+    assert stat_size(out) == 12345
+
+
+class TestFileDownload:
+    @pytest.fixture
+    def fs_manager(self, monkeypatch):
+        from fastink.routers.v2 import fs_manager
+
+        calls = []
+
+        async def get_file_size(fname, username, mgm, krb5_enabled=True):
+            calls.append(("size", krb5_enabled))
+            if username == "expired":
+                raise TokenExpiredException("ticket expired")
+            return 10
+
+        async def get_file_stream(fname, username, mgm, krb5_enabled=True, offset=0, length=None, fsize=None):
+            calls.append(("stream", krb5_enabled))
+            yield b"0123456789"[offset:offset + (length or 10)]
+
+        monkeypatch.setattr(fs_manager.common, "get_file_size", get_file_size)
+        monkeypatch.setattr(fs_manager.common, "get_file_stream", get_file_stream)
+        return fs_manager, calls
+
+    def test_shared_downloads_stat_without_kerberos(self, fs_manager):
+        fs_manager, calls = fs_manager
+
+        async def scenario():
+            response = await fs_manager.file_download("/home/alice/f", "alice", krb5_enabled=False)
+            return b"".join([chunk async for chunk in response.body_iterator])
+
+        assert asyncio.run(scenario()) == b"0123456789"
+        assert calls == [("size", False), ("stream", False)]
+
+    def test_expired_token_gets_an_envelope(self, fs_manager):
+        fs_manager, _ = fs_manager
+        result = asyncio.run(fs_manager.file_download("/home/expired/f", "expired"))
+        assert result["status"] == InkStatus.TOKEN_EXPIRED
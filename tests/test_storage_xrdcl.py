@@ -0,0 +1,103 @@
+"""Unit tests for the pooled XRootD client backend (fastink.storage.xrdcl).
+
+The XRootD python bindings are optional; tests that need the flag enums are
+skipped when they are not installed.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fastink.storage.xrdcl import ClientPool
+
+
+class TestUserURL:
+    def test_username_is_injected(self):
+        assert ClientPool.user_url("root://mgm.example.org:1094", "alice") == "root://alice@mgm.example.org:1094"
+
+    def test_existing_user_is_replaced(self):
+        assert ClientPool.user_url("root://bob@mgm:1094/", "alice") == "root://alice@mgm:1094"
+
+    def test_empty_username(self):
+        assert ClientPool.user_url("root://mgm:1094", "") == "root://mgm:1094"
+
+
+class TestStatEntry:
+    def test_entry_shape_matches_xrdfs_listing(self):
+        flags = pytest.importorskip("XRootD.client.flags")
+        from fastink.storage.xrdcl import stat_entry
+
+        info = SimpleNamespace(flags=flags.StatInfoFlags.IS_DIR, size=4096, modtime=0, mode=0o755,
+                               owner="alice", group="physics")
+        entry = stat_entry("/home/alice/data", info, raw=True)
+        assert entry["type"] == "directory"
+        assert entry["permission"] == "drwxr-xr-x"
+        assert entry["size"] == 4096
+        assert set(entry) == {"type", "permission", "user", "group", "size", "time", "path"}
+
+    def test_permission_from_flags(self):
+        flags = pytest.importorskip("XRootD.client.flags")
+        from fastink.storage.xrdcl import stat_permission
+
+        info = SimpleNamespace(flags=flags.StatInfoFlags.IS_READABLE | flags.StatInfoFlags.IS_WRITABLE)
+        assert stat_permission(info) == "-rw-r--r--"
+
+
+class TestChannelURL:
+    def test_ccache_travels_with_the_url(self):
+        url = ClientPool.channel_url("root://mgm:1094", "alice", "/tmp/krb5cc_1000", "/eos/a.txt")
+        assert url == "root://alice@mgm:1094//eos/a.txt?xrd.k5ccname=/tmp/krb5cc_1000"
+
+    def test_filesystem_url_without_ccache(self):
+        assert ClientPool.channel_url("root://mgm:1094", "alice", "") == "root://alice@mgm:1094//"
+
+
+class TestClientPool:
+    def _pool(self, monkeypatch, maxsize=2):
+        pool = ClientPool(maxsize=maxsize)
+        logins = []
+
+        def login(url):
+            logins.append(url)
+            time.sleep(0.05)
+            return object()
+
+        monkeypatch.setattr(pool, "_login", login)
+        return pool, logins
+
+    def test_concurrent_first_logins_are_shared(self, monkeypatch):
+        pool, logins = self._pool(monkeypatch)
+
+        async def main():
+            return await asyncio.gather(*[pool.get("alice", "/tmp/cc_a", "root://mgm") for _ in range(5)])
+
+        clients = asyncio.run(main())
+        assert len(logins) == 1
+        assert all(c is clients[0] for c in clients)
+
+    def test_identities_get_their_own_channel(self, monkeypatch):
+        pool, logins = self._pool(monkeypatch)
+
+        async def main():
+            await pool.get("alice", "/tmp/cc_a", "root://mgm")
+            await pool.get("bob", "/tmp/cc_b", "root://mgm")
+
+        asyncio.run(main())
+        assert logins == [
+            "root://alice@mgm//?xrd.k5ccname=/tmp/cc_a",
+            "root://bob@mgm//?xrd.k5ccname=/tmp/cc_b",
+        ]
+
+    def test_lru_eviction(self, monkeypatch):
+        pool, logins = self._pool(monkeypatch, maxsize=1)
+        closed = []
+        monkeypatch.setattr(pool, "_close", lambda key, fs: closed.append(key[0]))
+
+        async def main():
+            await pool.get("alice", "/tmp/cc_a", "root://mgm")
+            await pool.get("bob", "/tmp/cc_b", "root://mgm")
+
+        asyncio.run(main())
+        assert closed == ["alice"]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark list_path parsing of `xrdfs ls -l` output.
+
+Compares the per-line re.split/dateutil parser that list_path used to run
+with fastink.storage.listing on a synthetic listing, and times paging
+through the parsed result.
+
+    python3 tools/bench_listing.py [--lines 100000] [--links 100] [--repeat 3]
+"""
+
+import argparse, asyncio, os, random, re, time
+from dateutil import parser, tz
+from fastink.storage.listing import parse_listing, sort_entries, paginate
+from fastink.storage.utils import nice_size
+
+def synthetic_listing(lines: int, links: int, dname: str = "/eos/user/a/alice/data") -> str:
+    rnd = random.Random(42)
+    start = 1700000000
+    out = []
+    for i in range(lines):
+        ts = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + rnd.randrange(0, 86400 * 365)))
+        if i < links:
+            out.append(f"lrwxrwxrwx alice users 12 {ts} {dname}/link{i:06d} -> /tmp")
+        elif i % 10 == 0:
+            out.append(f"drwxr-xr-x alice users 4096 {ts} {dname}/dir{i:06d}")
+        else:
+            out.append(f"-rw-r--r-- alice users {rnd.randrange(0, 1 << 30)} {ts} {dname}/file {i:06d}.root")
+    return "\n".join(out) + "\n"
+
+def legacy_parse(ret: str, dname: str, showhidden: bool = False, raw: bool = False):
+    """ The list_path loop before fastink.storage.listing, minus logging. """
+    contents = []
+    for l in ret.split("\n"):
+        if len(l) == 0 or l[0:5] == "total":
+            continue
+        if l[4] == " ":
+            ll = re.split(r"\s+", l, maxsplit=4)
+            if os.path.basename(ll[4])[0] == "." and not showhidden:
+                continue
+            contents.append({"type": "directory", "path": ll[4]})
+            continue
+        if l[0] == "l":
+            l = l[:l.index(" -> ")]
+        ll = re.split(r"\s+", l, maxsplit=6)
+        if os.path.basename(ll[6])[0] == "." and not showhidden:
+            continue
+        if ll[0][0] == "l":
+            ll[0] = "drwxrwxrwx" if os.path.isdir(os.path.join(dname, ll[-1])) else "-rwxrwxrwx"
+        contents.append({
+            "type": "directory" if ll[0][0] == "d" else "file",
+            "permission": ll[0],
+            "user": ll[1],
+            "group": ll[2],
+            "size": nice_size(int(ll[3]), raw),
+            "time": str(parser.parse(f"{ll[4]} {ll[5]}").replace(tzinfo=tz.tzutc()).astimezone(tz.tzlocal()).replace(tzinfo=None)),
+            "path": ll[6],
+        })
+    return sorted(contents, key=lambda x: (x["type"] != "directory", x["path"]))
+
+def best_of(repeat: int, func):
+    best, result = None, None
+    for _ in range(repeat):
+        tm_start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - tm_start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    ap = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lines", type = int, default = 100000)
+    ap.add_argument("--links", type = int, default = 100)
+    ap.add_argument("--repeat", type = int, default = 3)
+    ap.add_argument("--page", type = int, default = 500)
+    args = ap.parse_args()
+
+    dname = "/eos/user/a/alice/data"
+    output = synthetic_listing(args.lines, args.links, dname)
+    print(f"{args.lines} lines, {args.links} symlinks, best of {args.repeat}")
+
+    legacy, old = best_of(args.repeat, lambda: legacy_parse(output, dname))
+    print(f"  legacy parser      {legacy:8.3f} s")
+    fast, new = best_of(args.repeat, lambda: asyncio.run(parse_listing(output, dname)))
+    print(f"  listing parser     {fast:8.3f} s   ({legacy / fast:.1f}x)")
+    if old != new:
+        print("  WARNING: results differ")
+
+    raw = asyncio.run(parse_listing(output, dname, raw = True))
+    sort_time, ordered = best_of(args.repeat, lambda: sort_entries(raw, key = "size", reverse = True))
+    print(f"  sort by size       {sort_time:8.3f} s")
+    page_time, _ = best_of(args.repeat, lambda: paginate(ordered, offset = len(ordered) // 2, limit = args.page))
+    print(f"  one page of {args.page:<6} {page_time:8.3f} s")
+
+if __name__ == "__main__":
+    main()
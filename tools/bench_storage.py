@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Benchmark the xrootd storage backend against fake xrdfs/xrdcp commands.
+
+tools/fake_xrd serves a scratch directory through stand-ins for xrdfs and
+xrdcp, so every operation pays the same fork/exec cost as in production, plus
+an optional simulated server latency. Each operation runs --iterations times
+with at most --concurrency in flight. The report shows p50/p95/p99 latency,
+client commands forked per operation and peak RSS.
+
+    INK_CONFIG_FILE=deploy/tests/ci/config.ci.yml PYTHONPATH=src \\
+        python3 tools/bench_storage.py --iterations 200 --concurrency 16 --latency 0.005
+
+Only the command environment and the sudo wrapper of fastink.storage.xrd are
+redirected; the code under test is unchanged.
+"""
+
+import argparse, asyncio, getpass, json, os, resource, shutil, sys, tempfile, time
+from typing import Any, Awaitable, Callable, Dict, List
+
+fake_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_xrd")
+all_ops = ["path_exist", "list_path", "get_file_stream", "upload_file", "prepare_zip_file", "delete_path"]
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def peak_rss_mb() -> Dict[str, float]:
+    #### ru_maxrss is in KiB on Linux
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.root = tempfile.mkdtemp(prefix = "ink-bench-")
+        self.log = os.path.join(self.root, "forks.log")
+        self.data = os.path.join(self.root, "ns")
+        self.username = getpass.getuser()
+        self.base = "/bench"
+
+    def forks(self) -> int:
+        try:
+            with open(self.log) as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def setup(self):
+        from fastink.storage import xrd
+        self.xrd = xrd
+        self.saved = {k: getattr(xrd, k) for k in ("xrd_env", "xrd_cmd", "krb5_enabled")}
+        env = {
+            "PATH": f"{fake_dir}:{os.environ.get('PATH', os.defpath)}",
+            "FAKE_XRD_ROOT": self.data,
+            "FAKE_XRD_LATENCY": str(self.args.latency),
+            "FAKE_XRD_LOG": self.log,
+        }
+        xrd.xrd_env = lambda krb5ccname, krb5_enabled = True: dict(env)
+        xrd.xrd_cmd = lambda base_cmd, username = "", krb5ccname = "", krb5_enabled = True: list(base_cmd)
+        xrd.krb5_enabled = False
+
+        listing = os.path.join(self.data, "bench/list")
+        os.makedirs(listing)
+        for i in range(self.args.files):
+            open(os.path.join(listing, f"file{i:06d}.dat"), "wb").close()
+        payload = os.urandom(self.args.file_size)
+        with open(os.path.join(self.data, "bench/blob"), "wb") as f:
+            f.write(payload)
+        os.makedirs(os.path.join(self.data, "bench/zip"))
+        for i in range(self.args.zip_files):
+            with open(os.path.join(self.data, f"bench/zip/member{i:04d}"), "wb") as f:
+                f.write(payload[: self.args.file_size // max(self.args.zip_files, 1)])
+        os.makedirs(os.path.join(self.data, "bench/up"))
+        os.makedirs(os.path.join(self.data, "bench/del"))
+        self.payload = payload
+
+    def make_tree(self, i: int) -> str:
+        top = os.path.join(self.data, f"bench/del/t{i}")
+        for d in range(self.args.tree_dirs):
+            os.makedirs(os.path.join(top, f"d{d}"))
+            for f in range(self.args.tree_files // max(self.args.tree_dirs, 1)):
+                open(os.path.join(top, f"d{d}/f{f}"), "wb").close()
+        return f"{self.base}/del/t{i}"
+
+    def ops(self) -> Dict[str, Callable[[int], Awaitable[Any]]]:
+        xrd, user, base = self.xrd, self.username, self.base
+
+        async def get_file_stream(i):
+            async for _ in xrd.get_file_stream(f"{base}/blob", user, krb5_enabled = False):
+                pass
+
+        async def prepare_zip_file(i):
+            out = os.path.join(self.root, f"bench-{i}.zip")
+            try:
+                await xrd.prepare_zip_file(out, f"{base}/zip", self.zip_list, username = user, krb5_enabled = False)
+            finally:
+                if os.path.exists(out):
+                    os.remove(out)
+
+        return {
+            "path_exist": lambda i: xrd.path_exist(f"{base}/blob", user),
+            "list_path": lambda i: xrd.list_path(f"{base}/list", user, raw = True),
+            "get_file_stream": get_file_stream,
+            "upload_file": lambda i: xrd.upload_file(self.payload, f"{base}/up/f{i}", user),
+            "prepare_zip_file": prepare_zip_file,
+            "delete_path": lambda i: xrd.delete_path(self.trees[i], user, krb5_enabled = False),
+        }
+
+    async def run_op(self, name: str, func: Callable[[int], Awaitable[Any]]) -> Dict[str, Any]:
+        n = self.args.iterations
+        if name == "delete_path":
+            #### Trees are created up front and not timed
+            self.trees = [self.make_tree(i) for i in range(n)]
+        slots = asyncio.Semaphore(self.args.concurrency)
+        latencies, errors = [], 0
+
+        async def one(i: int):
+            nonlocal errors
+            async with slots:
+                tm_start = time.perf_counter()
+                try:
+                    result = await func(i)
+                    if name == "delete_path" and not result:
+                        errors += 1
+                except Exception as e:
+                    errors += 1
+                    if errors == 1:
+                        print(f"  {name} failed: {e}", file = sys.stderr)
+                latencies.append(time.perf_counter() - tm_start)
+
+        forks_before = self.forks()
+        tm_start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(n)])
+        wall = time.perf_counter() - tm_start
+        return {
+            "op": name,
+            "n": n,
+            "errors": errors,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "ops_per_s": n / wall if wall else 0.0,
+            "forks_per_op": (self.forks() - forks_before) / n if n else 0.0,
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        ops = self.ops()
+        self.zip_list = await self.xrd.list_path(f"{self.base}/zip", self.username, raw = True)
+        results = []
+        for name in self.args.ops:
+            results.append(await self.run_op(name, ops[name]))
+        return {"params": {k: v for k, v in vars(self.args).items() if k != "json"}, "results": results, "peak_rss_mb": peak_rss_mb()}
+
+    def cleanup(self):
+        for k, v in getattr(self, "saved", {}).items():
+            setattr(self.xrd, k, v)
+        shutil.rmtree(self.root, ignore_errors = True)
+
+def report(summary: Dict[str, Any]):
+    p = summary["params"]
+    print(f"concurrency {p['concurrency']}, {p['iterations']} iterations, latency {p['latency']}s, "
+          f"{p['files']} entries listed, {p['file_size']} byte files")
+    print(f"{'op':<18}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'forks/op':>10}")
+    for r in summary["results"]:
+        print(f"{r['op']:<18}{r['n']:>6}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{r['ops_per_s']:>10.1f}{r['forks_per_op']:>10.2f}")
+    rss = summary["peak_rss_mb"]
+    print(f"peak RSS: {rss['self']:.1f} MiB (benchmark process), {rss['children']:.1f} MiB (largest command)")
+
+def main():
+    ap = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ops", nargs = "+", choices = all_ops, default = all_ops)
+    ap.add_argument("--iterations", type = int, default = 50)
+    ap.add_argument("--concurrency", type = int, default = 8)
+    ap.add_argument("--latency", type = float, default = 0.0, help = "seconds added to every fake command")
+    ap.add_argument("--files", type = int, default = 1000, help = "entries in the listed directory")
+    ap.add_argument("--file-size", type = int, default = 1024 * 1024)
+    ap.add_argument("--zip-files", type = int, default = 10)
+    ap.add_argument("--tree-files", type = int, default = 100, help = "files per tree removed by delete_path")
+    ap.add_argument("--tree-dirs", type = int, default = 5)
+    ap.add_argument("--json", help = "also write the results to this file")
+    args = ap.parse_args()
+
+    bench = Bench(args)
+    try:
+        bench.setup()
+        summary = asyncio.run(bench.run())
+    finally:
+        bench.cleanup()
+    report(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent = 2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Stand-ins for the xrdfs and xrdcp commands used by fastink.storage.xrd.
+
+Paths are served from the local directory FAKE_XRD_ROOT, so "root://host//a/b"
+is FAKE_XRD_ROOT/a/b. Only the subcommands and flags FastINK issues are
+implemented, with output in the format of the real clients.
+
+Environment:
+    FAKE_XRD_ROOT     directory holding the namespace (required)
+    FAKE_XRD_LATENCY  seconds to sleep before every command (default 0)
+    FAKE_XRD_LOG      file that gets one line per invocation, to count forks
+"""
+
+import os, shutil, stat, sys, time
+
+ENOENT = 54
+
+def root() -> str:
+    try:
+        return os.environ["FAKE_XRD_ROOT"]
+    except KeyError:
+        sys.exit("FAKE_XRD_ROOT is not set")
+
+def local(path: str) -> str:
+    """ "root://host:1094//a/b", "root://host//a/b" or "/a/b" -> local path. """
+    if "://" in path:
+        path = path.split("://", 1)[1]
+        path = path[path.index("/"):] if "/" in path else "/"
+    path = os.path.normpath("/" + path.lstrip("/"))
+    return os.path.join(root(), path.lstrip("/"))
+
+def remote(path: str) -> str:
+    rel = os.path.relpath(path, root())
+    return "/" if rel == "." else "/" + rel
+
+def error(msg: str, code: int = ENOENT):
+    sys.stderr.write(f"[ERROR] Server responded with an error: [3011] {msg}\n")
+    sys.exit(code)
+
+def begin(tag: str):
+    latency = float(os.environ.get("FAKE_XRD_LATENCY") or 0)
+    log = os.environ.get("FAKE_XRD_LOG")
+    if log:
+        with open(log, "a") as f:
+            f.write(tag + "\n")
+    if latency > 0:
+        time.sleep(latency)
+
+def ls_line(path: str) -> str:
+    st = os.lstat(path)
+    mtime = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(st.st_mtime))
+    return f"{stat.filemode(st.st_mode)} fake fake {st.st_size} {mtime} {remote(path)}"
+
+def xrdfs_stat(args):
+    path = local(args[0])
+    if not os.path.exists(path):
+        error("No such file or directory")
+    st = os.stat(path)
+    flags = "XBitSet|IsDir|IsReadable" if stat.S_ISDIR(st.st_mode) else "IsReadable|IsWritable"
+    print(f"Path:   {remote(path)}\nId:     {st.st_ino}\nSize:   {st.st_size}\n"
+          f"MTime:  {time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(st.st_mtime))}\nFlags:  0 ({flags})")
+
+def xrdfs_ls(args):
+    long = recursive = hidden = False
+    paths = []
+    for a in args:
+        if a.startswith("-"):
+            long, recursive, hidden = long or "l" in a, recursive or "R" in a, hidden or "a" in a
+        else:
+            paths.append(a)
+    path = local(paths[0])
+    if not os.path.isdir(path):
+        if os.path.exists(path):
+            print(ls_line(path) if long else remote(path))
+            return
+        error("No such file or directory")
+    out = []
+    for cur, dirs, files in os.walk(path):
+        if not hidden:
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in sorted(dirs + files):
+            if name.startswith(".") and not hidden:
+                continue
+            full = os.path.join(cur, name)
+            out.append(ls_line(full) if long else remote(full))
+        if not recursive:
+            break
+    if out:
+        sys.stdout.write("\n".join(out) + "\n")
+
+def xrdfs_mkdir(args):
+    paths = [a for a in args if not a.startswith("-")]
+    parents = "-p" in args
+    for p in paths:
+        try:
+            os.makedirs(local(p), exist_ok = parents) if parents else os.mkdir(local(p))
+        except FileExistsError:
+            error("File exists", 1)
+        except FileNotFoundError:
+            error("No such file or directory")
+
+def xrdfs_rm(args):
+    failed = False
+    for p in args:
+        try:
+            os.remove(local(p))
+        except OSError as e:
+            sys.stderr.write(f"[ERROR] Server responded with an error: [3011] {p}: {e.strerror}\n")
+            failed = True
+    if failed:
+        sys.exit(ENOENT)
+
+def xrdfs_rmdir(args):
+    try:
+        os.rmdir(local(args[0]))
+    except OSError as e:
+        error(e.strerror)
+
+def xrdfs_mv(args):
+    try:
+        os.rename(local(args[0]), local(args[1]))
+    except OSError as e:
+        error(e.strerror)
+
+def xrdfs_chmod(args):
+    if not os.path.exists(local(args[0])):
+        error("No such file or directory")
+
+def xrdfs_cat(args):
+    try:
+        with open(local(args[0]), "rb") as f:
+            shutil.copyfileobj(f, sys.stdout.buffer)
+    except OSError as e:
+        error(e.strerror)
+
+xrdfs_commands = {
+    "stat": xrdfs_stat, "ls": xrdfs_ls, "mkdir": xrdfs_mkdir, "rm": xrdfs_rm, "rmdir": xrdfs_rmdir,
+    "mv": xrdfs_mv, "chmod": xrdfs_chmod, "cat": xrdfs_cat,
+}
+
+def xrdfs(argv):
+    """ xrdfs <url> <command> [args] """
+    begin(f"xrdfs {argv[2] if len(argv) > 2 else ''}")
+    if len(argv) < 3 or argv[2] not in xrdfs_commands:
+        error(f"Unsupported command {' '.join(argv[1:3])}", 50)
+    xrdfs_commands[argv[2]](argv[3:])
+
+def xrdcp(argv):
+    """ xrdcp [-N] [-f] [--retry n] <src> <dst>, "-" is stdin/stdout. """
+    begin("xrdcp")
+    args, i = [], 1
+    while i < len(argv):
+        if argv[i] == "--retry":
+            i += 2
+            continue
+        if argv[i] in ("-N", "-f", "-s"):
+            i += 1
+            continue
+        args.append(argv[i])
+        i += 1
+    src, dst = args
+    try:
+        fin = sys.stdin.buffer if src == "-" else open(local(src), "rb")
+        fout = sys.stdout.buffer if dst == "-" else open(local(dst), "wb")
+        with fin, fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+    except OSError as e:
+        error(e.strerror)